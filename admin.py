@@ -14,6 +14,7 @@ import logging
 import os
 import secrets
 import time
+from datetime import datetime, timedelta, timezone
 
 import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
@@ -22,6 +23,8 @@ from flask_login import current_user, login_required, login_user, logout_user
 import dbstore
 import poller
 import notifier
+import reqtiming
+import upstreamstats
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -31,6 +34,9 @@ admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 # post-password session cookie could be used to complete login later.
 MFA_CHALLENGE_TTL_SECONDS = 5 * 60
 
+# Longest range /api/metrics-history serves - the daily rollup's retention.
+METRICS_HISTORY_MAX_HOURS = dbstore.METRICS_ROLLUP_TIERS[-1][2]
+
 
 def _read_app_version() -> str:
     """Read the app version from the repo-root VERSION file, once at import.
@@ -101,9 +107,10 @@ def _needs_bootstrap() -> bool:
 
 def _validate_tailscale_credentials(tailnet_domain: str, auth_header: dict):
     """Trial call against the Tailscale devices API; raises on failure."""
-    url = f"https://api.tailscale.com/api/v2/tailnet/{tailnet_domain}/devices"
-    response = requests.get(url, headers=auth_header, timeout=10)
-    response.raise_for_status()
+    url = poller.api_url(f"/api/v2/tailnet/{tailnet_domain}/devices")
+    with upstreamstats.observe("credential_validation") as call:
+        call.response = requests.get(url, headers=auth_header, timeout=10)
+    call.response.raise_for_status()
 
 
 # ---------------------------------------------------------------------------
@@ -231,11 +238,13 @@ def api_setup():
             if not client_id or not client_secret:
                 return jsonify({"error": "OAuth client id and secret are required"}), 400
             try:
-                token_resp = requests.post(
-                    "https://api.tailscale.com/api/v2/oauth/token",
-                    data={"client_id": client_id, "client_secret": client_secret},
-                    timeout=10,
-                )
+                with upstreamstats.observe("credential_validation") as call:
+                    call.response = requests.post(
+                        poller.api_url("/api/v2/oauth/token"),
+                        data={"client_id": client_id, "client_secret": client_secret},
+                        timeout=10,
+                    )
+                token_resp = call.response
                 token_resp.raise_for_status()
                 access_token = token_resp.json()["access_token"]
                 _validate_tailscale_credentials(tailnet_domain, {"Authorization": f"Bearer {access_token}"})
@@ -286,9 +295,10 @@ def api_setup():
 
     response["setup_complete"] = not _setup_incomplete()
     if response.get("connection_configured"):
-        # Kick off an immediate poll so the dashboard has data right away.
+        # Queue an immediate poll so the dashboard has data right away.
         try:
-            poller.run_poll_cycle()
+            job, _created = dbstore.enqueue_poll_job(requested_by="setup")
+            response["poll_job_id"] = job["id"]
         except Exception as e:  # pragma: no cover - best effort
             logging.warning(f"Post-setup poll trigger failed: {e}")
     return jsonify(response)
@@ -524,23 +534,36 @@ def api_notifications_test():
 @admin_bp.route("/api/poll-now", methods=["POST"])
 @login_required
 def api_poll_now():
-    # Takes the same claim /health/cache/invalidate does. Without it, clicking
-    # "Poll now" ran a second full cycle concurrently with the background
-    # poller (or with another admin's click), so two cycles raced on the same
-    # upsert + audit-diff writes.
-    if not dbstore.try_claim_manual_poll():
-        return jsonify({
-            "ok": False,
-            "message": "A refresh is already in progress; try again shortly.",
-            "last_polled_at": dbstore.get_poll_meta(),
-        }), 202
+    # Enqueued to the poller like /health/cache/invalidate, never run here:
+    # the cycle always happens in the one process that polls, so it can't
+    # race the scheduled cycle on the same upsert + audit-diff writes, and
+    # this worker is free again immediately. A click while a refresh is
+    # already queued/running joins that job (coalesced: true).
+    job, created = dbstore.enqueue_poll_job(requested_by=current_user.username)
+    return jsonify({
+        "ok": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "coalesced": not created,
+        "status_url": url_for("admin.api_poll_job", job_id=job["id"]),
+        "last_polled_at": dbstore.get_poll_meta(),
+    }), 202
+
+
+@admin_bp.route("/api/poll-now/<job_id>", methods=["GET"])
+@login_required
+def api_poll_job(job_id):
     try:
-        poller.run_poll_cycle()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        dbstore.release_manual_poll_claim()
-    return jsonify({"ok": True, "last_polled_at": dbstore.get_poll_meta()})
+        wait = float(request.args.get("wait", 0))
+    except (TypeError, ValueError):
+        wait = 0.0
+    job, waited = poller.wait_for_poll_job(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    if not waited:
+        # Too many long-polls open in this worker; see poller.POLL_JOB_MAX_WAITERS.
+        return jsonify(job), 202, {"Retry-After": "1"}
+    return jsonify(job)
 
 
 @admin_bp.route("/api/users", methods=["GET"])
@@ -577,11 +600,22 @@ def api_delete_user(username):
 @admin_bp.route("/api/audit", methods=["GET"])
 @login_required
 def api_audit_log():
+    """One page of the audit log plus the filtered `total`.
+
+    Page with `cursor` (the previous page's `next_cursor`) - a keyset seek,
+    constant cost however deep you go. `offset` is still accepted for older
+    clients but costs O(offset)."""
     try:
         limit = max(1, min(500, int(request.args.get("limit", 100))))
         offset = max(0, int(request.args.get("offset", 0)))
     except ValueError:
         return jsonify({"error": "limit/offset must be integers"}), 400
+    before = None
+    if request.args.get("cursor"):
+        try:
+            before = dbstore.decode_audit_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
     filters = {
         "entity_type": request.args.get("entity_type") or None,
         "entity_id": request.args.get("entity_id") or None,
@@ -592,7 +626,10 @@ def api_audit_log():
         "changed_field": request.args.get("changed_field") or None,
         "changes_contains": (request.args.get("changes_contains") or "").strip() or None,
     }
-    entries = dbstore.list_audit_log(limit=limit, offset=offset, **filters)
+    # One extra row tells whether there is a next page without a second query.
+    entries = dbstore.list_audit_log(limit=limit + 1, offset=offset, before=before, **filters)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
     # `total` is what lets the UI paginate and say how much it isn't showing -
     # without it a truncated result was indistinguishable from a complete one.
     return jsonify({
@@ -600,6 +637,7 @@ def api_audit_log():
         "total": dbstore.count_audit_log(**filters),
         "limit": limit,
         "offset": offset,
+        "next_cursor": dbstore.encode_audit_cursor(entries[-1]) if has_more else None,
     })
 
 
@@ -621,11 +659,62 @@ def api_audit_filters():
 @admin_bp.route("/api/metrics-history", methods=["GET"])
 @login_required
 def api_metrics_history():
+    """Trend data for the dashboard. Ranges past the raw rows' 48h (or with
+    more rows than `points`) are served from the 5-minute/hourly/daily
+    rollups; `resolution` says which."""
     try:
-        hours = max(1, min(168, int(request.args.get("hours", 24))))
+        hours = max(1, min(METRICS_HISTORY_MAX_HOURS, int(request.args.get("hours", 24))))
+        points = max(10, min(5000, int(request.args.get("points", dbstore.METRICS_HISTORY_MAX_POINTS))))
+    except ValueError:
+        return jsonify({"error": "hours and points must be integers"}), 400
+    return jsonify(dbstore.get_metrics_series(hours=hours, max_points=points))
+
+
+@admin_bp.route("/api/devices/<device_id>/health-history", methods=["GET"])
+@login_required
+def api_device_health_history(device_id):
+    """Uptime percentage and state intervals per health dimension
+    (healthy/online/key/update/lock) for one device over the last `hours`."""
+    try:
+        hours = max(1, min(24 * dbstore.DEVICE_HEALTH_HISTORY_RETENTION_DAYS, int(request.args.get("hours", 24))))
     except ValueError:
         return jsonify({"error": "hours must be an integer"}), 400
-    return jsonify({"entries": dbstore.get_metrics_history(hours=hours)})
+    start = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return jsonify(dbstore.get_device_health_history(device_id, start))
+
+
+@admin_bp.route("/api/debug/request-latency", methods=["GET"])
+@login_required
+def api_request_latency():
+    """Per-route request latency percentiles over the last `minutes`
+    (default 60), across all workers (see reqtiming.py)."""
+    try:
+        minutes = max(1, min(dbstore.REQUEST_LATENCY_RETENTION_MINUTES, int(request.args.get("minutes", 60))))
+    except ValueError:
+        return jsonify({"error": "minutes must be an integer"}), 400
+    routes = [
+        {"route": route, **reqtiming.summarize(counts)}
+        for route, counts in dbstore.get_request_latency(minutes).items()
+    ]
+    routes.sort(key=lambda r: -r["count"])
+    return jsonify({"minutes": minutes, "routes": routes, "flush_seconds": reqtiming.FLUSH_SECONDS})
+
+
+@admin_bp.route("/api/debug/upstream", methods=["GET"])
+@login_required
+def api_upstream_calls():
+    """Per-endpoint Tailscale API call statistics over the last `minutes`
+    (default 60), from every process that made calls (see upstreamstats.py)."""
+    try:
+        minutes = max(1, min(dbstore.UPSTREAM_CALLS_RETENTION_MINUTES, int(request.args.get("minutes", 60))))
+    except ValueError:
+        return jsonify({"error": "minutes must be an integer"}), 400
+    endpoints = [
+        {"endpoint": endpoint, **upstreamstats.summarize(values)}
+        for endpoint, values in dbstore.get_upstream_calls(minutes).items()
+    ]
+    endpoints.sort(key=lambda e: -e["calls"])
+    return jsonify({"minutes": minutes, "endpoints": endpoints})
 
 
 @admin_bp.route("/api/debug/poller-log", methods=["GET"])
@@ -643,4 +732,5 @@ def api_poller_log():
         "enabled": dbstore.get_setting_typed("debug_log_enabled"),
         "last_polled_at": dbstore.get_poll_meta(),
         "poll_interval_seconds": poller.poll_interval_seconds(),
+        "cycle_timing": dbstore.get_poll_cycle_timing_summary(),
     })
@@ -5,18 +5,24 @@ it is synced into the DB (source='env') on process startup so that removing the
 env later leaves the last-known-good value intact (source stays 'env' until a
 human explicitly changes it via the admin UI, which writes source='db').
 """
+import base64
+import fcntl
+import hashlib
 import os
 import json
+import math
 import secrets
 import sqlite3
 import tempfile
+import threading
 import time
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 
-import pyotp
 from werkzeug.security import generate_password_hash, check_password_hash
 
+import reqtiming
+
 # Every runtime-configurable app setting, keyed by DB setting name. Each spec
 # is (env_var, type, default, sentinel, group):
 #   - env_var: the environment variable that overrides the DB value when set
@@ -93,6 +99,12 @@ SETTINGS_REGISTRY = {
     # General
     "timezone": ("TIMEZONE", "str", "UTC", None, "general"),
     "http_timeout": ("HTTP_TIMEOUT", "float", 10.0, None, "general"),
+    # Seconds a worker reuses a computed /health (and /health/healthy,
+    # /health/unhealthy, /health/<identifier>) response while neither the
+    # device snapshot nor any setting has changed. Concurrent requests for
+    # the same response always share one computation; 0 disables reuse
+    # beyond that.
+    "health_cache_seconds": ("HEALTH_CACHE_SECONDS", "float", 5.0, None, "general"),
     # Takes effect on next process restart only (logging.basicConfig runs once at import).
     "log_level": ("LOG_LEVEL", "str", "INFO", None, "logging"),
     # Whether the background poller records into its in-memory ring buffer
@@ -137,6 +149,22 @@ SETTINGS_REGISTRY = {
     "backoff_base_seconds": ("BACKOFF_BASE_SECONDS", "float", 0.5, None, "retry"),
     "backoff_max_seconds": ("BACKOFF_MAX_SECONDS", "float", 8.0, None, "retry"),
     "backoff_jitter_seconds": ("BACKOFF_JITTER_SECONDS", "float", 0.1, None, "retry"),
+    # Circuit breaker in front of the Tailscale API: after this many
+    # consecutive upstream failures (429/5xx, timeouts, dropped connections -
+    # never a 401/403/404, those are config problems retrying can't fix) the
+    # poller stops calling upstream for the cool-off window and keeps serving
+    # the last snapshot, flagged degraded in poll_meta. 0 disables the breaker.
+    "circuit_breaker_threshold": ("CIRCUIT_BREAKER_THRESHOLD", "int", 5, None, "retry"),
+    "circuit_breaker_cooldown_seconds": ("CIRCUIT_BREAKER_COOLDOWN_SECONDS", "int", 300, None, "retry"),
+
+    # /metrics per-device series. `all`, `unhealthy` (only devices that are
+    # currently unhealthy get series) or `none`; labels beyond the always-
+    # present `id` are a comma-separated subset of device, hostname, os,
+    # tags; and at most max_devices devices are exported (0 = no cap), so
+    # a large tailnet can't blow up the scraper's series count.
+    "metrics_device_gauges": ("METRICS_DEVICE_GAUGES", "str", "all", None, "metrics"),
+    "metrics_device_labels": ("METRICS_DEVICE_LABELS", "str", "device", None, "metrics"),
+    "metrics_max_devices": ("METRICS_MAX_DEVICES", "int", 2000, None, "metrics"),
 
     # Poller / audit
     "poll_interval_seconds": ("POLL_INTERVAL_SECONDS", "int", 60, None, "poll"),
@@ -171,6 +199,39 @@ SETTINGS_REGISTRY = {
     # flapping across the healthy line still produces one alert per flap.
     # 0 (the default) keeps the previous behavior: every transition notifies.
     "notification_cooldown_minutes": ("NOTIFICATION_COOLDOWN_MINUTES", "int", 0, None, "notifications"),
+    # Delivery of queued notifications (notification_outbox) by the
+    # poller's background dispatcher: parallel Apprise requests, per-request
+    # timeout, and how many attempts (with exponential backoff) before a
+    # notification is dead-lettered.
+    "notification_concurrency": ("NOTIFICATION_CONCURRENCY", "int", 4, None, "notifications"),
+    "notification_timeout_seconds": ("NOTIFICATION_TIMEOUT_SECONDS", "int", 10, None, "notifications"),
+    "notification_max_attempts": ("NOTIFICATION_MAX_ATTEMPTS", "int", 6, None, "notifications"),
+    # Digest mode: deliver every queued notification of the same event type
+    # as one message (a count plus a truncated list) instead of one per
+    # device. The window holds the first one back that many seconds so
+    # later transitions can join it; 0 groups what a single poll cycle queued.
+    "notification_digest": ("NOTIFICATION_DIGEST", "bool", False, None, "notifications"),
+    "notification_digest_window_seconds": ("NOTIFICATION_DIGEST_WINDOW_SECONDS", "int", 0, None, "notifications"),
+    # Global send budget (token bucket) shared by every event type: at most
+    # rate_per_minute messages on average, bursts of up to `burst` (0 = the
+    # same as the rate). Whatever doesn't fit goes out as one summary
+    # message. 0 disables the budget.
+    "notification_rate_per_minute": ("NOTIFICATION_RATE_PER_MINUTE", "int", 0, None, "notifications"),
+    "notification_rate_burst": ("NOTIFICATION_RATE_BURST", "int", 0, None, "notifications"),
+}
+
+# audit_log and poller_log are views over one table per UTC day, and SQLite
+# refuses a compound SELECT of more than 500 terms - past that, rebuilding
+# the view (on the first write of each day) fails and takes the audit write
+# and the poll cycle with it. Retention, and so the number of day
+# partitions, stays well below that.
+LOG_RETENTION_MAX_DAYS = 400
+
+# Inclusive (min, max) for int settings that have one; validate_setting_value()
+# rejects values outside it and the getters clamp env-provided ones.
+SETTING_INT_RANGES = {
+    "audit_retention_days": (1, LOG_RETENTION_MAX_DAYS),
+    "poller_log_retention_days": (1, LOG_RETENTION_MAX_DAYS),
 }
 
 # Device/key fields that trigger an audit_log row when changed. `last_seen`
@@ -261,188 +322,552 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+# What this process has written: transactions that changed anything, and
+# rows changed (sqlite total_changes, triggers included). The poller
+# reports the difference across each cycle - see poller.run_poll_cycle().
+WRITE_STATS = {"transactions": 0, "rows": 0}
+_write_stats_lock = threading.Lock()
+
+
 @contextmanager
 def get_connection():
-    conn = sqlite3.connect(_current_database_path(), timeout=30, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    # Time holding a connection - opening it, the queries, and whatever the
+    # caller does inside the block - is the request's "db" phase.
+    with reqtiming.phase("db"):
+        conn = sqlite3.connect(_current_database_path(), timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA foreign_keys=ON")
+            yield conn
+            conn.commit()
+            if conn.total_changes:
+                with _write_stats_lock:
+                    WRITE_STATS["transactions"] += 1
+                    WRITE_STATS["rows"] += conn.total_changes
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Schema migrations
+# ---------------------------------------------------------------------------
+
+# The schema as of the first versioned release. CREATE ... IF NOT EXISTS,
+# because databases from before schema_version already have some or all of it.
+_BASELINE_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT,
+            source TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            last_login_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS devices (
+            device_id TEXT PRIMARY KEY,
+            name TEXT,
+            hostname TEXT,
+            os TEXT,
+            client_version TEXT,
+            update_available INTEGER,
+            connected_to_control INTEGER,
+            last_seen TEXT,
+            key_expiry_disabled INTEGER,
+            expires TEXT,
+            tags TEXT,
+            tailnet_lock_error TEXT,
+            raw_json TEXT NOT NULL,
+            first_seen_at TEXT NOT NULL,
+            last_polled_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS tailnet_keys (
+            key_id TEXT PRIMARY KEY,
+            description TEXT,
+            key_type TEXT,
+            capabilities TEXT,
+            created TEXT,
+            expires TEXT,
+            raw_json TEXT NOT NULL,
+            first_seen_at TEXT NOT NULL,
+            last_polled_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS metrics_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            occurred_at TEXT NOT NULL,
+            counter_healthy_true INTEGER,
+            counter_healthy_false INTEGER,
+            counter_healthy_online_true INTEGER,
+            counter_healthy_online_false INTEGER,
+            counter_key_healthy_true INTEGER,
+            counter_key_healthy_false INTEGER,
+            counter_update_healthy_true INTEGER,
+            counter_update_healthy_false INTEGER,
+            keys_counter_healthy_true INTEGER,
+            keys_counter_healthy_false INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_metrics_history_occurred_at ON metrics_history(occurred_at);
+
+        CREATE TABLE IF NOT EXISTS user_recovery_codes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            code_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            used_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_user_recovery_codes_user_id ON user_recovery_codes(user_id);
+
+        -- Fixed-window per-IP counter guarding /admin/api/login and
+        -- /admin/api/login/mfa against brute-force, independent of the
+        -- general-purpose request rate limiter (which the login routes
+        -- are otherwise not specifically bound by).
+        CREATE TABLE IF NOT EXISTS login_rate_limit (
+            ip TEXT PRIMARY KEY,
+            window_start INTEGER NOT NULL,
+            count INTEGER NOT NULL
+        );
+
+        -- One row per (entity_type, entity_id) tracking the healthy/
+        -- unhealthy status observed on the *previous* poll cycle, so the
+        -- notifier (notifier.py) can fire only on a transition, not on
+        -- every poll. Kept separate from devices/tailnet_keys (whose
+        -- rows get fully replaced each poll) so this survives across
+        -- upserts and worker restarts.
+        CREATE TABLE IF NOT EXISTS entity_health_state (
+            entity_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            healthy INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (entity_type, entity_id)
+        );
+
+        -- When each (event_type, entity_id) pair last actually notified,
+        -- so notification_cooldown_minutes can suppress a device that
+        -- flaps across the healthy/unhealthy line repeatedly. Separate
+        -- from entity_health_state because the key is the event, not the
+        -- entity: one device has independent cooldowns for
+        -- device_unhealthy and device_needs_signing.
+        CREATE TABLE IF NOT EXISTS notification_state (
+            event_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            last_notified_at TEXT NOT NULL,
+            PRIMARY KEY (event_type, entity_id)
+        );
+
+        -- Manual refresh requests (/health/cache/invalidate,
+        -- /admin/api/poll-now) queued for the poller process, which is the
+        -- only thing that talks to the Tailscale API - the request thread
+        -- just inserts a row and returns 202 with the job id.
+        CREATE TABLE IF NOT EXISTS poll_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            requested_by TEXT,
+            requested_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            error TEXT,
+            last_polled_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_poll_jobs_status ON poll_jobs(status, requested_at);
+
+        -- Notifications waiting for (or done with) delivery by the
+        -- poller's dispatcher thread. The poll cycle only inserts rows;
+        -- next_attempt_at doubles as the claim lease while 'sending', so
+        -- a row claimed by a process that died is retried after restart.
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            target TEXT,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            finished_at TEXT,
+            last_error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox(status, next_attempt_at);
+
+        -- Per-device health timeline, run-length encoded: one row per
+        -- (device, dimension) interval with a constant state, opened and
+        -- closed only on a transition - grows with transitions, not polls.
+        -- ended_at is NULL for the current interval.
+        CREATE TABLE IF NOT EXISTS device_health_intervals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device_id TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            healthy INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            ended_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_device_health_intervals
+            ON device_health_intervals(device_id, dimension, started_at);
+        CREATE INDEX IF NOT EXISTS idx_device_health_intervals_open
+            ON device_health_intervals(device_id, dimension) WHERE ended_at IS NULL;
+
+        -- The Tailscale OAuth access token, shared by every process
+        -- (times are epoch seconds). lease_owner/lease_until mark the one
+        -- caller currently fetching a replacement, so workers never
+        -- fetch tokens concurrently.
+        CREATE TABLE IF NOT EXISTS oauth_tokens (
+            client_id TEXT PRIMARY KEY,
+            access_token TEXT,
+            fetched_at REAL,
+            renew_at REAL,
+            expires_at REAL,
+            lease_owner TEXT,
+            lease_until REAL
+        );
+"""
+
+
+def _migrate_baseline(conn):
+    # One execute() per statement rather than executescript(), which would
+    # COMMIT init_db()'s transaction before running and leave the tables
+    # created apart from their schema_version row.
+    for statement in _BASELINE_SCHEMA.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _add_missing_columns(conn, table: str, columns: dict):
+    """ALTER TABLE ADD COLUMN for each of `columns` (name -> DDL) the table
+    lacks - the pre-schema_version upgrades may or may not have run."""
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
+def _migrate_users_mfa(conn):
+    _add_missing_columns(conn, "users", {"totp_secret": "TEXT", "totp_enabled": "INTEGER NOT NULL DEFAULT 0"})
+
+
+def _migrate_devices_tailnet_lock(conn):
+    _add_missing_columns(conn, "devices", {"tailnet_lock_error": "TEXT"})
+
+
+def _migrate_metrics_rollup(conn):
+    _init_metrics_rollup(conn)
+
+
+def _migrate_log_partitions(conn):
+    for base in _PARTITIONED_LOGS:
+        _init_log_partitions(conn, base)
+
+
+def _migrate_audit_facets(conn):
+    _init_audit_facets(conn)
+
+
+def _migrate_device_feed(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS device_feed (
+            device_id TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            payload TEXT,
+            changed_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_device_feed_generation ON device_feed(generation)")
+
+
+def _migrate_request_latency(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS request_latency (
+            minute INTEGER NOT NULL,
+            route TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (minute, route, bucket)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _migrate_poll_cycle_timing(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS poll_cycle_timing (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            completed_at TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            phases TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _migrate_upstream_calls(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS upstream_calls (
+            minute INTEGER NOT NULL,
+            endpoint TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (minute, endpoint, metric, key)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+# Ordered (version, description, migrate(conn)). Append only: a released
+# version number is never reused or edited. Each step runs in its own
+# transaction together with its schema_version row.
+SCHEMA_MIGRATIONS = (
+    (1, "baseline schema", _migrate_baseline),
+    (2, "users: totp_secret, totp_enabled", _migrate_users_mfa),
+    (3, "devices: tailnet_lock_error", _migrate_devices_tailnet_lock),
+    (4, "metrics_rollup tiers", _migrate_metrics_rollup),
+    (5, "day-partitioned audit_log and poller_log", _migrate_log_partitions),
+    (6, "audit_facets", _migrate_audit_facets),
+    (7, "device_feed change log", _migrate_device_feed),
+    (8, "request_latency histograms", _migrate_request_latency),
+    (9, "poll_cycle_timing history", _migrate_poll_cycle_timing),
+    (10, "upstream_calls statistics", _migrate_upstream_calls),
+)
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+_SCHEMA_VERSION_SQL = (
+    "CREATE TABLE IF NOT EXISTS schema_version ("
+    "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TEXT NOT NULL)"
+)
+
+
+def _schema_version(conn) -> int:
     try:
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA busy_timeout=30000")
-        conn.execute("PRAGMA foreign_keys=ON")
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    except sqlite3.OperationalError:  # no such table: a new or pre-schema_version database
+        return 0
 
 
 def init_db():
-    """Create schema if it doesn't already exist. Safe to call repeatedly."""
-    with get_connection() as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS settings (
-                name TEXT PRIMARY KEY,
-                value TEXT,
-                source TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                last_login_at TEXT
-            );
-
-            CREATE TABLE IF NOT EXISTS devices (
-                device_id TEXT PRIMARY KEY,
-                name TEXT,
-                hostname TEXT,
-                os TEXT,
-                client_version TEXT,
-                update_available INTEGER,
-                connected_to_control INTEGER,
-                last_seen TEXT,
-                key_expiry_disabled INTEGER,
-                expires TEXT,
-                tags TEXT,
-                tailnet_lock_error TEXT,
-                raw_json TEXT NOT NULL,
-                first_seen_at TEXT NOT NULL,
-                last_polled_at TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS tailnet_keys (
-                key_id TEXT PRIMARY KEY,
-                description TEXT,
-                key_type TEXT,
-                capabilities TEXT,
-                created TEXT,
-                expires TEXT,
-                raw_json TEXT NOT NULL,
-                first_seen_at TEXT NOT NULL,
-                last_polled_at TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                occurred_at TEXT NOT NULL,
-                entity_type TEXT NOT NULL,
-                entity_id TEXT NOT NULL,
-                action TEXT NOT NULL,
-                changes TEXT NOT NULL,
-                actor TEXT
-            );
-            CREATE INDEX IF NOT EXISTS idx_audit_occurred_at ON audit_log(occurred_at);
-            -- list_audit_log()/count_audit_log() filter on these columns and
-            -- always order by occurred_at DESC; without a composite index every
-            -- filtered page (and its COUNT) was a full scan of a table that
-            -- grows at poll frequency.
-            CREATE INDEX IF NOT EXISTS idx_audit_entity ON audit_log(entity_type, entity_id, occurred_at);
-            CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log(action, occurred_at);
-            CREATE INDEX IF NOT EXISTS idx_audit_actor ON audit_log(actor, occurred_at);
-
-            CREATE TABLE IF NOT EXISTS metrics_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                occurred_at TEXT NOT NULL,
-                counter_healthy_true INTEGER,
-                counter_healthy_false INTEGER,
-                counter_healthy_online_true INTEGER,
-                counter_healthy_online_false INTEGER,
-                counter_key_healthy_true INTEGER,
-                counter_key_healthy_false INTEGER,
-                counter_update_healthy_true INTEGER,
-                counter_update_healthy_false INTEGER,
-                keys_counter_healthy_true INTEGER,
-                keys_counter_healthy_false INTEGER
-            );
-            CREATE INDEX IF NOT EXISTS idx_metrics_history_occurred_at ON metrics_history(occurred_at);
-
-            CREATE TABLE IF NOT EXISTS poller_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                occurred_at TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                detail TEXT
-            );
-            CREATE INDEX IF NOT EXISTS idx_poller_log_occurred_at ON poller_log(occurred_at);
-            CREATE INDEX IF NOT EXISTS idx_poller_log_event_type ON poller_log(event_type);
-
-            CREATE TABLE IF NOT EXISTS user_recovery_codes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                code_hash TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                used_at TEXT
-            );
-            CREATE INDEX IF NOT EXISTS idx_user_recovery_codes_user_id ON user_recovery_codes(user_id);
-
-            -- Fixed-window per-IP counter guarding /admin/api/login and
-            -- /admin/api/login/mfa against brute-force, independent of the
-            -- general-purpose request rate limiter (which the login routes
-            -- are otherwise not specifically bound by).
-            CREATE TABLE IF NOT EXISTS login_rate_limit (
-                ip TEXT PRIMARY KEY,
-                window_start INTEGER NOT NULL,
-                count INTEGER NOT NULL
-            );
-
-            -- One row per (entity_type, entity_id) tracking the healthy/
-            -- unhealthy status observed on the *previous* poll cycle, so the
-            -- notifier (notifier.py) can fire only on a transition, not on
-            -- every poll. Kept separate from devices/tailnet_keys (whose
-            -- rows get fully replaced each poll) so this survives across
-            -- upserts and worker restarts.
-            CREATE TABLE IF NOT EXISTS entity_health_state (
-                entity_type TEXT NOT NULL,
-                entity_id TEXT NOT NULL,
-                healthy INTEGER NOT NULL,
-                updated_at TEXT NOT NULL,
-                PRIMARY KEY (entity_type, entity_id)
-            );
-
-            -- When each (event_type, entity_id) pair last actually notified,
-            -- so notification_cooldown_minutes can suppress a device that
-            -- flaps across the healthy/unhealthy line repeatedly. Separate
-            -- from entity_health_state because the key is the event, not the
-            -- entity: one device has independent cooldowns for
-            -- device_unhealthy and device_needs_signing.
-            CREATE TABLE IF NOT EXISTS notification_state (
-                event_type TEXT NOT NULL,
-                entity_id TEXT NOT NULL,
-                last_notified_at TEXT NOT NULL,
-                PRIMARY KEY (event_type, entity_id)
-            );
-            """
-        )
-        # users table predates totp_secret/totp_enabled - add them for
-        # existing databases (CREATE TABLE IF NOT EXISTS above only handles
-        # brand new installs; ALTER TABLE is needed for upgrades in place).
-        existing_columns = {row["name"] for row in conn.execute("PRAGMA table_info(users)")}
-        if "totp_secret" not in existing_columns:
-            conn.execute("ALTER TABLE users ADD COLUMN totp_secret TEXT")
-        if "totp_enabled" not in existing_columns:
-            conn.execute("ALTER TABLE users ADD COLUMN totp_enabled INTEGER NOT NULL DEFAULT 0")
-        # devices table predates tailnet_lock_error - add it for existing databases.
-        existing_device_columns = {row["name"] for row in conn.execute("PRAGMA table_info(devices)")}
-        if "tailnet_lock_error" not in existing_device_columns:
-            conn.execute("ALTER TABLE devices ADD COLUMN tailnet_lock_error TEXT")
+    """Bring the schema up to SCHEMA_VERSION. Safe to call repeatedly: when
+    the database is already current this is one SELECT, no DDL.
+
+    Pending migrations run under an exclusive lock file next to the
+    database, so of several processes starting at once exactly one migrates
+    and the others wait for it and then find nothing to do.
+    """
+    with get_connection() as conn:
+        if _schema_version(conn) >= SCHEMA_VERSION:
+            return
+    lock_path = _current_database_path() + ".migrate.lock"
+    with open(lock_path, "a+") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            with get_connection() as conn:
+                conn.execute(_SCHEMA_VERSION_SQL)
+                current = _schema_version(conn)
+                for version, description, migrate in SCHEMA_MIGRATIONS:
+                    if version <= current:
+                        continue
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN IMMEDIATE")
+                    migrate(conn)
+                    conn.execute(
+                        "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                        (version, description, _now_iso()),
+                    )
+                    conn.commit()
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
 # ---------------------------------------------------------------------------
-# Settings
+# Day partitions (audit_log, poller_log)
 # ---------------------------------------------------------------------------
 
-def _add_audit(conn, entity_type, entity_id, action, changes, actor=None):
+# audit_log and poller_log are stored as one table per UTC day
+# (audit_log_20261019, ...). Retention drops whole tables instead of a
+# DELETE that rewrites index pages and grows the WAL, and reads visit only
+# the days their date range overlaps. The plain names are views over every
+# partition for ad-hoc reads; all writes go to a partition.
+_PARTITIONED_LOGS = {
+    "audit_log": (
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, occurred_at TEXT NOT NULL, entity_type TEXT NOT NULL, "
+        "entity_id TEXT NOT NULL, action TEXT NOT NULL, changes TEXT NOT NULL, actor TEXT",
+        # list_audit_log()/count_audit_log() filter on these columns and
+        # always order by occurred_at DESC; id is the rowid, so each index
+        # also serves the (occurred_at, id) keyset seek.
+        ("occurred_at", "entity_type, entity_id, occurred_at", "action, occurred_at", "actor, occurred_at"),
+    ),
+    "poller_log": (
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, occurred_at TEXT NOT NULL, event_type TEXT NOT NULL, "
+        "message TEXT NOT NULL, detail TEXT",
+        ("occurred_at", "event_type, occurred_at"),
+    ),
+}
+# Row ids are day number * stride + n, so they stay unique and increasing
+# across partitions (the audit search index and keyset cursors rely on it).
+_PARTITION_ID_STRIDE = 10 ** 9
+_EPOCH_DATE = datetime(1970, 1, 1, tzinfo=timezone.utc).date()
+
+
+def _partition_day(occurred_at: str) -> str:
+    return occurred_at[:10].replace("-", "")
+
+
+def _partition_name(base: str, day: str) -> str:
+    return f"{base}_{day}"
+
+
+def _list_partition_days(conn, base: str) -> list:
+    """Days (YYYYMMDD) that have a partition of `base`, oldest first."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+        (f"{base}_[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]",),
+    ).fetchall()
+    return sorted(r["name"][len(base) + 1:] for r in rows)
+
+
+def _partition_days_for_range(conn, base: str, start: str = None, end: str = None) -> list:
+    """Partition days that can hold rows between `start` and `end` (ISO
+    strings, either optional), newest first. A day of slack either side
+    covers bounds written with a non-UTC offset."""
+    days = _list_partition_days(conn, base)
+    if start:
+        first = (datetime.fromisoformat(start[:10]) - timedelta(days=1)).strftime("%Y%m%d")
+        days = [d for d in days if d >= first]
+    if end:
+        last = (datetime.fromisoformat(end[:10]) + timedelta(days=1)).strftime("%Y%m%d")
+        days = [d for d in days if d <= last]
+    return days[::-1]
+
+
+def _rebuild_partition_view(conn, base: str):
+    columns, _ = _PARTITIONED_LOGS[base]
+    days = _list_partition_days(conn, base)
+    conn.execute(f"DROP VIEW IF EXISTS {base}")
+    if days:
+        body = " UNION ALL ".join(f"SELECT * FROM {_partition_name(base, d)}" for d in days)
+    else:
+        names = [c.split()[0] for c in columns.split(", ")]
+        body = "SELECT " + ", ".join(f"NULL AS {n}" for n in names) + " WHERE 0"
+    conn.execute(f"CREATE VIEW {base} AS {body}")
+
+
+def _ensure_partition(conn, base: str, day: str) -> str:
+    """The partition table for `day`, created (with its indexes, id range
+    and - for audit_log - search index) on first use."""
+    table = _partition_name(base, day)
+    exists_sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    if conn.execute(exists_sql, (table,)).fetchone():
+        return table
+    # The table, its id seed and the view must appear together: sqlite3
+    # runs DDL outside a transaction unless one is open, and another process
+    # that saw the table before its sqlite_sequence row would insert id 1.
+    # Take the write lock first, then look again - someone may have just
+    # created it. (Inside an open write transaction the lock is already held.)
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute(exists_sql, (table,)).fetchone():
+            return table
+    columns, indexes = _PARTITIONED_LOGS[base]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    for i, index_columns in enumerate(indexes):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{i} ON {table}({index_columns})")
+    day_number = (datetime.strptime(day, "%Y%m%d").date() - _EPOCH_DATE).days
     conn.execute(
-        "INSERT INTO audit_log (occurred_at, entity_type, entity_id, action, changes, actor) "
-        "VALUES (?, ?, ?, ?, ?, ?)",
-        (_now_iso(), entity_type, entity_id, action, json.dumps(changes), actor),
+        "INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? WHERE NOT EXISTS "
+        "(SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+        (table, day_number * _PARTITION_ID_STRIDE, table),
     )
+    if base == "audit_log":
+        _create_audit_search_partition(conn, day)
+    _rebuild_partition_view(conn, base)
+    return table
+
+
+def _insert_log_row(conn, base: str, row: dict) -> int:
+    table = _ensure_partition(conn, base, _partition_day(row["occurred_at"]))
+    cursor = conn.execute(
+        f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})", tuple(row.values()),
+    )
+    return cursor.lastrowid
+
+
+def _drop_partitions_before(conn, base: str, cutoff_iso: str, before_drop=None) -> list:
+    """Drop every partition whose whole day is older than `cutoff_iso` -
+    retention is day-granular. `before_drop(conn, table)` runs first for
+    each (audit_log uses it to settle audit_facets). Returns the days
+    dropped."""
+    cutoff_day = _partition_day(cutoff_iso)
+    dropped = [d for d in _list_partition_days(conn, base) if d < cutoff_day]
+    for day in dropped:
+        table = _partition_name(base, day)
+        if before_drop:
+            before_drop(conn, table)
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        if base == "audit_log":
+            conn.execute(f"DROP TABLE IF EXISTS {_audit_search_table(day)}")
+    if dropped:
+        _rebuild_partition_view(conn, base)
+    return dropped
+
+
+def _init_log_partitions(conn, base: str):
+    """Create the view over `base`'s partitions, moving the rows of a
+    pre-partitioning table (same name, one big table) into per-day
+    partitions first. Their ids are kept: they are all below any
+    partition's id range, so ordering and uniqueness hold."""
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (base,),
+    ).fetchone()
+    if legacy:
+        conn.execute(f"ALTER TABLE {base} RENAME TO {base}_unpartitioned")
+        if base == "audit_log":
+            conn.execute("DROP TABLE IF EXISTS audit_log_fts")  # replaced by per-day search tables
+        days = [
+            r[0] for r in conn.execute(
+                f"SELECT DISTINCT substr(occurred_at, 1, 10) FROM {base}_unpartitioned"
+            )
+        ]
+        names = ", ".join(c.split()[0] for c in _PARTITIONED_LOGS[base][0].split(", "))
+        for day in days:
+            table = _ensure_partition(conn, base, day.replace("-", ""))
+            conn.execute(
+                f"INSERT INTO {table} ({names}) SELECT {names} FROM {base}_unpartitioned "
+                "WHERE substr(occurred_at, 1, 10) = ?",
+                (day,),
+            )
+        conn.execute(f"DROP TABLE {base}_unpartitioned")
+    _rebuild_partition_view(conn, base)
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+def _add_audit(conn, entity_type, entity_id, action, changes, actor=None, occurred_at=None):
+    occurred_at = occurred_at or _now_iso()
+    _insert_log_row(conn, "audit_log", {
+        "occurred_at": occurred_at, "entity_type": entity_type, "entity_id": entity_id,
+        "action": action, "changes": json.dumps(changes), "actor": actor,
+    })
+    _count_audit_facets(conn, entity_type, entity_id, changes, actor, occurred_at)
 
 
 def _db_get_setting_row(conn, name):
@@ -542,31 +967,31 @@ def sync_env_settings():
     If an env var that was previously set is later removed, the DB row must
     stop being locked as source='env' - the last known value is kept, but
     source flips back to 'db' so the admin UI unlocks the field again.
+
+    The whole registry is synced in ONE connection and transaction - every
+    worker runs this at boot, and a connection per setting made it the
+    bulk of startup time.
     """
     init_db()
-    for name in SETTINGS_REGISTRY:
-        value = _env_override_value(name)
-        if value is not None:
-            # "startup", not None - a bare NULL actor is reserved for the
-            # background poller's own device/key audit rows so the audit UI
-            # can distinguish "the poller changed this" from "this happened
-            # automatically at process boot", rather than lumping every
-            # non-human change together as if it came from polling.
-            set_setting(name, value, source="env", actor="startup")
-        else:
-            with get_connection() as conn:
-                row = conn.execute(
-                    "SELECT source FROM settings WHERE name = ?", (name,)
-                ).fetchone()
-            if row is not None and row["source"] == "env":
-                with get_connection() as conn:
-                    conn.execute(
-                        "UPDATE settings SET source = 'db', updated_at = ? WHERE name = ?",
-                        (_now_iso(), name),
-                    )
-                    conn.commit()
+    with get_connection() as conn:
+        sources = {r["name"]: r["source"] for r in conn.execute("SELECT name, source FROM settings")}
+        for name in SETTINGS_REGISTRY:
+            value = _env_override_value(name)
+            if value is not None:
+                # "startup", not None - a bare NULL actor is reserved for the
+                # background poller's own device/key audit rows so the audit UI
+                # can distinguish "the poller changed this" from "this happened
+                # automatically at process boot", rather than lumping every
+                # non-human change together as if it came from polling.
+                _set_setting_in_conn(conn, name, value, source="env", actor="startup")
+            elif sources.get(name) == "env":
+                conn.execute(
+                    "UPDATE settings SET source = 'db', updated_at = ? WHERE name = ?",
+                    (_now_iso(), name),
+                )
 
 
+@reqtiming.phase("settings")
 def get_setting(name: str):
     """Return the effective raw (string) value for a setting: env var if
     set/non-sentinel, else the last DB value, else None."""
@@ -614,9 +1039,13 @@ def validate_setting_value(name: str, raw: str):
     if type_name in ("int", "float"):
         caster = int if type_name == "int" else float
         try:
-            caster(raw)
+            value = caster(raw)
         except (TypeError, ValueError):
             raise ValueError(f"{name} must be a valid {type_name}")
+        if name in SETTING_INT_RANGES:
+            low, high = SETTING_INT_RANGES[name]
+            if not low <= value <= high:
+                raise ValueError(f"{name} must be between {low} and {high}")
     return encode_setting_value(name, raw)
 
 
@@ -626,6 +1055,7 @@ def get_setting_typed(name: str):
     return _cast(get_setting(name), type_name, default)
 
 
+@reqtiming.phase("settings")
 def get_settings_typed(names) -> dict:
     """Resolve multiple settings in a single DB round trip.
 
@@ -731,11 +1161,11 @@ def get_secret_key() -> str:
 
 
 def get_audit_retention_days() -> int:
-    return max(1, get_setting_typed("audit_retention_days"))
+    return min(LOG_RETENTION_MAX_DAYS, max(1, get_setting_typed("audit_retention_days")))
 
 
 def set_audit_retention_days(days: int, actor: str = None):
-    set_setting("audit_retention_days", str(int(days)), source="db", actor=actor)
+    set_setting("audit_retention_days", validate_setting_value("audit_retention_days", int(days)), source="db", actor=actor)
 
 
 def set_poll_meta(last_polled_at: str):
@@ -753,58 +1183,198 @@ def get_poll_meta():
         return row["value"] if row else None
 
 
-MANUAL_POLL_CLAIM_TTL_SECONDS = 300  # crash-recovery ceiling only, see try_claim_manual_poll
+def _bump_snapshot_generation(conn):
+    conn.execute(
+        "INSERT INTO settings (name, value, source, updated_at) VALUES ('snapshot_generation', '1', 'db', ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + 1, updated_at = excluded.updated_at",
+        (_now_iso(),),
+    )
+
+
+def get_cache_generations() -> tuple:
+    """(snapshot generation, settings generation) for keying cached /health
+    responses, in one cheap read.
 
+    The snapshot generation is bumped in the same transaction as every
+    upsert_devices() and upsert_keys(). The settings generation is the
+    newest updated_at in the settings table, which moves on any settings
+    save and also on the poller's own rows there (last_polled_at,
+    last_poll_status, the circuit breaker, poller_metrics) - everything
+    else a /health or /metrics response is computed from. Env
+    overrides aren't covered: they can't change without a restart.
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT (SELECT value FROM settings WHERE name = 'snapshot_generation'), MAX(updated_at) FROM settings"
+        ).fetchone()
+    return int(row[0] or 0), row[1]
+
+
+# A queued job nobody has picked up, or a running one whose poller died
+# mid-cycle, is failed after this long so callers stop waiting on it and new
+# requests aren't coalesced onto a job that will never finish. It's a
+# crash-recovery ceiling, not an estimate of cycle length - HTTP_TIMEOUT and
+# MAX_RETRIES are admin-configurable, so a legitimately slow cycle must not
+# be failed out from under the poller.
+POLL_JOB_STALE_SECONDS = 300
+POLL_JOB_RETENTION_HOURS = 24
 
-def try_claim_manual_poll(ttl_seconds: int = MANUAL_POLL_CLAIM_TTL_SECONDS) -> bool:
-    """Atomically claim the right to run an out-of-band poll cycle right now.
 
-    /health/cache/invalidate is public/unauthenticated, and run_poll_cycle()
-    does real outbound HTTP + DB work - without this, N concurrent public
-    callers would each synchronously run their own full cycle, tying up
-    every Gunicorn worker for the duration of the outbound calls. This claim
-    is stored in the settings table (shared across all worker processes via
-    SQLite) so concurrent/rapid calls collapse into a single actual poll
-    instead: only the caller that wins the claim runs one, everyone else
-    while it's held is told a refresh is already in flight and does no
-    outbound work at all.
+def _poll_job_row_to_dict(row) -> dict:
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "requested_by": row["requested_by"],
+        "requested_at": row["requested_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+        "error": row["error"],
+        "last_polled_at": row["last_polled_at"],
+    }
 
-    ttl_seconds is a crash-recovery ceiling, NOT how long a normal poll is
-    expected to take - HTTP_TIMEOUT/MAX_RETRIES are both admin-configurable,
-    so no fixed short TTL can safely bound how long a real cycle might run;
-    a too-short TTL just lets concurrent callers back in mid-cycle and
-    defeats the point of claiming at all. The caller must release_manual_
-    poll_claim() as soon as the cycle actually finishes (success or
-    failure) rather than relying on the TTL for the normal-completion case -
-    the TTL only matters if the process dies mid-cycle without releasing.
+
+def _fail_stale_poll_jobs(conn):
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=POLL_JOB_STALE_SECONDS)).isoformat()
+    conn.execute(
+        "UPDATE poll_jobs SET status = 'failed', finished_at = ?, "
+        "error = CASE status WHEN 'queued' THEN 'No poller picked up the request' "
+        "ELSE 'Poller stopped before the cycle finished' END "
+        "WHERE (status = 'queued' AND requested_at < ?) OR (status = 'running' AND started_at < ?)",
+        (_now_iso(), cutoff, cutoff),
+    )
+
+
+def enqueue_poll_job(requested_by: str = None):
+    """Queue a manual poll for the poller process; returns (job, created).
+
+    Coalescing: while a job is queued or running, every further request gets
+    that same job back (created=False) instead of a new one, so N concurrent
+    /health/cache/invalidate callers still produce exactly one extra cycle.
+    BEGIN IMMEDIATE makes the check-then-insert atomic across worker
+    processes.
+    """
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _fail_stale_poll_jobs(conn)
+        row = conn.execute(
+            "SELECT * FROM poll_jobs WHERE status IN ('queued', 'running') ORDER BY requested_at LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            return _poll_job_row_to_dict(row), False
+        job_id = secrets.token_hex(8)
+        conn.execute(
+            "INSERT INTO poll_jobs (id, status, requested_by, requested_at) VALUES (?, 'queued', ?, ?)",
+            (job_id, requested_by, _now_iso()),
+        )
+        row = conn.execute("SELECT * FROM poll_jobs WHERE id = ?", (job_id,)).fetchone()
+        return _poll_job_row_to_dict(row), True
+
+
+def get_poll_job(job_id: str):
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM poll_jobs WHERE id = ?", (job_id,)).fetchone()
+        return _poll_job_row_to_dict(row) if row else None
+
+
+def has_queued_poll_job() -> bool:
+    """Cheap read-only check the poll loop makes between cycles."""
+    with get_connection() as conn:
+        return conn.execute("SELECT 1 FROM poll_jobs WHERE status = 'queued' LIMIT 1").fetchone() is not None
+
+
+def claim_queued_poll_jobs() -> list:
+    """Mark every queued job running and return their ids. Called by the
+    poller right before a cycle - one cycle satisfies all of them."""
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        ids = [r["id"] for r in conn.execute("SELECT id FROM poll_jobs WHERE status = 'queued'")]
+        if ids:
+            conn.executemany(
+                "UPDATE poll_jobs SET status = 'running', started_at = ? WHERE id = ?",
+                [(_now_iso(), job_id) for job_id in ids],
+            )
+        return ids
+
+
+def finish_poll_jobs(job_ids, ok: bool, error: str = None, last_polled_at: str = None):
+    if not job_ids:
+        return
+    with get_connection() as conn:
+        conn.executemany(
+            "UPDATE poll_jobs SET status = ?, finished_at = ?, error = ?, last_polled_at = ? WHERE id = ?",
+            [("succeeded" if ok else "failed", _now_iso(), error, last_polled_at, job_id) for job_id in job_ids],
+        )
+
+
+def purge_poll_jobs(retention_hours: int = POLL_JOB_RETENTION_HOURS):
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=retention_hours)).isoformat()
+    with get_connection() as conn:
+        conn.execute(
+            "DELETE FROM poll_jobs WHERE status NOT IN ('queued', 'running') AND requested_at < ?",
+            (cutoff,),
+        )
+
+
+def get_oauth_token(client_id: str):
+    """The shared OAuth token row for `client_id`, or None."""
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM oauth_tokens WHERE client_id = ?", (client_id,)).fetchone()
+        return dict(row) if row else None
+
+
+def acquire_oauth_lease(client_id: str, owner: str, lease_seconds: float, rejected_token: str = None) -> bool:
+    """Try to become the one caller fetching a new token for `client_id`.
+
+    Returns False if another owner holds an unexpired lease, or if a token
+    that is not yet due for renewal (and is not `rejected_token`, one that
+    just drew a 401) appeared since the caller last looked - someone else
+    already did the fetch. The check and the claim happen in one
+    BEGIN IMMEDIATE transaction, so only one process across all workers
+    ever wins.
     """
     now = time.time()
-    new_value = str(now + ttl_seconds)
     with get_connection() as conn:
-        row = conn.execute("SELECT value FROM settings WHERE name = 'manual_poll_claimed_until'").fetchone()
-        if row is None:
-            try:
-                conn.execute(
-                    "INSERT INTO settings (name, value, source, updated_at) VALUES ('manual_poll_claimed_until', ?, 'db', ?)",
-                    (new_value, _now_iso()),
-                )
-                return True
-            except sqlite3.IntegrityError:
-                return False  # another process/thread inserted the first claim first
-        cur = conn.execute(
-            "UPDATE settings SET value = ?, updated_at = ? "
-            "WHERE name = 'manual_poll_claimed_until' AND CAST(value AS REAL) <= ?",
-            (new_value, _now_iso(), now),
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM oauth_tokens WHERE client_id = ?", (client_id,)).fetchone()
+        if row is not None:
+            if row["lease_owner"] and row["lease_owner"] != owner and (row["lease_until"] or 0) > now:
+                return False
+            fresh = row["access_token"] and row["access_token"] != rejected_token and now < (row["renew_at"] or 0)
+            if fresh:
+                return False
+        conn.execute(
+            "INSERT INTO oauth_tokens (client_id, lease_owner, lease_until) VALUES (?, ?, ?) "
+            "ON CONFLICT(client_id) DO UPDATE SET lease_owner=excluded.lease_owner, lease_until=excluded.lease_until",
+            (client_id, owner, now + lease_seconds),
+        )
+        return True
+
+
+def release_oauth_lease(client_id: str, owner: str):
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE oauth_tokens SET lease_owner = NULL, lease_until = NULL WHERE client_id = ? AND lease_owner = ?",
+            (client_id, owner),
         )
-        return cur.rowcount == 1
 
 
-def release_manual_poll_claim():
-    """Release the manual-poll claim immediately once a cycle finishes
-    (success or failure), instead of making the next legitimate caller wait
-    out the crash-recovery TTL."""
+def store_oauth_token(client_id: str, access_token: str, expires_in: float, renew_fraction: float):
+    """Publish a freshly fetched token to every process and drop the lease.
+
+    renew_at is fetched_at + renew_fraction * expires_in: the point from
+    which the token is still served but the poller replaces it. Rows for any
+    other client id (credentials replaced via the settings UI) are removed.
+    """
+    now = time.time()
     with get_connection() as conn:
-        conn.execute("DELETE FROM settings WHERE name = 'manual_poll_claimed_until'")
+        conn.execute("DELETE FROM oauth_tokens WHERE client_id != ?", (client_id,))
+        conn.execute(
+            "INSERT INTO oauth_tokens (client_id, access_token, fetched_at, renew_at, expires_at, lease_owner, lease_until) "
+            "VALUES (?, ?, ?, ?, ?, NULL, NULL) "
+            "ON CONFLICT(client_id) DO UPDATE SET access_token=excluded.access_token, fetched_at=excluded.fetched_at, "
+            "renew_at=excluded.renew_at, expires_at=excluded.expires_at, lease_owner=NULL, lease_until=NULL",
+            (client_id, access_token, now, now + renew_fraction * expires_in, now + expires_in),
+        )
 
 
 def set_poll_status(ok: bool, error: str = None, auth_error: bool = False):
@@ -820,6 +1390,50 @@ def set_poll_status(ok: bool, error: str = None, auth_error: bool = False):
         )
 
 
+def record_poller_metrics(cycle: dict):
+    """Store one poll cycle's internals for /metrics: `cycle` carries
+    duration_seconds, ok, api_seconds ({request: seconds}), retries,
+    db_rows_written and db_transactions. Kept as the last cycle's values
+    plus running totals, in one settings row - the poller may be another
+    process, so the web workers serving /metrics read it from here."""
+    with get_connection() as conn:
+        row = _db_get_setting_row(conn, "poller_metrics")
+        previous = _parse_poller_metrics(row["value"] if row else None)
+        totals = {
+            "cycles_total": previous["cycles_total"] + 1,
+            "cycle_failures_total": previous["cycle_failures_total"] + (0 if cycle["ok"] else 1),
+            "retries_total": previous["retries_total"] + cycle["retries"],
+            "db_rows_written_total": previous["db_rows_written_total"] + cycle["db_rows_written"],
+            "db_transactions_total": previous["db_transactions_total"] + cycle["db_transactions"],
+        }
+        conn.execute(
+            "INSERT INTO settings (name, value, source, updated_at) VALUES ('poller_metrics', ?, 'db', ?) "
+            "ON CONFLICT(name) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+            (json.dumps({**totals, "last_cycle": cycle}), _now_iso()),
+        )
+
+
+_POLLER_METRICS_DEFAULT = {
+    "cycles_total": 0, "cycle_failures_total": 0, "retries_total": 0,
+    "db_rows_written_total": 0, "db_transactions_total": 0, "last_cycle": None,
+}
+
+
+def _parse_poller_metrics(raw) -> dict:
+    if not raw:
+        return dict(_POLLER_METRICS_DEFAULT)
+    try:
+        return {**_POLLER_METRICS_DEFAULT, **json.loads(raw)}
+    except (TypeError, ValueError):
+        return dict(_POLLER_METRICS_DEFAULT)
+
+
+def get_poller_metrics() -> dict:
+    with get_connection() as conn:
+        row = _db_get_setting_row(conn, "poller_metrics")
+    return _parse_poller_metrics(row["value"] if row else None)
+
+
 def get_poll_status():
     with get_connection() as conn:
         row = _db_get_setting_row(conn, "last_poll_status")
@@ -831,6 +1445,90 @@ def get_poll_status():
         return {"ok": None, "error": None, "auth_error": False}
 
 
+_CIRCUIT_DEFAULT = {"failures": 0, "open_until": None, "last_error": None}
+
+
+def _parse_circuit_state(raw) -> dict:
+    if not raw:
+        return dict(_CIRCUIT_DEFAULT)
+    try:
+        state = json.loads(raw)
+    except (TypeError, ValueError):
+        return dict(_CIRCUIT_DEFAULT)
+    return {**_CIRCUIT_DEFAULT, **state}
+
+
+def get_circuit_state() -> dict:
+    """Return the Tailscale API circuit breaker state: consecutive upstream
+    failures, the epoch until which upstream calls are suspended (None when
+    closed) and the error that last counted against it.
+
+    Stored as an internal settings row, like last_poll_status, so every
+    process (the polling worker, manual /health/cache/invalidate callers,
+    the admin credential check) sees one shared breaker rather than each
+    hammering a struggling API until its own private counter trips.
+    """
+    with get_connection() as conn:
+        row = _db_get_setting_row(conn, "upstream_circuit")
+    return _parse_circuit_state(row["value"] if row else None)
+
+
+def circuit_open_until(state: dict = None, now: float = None):
+    """Epoch seconds the breaker stays open until, or None if calls may go
+    through. Once the window passes the breaker is half-open: the next call
+    is let through, and since the failure count is still at the threshold a
+    single further failure re-opens it immediately."""
+    state = get_circuit_state() if state is None else state
+    open_until = state.get("open_until")
+    if open_until is None:
+        return None
+    now = time.time() if now is None else now
+    return open_until if open_until > now else None
+
+
+def _write_circuit_state(conn, state: dict):
+    conn.execute(
+        "INSERT INTO settings (name, value, source, updated_at) VALUES ('upstream_circuit', ?, 'db', ?) "
+        "ON CONFLICT(name) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+        (json.dumps(state), _now_iso()),
+    )
+
+
+def record_upstream_failure(error: str, threshold: int, cooldown_seconds: int, retry_after: float = None) -> dict:
+    """Count one failed upstream request against the breaker; returns the new state.
+
+    The breaker opens for `cooldown_seconds` once `threshold` consecutive
+    failures have been seen (threshold <= 0 disables that trigger). An
+    explicit Retry-After from the API opens it for at least that long
+    regardless of the count - the server has told us when to come back, and
+    calling earlier only burns quota on another 429.
+    """
+    now = time.time()
+    with get_connection() as conn:
+        # IMMEDIATE so two processes failing at once can't both read N and
+        # both write N+1.
+        conn.execute("BEGIN IMMEDIATE")
+        row = _db_get_setting_row(conn, "upstream_circuit")
+        state = _parse_circuit_state(row["value"] if row else None)
+        state["failures"] = int(state.get("failures") or 0) + 1
+        state["last_error"] = error
+        open_for = 0.0
+        if threshold and threshold > 0 and state["failures"] >= threshold:
+            open_for = float(cooldown_seconds or 0)
+        if retry_after:
+            open_for = max(open_for, float(retry_after))
+        if open_for > 0:
+            state["open_until"] = now + open_for
+        _write_circuit_state(conn, state)
+    return state
+
+
+def record_upstream_success():
+    """Close the breaker and reset the failure count after a good response."""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM settings WHERE name = 'upstream_circuit'")
+
+
 # ---------------------------------------------------------------------------
 # Users
 # ---------------------------------------------------------------------------
@@ -897,9 +1595,18 @@ def list_users():
         return [dict(r) for r in rows]
 
 
-# Computed once at import: a hash of a random throwaway secret, used purely to
-# burn the same time as a real comparison when the username doesn't exist.
-_DUMMY_PASSWORD_HASH = generate_password_hash(secrets.token_urlsafe(32))
+# A hash of a random throwaway secret, used purely to burn the same time as a
+# real comparison when the username doesn't exist. Computed on first use, not
+# at import: a full password hash is the slowest thing a worker would
+# otherwise do at boot, and most workers never see a failed login.
+_dummy_password_hash = None
+
+
+def _get_dummy_password_hash() -> str:
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = generate_password_hash(secrets.token_urlsafe(32))
+    return _dummy_password_hash
 
 
 def verify_password(username: str, password: str):
@@ -913,7 +1620,7 @@ def verify_password(username: str, password: str):
         # the same wall-clock time as a known one with a wrong password.
         # Returning early here made the two distinguishable by timing, which
         # is a username-enumeration oracle on an otherwise uniform 401.
-        check_password_hash(_DUMMY_PASSWORD_HASH, password)
+        check_password_hash(_get_dummy_password_hash(), password)
         return None
     if not check_password_hash(user["password_hash"], password):
         return None
@@ -992,17 +1699,26 @@ def change_password(username: str, current_password: str, new_password: str) ->
 # flipped on - an abandoned/incorrect enrollment never touches the DB.
 # ---------------------------------------------------------------------------
 
+# pyotp is imported where it's used: only MFA enrollment and login need it,
+# and keeping it off the import path keeps worker boot short.
+
 def generate_totp_secret() -> str:
+    import pyotp
+
     return pyotp.random_base32()
 
 
 def totp_provisioning_uri(username: str, secret: str) -> str:
+    import pyotp
+
     return pyotp.TOTP(secret).provisioning_uri(name=username, issuer_name="TailscaleHealthcheck")
 
 
 def verify_totp_code(secret: str, code: str) -> bool:
     if not secret or not code:
         return False
+    import pyotp
+
     try:
         return pyotp.TOTP(secret).verify(str(code).strip(), valid_window=1)
     except Exception:
@@ -1191,6 +1907,7 @@ def upsert_devices(devices: list):
         for device_id in removed_ids:
             conn.execute("DELETE FROM devices WHERE device_id = ?", (device_id,))
             _add_audit(conn, "device", device_id, "removed", {"name": existing_rows[device_id]["name"]})
+        _bump_snapshot_generation(conn)
 
 
 def _existing_device_field(row, field):
@@ -1291,6 +2008,7 @@ def upsert_keys(keys: list, key_type_resolver):
         for key_id in removed_ids:
             conn.execute("DELETE FROM tailnet_keys WHERE key_id = ?", (key_id,))
             _add_audit(conn, "tailnet_key", key_id, "removed", {"description": existing_rows[key_id]["description"]})
+        _bump_snapshot_generation(conn)
 
 
 def _existing_key_field(row, field):
@@ -1311,10 +2029,11 @@ _AUDIT_CHANGE_META_KEYS = ("old", "new", "source")
 
 
 def _audit_log_filter_sql(
-    entity_type, entity_id, action, actor, start, end, changed_field=None, changes_contains=None,
+    day, entity_type, entity_id, action, actor, start, end, changed_field=None, changes_contains=None,
 ):
-    """Build the shared WHERE clause for the audit log, so listing and
-    counting can never drift apart and disagree about the total."""
+    """Build the shared WHERE clause for one audit_log partition (`day`), so
+    listing and counting can never drift apart and disagree about the
+    total."""
     clauses = []
     params = []
     if entity_type:
@@ -1352,22 +2071,82 @@ def _audit_log_filter_sql(
             clauses.append("0")
         else:
             clauses.append(
-                "EXISTS (SELECT 1 FROM json_each(audit_log.changes) WHERE json_each.key = ?)"
+                f"EXISTS (SELECT 1 FROM json_each({_partition_name('audit_log', day)}.changes) "
+                "WHERE json_each.key = ?)"
             )
             params.append(changed_field)
     if changes_contains:
-        # Substring match over the raw JSON, so a hostname, version string, or
-        # an old/new value all find their rows. LIKE is ASCII-case-insensitive
-        # in SQLite, which is what a search box should do.
-        clauses.append("changes LIKE ? ESCAPE '\\'")
-        params.append(f"%{_escape_like(changes_contains)}%")
+        # Prefix match against the partition's search index (the changes JSON
+        # plus the entity name), so a hostname, version string, or an old/new
+        # value all find their rows - case-insensitively, through the index
+        # rather than a LIKE scan of every row.
+        match = _audit_match_query(changes_contains)
+        if match is None:
+            clauses.append("0")
+        else:
+            fts = _audit_search_table(day)
+            clauses.append(f"id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)")
+            params.append(match)
     return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
 
 
-def _escape_like(value: str) -> str:
-    """Neutralize LIKE wildcards in user input so searching for "100%" doesn't
-    silently match everything."""
-    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+# Display name indexed next to an audit row's changes - what the audit page
+# shows for the entity (see _resolve_entity_name()), as of when it was logged.
+_AUDIT_FTS_ENTITY_NAME_SQL = (
+    "COALESCE("
+    "CASE new.entity_type "
+    "WHEN 'device' THEN (SELECT name FROM devices WHERE device_id = new.entity_id) "
+    "WHEN 'tailnet_key' THEN (SELECT description FROM tailnet_keys WHERE key_id = new.entity_id) END, "
+    "new.entity_id)"
+)
+
+
+def _audit_search_table(day: str) -> str:
+    return f"audit_log_fts_{day}"
+
+
+def _create_audit_search_partition(conn, day: str):
+    """Full-text index behind the audit page's search box, one per audit_log
+    partition (and dropped with it): each row's changes JSON and entity name
+    under the row's id, filled by an insert trigger so every writer is
+    covered."""
+    table, fts = _partition_name("audit_log", day), _audit_search_table(day)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(changes, entity_name)")
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts} (rowid, changes, entity_name) "
+        f"VALUES (new.id, new.changes, {_AUDIT_FTS_ENTITY_NAME_SQL}); END"
+    )
+
+
+def _audit_match_query(text: str):
+    """Turn search-box input into an FTS5 query: every whitespace-separated
+    word must appear, each as a prefix phrase ("rev" finds ReverseProxy,
+    "1.1" finds the tokens 1, 1* in sequence). Words with nothing to index
+    (e.g. "%") are dropped; None if nothing is left."""
+    words = [w for w in text.split() if any(ch.isalnum() for ch in w)]
+    if not words:
+        return None
+    return " AND ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+
+def encode_audit_cursor(entry: dict) -> str:
+    """Opaque keyset cursor for the page after `entry` (the last row shown):
+    its (occurred_at, id), url-safe base64 JSON."""
+    raw = json.dumps([entry["occurred_at"], entry["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_audit_cursor(cursor: str) -> tuple:
+    """Inverse of encode_audit_cursor(); ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        occurred_at, row_id = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {e}") from None
+    if not isinstance(occurred_at, str) or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError("invalid cursor")
+    return occurred_at, row_id
 
 
 def count_audit_log(
@@ -1381,12 +2160,18 @@ def count_audit_log(
     changes_contains: str = None,
 ) -> int:
     """Total matching rows, ignoring limit/offset - what the UI needs to show
-    "showing 1-100 of 4,213" and render real pagination controls."""
-    where, params = _audit_log_filter_sql(
-        entity_type, entity_id, action, actor, start, end, changed_field, changes_contains,
-    )
+    "showing 1-100 of 4,213" and render real pagination controls. Summed
+    over the partitions the date range overlaps."""
+    total = 0
     with get_connection() as conn:
-        return conn.execute("SELECT COUNT(*) AS n FROM audit_log" + where, params).fetchone()["n"]
+        for day in _partition_days_for_range(conn, "audit_log", start, end):
+            where, params = _audit_log_filter_sql(
+                day, entity_type, entity_id, action, actor, start, end, changed_field, changes_contains,
+            )
+            total += conn.execute(
+                f"SELECT COUNT(*) AS n FROM {_partition_name('audit_log', day)}" + where, params,
+            ).fetchone()["n"]
+    return total
 
 
 def list_audit_log(
@@ -1400,26 +2185,54 @@ def list_audit_log(
     end: str = None,
     changed_field: str = None,
     changes_contains: str = None,
+    before: tuple = None,
 ):
     """List audit_log rows, most recent first, filters combined with AND.
 
+    `before` is a decoded keyset cursor (occurred_at, id): only rows sorting
+    after it are returned, via `(occurred_at, id) < (?, ?)`. That seeks
+    straight into the (.., occurred_at) indexes - id is the rowid, so every
+    index already ends in it - where `offset` has to walk past every skipped
+    row. Offset still works (and combines) for older clients.
+
+    Partitions are disjoint day ranges, so walking them newest first and
+    stopping once the page is full returns rows in the global order without
+    touching older days.
+
     `start`/`end` are ISO8601 timestamps (inclusive) filtering occurred_at.
     `actor` matches the exact username, except the special value "poller"
     which matches automatic (actor IS NULL) changes - the poller doesn't
     write an actor of its own, so this is the only way to filter to/from it.
     `changed_field` keeps only rows whose changes blob touches that field
     (e.g. "os", "update_available"); `changes_contains` is a free-text
-    substring match over the changes JSON, matching values as well as field
-    names - together they're what makes the changes column diggable rather
-    than just readable.
+    search (word prefixes, via audit_log_fts) over the changes JSON and the
+    entity name, matching values as well as field names - together they're
+    what makes the changes column diggable rather than just readable.
     """
-    where, params = _audit_log_filter_sql(
-        entity_type, entity_id, action, actor, start, end, changed_field, changes_contains,
-    )
-    query = "SELECT * FROM audit_log" + where + " ORDER BY occurred_at DESC, id DESC LIMIT ? OFFSET ?"
-    params = [*params, limit, offset]
+    rows = []
     with get_connection() as conn:
-        rows = conn.execute(query, params).fetchall()
+        for day in _partition_days_for_range(conn, "audit_log", start, end):
+            if len(rows) >= limit:
+                break
+            if before and day > _partition_day(before[0]):
+                continue
+            table = _partition_name("audit_log", day)
+            where, params = _audit_log_filter_sql(
+                day, entity_type, entity_id, action, actor, start, end, changed_field, changes_contains,
+            )
+            if before:
+                where += (" AND " if where else " WHERE ") + "(occurred_at, id) < (?, ?)"
+                params = [*params, *before]
+            if offset:
+                in_partition = conn.execute(f"SELECT COUNT(*) FROM {table}" + where, params).fetchone()[0]
+                if in_partition <= offset:
+                    offset -= in_partition
+                    continue
+            rows += conn.execute(
+                f"SELECT * FROM {table}" + where + " ORDER BY occurred_at DESC, id DESC LIMIT ? OFFSET ?",
+                [*params, limit - len(rows), offset],
+            ).fetchall()
+            offset = 0
         names = _load_entity_names(conn)
         result = []
         for r in rows:
@@ -1480,14 +2293,106 @@ def _name_from_changes(changes, field: str):
     return None
 
 
+# audit_facets holds the audit filter UI's option lists, maintained on write
+# by _add_audit() and decremented by purge_audit_log(): one row per distinct
+# actor ('' for the poller's NULL actor), entity (with the name last logged
+# for it) and changed field, each with how many live audit rows carry it.
+# Reading the filter options is then a few indexed reads instead of
+# DISTINCT/json_each scans of the whole log.
+_AUDIT_FACETS_SQL = """
+    CREATE TABLE audit_facets (
+        kind TEXT NOT NULL,
+        entity_type TEXT NOT NULL,
+        value TEXT NOT NULL,
+        name TEXT,
+        count INTEGER NOT NULL,
+        last_seen TEXT NOT NULL,
+        PRIMARY KEY (kind, entity_type, value)
+    )
+"""
+_UPSERT_AUDIT_FACET_SQL = (
+    "INSERT INTO audit_facets (kind, entity_type, value, name, count, last_seen) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(kind, entity_type, value) DO UPDATE SET count = count + excluded.count, "
+    "last_seen = MAX(last_seen, excluded.last_seen), name = COALESCE(excluded.name, name)"
+)
+
+
+def _audit_changed_fields(changes) -> list:
+    """Top-level keys of a changes blob that count as changed fields - see
+    _AUDIT_CHANGE_META_KEYS."""
+    if not isinstance(changes, dict):
+        return []
+    return [k for k in changes if k not in _AUDIT_CHANGE_META_KEYS]
+
+
+def _audit_entity_name(entity_type: str, changes):
+    if entity_type == "device":
+        return _name_from_changes(changes, "name")
+    if entity_type == "tailnet_key":
+        return _name_from_changes(changes, "description")
+    return None
+
+
+def _count_audit_facets(conn, entity_type, entity_id, changes, actor, occurred_at):
+    rows = [
+        ("actor", "", actor or "", None, 1, occurred_at),
+        ("entity", entity_type, entity_id, _audit_entity_name(entity_type, changes), 1, occurred_at),
+    ]
+    rows.extend(("field", entity_type, field, None, 1, occurred_at) for field in _audit_changed_fields(changes))
+    conn.executemany(_UPSERT_AUDIT_FACET_SQL, rows)
+
+
+def _audit_facet_counts(conn, table: str = "audit_log", where: str = "", params=()) -> list:
+    """Facet rows (as _UPSERT_AUDIT_FACET_SQL parameters) aggregated over the
+    rows of `table` (the audit_log view or one partition) matching `where` -
+    used to back-fill the table and to work out what a purge takes away."""
+    rows = [
+        ("actor", "", r[0], None, r[1], r[2]) for r in conn.execute(
+            f"SELECT COALESCE(actor, ''), COUNT(*), MAX(occurred_at) FROM {table} {where} GROUP BY 1", params,
+        )
+    ]
+    # The newest changes blob per entity supplies its fallback name.
+    for r in conn.execute(
+        f"SELECT entity_type, entity_id, COUNT(*), MAX(occurred_at), MAX(id) FROM {table} {where} GROUP BY 1, 2",
+        params,
+    ):
+        latest = conn.execute(f"SELECT changes FROM {table} WHERE id = ?", (r[4],)).fetchone()
+        try:
+            changes = json.loads(latest["changes"])
+        except (TypeError, ValueError):
+            changes = None
+        rows.append(("entity", r[0], r[1], _audit_entity_name(r[0], changes), r[2], r[3]))
+    placeholders = ",".join("?" for _ in _AUDIT_CHANGE_META_KEYS)
+    field_where = (where + " AND" if where else "WHERE") + (
+        f" json_valid({table}.changes) AND json_each.key IS NOT NULL AND json_each.key NOT IN ({placeholders})"
+    )
+    rows.extend(
+        ("field", r[0], r[1], None, r[2], r[3]) for r in conn.execute(
+            f"SELECT {table}.entity_type, json_each.key, COUNT(*), MAX(occurred_at) "
+            f"FROM {table}, json_each({table}.changes) {field_where} GROUP BY 1, 2",
+            [*params, *_AUDIT_CHANGE_META_KEYS],
+        )
+    )
+    return rows
+
+
+def _init_audit_facets(conn):
+    """Create audit_facets and back-fill it from the existing log, once."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_facets'").fetchone():
+        return
+    conn.execute(_AUDIT_FACETS_SQL)
+    conn.executemany(_UPSERT_AUDIT_FACET_SQL, _audit_facet_counts(conn))
+
+
 def list_audit_log_actors():
     """Distinct actors seen in audit_log, for the audit filter UI. "poller"
     stands in for automatic (actor IS NULL) changes."""
     with get_connection() as conn:
-        rows = conn.execute("SELECT DISTINCT actor FROM audit_log WHERE actor IS NOT NULL ORDER BY actor").fetchall()
-        actors = [r["actor"] for r in rows]
-        has_poller = conn.execute("SELECT 1 FROM audit_log WHERE actor IS NULL LIMIT 1").fetchone() is not None
-    if has_poller:
+        rows = conn.execute(
+            "SELECT value FROM audit_facets WHERE kind = 'actor' AND entity_type = '' ORDER BY value"
+        ).fetchall()
+    actors = [r["value"] for r in rows if r["value"]]
+    if len(actors) < len(rows):
         actors.append("poller")
     return actors
 
@@ -1496,60 +2401,38 @@ def list_audit_log_entity_ids(entity_type: str = None):
     """Distinct (entity_type, entity_id) pairs seen in audit_log, each with a
     human-readable `name` (see _resolve_entity_name), optionally scoped to
     one entity_type. Used to populate the audit filter UI's entity_id select
-    with readable labels instead of raw device/key ids."""
-    query = "SELECT DISTINCT entity_type, entity_id FROM audit_log"
+    with readable labels instead of raw device/key ids.
+
+    Reads audit_facets; the live name comes from a primary-key join per
+    entity, falling back to the name last logged for it (removed entities)."""
+    query = (
+        "SELECT f.entity_type, f.value AS entity_id, "
+        "COALESCE(NULLIF(d.name, ''), NULLIF(k.description, ''), f.name, f.value) AS name FROM audit_facets f "
+        "LEFT JOIN devices d ON f.entity_type = 'device' AND d.device_id = f.value "
+        "LEFT JOIN tailnet_keys k ON f.entity_type = 'tailnet_key' AND k.key_id = f.value "
+        "WHERE f.kind = 'entity'"
+    )
     params = []
     if entity_type:
-        query += " WHERE entity_type = ?"
+        query += " AND f.entity_type = ?"
         params.append(entity_type)
-    query += " ORDER BY entity_type, entity_id"
+    query += " ORDER BY f.entity_type, f.value"
     with get_connection() as conn:
-        rows = conn.execute(query, params).fetchall()
-        names = _load_entity_names(conn)
-        # The most recent changes blob per entity, for the name-resolution
-        # fallback on removed entities. One grouped query instead of one per
-        # distinct entity; MAX(id) is the newest row because id is a
-        # monotonic AUTOINCREMENT, which is also the original query's
-        # tiebreaker within a single occurred_at.
-        latest_changes = {
-            (r["entity_type"], r["entity_id"]): r["changes"]
-            for r in conn.execute(
-                "SELECT entity_type, entity_id, changes FROM audit_log "
-                "WHERE id IN (SELECT MAX(id) FROM audit_log GROUP BY entity_type, entity_id)"
-            )
-        }
-        result = []
-        for r in rows:
-            raw = latest_changes.get((r["entity_type"], r["entity_id"]))
-            changes = None
-            if raw:
-                try:
-                    changes = json.loads(raw)
-                except (TypeError, ValueError):
-                    changes = None
-            name = _resolve_entity_name(names, r["entity_type"], r["entity_id"], changes)
-            result.append({"entity_type": r["entity_type"], "entity_id": r["entity_id"], "name": name})
-        return result
+        return [dict(r) for r in conn.execute(query, params)]
 
 
 def list_audit_log_changed_fields(entity_type: str = None):
     """Distinct field names appearing in audit_log changes blobs, for the
     "changed field" filter select, optionally scoped to one entity_type.
 
-    Reads the top-level JSON keys via json_each. Rows whose changes aren't a
-    JSON object are skipped (json_each yields a NULL key for a scalar), and
-    the setting-shaped wrapper keys are excluded - see
+    The top-level keys of each changes object, recorded in audit_facets as
+    rows are written; the setting-shaped wrapper keys are excluded - see
     _AUDIT_CHANGE_META_KEYS.
     """
-    placeholders = ",".join("?" for _ in _AUDIT_CHANGE_META_KEYS)
-    query = (
-        "SELECT DISTINCT json_each.key AS field FROM audit_log, json_each(audit_log.changes) "
-        f"WHERE json_valid(audit_log.changes) AND json_each.key IS NOT NULL "
-        f"AND json_each.key NOT IN ({placeholders})"
-    )
-    params = list(_AUDIT_CHANGE_META_KEYS)
+    query = "SELECT DISTINCT value AS field FROM audit_facets WHERE kind = 'field'"
+    params = []
     if entity_type:
-        query += " AND audit_log.entity_type = ?"
+        query += " AND entity_type = ?"
         params.append(entity_type)
     query += " ORDER BY field"
     with get_connection() as conn:
@@ -1560,15 +2443,25 @@ def purge_audit_log(retention_days: int = None):
     if retention_days is None:
         retention_days = get_audit_retention_days()
     cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+
+    def settle_facets(conn, table):
+        # Take the dropped day's share off audit_facets in the same transaction.
+        purged = _audit_facet_counts(conn, table)
+        conn.executemany(
+            "UPDATE audit_facets SET count = count - ? WHERE kind = ? AND entity_type = ? AND value = ?",
+            [(count, kind, entity_type, value) for kind, entity_type, value, _, count, _ in purged],
+        )
+
     with get_connection() as conn:
-        conn.execute("DELETE FROM audit_log WHERE occurred_at < ?", (cutoff,))
+        if _drop_partitions_before(conn, "audit_log", cutoff, before_drop=settle_facets):
+            conn.execute("DELETE FROM audit_facets WHERE count <= 0")
 
 
 # ---------------------------------------------------------------------------
 # Metrics history (lightweight aggregate snapshots for dashboard trend tiles)
 # ---------------------------------------------------------------------------
 
-METRICS_HISTORY_RETENTION_HOURS = 48  # keep a bit more than the 24h the UI shows
+METRICS_HISTORY_RETENTION_HOURS = 48  # raw rows; keep a bit more than the 24h the UI shows
 
 METRICS_HISTORY_COLUMNS = (
     "counter_healthy_true", "counter_healthy_false",
@@ -1579,8 +2472,58 @@ METRICS_HISTORY_COLUMNS = (
 )
 
 
+# Rollup tiers of metrics_history: (name, bucket seconds, retention hours),
+# finest first. Each bucket keeps the sample count and min/max/sum of every
+# counter, so averages stay exact however many raw rows a bucket absorbed.
+METRICS_ROLLUP_TIERS = (
+    ("5m", 5 * 60, 14 * 24),
+    ("1h", 60 * 60, 90 * 24),
+    ("1d", 24 * 60 * 60, 2 * 365 * 24),
+)
+# Default number of points get_metrics_history() returns at most - roughly
+# the width of a sparkline in pixels, not worth exceeding.
+METRICS_HISTORY_MAX_POINTS = 500
+
+
+def _init_metrics_rollup(conn):
+    aggregates = ", ".join(f"{c}_min INTEGER, {c}_max INTEGER, {c}_sum INTEGER" for c in METRICS_HISTORY_COLUMNS)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metrics_rollup'").fetchone():
+        return
+    conn.execute(
+        "CREATE TABLE metrics_rollup (tier TEXT NOT NULL, bucket_start TEXT NOT NULL, samples INTEGER NOT NULL, "
+        + aggregates + ", PRIMARY KEY (tier, bucket_start))"
+    )
+    # Upgrades in place: seed the tiers from the raw rows still on disk so
+    # long-range charts aren't empty until the first bucket fills.
+    for row in conn.execute("SELECT * FROM metrics_history ORDER BY occurred_at").fetchall():
+        _add_to_rollups(conn, row["occurred_at"], {c: row[c] or 0 for c in METRICS_HISTORY_COLUMNS})
+
+
+def _bucket_start(occurred_at: str, bucket_seconds: int) -> str:
+    epoch = int(datetime.fromisoformat(occurred_at).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % bucket_seconds, timezone.utc).isoformat()
+
+
+def _add_to_rollups(conn, occurred_at: str, values: dict):
+    """Fold one raw sample into its bucket of every tier (one upsert each)."""
+    columns = ", ".join(f"{c}_min, {c}_max, {c}_sum" for c in METRICS_HISTORY_COLUMNS)
+    placeholders = ", ".join("?, ?, ?" for _ in METRICS_HISTORY_COLUMNS)
+    updates = ", ".join(
+        f"{c}_min = MIN({c}_min, excluded.{c}_min), {c}_max = MAX({c}_max, excluded.{c}_max), "
+        f"{c}_sum = {c}_sum + excluded.{c}_sum"
+        for c in METRICS_HISTORY_COLUMNS
+    )
+    params = [v for c in METRICS_HISTORY_COLUMNS for v in (values[c], values[c], values[c])]
+    conn.executemany(
+        f"INSERT INTO metrics_rollup (tier, bucket_start, samples, {columns}) VALUES (?, ?, 1, {placeholders}) "
+        f"ON CONFLICT(tier, bucket_start) DO UPDATE SET samples = samples + 1, {updates}",
+        [(tier, _bucket_start(occurred_at, seconds), *params) for tier, seconds, _ in METRICS_ROLLUP_TIERS],
+    )
+
+
 def record_metrics_snapshot(health_metrics: dict, keys_metrics: dict):
-    """Append one aggregate counters row, taken once per poll cycle.
+    """Append one aggregate counters row, taken once per poll cycle, and
+    fold it into the rollup tiers in the same transaction.
 
     Deliberately just the small set of counters _compute_health_summary()/
     _compute_keys_summary() already produce - not a per-device snapshot -
@@ -1598,52 +2541,311 @@ def record_metrics_snapshot(health_metrics: dict, keys_metrics: dict):
         "keys_counter_healthy_true": keys_metrics.get("counter_key_healthy_true", 0),
         "keys_counter_healthy_false": keys_metrics.get("counter_key_healthy_false", 0),
     }
+    occurred_at = _now_iso()
     with get_connection() as conn:
         conn.execute(
             "INSERT INTO metrics_history (occurred_at, " + ", ".join(METRICS_HISTORY_COLUMNS) + ") "
             "VALUES (?, " + ", ".join("?" for _ in METRICS_HISTORY_COLUMNS) + ")",
-            (_now_iso(), *[values[c] for c in METRICS_HISTORY_COLUMNS]),
+            (occurred_at, *[values[c] for c in METRICS_HISTORY_COLUMNS]),
         )
+        _add_to_rollups(conn, occurred_at, values)
+
+
+def metrics_history_resolution(hours: int, max_points: int = METRICS_HISTORY_MAX_POINTS, raw_points: int = None) -> str:
+    """Pick the tier for a `hours`-long query: raw rows if they cover the
+    range and fit in `max_points`, else the finest rollup that does both;
+    the coarsest tier is the fallback for anything longer still."""
+    if hours <= METRICS_HISTORY_RETENTION_HOURS and raw_points is not None and raw_points <= max_points:
+        return "raw"
+    for tier, seconds, retention_hours in METRICS_ROLLUP_TIERS:
+        if hours <= retention_hours and hours * 3600 / seconds <= max_points:
+            return tier
+    return METRICS_ROLLUP_TIERS[-1][0]
+
 
+def get_metrics_series(hours: int = 24, max_points: int = METRICS_HISTORY_MAX_POINTS) -> dict:
+    """Counter history for the last `hours`, at most ~`max_points` entries,
+    as {"entries": [...], "resolution": "raw" | tier name}.
 
-def get_metrics_history(hours: int = 24):
+    Raw rows when they fit; otherwise one entry per rollup bucket, with each
+    counter's average under its usual name plus `<counter>_min`/`_max` and
+    the bucket's `samples`."""
     cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
     with get_connection() as conn:
+        raw_points = None
+        if hours <= METRICS_HISTORY_RETENTION_HOURS:
+            raw_points = conn.execute(
+                "SELECT COUNT(*) FROM metrics_history WHERE occurred_at >= ?", (cutoff,),
+            ).fetchone()[0]
+        resolution = metrics_history_resolution(hours, max_points, raw_points)
+        if resolution == "raw":
+            rows = conn.execute(
+                "SELECT * FROM metrics_history WHERE occurred_at >= ? ORDER BY occurred_at ASC",
+                (cutoff,),
+            ).fetchall()
+            return {"entries": [dict(r) for r in rows], "resolution": resolution}
+        bucket_seconds = next(s for tier, s, _ in METRICS_ROLLUP_TIERS if tier == resolution)
         rows = conn.execute(
-            "SELECT * FROM metrics_history WHERE occurred_at >= ? ORDER BY occurred_at ASC",
-            (cutoff,),
+            "SELECT * FROM metrics_rollup WHERE tier = ? AND bucket_start >= ? ORDER BY bucket_start ASC",
+            (resolution, _bucket_start(cutoff, bucket_seconds)),
         ).fetchall()
-        return [dict(r) for r in rows]
+    entries = []
+    for row in rows:
+        entry = {"occurred_at": row["bucket_start"], "samples": row["samples"]}
+        for c in METRICS_HISTORY_COLUMNS:
+            entry[c] = round(row[f"{c}_sum"] / row["samples"], 2)
+            entry[f"{c}_min"] = row[f"{c}_min"]
+            entry[f"{c}_max"] = row[f"{c}_max"]
+        entries.append(entry)
+    return {"entries": entries, "resolution": resolution}
+
+
+def get_metrics_history(hours: int = 24, max_points: int = METRICS_HISTORY_MAX_POINTS):
+    return get_metrics_series(hours, max_points)["entries"]
 
 
 def purge_metrics_history(retention_hours: int = METRICS_HISTORY_RETENTION_HOURS):
-    cutoff = (datetime.now(timezone.utc) - timedelta(hours=retention_hours)).isoformat()
+    """Drop raw rows after `retention_hours` and each rollup tier's buckets
+    after that tier's own retention."""
+    now = datetime.now(timezone.utc)
     with get_connection() as conn:
-        conn.execute("DELETE FROM metrics_history WHERE occurred_at < ?", (cutoff,))
+        conn.execute(
+            "DELETE FROM metrics_history WHERE occurred_at < ?", ((now - timedelta(hours=retention_hours)).isoformat(),),
+        )
+        conn.executemany(
+            "DELETE FROM metrics_rollup WHERE tier = ? AND bucket_start < ?",
+            [(tier, (now - timedelta(hours=keep)).isoformat()) for tier, _, keep in METRICS_ROLLUP_TIERS],
+        )
 
 
 # ---------------------------------------------------------------------------
-# Poller activity log (operational log for the /debug page)
+# Per-device health history (device_health_intervals)
 # ---------------------------------------------------------------------------
 
-def record_poller_log(event_type: str, message: str, detail: dict = None):
+# The health dimensions tracked per device, keyed to the /health fields they
+# come from.
+DEVICE_HEALTH_DIMENSIONS = {
+    "healthy": "healthy",
+    "online": "online_healthy",
+    "key": "key_healthy",
+    "update": "update_healthy",
+    "lock": "lock_healthy",
+}
+DEVICE_HEALTH_HISTORY_RETENTION_DAYS = 365
+
+
+def get_device_health_history(device_id: str, start: datetime, end: datetime = None) -> dict:
+    """Uptime and state intervals per dimension for one device between
+    `start` and `end` (default now), intervals clipped to the range.
+
+    uptime_percent is healthy time over *observed* time - stretches before
+    the device was first polled (or after it disappeared) count for neither.
+    """
+    end = end or datetime.now(timezone.utc)
+    start_iso, end_iso = start.isoformat(), end.isoformat()
     with get_connection() as conn:
-        conn.execute(
-            "INSERT INTO poller_log (occurred_at, event_type, message, detail) VALUES (?, ?, ?, ?)",
-            (_now_iso(), event_type, message, json.dumps(detail) if detail is not None else None),
+        rows = conn.execute(
+            "SELECT dimension, healthy, started_at, ended_at FROM device_health_intervals "
+            "WHERE device_id = ? AND started_at < ? AND (ended_at IS NULL OR ended_at > ?) "
+            "ORDER BY dimension, started_at",
+            (device_id, end_iso, start_iso),
+        ).fetchall()
+    dimensions = {}
+    for r in rows:
+        interval_start = max(datetime.fromisoformat(r["started_at"]), start)
+        interval_end = min(datetime.fromisoformat(r["ended_at"]), end) if r["ended_at"] else end
+        seconds = max(0.0, (interval_end - interval_start).total_seconds())
+        dim = dimensions.setdefault(
+            r["dimension"], {"observed_seconds": 0.0, "healthy_seconds": 0.0, "intervals": []},
+        )
+        dim["observed_seconds"] += seconds
+        if r["healthy"]:
+            dim["healthy_seconds"] += seconds
+        dim["intervals"].append({
+            "healthy": bool(r["healthy"]),
+            "started_at": interval_start.isoformat(),
+            "ended_at": r["ended_at"] and interval_end.isoformat(),
+        })
+    for dim in dimensions.values():
+        dim["transitions"] = len(dim["intervals"]) - 1
+        dim["uptime_percent"] = (
+            round(100.0 * dim["healthy_seconds"] / dim["observed_seconds"], 2) if dim["observed_seconds"] else None
+        )
+    return {"device_id": device_id, "start": start_iso, "end": end_iso, "dimensions": dimensions}
+
+
+def purge_device_health_intervals(retention_days: int = DEVICE_HEALTH_HISTORY_RETENTION_DAYS):
+    """Drop closed intervals that ended before the retention window; the
+    open one per device/dimension is kept however old it is."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max(1, retention_days))).isoformat()
+    with get_connection() as conn:
+        conn.execute("DELETE FROM device_health_intervals WHERE ended_at IS NOT NULL AND ended_at < ?", (cutoff,))
+
+
+# ---------------------------------------------------------------------------
+# Device change feed (/health/changes)
+# ---------------------------------------------------------------------------
+#
+# One row per device holding its latest evaluated /health entry and the
+# generation that last changed it; a removed (or newly filtered-out) device
+# keeps a tombstone row (payload NULL). The generation only advances when a
+# poll cycle actually changes something, so "what changed since N" is an
+# index range scan on generation, and a client that is current gets an
+# empty answer without a single payload being read.
+
+# Tombstones older than this are dropped; a client whose `since` predates the
+# newest dropped one can no longer be told what was removed, so it gets a
+# full resync instead (see get_device_changes()).
+DEVICE_FEED_TOMBSTONE_RETENTION_DAYS = 7
+
+# Excluded from the change digest: for a device connected to control it is
+# "now" on every evaluation, so it would mark every online device as changed
+# every cycle. The payload served still carries the current value.
+_DEVICE_FEED_VOLATILE_FIELDS = ("lastSeen",)
+
+_DEVICE_FEED_STATE_DEFAULT = {"generation": 0, "horizon": 0}
+
+
+def _device_feed_state(conn) -> dict:
+    row = _db_get_setting_row(conn, "device_feed_state")
+    try:
+        return {**_DEVICE_FEED_STATE_DEFAULT, **json.loads(row["value"])} if row else dict(_DEVICE_FEED_STATE_DEFAULT)
+    except (TypeError, ValueError):
+        return dict(_DEVICE_FEED_STATE_DEFAULT)
+
+
+def _set_device_feed_state(conn, state: dict):
+    conn.execute(
+        "INSERT INTO settings (name, value, source, updated_at) VALUES ('device_feed_state', ?, 'db', ?) "
+        "ON CONFLICT(name) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+        (json.dumps(state), _now_iso()),
+    )
+
+
+def _device_feed_digest(entry: dict) -> str:
+    stable = {k: v for k, v in entry.items() if k not in _DEVICE_FEED_VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(stable, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def record_device_feed(health_status: list) -> int:
+    """Fold one poll cycle's evaluated device list (the /health `devices`
+    entries) into the change feed. Devices whose entry changed, and devices
+    no longer present, are stamped with a new generation in one
+    transaction; returns the (possibly unchanged) current generation."""
+    now = _now_iso()
+    with get_connection() as conn:
+        state = _device_feed_state(conn)
+        known = {
+            r["device_id"]: r["digest"]
+            for r in conn.execute("SELECT device_id, digest FROM device_feed WHERE payload IS NOT NULL")
+        }
+        changed = []
+        for entry in health_status:
+            digest = _device_feed_digest(entry)
+            if known.pop(entry["id"], None) != digest:
+                changed.append((entry["id"], digest, json.dumps(entry)))
+        if not changed and not known:
+            return state["generation"]
+        generation = state["generation"] + 1
+        conn.executemany(
+            "INSERT INTO device_feed (device_id, generation, digest, payload, changed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(device_id) DO UPDATE SET generation=excluded.generation, digest=excluded.digest, "
+            "payload=excluded.payload, changed_at=excluded.changed_at",
+            [(device_id, generation, digest, payload, now) for device_id, digest, payload in changed],
+        )
+        conn.executemany(
+            "UPDATE device_feed SET generation = ?, digest = '', payload = NULL, changed_at = ? WHERE device_id = ?",
+            [(generation, now, device_id) for device_id in known],
         )
+        _set_device_feed_state(conn, {**state, "generation": generation})
+        return generation
+
+
+def get_device_changes(since: int = 0) -> dict:
+    """Devices changed after generation `since`: {"generation", "reset",
+    "changed": [entry, ...], "removed": [device_id, ...]}.
+
+    `reset` means the caller's `since` can't be served incrementally (0, from
+    the future - e.g. the database was replaced - or older than the
+    tombstones still kept), so `changed` is the complete current list and
+    the caller should replace, not merge."""
+    with get_connection() as conn:
+        state = _device_feed_state(conn)
+        reset = since <= 0 or since > state["generation"] or since < state["horizon"]
+        if reset:
+            rows = conn.execute("SELECT device_id, payload FROM device_feed WHERE payload IS NOT NULL").fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT device_id, payload FROM device_feed WHERE generation > ?", (since,),
+            ).fetchall()
+    return {
+        "generation": state["generation"],
+        "reset": reset,
+        "changed": [json.loads(r["payload"]) for r in rows if r["payload"] is not None],
+        "removed": [r["device_id"] for r in rows if r["payload"] is None],
+    }
+
+
+def get_stream_state() -> dict:
+    """The few values /health/stream watches for change, in one round trip:
+    the device feed generation, the last completed poll, and the newest
+    poller_log id (read from the newest day partition only)."""
+    with get_connection() as conn:
+        days = _list_partition_days(conn, "poller_log")
+        latest_log_id = None
+        if days:
+            latest_log_id = conn.execute(
+                f"SELECT MAX(id) FROM {_partition_name('poller_log', days[-1])}"
+            ).fetchone()[0]
+        last_polled = _db_get_setting_row(conn, "last_polled_at")
+        return {
+            "generation": _device_feed_state(conn)["generation"],
+            "last_polled_at": last_polled["value"] if last_polled else None,
+            "poller_log_id": latest_log_id,
+        }
+
+
+def purge_device_feed(retention_days: int = DEVICE_FEED_TOMBSTONE_RETENTION_DAYS):
+    """Drop old tombstones, raising the horizon below which a `since` needs a
+    full resync to the newest generation dropped."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max(1, retention_days))).isoformat()
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT MAX(generation) FROM device_feed WHERE payload IS NULL AND changed_at < ?", (cutoff,),
+        ).fetchone()
+        if row[0] is None:
+            return
+        conn.execute("DELETE FROM device_feed WHERE payload IS NULL AND changed_at < ?", (cutoff,))
+        state = _device_feed_state(conn)
+        _set_device_feed_state(conn, {**state, "horizon": max(state["horizon"], row[0])})
+
+
+# ---------------------------------------------------------------------------
+# Poller activity log (operational log for the /debug page)
+# ---------------------------------------------------------------------------
+
+def record_poller_log(event_type: str, message: str, detail: dict = None, occurred_at: str = None):
+    with get_connection() as conn:
+        _insert_log_row(conn, "poller_log", {
+            "occurred_at": occurred_at or _now_iso(), "event_type": event_type, "message": message,
+            "detail": json.dumps(detail) if detail is not None else None,
+        })
 
 
 def list_poller_log(event_type: str = None, limit: int = 200):
-    query = "SELECT * FROM poller_log"
-    params = []
-    if event_type:
-        query += " WHERE event_type = ?"
-        params.append(event_type)
-    query += " ORDER BY occurred_at DESC, id DESC LIMIT ?"
-    params.append(limit)
+    where = " WHERE event_type = ?" if event_type else ""
+    rows = []
     with get_connection() as conn:
-        rows = conn.execute(query, params).fetchall()
+        # Newest partition first; older days are only read to fill the page.
+        for day in _partition_days_for_range(conn, "poller_log"):
+            if len(rows) >= limit:
+                break
+            params = [event_type] if event_type else []
+            rows += conn.execute(
+                f"SELECT * FROM {_partition_name('poller_log', day)}{where} "
+                "ORDER BY occurred_at DESC, id DESC LIMIT ?",
+                [*params, limit - len(rows)],
+            ).fetchall()
         result = []
         for r in rows:
             entry = dict(r)
@@ -1663,7 +2865,7 @@ def list_poller_log_event_types():
 
 
 def get_poller_log_retention_days() -> int:
-    return max(1, get_setting_typed("poller_log_retention_days"))
+    return min(LOG_RETENTION_MAX_DAYS, max(1, get_setting_typed("poller_log_retention_days")))
 
 
 def purge_poller_log(retention_days: int = None):
@@ -1671,7 +2873,64 @@ def purge_poller_log(retention_days: int = None):
         retention_days = get_poller_log_retention_days()
     cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
     with get_connection() as conn:
-        conn.execute("DELETE FROM poller_log WHERE occurred_at < ?", (cutoff,))
+        _drop_partitions_before(conn, "poller_log", cutoff)
+
+
+# One row per poll cycle: its total and per-phase wall times (ms, phases as
+# a JSON object), kept for the most recent POLL_CYCLE_TIMING_KEEP cycles -
+# a day at the default poll interval.
+POLL_CYCLE_TIMING_KEEP = 1440
+
+
+def record_poll_cycle_timing(duration_ms: float, phases: dict, completed_at: str = None):
+    with get_connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO poll_cycle_timing (completed_at, duration_ms, phases) VALUES (?, ?, ?)",
+            (completed_at or _now_iso(), duration_ms, json.dumps(phases)),
+        )
+        conn.execute("DELETE FROM poll_cycle_timing WHERE id <= ?", (cursor.lastrowid - POLL_CYCLE_TIMING_KEEP,))
+
+
+def _nearest_rank(ordered: list, pct: float):
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def get_poll_cycle_timing_summary(cycles: int = POLL_CYCLE_TIMING_KEEP) -> dict:
+    """p50/p95/max (ms) of the whole cycle and of each phase over the last
+    `cycles` poll cycles. A phase's figures cover only the cycles it ran in
+    (a failed fetch skips its upsert; notify_auth runs on the first
+    authentication failure only), counted in its `cycles`."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT completed_at, duration_ms, phases FROM poll_cycle_timing ORDER BY id DESC LIMIT ?", (cycles,),
+        ).fetchall()
+
+    def stats(values):
+        ordered = sorted(values)
+        return {
+            "cycles": len(ordered),
+            "p50_ms": _nearest_rank(ordered, 50),
+            "p95_ms": _nearest_rank(ordered, 95),
+            "max_ms": ordered[-1],
+        }
+
+    by_phase = {}
+    for row in rows:
+        try:
+            phases = json.loads(row["phases"])
+        except (TypeError, ValueError):
+            continue
+        for name, ms in phases.items():
+            by_phase.setdefault(name, []).append(ms)
+    return {
+        "cycles": len(rows),
+        "since": rows[-1]["completed_at"] if rows else None,
+        "total": stats([row["duration_ms"] for row in rows]) if rows else None,
+        "phases": sorted(
+            ({"phase": name, **stats(values)} for name, values in by_phase.items()),
+            key=lambda entry: -entry["p95_ms"],
+        ),
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -1746,11 +3005,217 @@ def get_last_notified(event_type: str) -> dict:
 
 
 def set_last_notified(event_type: str, entity_id: str, when: str = None):
+    set_last_notified_bulk(event_type, [entity_id], when)
+
+
+def set_last_notified_bulk(event_type: str, entity_ids, when: str = None):
+    when = when or _now_iso()
     with get_connection() as conn:
-        conn.execute(
+        conn.executemany(
             "INSERT INTO notification_state (event_type, entity_id, last_notified_at) VALUES (?, ?, ?) "
             "ON CONFLICT(event_type, entity_id) DO UPDATE SET last_notified_at=excluded.last_notified_at",
-            (event_type, entity_id, when or _now_iso()),
+            [(event_type, entity_id, when) for entity_id in entity_ids],
+        )
+
+
+# ---------------------------------------------------------------------------
+# Notification outbox (queued by the poll cycle, delivered by the dispatcher)
+# ---------------------------------------------------------------------------
+
+# statuses: pending (due at next_attempt_at), sending (claimed; next_attempt_at
+# is the claim's expiry), sent, dead (gave up after notification_max_attempts).
+NOTIFICATION_OUTBOX_RETENTION_DAYS = 7
+
+
+def _insert_outbox_row(conn, event_type, entity_id, target, title, body, hold_seconds, now) -> int:
+    due = now
+    if hold_seconds > 0:
+        # Join the digest window a held notification of this type already opened.
+        row = conn.execute(
+            "SELECT MAX(next_attempt_at) AS due FROM notification_outbox "
+            "WHERE event_type = ? AND status = 'pending' AND attempts = 0 AND next_attempt_at > ?",
+            (event_type, now),
+        ).fetchone()
+        due = row["due"] if row and row["due"] else now + hold_seconds
+    cur = conn.execute(
+        "INSERT INTO notification_outbox (event_type, entity_id, target, title, body, status, next_attempt_at, created_at) "
+        "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+        (event_type, entity_id, target, title, body, due, _now_iso()),
+    )
+    return cur.lastrowid
+
+
+def enqueue_notification(event_type: str, entity_id: str, target: str, title: str, body: str,
+                         hold_seconds: float = 0) -> int:
+    """Queue one notification. `hold_seconds` (digest window) delays its
+    first attempt; if a held notification of the same event type is already
+    waiting, this one joins that window - same due time - so the dispatcher
+    claims them together."""
+    with get_connection() as conn:
+        return _insert_outbox_row(conn, event_type, entity_id, target, title, body, hold_seconds, time.time())
+
+
+def load_notification_state() -> dict:
+    """Everything the poller's notification bookkeeping reads, in one
+    connection: previous-cycle health per entity type, last delivery per
+    event type, and which (event, entity) pairs still sit undelivered in the
+    outbox. poller.py keeps this in memory and writes changes back through
+    apply_notification_state(). `intervals` is each device's open
+    device_health_intervals state per dimension."""
+    with get_connection() as conn:
+        health, last_notified = {}, {}
+        for r in conn.execute("SELECT entity_type, entity_id, healthy FROM entity_health_state"):
+            health.setdefault(r["entity_type"], {})[r["entity_id"]] = bool(r["healthy"])
+        for r in conn.execute("SELECT event_type, entity_id, last_notified_at FROM notification_state"):
+            last_notified.setdefault(r["event_type"], {})[r["entity_id"]] = r["last_notified_at"]
+        undelivered = {
+            (r["event_type"], r["entity_id"]) for r in conn.execute(
+                "SELECT DISTINCT event_type, entity_id FROM notification_outbox WHERE status IN ('pending', 'sending')"
+            )
+        }
+        intervals = {
+            (r["device_id"], r["dimension"]): bool(r["healthy"]) for r in conn.execute(
+                "SELECT device_id, dimension, healthy FROM device_health_intervals WHERE ended_at IS NULL"
+            )
+        }
+    return {"health": health, "last_notified": last_notified, "undelivered": undelivered, "intervals": intervals}
+
+
+def apply_notification_state(health_upserts: dict = None, health_deletes=(), outbox_rows=(), interval_changes=()):
+    """Write back one cycle's worth of notification bookkeeping in a single
+    transaction: health_upserts {(entity_type, entity_id): healthy},
+    health_deletes [(entity_type, entity_id)], outbox_rows [(event_type,
+    entity_id, target, title, body, hold_seconds)] queued in order, and
+    interval_changes [(device_id, dimension, healthy, at_iso)] - each closes
+    the open interval and, unless healthy is None (device gone), opens the
+    next. Returns the new outbox ids."""
+    now = time.time()
+    now_iso = _now_iso()
+    with get_connection() as conn:
+        if health_upserts:
+            conn.executemany(
+                _SET_HEALTH_STATE_SQL,
+                [(t, i, int(bool(h)), now_iso) for (t, i), h in health_upserts.items()],
+            )
+        if health_deletes:
+            conn.executemany(
+                "DELETE FROM entity_health_state WHERE entity_type = ? AND entity_id = ?", list(health_deletes),
+            )
+        for device_id, dimension, healthy, at in interval_changes:
+            conn.execute(
+                "UPDATE device_health_intervals SET ended_at = ? "
+                "WHERE device_id = ? AND dimension = ? AND ended_at IS NULL",
+                (at, device_id, dimension),
+            )
+            if healthy is not None:
+                conn.execute(
+                    "INSERT INTO device_health_intervals (device_id, dimension, healthy, started_at) VALUES (?, ?, ?, ?)",
+                    (device_id, dimension, int(bool(healthy)), at),
+                )
+        return [_insert_outbox_row(conn, *row, now) for row in outbox_rows]
+
+
+def claim_due_notifications(limit: int, claim_seconds: float) -> list:
+    """Claim up to `limit` due notifications (oldest first) for delivery.
+
+    Claimed rows move to 'sending' with next_attempt_at pushed out by
+    `claim_seconds`; if the claiming process dies before settling them they
+    become due again once that passes - nothing queued is lost to a restart.
+    """
+    now = time.time()
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT * FROM notification_outbox WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+            "ORDER BY id LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        if rows:
+            conn.executemany(
+                "UPDATE notification_outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                [(now + claim_seconds, r["id"]) for r in rows],
+            )
+        return [dict(r) for r in rows]
+
+
+def mark_notifications_sent(outbox_ids, notified: dict = None):
+    """Settle delivered rows - one, or every row a digest message covered -
+    and, in the same transaction, start the cooldowns the delivery began:
+    notified {(event_type, entity_id): iso}. Written together, so a poller
+    that dies right after sending can't come back and send again."""
+    now_iso = _now_iso()
+    with get_connection() as conn:
+        conn.executemany(
+            "UPDATE notification_outbox SET status = 'sent', attempts = attempts + 1, finished_at = ?, last_error = NULL "
+            "WHERE id = ?",
+            [(now_iso, outbox_id) for outbox_id in outbox_ids],
+        )
+        if notified:
+            conn.executemany(
+                "INSERT INTO notification_state (event_type, entity_id, last_notified_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(event_type, entity_id) DO UPDATE SET last_notified_at=excluded.last_notified_at",
+                [(e, i, when) for (e, i), when in notified.items()],
+            )
+
+
+def mark_notifications_failed(outbox_ids, error: str, retry_at: float = None):
+    """Record a failed attempt: back to 'pending' until `retry_at`, or 'dead'
+    when `retry_at` is None (out of attempts)."""
+    now_iso = _now_iso()
+    with get_connection() as conn:
+        if retry_at is None:
+            conn.executemany(
+                "UPDATE notification_outbox SET status = 'dead', attempts = attempts + 1, finished_at = ?, last_error = ? "
+                "WHERE id = ?",
+                [(now_iso, error, outbox_id) for outbox_id in outbox_ids],
+            )
+        else:
+            conn.executemany(
+                "UPDATE notification_outbox SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?",
+                [(retry_at, error, outbox_id) for outbox_id in outbox_ids],
+            )
+
+
+def defer_notifications(outbox_ids, until: float):
+    """Hand claimed rows back as 'pending' until `until` without counting an
+    attempt - nothing was sent, the send budget just had no room for them."""
+    with get_connection() as conn:
+        conn.executemany(
+            "UPDATE notification_outbox SET status = 'pending', next_attempt_at = ? WHERE id = ?",
+            [(until, outbox_id) for outbox_id in outbox_ids],
+        )
+
+
+def next_notification_due_at():
+    """Epoch of the earliest pending/claimed notification, or None if the
+    outbox is empty - lets the dispatcher sleep exactly until then."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT MIN(next_attempt_at) AS due FROM notification_outbox WHERE status IN ('pending', 'sending')"
+        ).fetchone()
+    return row["due"] if row else None
+
+
+def list_notification_outbox(status: str = None, limit: int = 200) -> list:
+    query = "SELECT * FROM notification_outbox"
+    params = []
+    if status:
+        query += " WHERE status = ?"
+        params.append(status)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    with get_connection() as conn:
+        return [dict(r) for r in conn.execute(query, params).fetchall()]
+
+
+def purge_notification_outbox(older_than_days: int = NOTIFICATION_OUTBOX_RETENTION_DAYS):
+    """Drop delivered and dead-lettered rows after a week; pending ones are
+    never purged."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max(1, older_than_days))).isoformat()
+    with get_connection() as conn:
+        conn.execute(
+            "DELETE FROM notification_outbox WHERE status IN ('sent', 'dead') AND finished_at < ?", (cutoff,),
         )
 
 
@@ -1762,3 +3227,91 @@ def purge_notification_state(older_than_days: int = 30):
     cutoff = (datetime.now(timezone.utc) - timedelta(days=max(1, older_than_days))).isoformat()
     with get_connection() as conn:
         conn.execute("DELETE FROM notification_state WHERE last_notified_at < ?", (cutoff,))
+
+
+# ---------------------------------------------------------------------------
+# Request latency histograms (/debug, see reqtiming.py)
+# ---------------------------------------------------------------------------
+
+# One row per (UTC minute, route, latency bucket). Every worker adds its
+# counts to the same rows, so reads see all workers. The /debug panel shows
+# the last hour; a little more is kept so a window never starts mid-purge.
+REQUEST_LATENCY_RETENTION_MINUTES = 90
+
+
+def record_request_latency(rows):
+    """Add [(minute epoch, route, bucket, count)] from reqtiming.drain_due()
+    to the shared histograms, dropping minutes past retention as it goes."""
+    if not rows:
+        return
+    cutoff = int(time.time()) - REQUEST_LATENCY_RETENTION_MINUTES * 60
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO request_latency (minute, route, bucket, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(minute, route, bucket) DO UPDATE SET count = count + excluded.count",
+            rows,
+        )
+        conn.execute("DELETE FROM request_latency WHERE minute < ?", (cutoff,))
+
+
+def get_request_latency(minutes: int = 60) -> dict:
+    """{route: {bucket: count}} summed over the last `minutes`."""
+    since = int(time.time() // 60) * 60 - (minutes - 1) * 60
+    result = {}
+    with get_connection() as conn:
+        for row in conn.execute(
+            "SELECT route, bucket, SUM(count) AS n FROM request_latency WHERE minute >= ? GROUP BY route, bucket",
+            (since,),
+        ):
+            result.setdefault(row["route"], {})[row["bucket"]] = row["n"]
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Tailscale API call statistics (/debug and /metrics, see upstreamstats.py)
+# ---------------------------------------------------------------------------
+
+# One row per (UTC minute, endpoint, metric, key): calls, status/<code>,
+# latency_bucket/<n>, bytes_bucket/<n>, the *_sum totals and the retry,
+# refresh and timeout counters. Minute 0 holds the all-time totals that
+# /metrics exports as counters; real minutes are kept as long as the
+# request latency histograms.
+UPSTREAM_CALLS_RETENTION_MINUTES = REQUEST_LATENCY_RETENTION_MINUTES
+
+
+def record_upstream_call(endpoint: str, values: dict):
+    """Add one call's {(metric, key): value} to its minute and to the totals."""
+    minute = int(time.time() // 60) * 60
+    rows = [
+        (bucket_minute, endpoint, metric, key, value)
+        for (metric, key), value in values.items()
+        for bucket_minute in (minute, 0)
+    ]
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO upstream_calls (minute, endpoint, metric, key, value) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(minute, endpoint, metric, key) DO UPDATE SET value = value + excluded.value",
+            rows,
+        )
+        conn.execute(
+            "DELETE FROM upstream_calls WHERE minute > 0 AND minute < ?",
+            (minute - UPSTREAM_CALLS_RETENTION_MINUTES * 60,),
+        )
+
+
+def get_upstream_calls(minutes: int = None) -> dict:
+    """{endpoint: {(metric, key): value}} over the last `minutes`, or the
+    all-time totals when minutes is None."""
+    if minutes is None:
+        sql, params = "SELECT endpoint, metric, key, value FROM upstream_calls WHERE minute = 0", ()
+    else:
+        sql = (
+            "SELECT endpoint, metric, key, SUM(value) AS value FROM upstream_calls "
+            "WHERE minute >= ? GROUP BY endpoint, metric, key"
+        )
+        params = (int(time.time() // 60) * 60 - (minutes - 1) * 60,)
+    result = {}
+    with get_connection() as conn:
+        for row in conn.execute(sql, params):
+            result.setdefault(row["endpoint"], {})[(row["metric"], row["key"])] = row["value"]
+    return result
@@ -1,4 +1,5 @@
-import type { SettingsResponse } from '@/lib/types'
+import type { PollJob, PollJobAccepted, SettingsResponse } from '@/lib/types'
+import { POLL_JOB_MAX_WAIT_SECONDS } from '@/lib/api'
 
 export type AdminStatus = {
   tailnet_configured: boolean
@@ -110,10 +111,14 @@ export async function getApiBaseUrl(): Promise<string> {
   }
 }
 
-export function pollNow(): Promise<{ ok: boolean; last_polled_at: string | null }> {
+export function pollNow(): Promise<PollJobAccepted & { ok: boolean; coalesced: boolean }> {
   return request('/admin/api/poll-now', { method: 'POST' })
 }
 
+export function fetchPollJob(jobId: string, waitSeconds = POLL_JOB_MAX_WAIT_SECONDS): Promise<PollJob> {
+  return request(`/admin/api/poll-now/${encodeURIComponent(jobId)}?wait=${waitSeconds}`)
+}
+
 export function testNotification(overrides: Record<string, string>): Promise<{ ok: true }> {
   return request('/admin/api/notifications/test', { method: 'POST', body: JSON.stringify(overrides) })
 }
@@ -132,7 +137,7 @@ export function deleteUser(username: string): Promise<{ ok: boolean }> {
 
 export function fetchAuditLog(
   params: Record<string, string> & { actor?: string },
-): Promise<{ entries: AuditEntry[]; total: number; limit: number; offset: number }> {
+): Promise<{ entries: AuditEntry[]; total: number; limit: number; offset: number; next_cursor: string | null }> {
   const qs = new URLSearchParams(Object.fromEntries(Object.entries(params).filter(([, v]) => v))).toString()
   return request(`/admin/api/audit${qs ? `?${qs}` : ''}`)
 }
@@ -159,20 +164,83 @@ export type PollerLogEntry = {
   detail: Record<string, unknown> | null
 }
 
+export type CycleTimingStats = {
+  cycles: number
+  p50_ms: number
+  p95_ms: number
+  max_ms: number
+}
+
+// Per-phase wall times over the most recent poll cycles (up to a day's worth).
+export type CycleTimingSummary = {
+  cycles: number
+  since: string | null
+  total: CycleTimingStats | null
+  phases: (CycleTimingStats & { phase: string })[]
+}
+
 export type PollerLogResponse = {
   entries: PollerLogEntry[]
   event_types: string[]
   enabled: boolean
   last_polled_at: string | null
   poll_interval_seconds: number
+  cycle_timing: CycleTimingSummary
 }
 
 export function fetchPollerLog(limit = 300): Promise<PollerLogResponse> {
   return request(`/admin/api/debug/poller-log?limit=${limit}`)
 }
 
+// Percentiles are bucket upper bounds: never understated, at most ~19% over.
+export type RouteLatency = {
+  route: string
+  count: number
+  p50_ms: number | null
+  p95_ms: number | null
+  p99_ms: number | null
+  max_ms: number | null
+}
+
+export type RequestLatencyResponse = {
+  minutes: number
+  routes: RouteLatency[]
+  flush_seconds: number
+}
+
+export function fetchRequestLatency(minutes = 60): Promise<RequestLatencyResponse> {
+  return request(`/admin/api/debug/request-latency?minutes=${minutes}`)
+}
+
+// Latency and size percentiles are bucket upper bounds, like RouteLatency's.
+// `status` maps HTTP status (or "none": timeout/connection error) to calls.
+export type UpstreamEndpointStats = {
+  endpoint: string
+  calls: number
+  errors: number
+  timeouts: number
+  retries: number
+  auth_refreshes: number
+  status: Record<string, number>
+  latency_ms: { p50: number | null; p95: number | null; p99: number | null; max: number | null; mean: number | null }
+  response_bytes: { p50: number | null; p95: number | null; max: number | null; total: number }
+}
+
+export type UpstreamCallsResponse = {
+  minutes: number
+  endpoints: UpstreamEndpointStats[]
+}
+
+export function fetchUpstreamCalls(minutes = 60): Promise<UpstreamCallsResponse> {
+  return request(`/admin/api/debug/upstream?minutes=${minutes}`)
+}
+
+// Raw rows carry `id`; rollup buckets (5m/1h/1d, for longer ranges) carry
+// the bucket's sample count, with each counter averaged over it and its
+// extremes under `<counter>_min` / `<counter>_max`.
 export type MetricsHistoryEntry = {
-  id: number
+  id?: number
+  samples?: number
   occurred_at: string
   counter_healthy_true: number
   counter_healthy_false: number
@@ -184,10 +252,43 @@ export type MetricsHistoryEntry = {
   counter_update_healthy_false: number
   keys_counter_healthy_true: number
   keys_counter_healthy_false: number
+  [extreme: `${string}_min` | `${string}_max`]: number | undefined
 }
 
-export function fetchMetricsHistory(hours = 24): Promise<{ entries: MetricsHistoryEntry[] }> {
-  return request(`/admin/api/metrics-history?hours=${hours}`)
+export type DeviceHealthDimension = 'healthy' | 'online' | 'key' | 'update' | 'lock'
+
+export type DeviceHealthInterval = { healthy: boolean; started_at: string; ended_at: string | null }
+
+export type DeviceHealthHistory = {
+  device_id: string
+  start: string
+  end: string
+  dimensions: Partial<
+    Record<
+      DeviceHealthDimension,
+      {
+        uptime_percent: number | null
+        observed_seconds: number
+        healthy_seconds: number
+        transitions: number
+        intervals: DeviceHealthInterval[]
+      }
+    >
+  >
+}
+
+export function fetchDeviceHealthHistory(deviceId: string, hours = 24): Promise<DeviceHealthHistory> {
+  return request(`/admin/api/devices/${encodeURIComponent(deviceId)}/health-history?hours=${hours}`)
+}
+
+export type MetricsHistoryResolution = 'raw' | '5m' | '1h' | '1d'
+
+export function fetchMetricsHistory(
+  hours = 24,
+  points?: number,
+): Promise<{ entries: MetricsHistoryEntry[]; resolution: MetricsHistoryResolution }> {
+  const query = points ? `hours=${hours}&points=${points}` : `hours=${hours}`
+  return request(`/admin/api/metrics-history?${query}`)
 }
 
 export function generateToken(): Promise<{ token: string }> {
@@ -1,4 +1,4 @@
-import type { Device, HealthResponse, KeysResponse } from '@/lib/types'
+import type { Device, HealthResponse, KeysResponse, PollJob, PollJobAccepted } from '@/lib/types'
 
 class ApiError extends Error {
   status: number
@@ -36,8 +36,25 @@ export async function fetchDeviceByIdentifier(identifier: string): Promise<Devic
   return data.device
 }
 
-export function invalidateCache(): Promise<void> {
-  return fetch('/health/cache/invalidate', { headers: { Accept: 'application/json' } }).then(() => undefined)
+export function invalidateCache(): Promise<PollJobAccepted> {
+  return getJson<PollJobAccepted>('/health/cache/invalidate')
+}
+
+// The server's cap on ?wait= for poll-job status (poller.POLL_JOB_MAX_WAIT_SECONDS).
+export const POLL_JOB_MAX_WAIT_SECONDS = 10
+
+// Long-polls a queued refresh until the poller settles it. Each request
+// waits server-side (capped there, and answered at once when the worker
+// has too many waiters, so pause before asking again); give up after
+// maxWaitMs and let the caller reload whatever is there.
+export async function waitForPollJob(statusUrl: string, maxWaitMs = 60_000): Promise<PollJob | null> {
+  const deadline = Date.now() + maxWaitMs
+  while (Date.now() < deadline) {
+    const job = await getJson<PollJob>(`${statusUrl}?wait=${POLL_JOB_MAX_WAIT_SECONDS}`)
+    if (job.status !== 'queued' && job.status !== 'running') return job
+    await new Promise((resolve) => setTimeout(resolve, 1000))
+  }
+  return null
 }
 
 export { ApiError }
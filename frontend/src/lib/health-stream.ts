@@ -0,0 +1,116 @@
+import { useEffect, useRef, useState } from 'react'
+
+// One EventSource on /health/stream per tab, shared by every hook below and
+// opened only while at least one component is listening. The server ends
+// each stream after a few minutes and EventSource reconnects by itself; if
+// the endpoint refuses outright (401, 503 when a worker is at its stream
+// limit) the source is closed and retried after REOPEN_DELAY_MS, and
+// callers see `connected: false` and keep polling in the meantime.
+const STREAM_URL = '/health/stream'
+const REOPEN_DELAY_MS = 60_000
+
+export type HealthStreamEvent = 'generation' | 'transition' | 'poller_log'
+
+export interface GenerationEvent {
+  generation: number
+  last_polled_at: string | null
+}
+
+export interface TransitionEvent {
+  id: string
+  device: string | null
+  healthy: boolean | null
+  previous: boolean | null
+  generation: number
+}
+
+export interface PollerLogEvent {
+  poller_log_id: number | null
+}
+
+type Handler = (data: unknown) => void
+
+let source: EventSource | null = null
+let reopenTimer: ReturnType<typeof setTimeout> | null = null
+let connected = false
+let refs = 0
+const handlers = new Map<HealthStreamEvent, Set<Handler>>()
+const statusListeners = new Set<(connected: boolean) => void>()
+
+function setConnected(value: boolean) {
+  if (connected === value) return
+  connected = value
+  statusListeners.forEach((listener) => listener(value))
+}
+
+function dispatch(event: HealthStreamEvent) {
+  return (message: MessageEvent) => {
+    let data: unknown
+    try {
+      data = JSON.parse(message.data)
+    } catch {
+      return
+    }
+    handlers.get(event)?.forEach((handler) => handler(data))
+  }
+}
+
+function open() {
+  if (source || typeof EventSource === 'undefined') return
+  const es = new EventSource(STREAM_URL)
+  source = es
+  es.onopen = () => setConnected(true)
+  es.onerror = () => {
+    setConnected(false)
+    // CONNECTING means the browser is already retrying (a normal end of
+    // stream); CLOSED means the server refused it - back off and retry.
+    if (es.readyState === EventSource.CLOSED) {
+      source = null
+      reopenTimer = setTimeout(() => {
+        reopenTimer = null
+        if (refs > 0) open()
+      }, REOPEN_DELAY_MS)
+    }
+  }
+  for (const event of ['generation', 'transition', 'poller_log'] as HealthStreamEvent[]) {
+    es.addEventListener(event, dispatch(event) as EventListener)
+  }
+}
+
+function close() {
+  if (reopenTimer) clearTimeout(reopenTimer)
+  reopenTimer = null
+  source?.close()
+  source = null
+  setConnected(false)
+}
+
+/**
+ * Subscribe to one /health/stream event type for the component's lifetime.
+ * Returns whether the stream is currently connected, so callers can fall
+ * back to timer-based polling while it isn't.
+ */
+export function useHealthStream<T>(event: HealthStreamEvent, handler: (data: T) => void): boolean {
+  const [isConnected, setIsConnected] = useState(connected)
+  // Latest handler without resubscribing on every render.
+  const handlerRef = useRef(handler)
+  handlerRef.current = handler
+
+  useEffect(() => {
+    const wrapped: Handler = (data) => handlerRef.current(data as T)
+    if (!handlers.has(event)) handlers.set(event, new Set())
+    handlers.get(event)!.add(wrapped)
+    statusListeners.add(setIsConnected)
+    refs += 1
+    open()
+    setIsConnected(connected)
+    return () => {
+      handlers.get(event)?.delete(wrapped)
+      statusListeners.delete(setIsConnected)
+      refs -= 1
+      if (refs === 0) close()
+    }
+  }, [event])
+
+  return isConnected
+}
@@ -69,6 +69,26 @@ export interface PollMeta {
   last_poll_auth_error?: boolean
   /** Configured IANA timezone - render every timestamp in this, not the browser's. */
   timezone?: string
+  /** Tailscale API circuit breaker is open - data is the last snapshot until circuit_open_until. */
+  degraded?: boolean
+  circuit_open_until?: string | null
+}
+
+/** A manual refresh queued for the poller (/health/cache/invalidate, /admin/api/poll-now). */
+export interface PollJob {
+  id: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  requested_at: string
+  started_at: string | null
+  finished_at: string | null
+  error: string | null
+  last_polled_at: string | null
+}
+
+export interface PollJobAccepted {
+  job_id: string
+  status: PollJob['status']
+  status_url: string
 }
 
 export interface HealthResponse {
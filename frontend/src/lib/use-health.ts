@@ -1,5 +1,6 @@
 import { useCallback, useEffect, useState } from 'react'
-import { fetchHealth, fetchKeys, invalidateCache } from '@/lib/api'
+import { fetchHealth, fetchKeys, invalidateCache, waitForPollJob } from '@/lib/api'
+import { useHealthStream, type GenerationEvent } from '@/lib/health-stream'
 import type { HealthResponse, KeysResponse } from '@/lib/types'
 
 // Fallback retry cadence used before the app has ever obtained a real
@@ -79,7 +80,8 @@ export function useHealth() {
 
   const refresh = useCallback(async () => {
     try {
-      await invalidateCache()
+      const job = await invalidateCache()
+      await waitForPollJob(job.status_url)
     } catch {
       // best-effort; still reload
     }
@@ -90,7 +92,15 @@ export function useHealth() {
     load()
   }, [load])
 
-  // Auto-refetch on the same cadence as the background poller, so the UI
+  // While /health/stream is connected a new poll is announced as a
+  // `generation` event, so reload on that instead of on a timer. The
+  // initial event on connect also triggers one reload, which picks up
+  // anything that changed while the stream was down.
+  const streaming = useHealthStream<GenerationEvent>('generation', () => {
+    load()
+  })
+
+  // Without the stream, auto-refetch on the same cadence as the background poller, so the UI
   // doesn't sit on stale data until someone manually hits Refresh.
   //
   // pollIntervalSeconds only exists once a load has ever *succeeded*
@@ -100,14 +110,14 @@ export function useHealth() {
   // the fallback used until real poll_meta has been obtained at least once.
   const pollIntervalSeconds = state.health?.poll_meta?.poll_interval_seconds ?? DEFAULT_RETRY_SECONDS
   useEffect(() => {
-    if (state.lastAttemptAt == null) return
+    if (streaming || state.lastAttemptAt == null) return
     const elapsedMs = Date.now() - state.lastAttemptAt
     const remainingMs = Math.max(0, pollIntervalSeconds * 1000 - elapsedMs)
     const timer = setTimeout(() => {
       load()
     }, remainingMs)
     return () => clearTimeout(timer)
-  }, [pollIntervalSeconds, state.lastAttemptAt, load])
+  }, [streaming, pollIntervalSeconds, state.lastAttemptAt, load])
 
   return { ...state, reload: load, refresh }
 }
@@ -183,7 +183,13 @@ export default function AdminAuditPage() {
   const [end, setEnd] = useUrlState('to', '')
   const [loadError, setLoadError] = useState<string | null>(null)
   const [total, setTotal] = useState(0)
-  const [offset, setOffset] = useState(0)
+  // Keyset pagination: the cursor each visited page was fetched with (page 0
+  // has none), plus the current page's next_cursor. Deep pages cost the
+  // server the same as the first one, unlike an OFFSET.
+  const [pageCursors, setPageCursors] = useState<string[]>([''])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const page = pageCursors.length - 1
+  const offset = page * PAGE_SIZE
   const debouncedChanges = useDebounced(changesQuery.trim())
   const timezone = useTimezone()
 
@@ -214,11 +220,12 @@ export default function AdminAuditPage() {
       changed_field: changedField === ALL ? '' : changedField,
       changes_contains: debouncedChanges,
       limit: String(PAGE_SIZE),
-      offset: String(offset),
+      cursor: pageCursors[page],
     })
       .then((data) => {
         setEntries(data.entries)
         setTotal(data.total)
+        setNextCursor(data.next_cursor)
       })
       // entries===null is also the loading state, so without this an error
       // was indistinguishable from "still loading" and the skeleton stayed up.
@@ -228,14 +235,23 @@ export default function AdminAuditPage() {
       })
   }
 
-  useEffect(load, [entityType, action, entityId, actor, changedField, debouncedChanges, timePreset, start, end, offset]) // eslint-disable-line react-hooks/exhaustive-deps
+  useEffect(load, [entityType, action, entityId, actor, changedField, debouncedChanges, timePreset, start, end, pageCursors]) // eslint-disable-line react-hooks/exhaustive-deps
 
-  // Any filter change invalidates the current page - staying on offset 400
-  // after narrowing to 12 results would show an empty table.
+  // Any filter change invalidates the current page - staying on page 5 after
+  // narrowing to 12 results would show an empty table.
   useEffect(() => {
-    setOffset(0)
+    setPageCursors((cursors) => (cursors.length === 1 ? cursors : ['']))
   }, [entityType, action, entityId, actor, changedField, debouncedChanges, timePreset, start, end])
 
+  // Pagination only ever steps one page either way.
+  function changePage(newOffset: number) {
+    if (newOffset > offset) {
+      if (nextCursor) setPageCursors((cursors) => [...cursors, nextCursor])
+    } else if (page > 0) {
+      setPageCursors((cursors) => cursors.slice(0, -1))
+    }
+  }
+
   const entityIdOptions = useMemo(() => {
     const ids = filters?.entity_ids ?? []
     const filtered = entityType === ALL ? ids : ids.filter((e) => e.entity_type === entityType)
@@ -504,7 +520,7 @@ export default function AdminAuditPage() {
           total={total}
           noun="audit entry"
           nounPlural="audit entries"
-          onOffsetChange={setOffset}
+          onOffsetChange={changePage}
         />
       )}
     </div>
@@ -8,7 +8,7 @@ import { Skeleton } from '@/components/ui/skeleton'
 import { Switch } from '@/components/ui/switch'
 import { TagInput } from '@/components/ui/tag-input'
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select'
-import { fetchSettings, updateSettings, pollNow, generateToken, testNotification, errorMessage } from '@/lib/admin-api'
+import { fetchSettings, updateSettings, pollNow, fetchPollJob, generateToken, testNotification, errorMessage } from '@/lib/admin-api'
 import { Alert } from '@/components/ui/alert'
 import { formatDateTime } from '@/lib/format'
 import { useToast } from '@/lib/toast'
@@ -18,7 +18,7 @@ import type { SettingField, SettingsResponse } from '@/lib/types'
 type FieldDef = { name: string; label: string; unit?: string; help?: string; generatable?: boolean }
 
 const GROUP_ORDER = [
-  'connection', 'thresholds', 'filters', 'notifications', 'general', 'security', 'logging', 'rate_limit', 'retry', 'poll',
+  'connection', 'thresholds', 'filters', 'notifications', 'general', 'security', 'logging', 'rate_limit', 'retry', 'metrics', 'poll',
 ] as const
 
 const GROUP_LABELS: Record<string, string> = {
@@ -31,6 +31,7 @@ const GROUP_LABELS: Record<string, string> = {
   logging: 'Logging',
   rate_limit: 'Rate Limiting',
   retry: 'Retry / Backoff',
+  metrics: 'Prometheus Metrics',
   poll: 'Polling & Audit',
 }
 
@@ -44,6 +45,7 @@ const GROUP_DESCRIPTIONS: Record<string, string> = {
   logging: 'Application log verbosity.',
   rate_limit: 'Protect the API from excessive request volume.',
   retry: 'Backoff behavior for retried Tailscale API requests.',
+  metrics: 'Per-device series on /metrics. Each exported device adds a few series per scrape, so large tailnets may want to narrow them.',
   poll: 'How often data is refreshed in the background, and how long audit history is kept.',
 }
 
@@ -147,10 +149,49 @@ const FIELDS_BY_GROUP: Record<string, FieldDef[]> = {
       unit: 'minutes',
       help: 'Minimum gap between two notifications for the same event and device/key. Alerts already only fire on a transition, but a device flapping across the healthy line still alerts once per flap - a cooldown collapses those into one. 0 disables it. Suppressed alerts show on the Debug page as notification_suppressed events.',
     },
+    {
+      name: 'notification_concurrency',
+      label: 'Parallel deliveries',
+      help: 'How many notifications the background dispatcher sends to Apprise at once. Queued alerts never hold up a poll cycle; this only decides how fast a burst (e.g. a mass outage) drains.',
+    },
+    { name: 'notification_timeout_seconds', label: 'Delivery timeout', unit: 'seconds', help: 'Timeout for each request to the Apprise API.' },
+    {
+      name: 'notification_max_attempts',
+      label: 'Delivery attempts',
+      help: 'Attempts per notification (with exponential backoff from 30s) before it is given up on. Failed attempts and the final give-up show on the Debug page as notification_failed events.',
+    },
+    {
+      name: 'notification_digest',
+      label: 'Digest notifications',
+      help: 'Send all notifications of the same event as one message (a count plus a list of the first 25) instead of one per device - e.g. one "40 devices became unhealthy" when a subnet router dies. Per-device cooldowns still apply.',
+    },
+    {
+      name: 'notification_digest_window_seconds',
+      label: 'Digest window',
+      unit: 'seconds',
+      help: 'With digests on, hold the first notification this long so transitions from later poll cycles can join the same message. 0 groups what a single poll cycle produced.',
+    },
+    {
+      name: 'notification_rate_per_minute',
+      label: 'Send budget',
+      unit: 'per minute',
+      help: 'Most messages sent to Apprise per minute, across all events. Anything over the budget is sent as one summary message (at most one a minute) and logged on the Debug page as a notification_suppressed event with counts. 0 disables the budget.',
+    },
+    {
+      name: 'notification_rate_burst',
+      label: 'Send burst',
+      help: 'How many messages may go out back to back before the per-minute budget applies. 0 uses the per-minute budget.',
+    },
   ],
   general: [
     { name: 'timezone', label: 'Timezone', help: "IANA timezone (e.g. Europe/Berlin) used for lastSeen and key-expiry timestamps shown throughout the app." },
     { name: 'http_timeout', label: 'HTTP timeout', unit: 'seconds', help: 'Timeout for outbound requests to the Tailscale API.' },
+    {
+      name: 'health_cache_seconds',
+      label: '/health response cache',
+      unit: 'seconds',
+      help: 'How long each worker reuses a computed /health response while the device snapshot and settings are unchanged. Any poll or settings change invalidates it at once. 0 disables it; simultaneous requests still share one computation.',
+    },
   ],
   security: [
     {
@@ -186,16 +227,36 @@ const FIELDS_BY_GROUP: Record<string, FieldDef[]> = {
     { name: 'backoff_base_seconds', label: 'Backoff base', unit: 'seconds', help: 'Starting delay before the first retry; doubles each subsequent attempt up to the max below.' },
     { name: 'backoff_max_seconds', label: 'Backoff max', unit: 'seconds', help: 'Upper bound on the exponential backoff delay between retries.' },
     { name: 'backoff_jitter_seconds', label: 'Backoff jitter', unit: 'seconds', help: 'Random extra delay (0..value) added to each backoff to avoid retry storms.' },
+    { name: 'circuit_breaker_threshold', label: 'Circuit breaker threshold', help: 'Consecutive failed Tailscale API requests (429/5xx, timeouts, dropped connections) before polling pauses for the cool-off below. The last snapshot keeps being served, flagged as degraded. 0 disables the breaker.' },
+    { name: 'circuit_breaker_cooldown_seconds', label: 'Circuit breaker cool-off', unit: 'seconds', help: 'How long polling pauses once the breaker opens. A longer Retry-After from the API always wins.' },
+  ],
+  metrics: [
+    { name: 'metrics_device_gauges', label: 'Per-device series', help: 'Which devices get healthy/online/key-expiry series on /metrics. The tailnet-wide counters are always exported.' },
+    { name: 'metrics_device_labels', label: 'Device labels', help: 'Labels added to each per-device series besides the device id. Every label value that changes starts a new series in Prometheus.' },
+    { name: 'metrics_max_devices', label: 'Max exported devices', help: 'Upper bound on devices with per-device series, unhealthy devices first. The rest are counted in tailscale_healthcheck_metrics_devices_dropped. 0 means no limit.' },
   ],
   poll: [
     { name: 'poll_interval_seconds', label: 'Poll interval', unit: 'seconds', help: 'How often the background poller refreshes devices/tailnet keys from the Tailscale API into the database.' },
-    { name: 'audit_retention_days', label: 'Audit log retention', unit: 'days', help: 'How long audit_log entries (device/key/setting/user changes) are kept before being purged.' },
-    { name: 'poller_log_retention_days', label: 'Poller activity log retention', unit: 'days', help: 'How long the operational poll-cycle log (shown on /debug) is kept - separate from audit log retention above.' },
+    { name: 'audit_retention_days', label: 'Audit log retention', unit: 'days', help: 'How long audit_log entries (device/key/setting/user changes) are kept before being purged. At most 400 days.' },
+    { name: 'poller_log_retention_days', label: 'Poller activity log retention', unit: 'days', help: 'How long the operational poll-cycle log (shown on /debug) is kept - separate from audit log retention above. At most 400 days.' },
   ],
 }
 
 const LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
 
+const METRICS_DEVICE_GAUGE_OPTIONS: { value: string; label: string }[] = [
+  { value: 'all', label: 'All devices' },
+  { value: 'unhealthy', label: 'Unhealthy devices only' },
+  { value: 'none', label: 'None' },
+]
+
+const METRICS_DEVICE_LABEL_OPTIONS: { value: string; label: string }[] = [
+  { value: 'device', label: 'Machine name (device)' },
+  { value: 'hostname', label: 'Hostname' },
+  { value: 'os', label: 'OS' },
+  { value: 'tags', label: 'Tags' },
+]
+
 type DraftValue = string | number | boolean
 
 function SettingLabel({
@@ -382,9 +443,19 @@ export default function AdminSettingsPage() {
   async function onPollNow() {
     setPolling(true)
     try {
-      await pollNow()
+      const accepted = await pollNow()
+      // The cycle runs in the poller, not this request; wait for it (a few
+      // long-polls at most, pausing in between in case the server answered
+      // without waiting) so the message reflects what actually happened.
+      let job = await fetchPollJob(accepted.job_id)
+      for (let i = 0; i < 4 && (job.status === 'queued' || job.status === 'running'); i++) {
+        await new Promise((resolve) => setTimeout(resolve, 1000))
+        job = await fetchPollJob(accepted.job_id)
+      }
       load()
-      notify('Poll triggered.')
+      if (job.status === 'succeeded') notify('Poll completed.')
+      else if (job.status === 'failed') notify(job.error || 'Poll failed', 'error')
+      else notify('Poll queued; results will appear when it finishes.')
     } catch (err) {
       // Previously swallowed entirely: the spinner stopped and nothing else
       // happened, so a failed manual poll was indistinguishable from success.
@@ -458,6 +529,46 @@ export default function AdminSettingsPage() {
           </SelectContent>
         </Select>
       )
+    } else if (def.name === 'metrics_device_gauges') {
+      const current = (typeof draftValue === 'string' ? draftValue : (meta.value as string)) || 'all'
+      control = (
+        <Select value={current} onValueChange={(v) => setDraftValue(def.name, v)} disabled={disabled}>
+          <SelectTrigger id={id} className="w-full">
+            <SelectValue />
+          </SelectTrigger>
+          <SelectContent>
+            {METRICS_DEVICE_GAUGE_OPTIONS.map((opt) => (
+              <SelectItem key={opt.value} value={opt.value}>
+                {opt.label}
+              </SelectItem>
+            ))}
+          </SelectContent>
+        </Select>
+      )
+    } else if (def.name === 'metrics_device_labels') {
+      const current = (typeof draftValue === 'string' ? draftValue : String(meta.value ?? ''))
+        .split(',')
+        .map((s) => s.trim())
+        .filter(Boolean)
+      const toggle = (label: string) => {
+        const next = current.includes(label) ? current.filter((l) => l !== label) : [...current, label]
+        setDraftValue(def.name, next.join(','))
+      }
+      control = (
+        <div className="grid grid-cols-1 gap-1.5 sm:grid-cols-2">
+          {METRICS_DEVICE_LABEL_OPTIONS.map((opt) => (
+            <label key={opt.value} className="flex items-center gap-2 text-xs">
+              <input
+                type="checkbox"
+                checked={current.includes(opt.value)}
+                onChange={() => toggle(opt.value)}
+                disabled={disabled}
+              />
+              {opt.label}
+            </label>
+          ))}
+        </div>
+      )
     } else if (def.name === 'notification_events') {
       const current = (typeof draftValue === 'string' ? draftValue : String(meta.value ?? ''))
         .split(',')
@@ -8,6 +8,7 @@ import { Separator } from '@/components/ui/separator'
 import { Skeleton } from '@/components/ui/skeleton'
 import { cn } from '@/lib/utils'
 import { getApiBaseUrl, fetchSettings } from '@/lib/admin-api'
+import { POLL_JOB_MAX_WAIT_SECONDS } from '@/lib/api'
 
 interface EndpointDef {
   method: 'GET'
@@ -18,6 +19,7 @@ interface EndpointDef {
   authNote: string
   example: unknown
   hasIdentifier?: boolean
+  identifierPlaceholder?: string
 }
 
 function slugFor(path: string): string {
@@ -153,9 +155,43 @@ const ENDPOINTS: EndpointDef[] = [
     method: 'GET',
     path: '/health/cache/invalidate',
     group: 'Operations',
-    description: 'Clears the response cache and triggers an immediate poll of the Tailscale API.',
-    authNote: 'Requires an authenticated session (login).',
-    example: { ok: true },
+    description:
+      'Queues an immediate poll of the Tailscale API and returns 202 straight away. Concurrent calls join the job already queued or running (triggered: false). Follow status_url to learn when it has finished.',
+    authNote:
+      'Unauthenticated by default. If HEALTH_ENDPOINT_TOKEN is configured, requests must include an X-Health-Token header matching it.',
+    example: {
+      triggered: true,
+      job_id: '9f1c2a7b3d4e5f60',
+      status: 'queued',
+      status_url: '/health/cache/jobs/9f1c2a7b3d4e5f60',
+      message: null,
+      last_polled_at: '2026-07-26T08:12:03Z',
+    },
+  },
+  {
+    method: 'GET',
+    path: '/health/cache/jobs/<job_id>',
+    group: 'Operations',
+    description:
+      `Status of a refresh queued by /health/cache/invalidate: queued, running, succeeded or failed. Pass ?wait=<seconds> (max ${POLL_JOB_MAX_WAIT_SECONDS}) to long-poll until it finishes; a worker that already has two long-polls open answers 202 at once with Retry-After.`,
+    params: [
+      { name: 'job_id', kind: 'path', description: 'The job_id returned by /health/cache/invalidate.' },
+      { name: 'wait', kind: 'query', description: `Seconds to wait for the job to finish (0-${POLL_JOB_MAX_WAIT_SECONDS}).` },
+    ],
+    authNote:
+      'Unauthenticated by default. If HEALTH_ENDPOINT_TOKEN is configured, requests must include an X-Health-Token header matching it.',
+    hasIdentifier: true,
+    identifierPlaceholder: 'Job id',
+    example: {
+      id: '9f1c2a7b3d4e5f60',
+      status: 'succeeded',
+      requested_by: 'health_endpoint',
+      requested_at: '2026-07-26T08:12:00Z',
+      started_at: '2026-07-26T08:12:01Z',
+      finished_at: '2026-07-26T08:12:03Z',
+      error: null,
+      last_polled_at: '2026-07-26T08:12:03Z',
+    },
   },
 ]
 
@@ -168,9 +204,9 @@ interface TryState {
   error?: string
 }
 
-// Only /health (and its trailing-slash form /health/) is ever unauthenticated by
-// default, so it's the only endpoint the health-endpoint-token field applies to.
-const HEALTH_TOKEN_ENDPOINTS = new Set(['/health'])
+// The endpoints gated by HEALTH_ENDPOINT_TOKEN: /health (and /health/), plus
+// the refresh trigger and its job status, which monitoring scripts call too.
+const HEALTH_TOKEN_ENDPOINTS = new Set(['/health', '/health/cache/invalidate', '/health/cache/jobs/<job_id>'])
 
 export default function ApiDocsPage() {
   const [baseUrl, setBaseUrl] = useState<string | null>(null)
@@ -218,13 +254,13 @@ export default function ApiDocsPage() {
     if (!endpoint.hasIdentifier) return endpoint.path
     const identifier = identifierInputs[endpoint.path]?.trim()
     if (!identifier) return endpoint.path
-    return `/health/${encodeURIComponent(identifier)}`
+    return endpoint.path.replace(/<[^>]+>/, encodeURIComponent(identifier))
   }
 
   async function tryIt(endpoint: EndpointDef) {
     const key = endpoint.path
     if (endpoint.hasIdentifier && !identifierInputs[key]?.trim()) {
-      setTryStates((s) => ({ ...s, [key]: { loading: false, error: 'Enter a device identifier first.' } }))
+      setTryStates((s) => ({ ...s, [key]: { loading: false, error: `Enter a ${endpoint.identifierPlaceholder?.toLowerCase() ?? 'device identifier'} first.` } }))
       return
     }
     setTryStates((s) => ({ ...s, [key]: { loading: true } }))
@@ -382,7 +418,7 @@ export default function ApiDocsPage() {
                         <div className="flex flex-wrap items-center gap-2">
                           {endpoint.hasIdentifier && (
                             <Input
-                              placeholder="Device identifier, e.g. web-01"
+                              placeholder={endpoint.identifierPlaceholder ?? 'Device identifier, e.g. web-01'}
                               className="max-w-xs"
                               value={identifierInputs[endpoint.path] ?? ''}
                               onChange={(e) =>
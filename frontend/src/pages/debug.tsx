@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState, useCallback } from 'react'
+import { useEffect, useMemo, useRef, useState, useCallback } from 'react'
 import { RefreshCw } from 'lucide-react'
 import { Button } from '@/components/ui/button'
 import { Badge } from '@/components/ui/badge'
@@ -6,9 +6,20 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/com
 import { Skeleton } from '@/components/ui/skeleton'
 import { cn } from '@/lib/utils'
 import { Alert } from '@/components/ui/alert'
-import { fetchPollerLog, errorMessage, type PollerLogEntry } from '@/lib/admin-api'
+import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table'
+import {
+  fetchPollerLog,
+  fetchRequestLatency,
+  fetchUpstreamCalls,
+  errorMessage,
+  type CycleTimingSummary,
+  type PollerLogEntry,
+  type RequestLatencyResponse,
+  type UpstreamCallsResponse,
+} from '@/lib/admin-api'
 import { formatDateTime, formatTime } from '@/lib/format'
 import { useTimezone } from '@/lib/health-context'
+import { useHealthStream } from '@/lib/health-stream'
 
 const FETCH_LIMIT = 300
 
@@ -26,11 +37,219 @@ function formatDetail(detail: Record<string, unknown> | null): string | null {
   return entries.map(([k, v]) => `${k}=${typeof v === 'object' ? JSON.stringify(v) : String(v)}`).join(' ')
 }
 
+const LATENCY_REFRESH_MS = 60_000
+
+function formatMs(ms: number | null): string {
+  if (ms === null) return '—'
+  return ms < 10 ? `${ms.toFixed(1)} ms` : `${Math.round(ms)} ms`
+}
+
+/** Per-endpoint latency over the last hour, across every worker. */
+function RequestLatencyCard() {
+  const [data, setData] = useState<RequestLatencyResponse | null>(null)
+  const [error, setError] = useState<string | null>(null)
+
+  const load = useCallback(async () => {
+    try {
+      setData(await fetchRequestLatency(60))
+      setError(null)
+    } catch (err) {
+      setError(errorMessage(err, 'Failed to load request latency'))
+    }
+  }, [])
+
+  useEffect(() => {
+    load()
+    const interval = setInterval(load, LATENCY_REFRESH_MS)
+    return () => clearInterval(interval)
+  }, [load])
+
+  return (
+    <Card>
+      <CardHeader>
+        <CardTitle>Request latency</CardTitle>
+        <CardDescription>
+          Server time per endpoint over the last hour, from all workers (up to {data?.flush_seconds ?? 10}s behind).
+          Each response's Server-Timing header breaks a single request down by phase.
+        </CardDescription>
+      </CardHeader>
+      <CardContent>
+        {error && <Alert>{error}</Alert>}
+        {!data && !error ? (
+          <Skeleton className="h-24" />
+        ) : data && data.routes.length === 0 ? (
+          <p className="text-sm text-muted-foreground">No requests recorded in the last hour.</p>
+        ) : data ? (
+          <Table>
+            <TableHeader>
+              <TableRow>
+                <TableHead>Endpoint</TableHead>
+                <TableHead className="text-right">Requests</TableHead>
+                <TableHead className="text-right">p50</TableHead>
+                <TableHead className="text-right">p95</TableHead>
+                <TableHead className="text-right">p99</TableHead>
+                <TableHead className="text-right">Max</TableHead>
+              </TableRow>
+            </TableHeader>
+            <TableBody>
+              {data.routes.map((r) => (
+                <TableRow key={r.route}>
+                  <TableCell className="font-mono text-xs">{r.route}</TableCell>
+                  <TableCell className="text-right tabular-nums">{r.count}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(r.p50_ms)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(r.p95_ms)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(r.p99_ms)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(r.max_ms)}</TableCell>
+                </TableRow>
+              ))}
+            </TableBody>
+          </Table>
+        ) : null}
+      </CardContent>
+    </Card>
+  )
+}
+
+function formatBytes(bytes: number | null): string {
+  if (bytes === null) return '—'
+  if (bytes < 1024) return `${bytes} B`
+  if (bytes < 1024 * 1024) return `${Math.round(bytes / 1024)} KiB`
+  return `${(bytes / (1024 * 1024)).toFixed(1)} MiB`
+}
+
+/** Tailscale API calls per endpoint over the last hour, from every process that made them. */
+function UpstreamCallsCard() {
+  const [data, setData] = useState<UpstreamCallsResponse | null>(null)
+  const [error, setError] = useState<string | null>(null)
+
+  const load = useCallback(async () => {
+    try {
+      setData(await fetchUpstreamCalls(60))
+      setError(null)
+    } catch (err) {
+      setError(errorMessage(err, 'Failed to load Tailscale API call statistics'))
+    }
+  }, [])
+
+  useEffect(() => {
+    load()
+    const interval = setInterval(load, LATENCY_REFRESH_MS)
+    return () => clearInterval(interval)
+  }, [load])
+
+  return (
+    <Card>
+      <CardHeader>
+        <CardTitle>Tailscale API calls</CardTitle>
+        <CardDescription>
+          Every request to the Tailscale API over the last hour, per attempt: latency, response size, status codes,
+          retries, 401-triggered token refreshes and timeouts. All-time totals are on /metrics.
+        </CardDescription>
+      </CardHeader>
+      <CardContent>
+        {error && <Alert>{error}</Alert>}
+        {!data && !error ? (
+          <Skeleton className="h-24" />
+        ) : data && data.endpoints.length === 0 ? (
+          <p className="text-sm text-muted-foreground">No Tailscale API calls in the last hour.</p>
+        ) : data ? (
+          <Table>
+            <TableHeader>
+              <TableRow>
+                <TableHead>Endpoint</TableHead>
+                <TableHead className="text-right">Calls</TableHead>
+                <TableHead>Status</TableHead>
+                <TableHead className="text-right">p50</TableHead>
+                <TableHead className="text-right">p95</TableHead>
+                <TableHead className="text-right">Max</TableHead>
+                <TableHead className="text-right">Size p95</TableHead>
+                <TableHead className="text-right">Retries</TableHead>
+                <TableHead className="text-right">Refreshes</TableHead>
+                <TableHead className="text-right">Timeouts</TableHead>
+              </TableRow>
+            </TableHeader>
+            <TableBody>
+              {data.endpoints.map((e) => (
+                <TableRow key={e.endpoint}>
+                  <TableCell className="font-mono text-xs">{e.endpoint}</TableCell>
+                  <TableCell className="text-right tabular-nums">{e.calls}</TableCell>
+                  <TableCell className="space-x-1">
+                    {Object.entries(e.status).map(([code, n]) => (
+                      <Badge key={code} variant={code === 'none' || Number(code) >= 400 ? 'destructive' : 'secondary'}>
+                        {code} × {n}
+                      </Badge>
+                    ))}
+                  </TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(e.latency_ms.p50)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(e.latency_ms.p95)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(e.latency_ms.max)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatBytes(e.response_bytes.p95)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{e.retries}</TableCell>
+                  <TableCell className="text-right tabular-nums">{e.auth_refreshes}</TableCell>
+                  <TableCell className="text-right tabular-nums">{e.timeouts}</TableCell>
+                </TableRow>
+              ))}
+            </TableBody>
+          </Table>
+        ) : null}
+      </CardContent>
+    </Card>
+  )
+}
+
+/** Where poll-cycle time goes, phase by phase, so a slowdown points at its step. */
+function CycleTimingCard({ timing }: { timing: CycleTimingSummary | null }) {
+  const timezone = useTimezone()
+  return (
+    <Card>
+      <CardHeader>
+        <CardTitle>Poll cycle timing</CardTitle>
+        <CardDescription>
+          Wall time of each poll-cycle phase
+          {timing?.since ? ` since ${formatDateTime(timing.since, timezone)}` : ''}
+          {timing ? ` (${timing.cycles} cycles)` : ''}. A phase only counts the cycles it ran in.
+        </CardDescription>
+      </CardHeader>
+      <CardContent>
+        {!timing ? (
+          <Skeleton className="h-24" />
+        ) : !timing.total ? (
+          <p className="text-sm text-muted-foreground">No poll cycles recorded yet.</p>
+        ) : (
+          <Table>
+            <TableHeader>
+              <TableRow>
+                <TableHead>Phase</TableHead>
+                <TableHead className="text-right">Cycles</TableHead>
+                <TableHead className="text-right">p50</TableHead>
+                <TableHead className="text-right">p95</TableHead>
+                <TableHead className="text-right">Max</TableHead>
+              </TableRow>
+            </TableHeader>
+            <TableBody>
+              {[{ phase: 'whole cycle', ...timing.total }, ...timing.phases].map((p) => (
+                <TableRow key={p.phase}>
+                  <TableCell className="font-mono text-xs">{p.phase}</TableCell>
+                  <TableCell className="text-right tabular-nums">{p.cycles}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(p.p50_ms)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(p.p95_ms)}</TableCell>
+                  <TableCell className="text-right tabular-nums">{formatMs(p.max_ms)}</TableCell>
+                </TableRow>
+              ))}
+            </TableBody>
+          </Table>
+        )}
+      </CardContent>
+    </Card>
+  )
+}
+
 export default function DebugPage() {
   const [entries, setEntries] = useState<PollerLogEntry[] | null>(null)
   const [eventTypes, setEventTypes] = useState<string[]>([])
   const [selected, setSelected] = useState<Set<string> | null>(null) // null = all selected
   const [meta, setMeta] = useState<{ enabled: boolean; last_polled_at: string | null; poll_interval_seconds: number } | null>(null)
+  const [cycleTiming, setCycleTiming] = useState<CycleTimingSummary | null>(null)
   const [loading, setLoading] = useState(false)
   const [loadError, setLoadError] = useState<string | null>(null)
   const timezone = useTimezone()
@@ -42,6 +261,7 @@ export default function DebugPage() {
       setEntries(data.entries) // already newest-first
       setEventTypes(data.event_types)
       setMeta({ enabled: data.enabled, last_polled_at: data.last_polled_at, poll_interval_seconds: data.poll_interval_seconds })
+      setCycleTiming(data.cycle_timing)
       setLoadError(null)
     } catch (err) {
       // try/finally with no catch meant a failed fetch (or the 15s auto-refresh
@@ -54,11 +274,30 @@ export default function DebugPage() {
     }
   }, [])
 
+  // A poll cycle writes several log rows in quick succession, each announced
+  // as its own `poller_log` stream event - coalesce them into one reload.
+  const reloadTimer = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const streaming = useHealthStream('poller_log', () => {
+    if (reloadTimer.current) return
+    reloadTimer.current = setTimeout(() => {
+      reloadTimer.current = null
+      load()
+    }, 1000)
+  })
+  useEffect(() => () => {
+    if (reloadTimer.current) clearTimeout(reloadTimer.current)
+  }, [])
+
   useEffect(() => {
     load()
+  }, [load])
+
+  // Poll only while the stream is unavailable.
+  useEffect(() => {
+    if (streaming) return
     const interval = setInterval(load, 15000)
     return () => clearInterval(interval)
-  }, [load])
+  }, [streaming, load])
 
   function toggleType(t: string) {
     setSelected((prev) => {
@@ -84,11 +323,18 @@ export default function DebugPage() {
 
   return (
     <div className="space-y-4">
+      <RequestLatencyCard />
+
+      <UpstreamCallsCard />
+
+      <CycleTimingCard timing={cycleTiming} />
+
       <Card>
         <CardHeader>
           <CardTitle>Poller activity log</CardTitle>
           <CardDescription>
-            Recent background poll-cycle events (device/key fetches, errors, timing). Auto-refreshes every 15s.
+            Recent background poll-cycle events (device/key fetches, errors, timing).
+            {streaming ? ' Updates live.' : ' Auto-refreshes every 15s.'}
             {meta && !meta.enabled && ' Capture is currently disabled via the debug_log_enabled setting.'}
           </CardDescription>
         </CardHeader>
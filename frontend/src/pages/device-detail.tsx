@@ -6,6 +6,7 @@ import { Skeleton } from '@/components/ui/skeleton'
 import { StatusBadge } from '@/components/status-badge'
 import { Badge } from '@/components/ui/badge'
 import { fetchDeviceByIdentifier, ApiError } from '@/lib/api'
+import { fetchDeviceHealthHistory, type DeviceHealthDimension, type DeviceHealthHistory } from '@/lib/admin-api'
 import type { Device } from '@/lib/types'
 import NotFoundPage from '@/pages/not-found'
 import { Alert } from '@/components/ui/alert'
@@ -18,6 +19,7 @@ export default function DeviceDetailPage() {
   const [loading, setLoading] = useState(true)
   const [notFound, setNotFound] = useState(false)
   const [error, setError] = useState<string | null>(null)
+  const [history, setHistory] = useState<DeviceHealthHistory | null>(null)
   const timezone = useTimezone()
 
   useEffect(() => {
@@ -45,6 +47,21 @@ export default function DeviceDetailPage() {
     }
   }, [identifier])
 
+  // 7-day uptime per health dimension - admin-only and best-effort, so the
+  // card is simply left out when signed out or the request fails.
+  useEffect(() => {
+    if (!device) return
+    let cancelled = false
+    fetchDeviceHealthHistory(device.id, 24 * 7)
+      .then((h) => {
+        if (!cancelled) setHistory(h)
+      })
+      .catch(() => {})
+    return () => {
+      cancelled = true
+    }
+  }, [device])
+
   if (notFound) return <NotFoundPage />
 
   if (loading) {
@@ -122,10 +139,41 @@ export default function DeviceDetailPage() {
           )}
         </CardContent>
       </Card>
+      {history && Object.keys(history.dimensions).length > 0 && (
+        <Card>
+          <CardHeader>
+            <CardTitle>Uptime (last 7 days)</CardTitle>
+          </CardHeader>
+          <CardContent className="grid grid-cols-2 gap-x-8 gap-y-3 sm:grid-cols-5">
+            {UPTIME_DIMENSIONS.filter(([dim]) => history.dimensions[dim]).map(([dim, label]) => {
+              const stats = history.dimensions[dim]!
+              return (
+                <Field
+                  key={dim}
+                  label={label}
+                  value={
+                    <span title={`${stats.transitions} state change(s)`}>
+                      {stats.uptime_percent == null ? '—' : `${stats.uptime_percent}%`}
+                    </span>
+                  }
+                />
+              )
+            })}
+          </CardContent>
+        </Card>
+      )}
     </div>
   )
 }
 
+const UPTIME_DIMENSIONS: [DeviceHealthDimension, string][] = [
+  ['healthy', 'Overall'],
+  ['online', 'Online'],
+  ['key', 'Key'],
+  ['update', 'Update'],
+  ['lock', 'Tailnet Lock'],
+]
+
 function Field({ label, value }: { label: string; value: ReactNode }) {
   return (
     <div className="flex flex-col gap-0.5">
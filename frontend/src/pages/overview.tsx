@@ -6,6 +6,7 @@ import { Button } from '@/components/ui/button'
 import { useHealthContext, useTimezone } from '@/lib/health-context'
 import { fetchMetricsHistory, type MetricsHistoryEntry } from '@/lib/admin-api'
 import { Alert } from '@/components/ui/alert'
+import { formatTime } from '@/lib/format'
 
 export default function OverviewPage() {
   const { health, keys, loading, error, loadedAt } = useHealthContext()
@@ -72,7 +73,18 @@ export default function OverviewPage() {
           </Button>
         </Alert>
       )}
-      {!pollMeta?.last_poll_auth_error && pollMeta?.last_poll_ok === false && (
+      {pollMeta?.degraded && (
+        <Alert className="flex flex-wrap items-center justify-between gap-3">
+          <div>
+            <p className="font-medium">Tailscale API paused after repeated failures</p>
+            <p className="text-xs text-destructive/90">
+              Showing the last snapshot; polling resumes
+              {pollMeta.circuit_open_until ? ` at ${formatTime(pollMeta.circuit_open_until, timezone)}` : ' shortly'}.
+            </p>
+          </div>
+        </Alert>
+      )}
+      {!pollMeta?.degraded && !pollMeta?.last_poll_auth_error && pollMeta?.last_poll_ok === false && (
         <Alert className="flex flex-wrap items-center justify-between gap-3">
           <div>
             <p className="font-medium">Unable to reach the Tailscale API</p>
@@ -1,8 +1,12 @@
 import os
+import sys
+import time
 import logging
+import subprocess
 from healthcheck import initialize_oauth  # Import the OAuth initialization function
 import dbstore
 import poller
+import stream
 
 # Configure logging with safe default (INFO) and env override
 def _get_log_level_from_env(default=logging.INFO):
@@ -15,6 +19,49 @@ logging.basicConfig(level=_get_log_level_from_env())
 timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))  # Default timeout to 120 seconds
 graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 120))  # Default graceful timeout to 120 seconds
 
+# Threaded workers: a slow request (a /health/stream subscriber, a job
+# long-poll, a large /health body to a slow client) holds one of a worker's
+# threads rather than the whole worker, so a handful of them can't starve
+# monitoring probes of request slots, and idle keep-alive connections are
+# parked without occupying a thread at all.
+#
+# Only gthread and sync are supported. Async classes (gevent, eventlet) would
+# need monkey-patching, which the poller's fcntl election, its background
+# threads and the blocking sqlite3 calls are not written for. Everything a
+# request touches is already safe to run on several threads at once: dbstore
+# opens a connection per call, the OAuth token is shared through a lease row
+# in SQLite rather than a module global, Flask-Login keeps the user on the
+# request context, and the file-backed rate limiter serializes on a lock file.
+SUPPORTED_WORKER_CLASSES = ("gthread", "sync")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread").strip().lower()
+if worker_class not in SUPPORTED_WORKER_CLASSES:
+    logging.warning(
+        f"GUNICORN_WORKER_CLASS={worker_class!r} is not supported "
+        f"(expected one of {', '.join(SUPPORTED_WORKER_CLASSES)}); using gthread."
+    )
+    worker_class = "gthread"
+# Gunicorn quietly upgrades a sync worker with threads > 1 to gthread, so
+# sync has to mean exactly one thread.
+threads = max(1, int(os.getenv("GUNICORN_THREADS", 16))) if worker_class == "gthread" else 1
+# Each open /health/stream holds one of those threads for up to
+# stream.STREAM_MAX_SECONDS, and the browser reconnects as soon as it ends.
+# Left uncapped, a few dozen dashboard tabs would take every thread and
+# everything else - probes included - would queue behind them, so a worker
+# accepts at most half its threads' worth of streams (STREAM_MAX_CLIENTS
+# overrides; it always leaves one thread free) and answers the rest with
+# 503, which sends the client back to polling. A sync worker's single
+# thread can't be spared at all.
+def _stream_max_clients(thread_count: int) -> int:
+    raw = os.getenv("STREAM_MAX_CLIENTS")
+    wanted = thread_count // 2 if raw in (None, "") else int(raw)
+    return max(0, min(wanted, thread_count - 1))
+
+stream_max_clients = _stream_max_clients(threads)
+
+# Seconds an idle keep-alive connection is held open for its next request
+# (ignored by sync workers, which close after every response).
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
 def on_starting(server):
     """
     Hook that runs only in the Gunicorn master process.
@@ -38,13 +85,82 @@ def on_starting(server):
             "complete the setup wizard at /admin/setup."
         )
 
+# The dedicated poller child (POLLER_MODE=process), owned by the master.
+_poller_process = None
+_poller_spawned_at = 0.0
+# Minimum gap between respawns, so a poller that crashes on startup (bad
+# DATABASE_PATH, say) can't turn every worker fork into another crash.
+POLLER_RESPAWN_MIN_SECONDS = 10
+
+
+def _spawn_poller_process():
+    global _poller_process, _poller_spawned_at
+    _poller_spawned_at = time.monotonic()
+    _poller_process = subprocess.Popen(
+        [sys.executable, "-m", "poller"],
+        cwd=os.path.dirname(os.path.abspath(poller.__file__)),
+    )
+    logging.info(f"Started dedicated poller process (pid {_poller_process.pid}).")
+
+
+def _ensure_poller_process():
+    """(Re)start the dedicated poller child if POLLER_MODE=process and it isn't running.
+
+    Gunicorn has no periodic master hook, so this piggybacks on the ones that
+    do fire over a long-lived deployment (every worker fork and exit,
+    including each --max-requests recycle). Note the master's SIGCHLD handler
+    reaps *any* exited child, this one included; Popen.poll() then reports
+    the child as finished rather than blocking, which is all that's needed.
+    """
+    if poller.POLLER_MODE != "process":
+        return
+    if _poller_process is not None and _poller_process.poll() is None:
+        return
+    if _poller_process is not None:
+        if time.monotonic() - _poller_spawned_at < POLLER_RESPAWN_MIN_SECONDS:
+            return
+        logging.error(f"Dedicated poller process (pid {_poller_process.pid}) is not running; restarting it.")
+    _spawn_poller_process()
+
+
+def when_ready(server):
+    """Master hook: start the dedicated poller once the server is listening."""
+    _ensure_poller_process()
+
+
+def pre_fork(server, worker):
+    _ensure_poller_process()
+
+
+def child_exit(server, worker):
+    _ensure_poller_process()
+
+
+def on_exit(server):
+    """Stop the dedicated poller with the master. SIGTERM lets it finish an
+    in-flight cycle (see poller.run_forever()); only a poller still busy
+    after the graceful timeout is killed."""
+    proc = _poller_process
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=graceful_timeout)
+    except subprocess.TimeoutExpired:
+        logging.error(f"Dedicated poller process (pid {proc.pid}) did not stop in {graceful_timeout}s; killing it.")
+        proc.kill()
+
+
 def post_fork(server, worker):
     """
     Hook that runs in each worker process after fork. Only one worker (the
     one that wins the fcntl lock election in poller.start()) actually runs
-    the background poll loop; the rest no-op.
+    the background poll loop; the rest no-op. With POLLER_MODE=process or
+    external no worker polls at all - they only read the SQLite snapshot.
     """
-    poller.start()
+    stream.STREAM_MAX_CLIENTS = stream_max_clients
+    if poller.polls_in_web_workers():
+        poller.start()
 
 def worker_exit(server, worker):
     """
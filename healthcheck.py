@@ -1,26 +1,17 @@
 import os
 import time
+import threading
 import json
 import fcntl
 import hmac
 import requests
 import random
 import secrets
+import email.utils
 from datetime import datetime, timedelta
-from flask import Flask, g, jsonify, redirect, request, render_template, url_for
-try:  # Optional dependency; app runs without rate limiting if unavailable
-    from flask_limiter import Limiter  # type: ignore
-    from flask_limiter.util import get_remote_address  # type: ignore
-    _HAVE_FLASK_LIMITER = True
-except Exception:  # pragma: no cover - import guard
-    Limiter = None  # type: ignore
-    _HAVE_FLASK_LIMITER = False
-    
-    def get_remote_address():  # type: ignore
-        return request.remote_addr
+from flask import Flask, Response, g, jsonify, redirect, request, render_template, url_for
 import pytz
 import logging  # Add logging for debugging
-from threading import Timer  # For token renewal
 from urllib3.exceptions import ProtocolError  # Add import for better error handling
 from http.client import RemoteDisconnected  # Add import for better error handling
 import fnmatch  # Add for wildcard pattern matching
@@ -31,8 +22,27 @@ import dbstore
 import poller
 import auth
 import notifier
+import stream
+import microcache
+import prometheus
+import reqtiming
+import upstreamstats
 from admin import admin_bp
 
+# Boot-time breakdown (milliseconds per phase of loading this module), logged
+# once at the end of the module and checked by tools/startup_benchmark.py,
+# which also covers the imports above via `python -X importtime`.
+STARTUP_TIMINGS = {}
+_startup_phase_started = time.perf_counter()
+
+
+def _mark_startup_phase(name: str):
+    """Record the time since the previous mark as phase `name`."""
+    global _startup_phase_started
+    now = time.perf_counter()
+    STARTUP_TIMINGS[name] = round((now - _startup_phase_started) * 1000, 1)
+    _startup_phase_started = now
+
 def get_log_level_from_env(default=logging.INFO):
     """Return a logging level from LOG_LEVEL env var, defaulting to INFO.
 
@@ -51,17 +61,25 @@ app.url_map.strict_slashes = False  # Allow trailing slashes to be ignored
 # Load configuration from environment variables
 dbstore.configure()
 dbstore.init_db()
+_mark_startup_phase("init_db")
 dbstore.sync_env_settings()
+_mark_startup_phase("sync_env_settings")
 
 app.secret_key = dbstore.get_secret_key()
 
+# Everything this module reads once at startup, in one DB round trip.
+_BOOT_SETTINGS = dbstore.get_settings_typed((
+    "trusted_proxy_count", "rate_limit_enabled", "rate_limit_per_ip", "rate_limit_global",
+    "rate_limit_storage_url", "rate_limit_headers_enabled",
+))
+
 # request.remote_addr feeds both rate limiters and the failed-login lockout, so
 # behind an undeclared reverse proxy every client looks like the proxy: one
 # attacker's failed logins would lock out every user, and the per-IP request
 # limit would silently become a global one. Opt-in (default 0 = off) because
 # trusting X-Forwarded-For when there is no proxy would let any client spoof
 # its own address. Read once here, hence in admin.RESTART_REQUIRED_SETTINGS.
-TRUSTED_PROXY_COUNT = max(0, dbstore.get_setting_typed("trusted_proxy_count"))
+TRUSTED_PROXY_COUNT = max(0, _BOOT_SETTINGS["trusted_proxy_count"])
 if TRUSTED_PROXY_COUNT:
     from werkzeug.middleware.proxy_fix import ProxyFix
     app.wsgi_app = ProxyFix(
@@ -88,11 +106,11 @@ PORT = int(os.getenv("PORT", 5000))  # Default to port 5000 - process bootstrap,
 # is wired up once here and logging.basicConfig() already ran above. Changing
 # them via /admin/settings persists to the DB but needs a restart to apply;
 # admin.py flags this to the UI via RESTART_REQUIRED_SETTINGS.
-RATE_LIMIT_ENABLED = dbstore.get_setting_typed("rate_limit_enabled")
-RATE_LIMIT_PER_IP = max(0, dbstore.get_setting_typed("rate_limit_per_ip"))
-RATE_LIMIT_GLOBAL_INT = max(0, dbstore.get_setting_typed("rate_limit_global"))
-RATE_LIMIT_STORAGE_URL = dbstore.get_setting_typed("rate_limit_storage_url") or None
-RATE_LIMIT_HEADERS_ENABLED = dbstore.get_setting_typed("rate_limit_headers_enabled")
+RATE_LIMIT_ENABLED = _BOOT_SETTINGS["rate_limit_enabled"]
+RATE_LIMIT_PER_IP = max(0, _BOOT_SETTINGS["rate_limit_per_ip"])
+RATE_LIMIT_GLOBAL_INT = max(0, _BOOT_SETTINGS["rate_limit_global"])
+RATE_LIMIT_STORAGE_URL = _BOOT_SETTINGS["rate_limit_storage_url"] or None
+RATE_LIMIT_HEADERS_ENABLED = _BOOT_SETTINGS["rate_limit_headers_enabled"]
 
 # Initialize rate limiter (no-op if disabled)
 limiter = None
@@ -101,21 +119,30 @@ _RATE_LIMIT_FILE_PATH = None
 if RATE_LIMIT_ENABLED and RATE_LIMIT_STORAGE_URL and RATE_LIMIT_STORAGE_URL.startswith("file://"):
     _USE_FILE_RATE_LIMIT = True
     _RATE_LIMIT_FILE_PATH = RATE_LIMIT_STORAGE_URL[len("file://"):]
-elif RATE_LIMIT_ENABLED and _HAVE_FLASK_LIMITER:
-    try:
-        limiter = Limiter(
-            key_func=get_remote_address,
-            app=app,
-            storage_uri=RATE_LIMIT_STORAGE_URL,  # Memory by default; can use Redis/etc via env
-            default_limits=[],
-            headers_enabled=RATE_LIMIT_HEADERS_ENABLED,
-        )
-    except Exception as e:  # pragma: no cover - initialization failure
-        logging.error(f"Failed to initialize rate limiter: {e}. Disabling rate limits.")
-        limiter = None
-        RATE_LIMIT_ENABLED = False
-elif RATE_LIMIT_ENABLED and not _HAVE_FLASK_LIMITER:
-    logging.warning("RATE_LIMIT_ENABLED=YES but Flask-Limiter is not installed. Rate limiting disabled.")
+elif RATE_LIMIT_ENABLED:
+    # Imported only when it's going to be used: Flask-Limiter (and the limits
+    # package under it) is the most expensive import a worker would pay at boot.
+    try:  # Optional dependency; app runs without rate limiting if unavailable
+        from flask_limiter import Limiter  # type: ignore
+        from flask_limiter.util import get_remote_address  # type: ignore
+    except Exception:  # pragma: no cover - import guard
+        Limiter = None  # type: ignore
+    if Limiter is None:
+        logging.warning("RATE_LIMIT_ENABLED=YES but Flask-Limiter is not installed. Rate limiting disabled.")
+    else:
+        try:
+            limiter = Limiter(
+                key_func=get_remote_address,
+                app=app,
+                storage_uri=RATE_LIMIT_STORAGE_URL,  # Memory by default; can use Redis/etc via env
+                default_limits=[],
+                headers_enabled=RATE_LIMIT_HEADERS_ENABLED,
+            )
+        except Exception as e:  # pragma: no cover - initialization failure
+            logging.error(f"Failed to initialize rate limiter: {e}. Disabling rate limits.")
+            limiter = None
+            RATE_LIMIT_ENABLED = False
+_mark_startup_phase("app_setup")
 
 def _apply_limits(fn):
     """Decorator to apply configured limits to a view function."""
@@ -155,7 +182,10 @@ def _rl_file_save(obj):
     try:
         directory = os.path.dirname(_RATE_LIMIT_FILE_PATH) or "."
         os.makedirs(directory, exist_ok=True)
-        tmp_path = f"{_RATE_LIMIT_FILE_PATH}.tmp"
+        # Per-writer temp file: with threaded workers two requests in the same
+        # process may save at once, and a shared .tmp path let one truncate
+        # the other's half-written file just before it was renamed into place.
+        tmp_path = f"{_RATE_LIMIT_FILE_PATH}.tmp.{os.getpid()}.{threading.get_ident()}"
         with open(tmp_path, "w") as fh:
             fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
             json.dump(obj, fh)
@@ -167,6 +197,26 @@ def _rl_file_save(obj):
         pass
 
 def _file_rate_limit_check_and_inc(ip):
+    """Count one request against the file-backed limits; (allowed, reason).
+
+    The load-check-save runs under an exclusive flock on a sidecar lock file,
+    which serializes it across worker processes and - because every call
+    opens its own file description - across threads of one worker as well.
+    Without it, concurrent requests read the same count and all but one
+    increment was lost."""
+    lock_fh = None
+    try:
+        lock_fh = open(f"{_RATE_LIMIT_FILE_PATH}.lock", "a")
+        fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+    except OSError:
+        pass  # best-effort, like the load/save helpers: count without the lock
+    try:
+        return _file_rate_limit_check_and_inc_locked(ip)
+    finally:
+        if lock_fh is not None:
+            lock_fh.close()  # releases the flock
+
+def _file_rate_limit_check_and_inc_locked(ip):
     now = int(time.time())
     window_start = now - (now % 60)  # minute window
     state = _rl_file_load() or {}
@@ -176,14 +226,12 @@ def _file_rate_limit_check_and_inc(ip):
     if RATE_LIMIT_PER_IP > 0:
         ip_count = int(state["per_ip"].get(ip, 0))
         if ip_count >= RATE_LIMIT_PER_IP:
-            _rl_file_save(state)  # persist unchanged state
             return False, f"Per-IP limit {RATE_LIMIT_PER_IP}/min exceeded"
         state["per_ip"][ip] = ip_count + 1
     # Check global
     if RATE_LIMIT_GLOBAL_INT > 0:
         global_count = int(state.get("global", 0))
         if global_count >= RATE_LIMIT_GLOBAL_INT:
-            _rl_file_save(state)
             return False, f"Global limit {RATE_LIMIT_GLOBAL_INT}/min exceeded"
         state["global"] = global_count + 1
     _rl_file_save(state)
@@ -191,8 +239,25 @@ def _file_rate_limit_check_and_inc(ip):
 
 RETRY_BACKOFF_SETTINGS = (
     "max_retries", "backoff_base_seconds", "backoff_max_seconds", "backoff_jitter_seconds",
+    "circuit_breaker_threshold", "circuit_breaker_cooldown_seconds",
 )
 
+# Upstream statuses worth retrying: rate limiting and server-side failures.
+# Everything else (401 aside, which refreshes the token) is a request/config
+# problem that the same request will just hit again.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the Tailscale API while the circuit breaker
+    is open - the caller keeps the last snapshot rather than spending quota
+    on an API that has just told us (or shown us) it is struggling."""
+
+    def __init__(self, open_until: float):
+        self.open_until = open_until
+        remaining = max(0, int(open_until - time.time()))
+        super().__init__(f"Tailscale API circuit breaker open; retrying upstream in {remaining}s")
+
 # HTTP method restrictions (read-only proxy, not user-configurable)
 ALLOWED_HTTP_METHODS = {"GET", "HEAD", "OPTIONS"}
 
@@ -215,6 +280,7 @@ def _build_poll_meta() -> dict:
     reach Tailscale" banner (driven by actual poll outcomes) instead of
     silently sitting on an empty/stale device list with no explanation."""
     status = dbstore.get_poll_status()
+    open_until = dbstore.circuit_open_until()
     return {
         "last_polled_at": dbstore.get_poll_meta(),
         "poll_interval_seconds": poller.poll_interval_seconds(),
@@ -225,6 +291,13 @@ def _build_poll_meta() -> dict:
         "last_poll_ok": status.get("ok"),
         "last_poll_error": status.get("error"),
         "last_poll_auth_error": bool(status.get("auth_error")),
+        # True while the Tailscale API circuit breaker is open: the poller is
+        # deliberately not calling upstream, so everything served is the last
+        # snapshot and will stay that way until circuit_open_until.
+        "degraded": open_until is not None,
+        "circuit_open_until": (
+            datetime.fromtimestamp(open_until, pytz.utc).isoformat() if open_until is not None else None
+        ),
     }
 
 # Device filter settings (INCLUDE_OS/EXCLUDE_OS/... ) are resolved dynamically
@@ -235,90 +308,129 @@ def _build_poll_meta() -> dict:
 # OAuth client id/secret are resolved via dbstore.get_setting() (env-first,
 # DB-fallback) so the admin settings UI can change them without a restart.
 
-# Global variable to store the OAuth access token and timer
-ACCESS_TOKEN = None
-# Which oauth_client_id ACCESS_TOKEN was fetched for - lets callers detect
-# "credentials were replaced via the settings UI" (a still-truthy but now
-# stale token for the OLD client) rather than only "no token at all", see
-# poller.py's self-heal check.
-ACCESS_TOKEN_CLIENT_ID = None
-TOKEN_RENEWAL_TIMER = None
+# The OAuth access token lives in SQLite (dbstore oauth_tokens), not in a
+# per-process global: every worker reads the same row, exactly one caller at
+# a time holds the lease to fetch a replacement, and the poller renews it
+# proactively once OAUTH_RENEW_FRACTION of its lifetime has passed (see
+# poller._renew_oauth_token_if_due()). Previously each process kept its own
+# token and 50-minute Timer, so forked workers inherited a token with no
+# timer and every worker that hit a 401 fetched a token of its own.
+OAUTH_RENEW_FRACTION = 0.75
+# Used when the token response carries no expires_in (Tailscale issues
+# one-hour tokens).
+OAUTH_DEFAULT_EXPIRES_IN = 3600
+# How long a lease holder may take to fetch before another caller may try.
+OAUTH_LEASE_SECONDS = 30
+_OAUTH_WAIT_STEP_SECONDS = 0.2
+
+
+def _oauth_credentials():
+    client_id = dbstore.get_setting("oauth_client_id")
+    client_secret = dbstore.get_setting("oauth_client_secret")
+    return (client_id, client_secret) if client_id and client_secret else (None, None)
 
-# Global variable to track if it's the initial token fetch
-IS_INITIAL_FETCH = True
 
-def fetch_oauth_token():
+def fetch_oauth_token(lease_owner: str = None):
     """
-    Fetches a new OAuth access token using the client ID and client secret.
+    Fetches a new OAuth access token using the client ID and client secret and
+    publishes it to the shared token store. Returns the token, or None on
+    failure. Callers go through get_oauth_access_token(), which makes sure
+    only the lease holder gets here.
     """
-    global ACCESS_TOKEN, ACCESS_TOKEN_CLIENT_ID, TOKEN_RENEWAL_TIMER, IS_INITIAL_FETCH
-    client_id = dbstore.get_setting("oauth_client_id")
-    client_secret = dbstore.get_setting("oauth_client_secret")
+    client_id, client_secret = _oauth_credentials()
+    if not client_id:
+        return None
+    response = None
     try:
-        response = requests.post(
-            "https://api.tailscale.com/api/v2/oauth/token",
-            data={
-                "client_id": client_id,
-                "client_secret": client_secret
-            },
-            timeout=get_http_timeout()
-        )
+        with upstreamstats.observe("oauth_token") as call:
+            response = call.response = requests.post(
+                poller.api_url("/api/v2/oauth/token"),
+                data={
+                    "client_id": client_id,
+                    "client_secret": client_secret
+                },
+                timeout=get_http_timeout()
+            )
         response.raise_for_status()
         token_data = response.json()
-        ACCESS_TOKEN = token_data["access_token"]
-        ACCESS_TOKEN_CLIENT_ID = client_id
-        logging.info("Successfully fetched OAuth access token.")
-
-        # Cancel any existing timer before scheduling a new one
-        if TOKEN_RENEWAL_TIMER:
-            TOKEN_RENEWAL_TIMER.cancel()
-
-        # Schedule the next token renewal after 50 minutes
-        TOKEN_RENEWAL_TIMER = Timer(50 * 60, fetch_oauth_token)
-        TOKEN_RENEWAL_TIMER.daemon = True
-        TOKEN_RENEWAL_TIMER.start()
-
-        # Log the token renewal time only if it's not the initial fetch
-        if not IS_INITIAL_FETCH:
-            timezone_name = get_timezone_name()
-            try:
-                tz = pytz.timezone(timezone_name)
-                renewal_time = datetime.now(tz).isoformat()
-                logging.info(f"OAuth access token renewed at {renewal_time} ({timezone_name}).")
-            except pytz.UnknownTimeZoneError:
-                logging.error(f"Unknown timezone: {timezone_name}. Logging renewal time in UTC.")
-                logging.info(f"OAuth access token renewed at {datetime.utcnow().isoformat()} UTC.")
-        else:
-            IS_INITIAL_FETCH = False  # Mark the initial fetch as complete
+        try:
+            expires_in = float(token_data.get("expires_in") or OAUTH_DEFAULT_EXPIRES_IN)
+        except (TypeError, ValueError):
+            expires_in = OAUTH_DEFAULT_EXPIRES_IN
+        dbstore.store_oauth_token(client_id, token_data["access_token"], expires_in, OAUTH_RENEW_FRACTION)
+        logging.info(
+            "Successfully fetched OAuth access token.",
+            extra={"event": "oauth_token_fetched", "expires_in": expires_in,
+                   "renew_in": round(expires_in * OAUTH_RENEW_FRACTION)},
+        )
+        return token_data["access_token"]
     except requests.exceptions.Timeout as to_err:
         logging.warning(f"Timeout during token fetch after {get_http_timeout()}s: {to_err}")
-        ACCESS_TOKEN = None
     except requests.exceptions.HTTPError as http_err:
         logging.error(f"HTTP error during token fetch: {http_err}")
-        if response.status_code == 401:
-            logging.error("Unauthorized error (401). Retrying token fetch...")
-            ACCESS_TOKEN = None
-        else:
+        if response is not None and response.status_code == 401:
+            logging.error("Unauthorized error (401) fetching OAuth token; check the client id/secret.")
+        elif response is not None:
             logging.error(f"Unexpected HTTP error: {response.status_code}")
     except Exception as e:
         logging.error(f"Failed to fetch OAuth access token: {e}")
-        ACCESS_TOKEN = None
+    if lease_owner:
+        dbstore.release_oauth_lease(client_id, lease_owner)
+    return None
+
+
+def get_oauth_access_token(rejected_token: str = None):
+    """Return a usable OAuth access token from the shared store, fetching
+    one only if this caller wins the lease.
+
+    - Current token not yet due for renewal: returned as-is, no network.
+    - Due for renewal but unexpired: renewed if the lease is free, otherwise
+      the current token is returned while the lease holder renews it.
+    - Missing, expired, for another client id, or `rejected_token` (it just
+      drew a 401): fetched by the lease winner; everyone else waits (up to
+      OAUTH_LEASE_SECONDS) for the winner's token instead of fetching too.
+
+    Returns None when OAuth is not configured or no token could be obtained.
+    """
+    client_id, _secret = _oauth_credentials()
+    if not client_id:
+        return None
+    deadline = time.time() + OAUTH_LEASE_SECONDS
+    while True:
+        row = dbstore.get_oauth_token(client_id)
+        now = time.time()
+        usable = bool(
+            row and row["access_token"] and row["access_token"] != rejected_token and now < (row["expires_at"] or 0)
+        )
+        if usable and now < row["renew_at"]:
+            return row["access_token"]
+        owner = secrets.token_hex(8)
+        if dbstore.acquire_oauth_lease(client_id, owner, OAUTH_LEASE_SECONDS, rejected_token=rejected_token):
+            token = fetch_oauth_token(lease_owner=owner)
+            return token or (row["access_token"] if usable else None)
+        if usable:
+            return row["access_token"]
+        if time.time() >= deadline:
+            logging.warning("Timed out waiting for another process to fetch an OAuth token.")
+            return None
+        time.sleep(_OAUTH_WAIT_STEP_SECONDS)
+
 
 def initialize_oauth():
     """
     Initializes OAuth token fetching if OAuth is configured.
-    This function should only be called once during the master process initialization.
+    This function should only be called once during the master process initialization,
+    so the shared token is in place before the workers fork.
     """
-    if dbstore.get_setting("oauth_client_id") and dbstore.get_setting("oauth_client_secret"):
+    if _oauth_credentials()[0]:
         logging.info("OAuth configuration detected. Fetching initial access token...")
-        fetch_oauth_token()
+        get_oauth_access_token()
 
 def build_auth_header() -> dict:
     """Return the Authorization header to use for Tailscale API calls."""
-    client_id = dbstore.get_setting("oauth_client_id")
-    client_secret = dbstore.get_setting("oauth_client_secret")
-    if client_id and client_secret and ACCESS_TOKEN:
-        return {"Authorization": f"Bearer {ACCESS_TOKEN}"}
+    access_token = get_oauth_access_token()
+    if access_token:
+        return {"Authorization": f"Bearer {access_token}"}
     auth_token = dbstore.get_setting("auth_token") or "your-default-token"
     return {"Authorization": f"Bearer {auth_token}"}
 
@@ -329,6 +441,36 @@ if os.getenv("GUNICORN_MASTER_PROCESS", "false").lower() == "true":
 # Log the configured timezone
 logging.debug(f"Configured TIMEZONE: {get_timezone_name()}")
 
+# Registered before every other hook, so its after_request half runs last
+# and the timing covers the other hooks too.
+@app.before_request
+def _begin_request_timing():
+    reqtiming.begin()
+
+@app.after_request
+def _finish_request_timing(response):
+    """Server-Timing header with the request's phases (see reqtiming.py),
+    and the request counted into its route's latency histogram. Every
+    reqtiming.FLUSH_SECONDS one request also adds this worker's counts to
+    the shared histograms, after its response has been sent."""
+    timed = reqtiming.end()
+    if timed is None:
+        return response
+    total_ms, phases = timed
+    response.headers["Server-Timing"] = reqtiming.server_timing_header(total_ms, phases)
+    rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    reqtiming.record(f"{request.method} {rule}", total_ms)
+    rows = reqtiming.drain_due()
+    if rows:
+        response.call_on_close(lambda: _flush_request_latency(rows))
+    return response
+
+def _flush_request_latency(rows):
+    try:
+        dbstore.record_request_latency(rows)
+    except Exception as e:  # pragma: no cover - defensive; losing a few seconds of samples is fine
+        logging.warning(f"Failed to record request latency histograms: {e}")
+
 @app.before_request
 def enforce_read_only_methods():
     """Reject non-read methods with a 403 to enforce read-only proxy.
@@ -454,11 +596,6 @@ def _enforce_file_rate_limits():
         return jsonify({"error": "Too Many Requests", "details": reason}), 429
     return None
 
-try:
-    from flask_limiter.errors import RateLimitExceeded
-except Exception:  # pragma: no cover - import guard
-    RateLimitExceeded = Exception  # type: ignore
-
 @app.errorhandler(429)
 def handle_429(e):  # Flask will pass the exception
     # Flask-Limiter raises RateLimitExceeded; ensure consistent JSON
@@ -510,15 +647,64 @@ def _upstream_error_payload(e: "requests.exceptions.HTTPError"):
             pass
     return {"error": message, "upstream_status": status}, status
 
+def _retry_after_seconds(response):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds,
+    or None if absent/unparseable."""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=pytz.utc)
+    return max(0.0, (when - datetime.now(pytz.utc)).total_seconds())
+
+def _backoff_delay(attempt, backoff_base, backoff_max, backoff_jitter):
+    delay = min(backoff_base * (2 ** (attempt - 1)), backoff_max)
+    jitter = random.uniform(0, backoff_jitter) if backoff_jitter > 0 else 0.0
+    return max(0.0, delay + jitter)
+
+# Retries this process has slept through, across all upstream requests.
+# The poller reports the difference across each cycle on /metrics; the
+# per-endpoint totals across processes live in upstreamstats.
+UPSTREAM_STATS = {"retries": 0}
+_upstream_stats_lock = threading.Lock()
+
+def _count_retry(endpoint):
+    with _upstream_stats_lock:
+        UPSTREAM_STATS["retries"] += 1
+    upstreamstats.count(endpoint, "retries")
+
+def _get(endpoint, url, headers):
+    with upstreamstats.observe(endpoint) as call:
+        call.response = requests.get(url, headers=headers, timeout=get_http_timeout())
+    return call.response
+
 def make_authenticated_request(url, headers):
     """
     Make an authenticated GET request with bounded, iterative retries.
 
-    - Retries only on transient connection errors (e.g., RemoteDisconnected, ProtocolError).
+    - Retries on transient connection errors (RemoteDisconnected, ProtocolError, dropped connections)
+      and on 429/5xx responses.
+    - Honours Retry-After on those responses: waits exactly that long when it
+      fits under `backoff_max_seconds`, otherwise gives up now and lets the
+      circuit breaker hold further calls off until the server's deadline.
     - On 401, fetches a new OAuth token and retries once immediately within the same attempt.
     - Uses exponential backoff with jitter between attempts.
     - Honours `HTTP_TIMEOUT` for each request attempt.
     - Bounds attempts by `max_retries` (total attempts, not additional retries).
+    - Raises CircuitOpenError without any network I/O while the shared
+      circuit breaker is open (see dbstore.record_upstream_failure()).
+    - Records every attempt, retry and token refresh in upstreamstats,
+      labelled with the endpoint the URL is for.
 
     Retry/backoff settings are resolved once here (a single DB round trip),
     not per attempt, so admin-edited values apply on the next call without a
@@ -533,26 +719,83 @@ def make_authenticated_request(url, headers):
     backoff_max = retry_cfg["backoff_max_seconds"]
     backoff_jitter = retry_cfg["backoff_jitter_seconds"]
 
+    circuit = dbstore.get_circuit_state()
+    open_until = dbstore.circuit_open_until(circuit)
+    if open_until is not None:
+        raise CircuitOpenError(open_until)
+
+    def _count_failure(error, retry_after=None):
+        state = dbstore.record_upstream_failure(
+            str(error),
+            retry_cfg["circuit_breaker_threshold"],
+            retry_cfg["circuit_breaker_cooldown_seconds"],
+            retry_after=retry_after,
+        )
+        if dbstore.circuit_open_until(state) is not None:
+            logging.error(
+                "Tailscale API circuit breaker opened.",
+                extra={
+                    "event": "auth_request_circuit_open",
+                    "failures": state["failures"],
+                    "open_until": state["open_until"],
+                    "error": str(error),
+                },
+            )
+
+    endpoint = upstreamstats.endpoint_for(url)
     last_err = None
     for attempt in range(1, max_retries + 1):
         try:
-            response = requests.get(url, headers=headers, timeout=get_http_timeout())
+            response = _get(endpoint, url, headers)
             if response.status_code == 401:
                 logging.error("Unauthorized error (401). Attempting to refresh OAuth token...")
-                fetch_oauth_token()
-                if ACCESS_TOKEN:
-                    headers["Authorization"] = f"Bearer {ACCESS_TOKEN}"
-                    response = requests.get(url, headers=headers, timeout=get_http_timeout())
+                upstreamstats.count(endpoint, "auth_refreshes")
+                rejected = headers.get("Authorization", "").removeprefix("Bearer ")
+                access_token = get_oauth_access_token(rejected_token=rejected)
+                if access_token:
+                    headers["Authorization"] = f"Bearer {access_token}"
+                    response = _get(endpoint, url, headers)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                retry_after = _retry_after_seconds(response)
+                last_err = f"HTTP {response.status_code} from Tailscale API"
+                if attempt >= max_retries or (retry_after is not None and retry_after > backoff_max):
+                    # Out of attempts, or the server wants longer than we'd
+                    # ever sleep inline: fail this call and let the breaker
+                    # keep every caller away until Retry-After has passed.
+                    _count_failure(last_err, retry_after=retry_after)
+                    response.raise_for_status()
+                    raise RuntimeError(last_err)  # raise_for_status() is a no-op on stub responses
+                sleep_for = retry_after if retry_after is not None else _backoff_delay(
+                    attempt, backoff_base, backoff_max, backoff_jitter,
+                )
+                logging.warning(
+                    "Retryable status from Tailscale API. Will retry.",
+                    extra={
+                        "event": "auth_request_retry",
+                        "attempt": attempt,
+                        "max_retries": max_retries,
+                        "status_code": response.status_code,
+                        "retry_after": retry_after,
+                        "sleep_seconds": round(sleep_for, 3),
+                    },
+                )
+                _count_retry(endpoint)
+                time.sleep(sleep_for)
+                continue
             response.raise_for_status()
+            if circuit["failures"]:
+                dbstore.record_upstream_success()
             return response
-        except (RemoteDisconnected, ProtocolError) as e:
+        except requests.exceptions.Timeout as to_err:
+            logging.warning(f"Timeout during external request after {get_http_timeout()}s: {to_err}")
+            _count_failure(to_err)
+            raise
+        except (RemoteDisconnected, ProtocolError, requests.exceptions.ConnectionError) as e:
             last_err = e
             if attempt >= max_retries:
                 break
             # Compute backoff with jitter and sleep
-            delay = min(backoff_base * (2 ** (attempt - 1)), backoff_max)
-            jitter = random.uniform(0, backoff_jitter) if backoff_jitter > 0 else 0.0
-            sleep_for = max(0.0, delay + jitter)
+            sleep_for = _backoff_delay(attempt, backoff_base, backoff_max, backoff_jitter)
             logging.error(
                 "Connection error during authenticated request. Will retry.",
                 extra={
@@ -563,10 +806,8 @@ def make_authenticated_request(url, headers):
                     "sleep_seconds": round(sleep_for, 3),
                 },
             )
+            _count_retry(endpoint)
             time.sleep(sleep_for)
-        except requests.exceptions.Timeout as to_err:
-            logging.warning(f"Timeout during external request after {get_http_timeout()}s: {to_err}")
-            raise
         except Exception as e:
             logging.error(f"Error during authenticated request: {e}")
             raise
@@ -580,6 +821,7 @@ def make_authenticated_request(url, headers):
             "error": str(last_err) if last_err else "unknown",
         },
     )
+    _count_failure(last_err or "Max retries exceeded")
     raise RuntimeError("Max retries exceeded for authenticated request")
 
 def fetch_devices():
@@ -643,6 +885,7 @@ def should_include_key(key: dict, key_type: str, filters=None) -> bool:
 
     return True
 
+@reqtiming.phase("compute")
 def _compute_keys_summary(keys):
     """Compute normalized tailnet key status list and aggregate metrics.
 
@@ -771,6 +1014,7 @@ HEALTH_SUMMARY_SETTINGS = (
     "include_tag_update_healthy", "exclude_tag_update_healthy",
 )
 
+@reqtiming.phase("compute")
 def _compute_health_summary(devices):
     """Compute normalized device health list and aggregate metrics.
 
@@ -1121,28 +1365,53 @@ def _health_endpoint_token_ok() -> bool:
     provided = request.headers.get("X-Health-Token", "")
     return hmac.compare_digest(provided, configured_token)
 
+# Single-flight + microcache for the /health family (see microcache.py).
+_health_cache = microcache.SingleFlightCache()
+
+
+def _cached_health_response(key, build):
+    """Serve build()'s (payload, status) through _health_cache.
+
+    The key is extended with the snapshot and settings generations, read
+    before build() reads anything, so a poll or settings save that lands
+    mid-computation can only make the stored body newer than its key -
+    never leave an outdated body under the current one. What's cached is
+    the serialized body, so a hit skips JSON encoding too. Exceptions
+    propagate to every waiting caller and are never cached.
+    """
+    def compute():
+        payload, status = build()
+        with reqtiming.phase("encode"):
+            body = jsonify(payload).get_data()
+        return (body, status), max(0.0, dbstore.get_setting_typed("health_cache_seconds"))
+
+    body, status = _health_cache.get_or_compute((*key, *dbstore.get_cache_generations()), compute)
+    return Response(body, status=status, mimetype=app.json.mimetype)
+
+
+def _health_payload():
+    # Fetch devices from the SQLite snapshot maintained by the background poller
+    devices = fetch_devices()
+
+    try:
+        health_status, metrics = _compute_health_summary(devices)
+    except ValueError as exc:
+        logging.error(str(exc))
+        return {"error": str(exc)}, 400
+
+    return {
+        "devices": health_status,
+        "metrics": metrics,
+        "poll_meta": _build_poll_meta(),
+    }, 200
+
 @app.route('/health', methods=['GET'])
 @_apply_limits
 def health_check():
     if not _health_endpoint_token_ok():
         return jsonify({"error": "Unauthorized"}), 401
     try:
-        # Fetch devices from the SQLite snapshot maintained by the background poller
-        devices = fetch_devices()
-
-        try:
-            health_status, metrics = _compute_health_summary(devices)
-        except ValueError as exc:
-            logging.error(str(exc))
-            return jsonify({"error": str(exc)}), 400
-
-        response = {
-            "devices": health_status,
-            "metrics": metrics,
-            "poll_meta": _build_poll_meta(),
-        }
-
-        return jsonify(response)
+        return _cached_health_response(("health",), _health_payload)
 
     except requests.exceptions.Timeout as e:
         logging.error(f"External API request timed out: {e}")
@@ -1195,12 +1464,132 @@ def keys_status():
         logging.error(f"Error in keys_status: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/health/changes', methods=['GET'])
+@_apply_limits
+def health_changes():
+    """Devices whose /health entry changed since generation `since`.
+
+    Backed by the change feed the poller writes each cycle (see
+    dbstore.record_device_feed()), so a consumer that keeps the returned
+    `generation` and passes it back as ?since= downloads only what changed:
+    `changed` holds full /health device entries, `removed` the ids that
+    dropped out (deleted, or now excluded by a device filter). With no (or
+    an unusable) `since`, `reset` is true and `changed` is the full list.
+    Entries are as evaluated by the last poll cycle.
+    """
+    if not _health_endpoint_token_ok():
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        since = int(request.args.get("since", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "since must be an integer generation"}), 400
+    response = dbstore.get_device_changes(since)
+    response["since"] = since
+    response["poll_meta"] = _build_poll_meta()
+    return jsonify(response)
+
+@app.route('/health/stream', methods=['GET'])
+@_apply_limits
+def health_stream():
+    """Server-Sent Events: snapshot generation changes, per-device health
+    transitions and new poller activity, pushed as the poller records them
+    (see stream.py). The connection is closed after a few minutes and the
+    browser reconnects; a worker with too many open streams answers 503 so
+    the client falls back to polling /health."""
+    if not _health_endpoint_token_ok():
+        return jsonify({"error": "Unauthorized"}), 401
+    sub = stream.broadcaster.subscribe()
+    if sub is None:
+        response = jsonify({"error": "Too many open streams; poll /health instead"})
+        response.headers["Retry-After"] = str(stream.STREAM_MAX_SECONDS)
+        return response, 503
+    return Response(
+        stream.iter_events(sub),
+        mimetype="text/event-stream",
+        # No proxy buffering (nginx honours X-Accel-Buffering) or caching:
+        # each event must reach the browser as soon as it is written.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+METRICS_DEVICE_SETTINGS = ("metrics_device_gauges", "metrics_device_labels", "metrics_max_devices")
+
+def _metrics_body() -> bytes:
+    if _is_tailnet_configured():
+        health_status, health_metrics = _compute_health_summary(fetch_devices())
+    else:
+        health_status, health_metrics = [], {}
+    _, keys_metrics = _get_tailnet_keys_status_safe()
+    poll_meta = _build_poll_meta()
+    poller_metrics = dbstore.get_poller_metrics()
+    device_options = dbstore.get_settings_typed(METRICS_DEVICE_SETTINGS)
+    upstream_calls = dbstore.get_upstream_calls()
+    with reqtiming.phase("encode"):
+        return prometheus.render(
+            health_status, health_metrics, keys_metrics, poll_meta, poller_metrics, device_options,
+            upstream_calls=upstream_calls,
+        ).encode("utf-8")
+
+@app.route('/metrics', methods=['GET'])
+@_apply_limits
+def prometheus_metrics():
+    """Prometheus/OpenMetrics-compatible text exposition (see prometheus.py).
+
+    The body is built once per snapshot/settings generation and kept for
+    up to a poll interval - the poller re-evaluates the clock-dependent
+    checks that often anyway - so a scrape between polls is a cache hit.
+    Guarded by the same optional X-Health-Token as /health.
+    """
+    if not _health_endpoint_token_ok():
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        body = _health_cache.get_or_compute(
+            ("metrics", *dbstore.get_cache_generations()),
+            lambda: (_metrics_body(), poller.poll_interval_seconds()),
+        )
+    except Exception as e:
+        logging.error(f"Error in prometheus_metrics: {e}")
+        return jsonify({"error": str(e)}), 500
+    return Response(body, content_type=prometheus.CONTENT_TYPE)
+
 @app.route('/health/', methods=['GET'])
 @_apply_limits
 def health_check_redirect():
     # Redirect to /health without trailing slash
     return redirect('/health', code=301)
 
+def _health_identifier_payload(identifier_lower: str):
+    # Fetch devices from the SQLite snapshot maintained by the background poller
+    devices = fetch_devices()
+    match = next(
+        (d for d in devices if identifier_lower in _device_identifiers(d)),
+        None,
+    )
+    if match is None:
+        return {"error": "Device not found"}, 404
+
+    try:
+        health_status, metrics = _compute_health_summary([match])
+    except ValueError as exc:
+        logging.error(str(exc))
+        return {"error": str(exc)}, 400
+
+    # Empty means the device exists but is excluded by the configured
+    # device filters - indistinguishable from "not found" to a consumer.
+    if not health_status:
+        return {"error": "Device not found"}, 404
+
+    return {
+        "device": health_status[0],
+        "metrics": metrics,
+        # If polling has been failing (credentials revoked, API
+        # unreachable), this device's fields are the last known
+        # snapshot, not current - poll_meta lets a monitoring
+        # consumer (e.g. the Gatus check in the README) detect
+        # that a "healthy: true" response may be stale, the same
+        # way /health already does.
+        "poll_meta": _build_poll_meta(),
+    }, 200
+
 @app.route('/health/<identifier>', methods=['GET'])
 @_apply_limits
 def health_check_by_identifier(identifier):
@@ -1215,40 +1604,11 @@ def health_check_by_identifier(identifier):
     """
     if not _health_endpoint_token_ok():
         return jsonify({"error": "Unauthorized"}), 401
+    identifier_lower = identifier.lower()
     try:
-        # Fetch devices from the SQLite snapshot maintained by the background poller
-        devices = fetch_devices()
-        identifier_lower = identifier.lower()
-        match = next(
-            (d for d in devices if identifier_lower in _device_identifiers(d)),
-            None,
+        return _cached_health_response(
+            ("health_identifier", identifier_lower), lambda: _health_identifier_payload(identifier_lower),
         )
-        if match is None:
-            return jsonify({"error": "Device not found"}), 404
-
-        try:
-            health_status, metrics = _compute_health_summary([match])
-        except ValueError as exc:
-            logging.error(str(exc))
-            return jsonify({"error": str(exc)}), 400
-
-        # Empty means the device exists but is excluded by the configured
-        # device filters - indistinguishable from "not found" to a consumer.
-        if not health_status:
-            return jsonify({"error": "Device not found"}), 404
-
-        response = {
-            "device": health_status[0],
-            "metrics": metrics,
-            # If polling has been failing (credentials revoked, API
-            # unreachable), this device's fields are the last known
-            # snapshot, not current - poll_meta lets a monitoring
-            # consumer (e.g. the Gatus check in the README) detect
-            # that a "healthy: true" response may be stale, the same
-            # way /health already does.
-            "poll_meta": _build_poll_meta(),
-        }
-        return jsonify(response)
 
     except requests.exceptions.Timeout as e:
         logging.error(f"External API request timed out: {e}")
@@ -1273,22 +1633,15 @@ def _health_subset_response(want_healthy: bool, endpoint_name: str):
     """
     if not _health_endpoint_token_ok():
         return jsonify({"error": "Unauthorized"}), 401
-    try:
-        # Fetch devices from the SQLite snapshot maintained by the background poller
-        devices = fetch_devices()
 
-        try:
-            health_status, metrics = _compute_health_summary(devices)
-        except ValueError as exc:
-            logging.error(str(exc))
-            return jsonify({"error": str(exc)}), 400
+    def build():
+        payload, status = _health_payload()
+        if status == 200:
+            payload["devices"] = [d for d in payload["devices"] if bool(d["healthy"]) is want_healthy]
+        return payload, status
 
-        response = {
-            "devices": [d for d in health_status if bool(d["healthy"]) is want_healthy],
-            "metrics": metrics,
-            "poll_meta": _build_poll_meta(),
-        }
-        return jsonify(response)
+    try:
+        return _cached_health_response((endpoint_name,), build)
 
     except requests.exceptions.Timeout as e:
         logging.error(f"External API request timed out: {e}")
@@ -1312,47 +1665,72 @@ def health_check_healthy():
     return _health_subset_response(True, "health_check_healthy")
 
 
+def _poll_job_response(job: dict, waited: bool):
+    """A poll job as JSON; 202 with Retry-After when its long-poll was
+    turned away, so the client backs off before asking again."""
+    if waited:
+        return jsonify(job)
+    response = jsonify(job)
+    response.headers["Retry-After"] = "1"
+    return response, 202
+
+def _wait_seconds_arg() -> float:
+    try:
+        return float(request.args.get("wait", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
 @app.route('/health/cache/invalidate', methods=['GET'])
 @_apply_limits
 def cache_invalidate():
-    """Trigger an immediate out-of-band poll cycle.
+    """Queue an immediate out-of-band poll cycle and return 202 at once.
 
     Kept at this URL/method for backward compatibility with existing
     monitoring scripts; the underlying response cache this route used to
     clear no longer exists (device/key data is now polled into SQLite).
+
+    The cycle itself runs in the poller (whichever process holds the
+    election), never in this request thread: a public caller used to pin a
+    sync Gunicorn worker for a whole upstream round trip. Concurrent callers
+    coalesce onto the job already queued/running (triggered: false, same
+    job_id), so N requests still cost one cycle. Poll status_url - optionally
+    with ?wait=<seconds> to long-poll - to learn when it has finished.
     """
     if not _health_endpoint_token_ok():
         return jsonify({"error": "Unauthorized"}), 401
-    # This route is public/unauthenticated by default - without a claim,
-    # concurrent callers would each synchronously run their own full poll
-    # cycle (real outbound HTTP + DB work) in the request thread, tying up
-    # every Gunicorn worker. Only the caller that wins the short-lived claim
-    # actually polls; everyone else within that window is told a refresh is
-    # already in flight and does no outbound work at all.
-    if not dbstore.try_claim_manual_poll():
-        return jsonify({
-            "triggered": False,
-            "message": "A refresh is already in progress; try again shortly.",
-            "last_polled_at": dbstore.get_poll_meta(),
-        }), 202
-    try:
-        poller.run_poll_cycle()
-        return jsonify({
-            "triggered": True,
-            "last_polled_at": dbstore.get_poll_meta(),
-        })
-    except Exception as e:
-        logging.error(f"Error triggering poll: {e}")
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # Released as soon as the cycle actually finishes (success or
-        # failure) rather than making the next caller wait out the
-        # crash-recovery TTL, which only exists for the case where this
-        # process dies mid-cycle without reaching this line.
-        dbstore.release_manual_poll_claim()
+    job, created = dbstore.enqueue_poll_job(requested_by="health_endpoint")
+    return jsonify({
+        "triggered": created,
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": url_for("poll_job_status", job_id=job["id"]),
+        "message": None if created else "A refresh is already queued or in progress; returning that job.",
+        "last_polled_at": dbstore.get_poll_meta(),
+    }), 202
+
+@app.route('/health/cache/jobs/<job_id>', methods=['GET'])
+@_apply_limits
+def poll_job_status(job_id):
+    """Status of a manual refresh queued via /health/cache/invalidate.
+    ?wait=<seconds> (max poller.POLL_JOB_MAX_WAIT_SECONDS) long-polls until
+    the job leaves queued/running. When this worker already has
+    poller.POLL_JOB_MAX_WAITERS long-polls open it answers 202 with the
+    job as it stands and a Retry-After instead of waiting."""
+    if not _health_endpoint_token_ok():
+        return jsonify({"error": "Unauthorized"}), 401
+    job, waited = poller.wait_for_poll_job(job_id, _wait_seconds_arg())
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return _poll_job_response(job, waited)
+
+_mark_startup_phase("routes")
+logging.info(
+    f"Startup took {sum(STARTUP_TIMINGS.values()):.1f} ms after imports ("
+    + ", ".join(f"{phase} {ms} ms" for phase, ms in STARTUP_TIMINGS.items()) + ")",
+    extra={"event": "startup_timing", "startup_ms": dict(STARTUP_TIMINGS)},
+)
 
 if __name__ == '__main__':
-    dbstore.init_db()
     poller.start()
     app.run(host='0.0.0.0', port=PORT)
 elif os.environ.get("FLASK_RUN_FROM_CLI") == "true":
@@ -1366,5 +1744,4 @@ elif os.environ.get("FLASK_RUN_FROM_CLI") == "true":
     # forking, and starting the poller pre-fork would have every forked
     # worker inherit the same already-acquired lock/timer state. Gunicorn
     # never sets FLASK_RUN_FROM_CLI, so this is safe.
-    dbstore.init_db()
     poller.start()
@@ -0,0 +1,98 @@
+"""Per-process single-flight + microcache for computed responses.
+
+Monitoring probes tend to arrive together (every Gatus/Uptime Kuma check and
+open dashboard firing at the top of the minute), and each /health request
+used to read the device snapshot and run the health summary on its own, for
+the same data. SingleFlightCache makes concurrent callers asking for the same
+key wait on the one computation already in flight and share its result, and
+keeps that result for a few seconds so the rest of the burst is a lookup.
+
+Keys carry the generations the value was computed from (see
+dbstore.get_cache_generations()), so new data is never served stale: a new
+poll or settings change produces a new key rather than waiting for a TTL.
+The TTL only bounds how long a value may age while its inputs stand still,
+which matters for the parts of /health that depend on the clock (the online
+threshold, key expiry). Entries are per worker process; nothing is shared.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    def __init__(self, max_entries: int = 256):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._inflight = {}  # key -> _Flight
+        self._max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, or compute it.
+
+        compute() returns (value, ttl_seconds). Only one caller per key runs
+        it at a time; the others block until it finishes and get the same
+        value - or the same exception, which is never cached. A ttl of 0
+        shares the value with those waiters and nobody after.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        ttl = 0
+        try:
+            flight.value, ttl = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.error is None and ttl > 0:
+                    self._store(key, flight.value, ttl)
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, value, ttl):
+        now = time.monotonic()
+        # Drop what has expired (entries for superseded generations are
+        # never asked for again), then the least recently used over the cap.
+        for stale in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[stale]
+        self._entries[key] = (now + ttl, value)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced}
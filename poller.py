@@ -3,6 +3,9 @@
 Only one process (of the 4 gunicorn workers) actually polls, elected via a
 non-blocking fcntl lock on a file in the same directory as the SQLite DB -
 the same primitive already used by healthcheck.py's file-based rate limiter.
+With POLLER_MODE=process/external the loop instead runs in its own
+`python -m poller` process (run_forever()), outside the request-serving
+workers entirely; the election still guards against double-polling.
 Everything that talks to the Tailscale API (auth headers, retries, OAuth
 token refresh) is reused from healthcheck.py to avoid duplicating that logic;
 imports of healthcheck are deferred to call time to dodge a circular import
@@ -11,8 +14,12 @@ imports of healthcheck are deferred to call time to dodge a circular import
 import os
 import fcntl
 import logging
+import signal
+import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 
 import requests
@@ -21,9 +28,47 @@ import dbstore
 import notifier
 
 _lock_fh = None
-_timer = None
+_loop_thread = None
+_dispatch_thread = None
+# Set whenever a notification is queued, so the dispatcher in this process
+# delivers it straight away instead of at its next idle tick.
+_dispatch_wakeup = threading.Event()
 _have_lock = False
 
+# Base URL for every Tailscale API call (poller, OAuth token fetch, setup
+# wizard validation). Process bootstrap only, like PORT - overriding it is for
+# pointing a test/staging instance at tools/tailscale_sim.py, not something to
+# change at runtime, so it stays out of the settings registry.
+TAILSCALE_API_URL = os.getenv("TAILSCALE_API_URL", "https://api.tailscale.com").rstrip("/")
+
+
+def api_url(path: str) -> str:
+    """Absolute URL for a Tailscale API path such as "/api/v2/oauth/token"."""
+    return f"{TAILSCALE_API_URL}{path}"
+
+
+# Where the poll loop runs. Process bootstrap only (read once at import):
+#   - "worker" (default): inside whichever Gunicorn web worker wins the fcntl
+#     election in start() - no extra process, but the loop shares that
+#     worker's GIL with its requests and dies with it on every
+#     --max-requests recycle.
+#   - "process": gunicorn_config.py's master hooks spawn and supervise a
+#     dedicated `python -m poller` child (see run_forever()); web workers
+#     never poll and are pure readers of the SQLite snapshot.
+#   - "external": same as "process" for the web workers, but nothing is
+#     spawned - run `python -m poller` yourself (a second container sharing
+#     the /data volume, a systemd unit, ...).
+POLLER_MODES = ("worker", "process", "external")
+POLLER_MODE = os.getenv("POLLER_MODE", "worker").strip().lower()
+if POLLER_MODE not in POLLER_MODES:
+    logging.warning(f"Unknown POLLER_MODE={POLLER_MODE!r}; falling back to 'worker'.")
+    POLLER_MODE = "worker"
+
+
+def polls_in_web_workers() -> bool:
+    """Whether Gunicorn web workers should take part in the poller election."""
+    return POLLER_MODE == "worker"
+
 # Event types this module emits, in the order a poll cycle produces them.
 # The /debug page filters on these (not log severity) - see
 # dbstore.list_poller_log_event_types() for what's actually present.
@@ -128,42 +173,420 @@ def _in_cooldown(last_notified_iso: str, cooldown_minutes: int) -> bool:
     return (datetime.now(timezone.utc) - last) < timedelta(minutes=cooldown_minutes)
 
 
+class _NotificationState:
+    """The poller's health-transition and cooldown bookkeeping, held in memory.
+
+    Loaded from SQLite once (per database - the path is checked so tests
+    and a reconfigured DATABASE_PATH reload), then read from memory every
+    cycle instead of one get_health_state()/get_last_notified() query per
+    entity/event type. Changes - health states, device timeline transitions
+    and newly queued outbox rows - accumulate in a write-behind buffer that
+    flush() writes in a single transaction once per poll cycle. Cooldown
+    starts are the exception: the dispatcher writes them with the delivery
+    itself (dbstore.mark_notifications_sent()) and only mirrors them here,
+    so a worker recycled before the next flush can't forget them. Only the
+    elected poller process touches these tables, so nothing else can make
+    the in-memory copy stale.
+
+    Locked because the dispatcher thread records deliveries concurrently
+    with the poll loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._db_path = None
+        self._health = {}
+        self._last_notified = {}
+        self._undelivered = set()
+        self._intervals = {}
+        self._interval_changes = []
+        self._health_upserts = {}
+        self._health_deletes = set()
+        self._outbox_rows = []
+
+    def _loaded(self):
+        if self._db_path != dbstore.DATABASE_PATH:
+            state = dbstore.load_notification_state()
+            self._health = state["health"]
+            self._last_notified = state["last_notified"]
+            self._undelivered = state["undelivered"]
+            self._intervals = state["intervals"]
+            self._health_upserts, self._health_deletes = {}, set()
+            self._outbox_rows, self._interval_changes = [], []
+            self._db_path = dbstore.DATABASE_PATH
+        return self
+
+    def health(self, entity_type: str) -> dict:
+        with self._lock:
+            return dict(self._loaded()._health.get(entity_type, {}))
+
+    def set_health(self, entity_type: str, states: dict, prune: bool = False):
+        """Record this cycle's states; only actual changes are written back.
+        With `prune`, entities of this type missing from `states` (removed
+        devices/keys) are dropped."""
+        with self._lock:
+            current = self._loaded()._health.setdefault(entity_type, {})
+            for entity_id, healthy in states.items():
+                healthy = bool(healthy)
+                if current.get(entity_id) is not healthy:
+                    current[entity_id] = healthy
+                    self._health_upserts[(entity_type, entity_id)] = healthy
+                    self._health_deletes.discard((entity_type, entity_id))
+            if prune:
+                for entity_id in [e for e in current if e not in states]:
+                    del current[entity_id]
+                    self._health_upserts.pop((entity_type, entity_id), None)
+                    self._health_deletes.add((entity_type, entity_id))
+
+    def record_device_health(self, states: dict, at: str):
+        """Extend each device's health timeline with this cycle's
+        {device_id: {dimension: healthy}}: a row is only closed/opened where
+        a dimension changed, and the open intervals of devices missing from
+        `states` - or of dimensions a device no longer reports, such as lock
+        once Tailnet Lock is turned off - are closed."""
+        with self._lock:
+            self._loaded()
+            for device_id, dims in states.items():
+                for dimension, healthy in dims.items():
+                    healthy = bool(healthy)
+                    if self._intervals.get((device_id, dimension)) is not healthy:
+                        self._intervals[(device_id, dimension)] = healthy
+                        self._interval_changes.append((device_id, dimension, healthy, at))
+            for key in [k for k in self._intervals if k[1] not in states.get(k[0], ())]:
+                del self._intervals[key]
+                self._interval_changes.append((key[0], key[1], None, at))
+
+    def last_notified(self, event_type: str) -> dict:
+        with self._lock:
+            return dict(self._loaded()._last_notified.get(event_type, {}))
+
+    def is_undelivered(self, event_type: str, entity_id: str) -> bool:
+        with self._lock:
+            return (event_type, entity_id) in self._loaded()._undelivered
+
+    def queue(self, event_type, entity_id, target, title, body, hold_seconds=0):
+        with self._lock:
+            self._loaded()._outbox_rows.append((event_type, entity_id, target, title, body, hold_seconds))
+            self._undelivered.add((event_type, entity_id))
+
+    def settled(self, event_type: str, entity_ids, delivered_at: str = None):
+        """The dispatcher finished with these rows (sent or dead-lettered);
+        `delivered_at` is the cooldown start it has already stored."""
+        with self._lock:
+            self._loaded()
+            for entity_id in entity_ids:
+                self._undelivered.discard((event_type, entity_id))
+                if delivered_at:
+                    self._last_notified.setdefault(event_type, {})[entity_id] = delivered_at
+
+    def flush(self) -> int:
+        """Write everything buffered in one transaction; returns how many
+        notifications were queued."""
+        with self._lock:
+            if self._db_path != dbstore.DATABASE_PATH:
+                return 0  # nothing loaded (or a stale database): nothing to write
+            if not (self._health_upserts or self._health_deletes or self._outbox_rows or self._interval_changes):
+                return 0
+            dbstore.apply_notification_state(
+                self._health_upserts, self._health_deletes, self._outbox_rows, self._interval_changes,
+            )
+            queued = len(self._outbox_rows)
+            self._health_upserts, self._health_deletes = {}, set()
+            self._outbox_rows, self._interval_changes = [], []
+        if queued:
+            _dispatch_wakeup.set()
+        return queued
+
+
+_state = _NotificationState()
+
+
 def _notify_entity(event_type, entity_id, target, title, body, cfg, cooldown_state, device_tags=None):
-    """Send one entity-scoped notification, honouring notification_cooldown_minutes.
+    """Queue one entity-scoped notification, honouring notification_cooldown_minutes.
 
     Notifications already only fire on a state *transition*, but a device
     flapping across the healthy line still produces one alert per flap. The
-    cooldown collapses those into at most one per window per (event, entity).
+    cooldown collapses those into at most one per window per (event, entity):
+    a delivered notification starts the window (the dispatcher records it),
+    and one still sitting in the outbox counts as already notified.
     Suppressions are recorded as their own poller_log event so /debug explains
     the silence rather than looking like the notifier simply stopped working.
+
+    Nothing here talks to Apprise, or even SQLite: the notification is
+    buffered in _state and lands in notification_outbox with the rest of the
+    cycle's bookkeeping (one transaction, see _NotificationState.flush()),
+    and the dispatcher thread delivers it - so a slow or dead Apprise
+    instance costs the poll cycle nothing per transition.
     """
+    allowed, _reason = notifier.should_notify(event_type, cfg, device_tags=device_tags)
+    if not allowed:
+        return
     cooldown_minutes = _cooldown_minutes(cfg)
-    if _in_cooldown(cooldown_state.get(entity_id), cooldown_minutes):
+    if cooldown_minutes and (
+        _in_cooldown(cooldown_state.get(entity_id), cooldown_minutes)
+        or _state.is_undelivered(event_type, entity_id)
+    ):
         _record(
             "notification_suppressed",
             f"Suppressed '{event_type}' for {target} (within {cooldown_minutes}m cooldown).",
             {"event_type": event_type, "cooldown_minutes": cooldown_minutes},
         )
         return
-    sent, reason = notifier.notify(event_type, title, body, cfg, device_tags=device_tags)
-    _record_notification(event_type, target, sent, reason)
-    if sent and cooldown_minutes:
-        now_iso = datetime.now(timezone.utc).isoformat()
-        dbstore.set_last_notified(event_type, entity_id, now_iso)
-        cooldown_state[entity_id] = now_iso
+    hold_seconds = 0
+    if cfg.get("notification_digest"):
+        hold_seconds = _setting_at_least(cfg, "notification_digest_window_seconds", 0)
+    _state.queue(event_type, entity_id, target, title, body, hold_seconds=hold_seconds)
+
+
+# Dispatcher backoff between delivery attempts of one notification: base *
+# 2^(attempt-1), capped - 30s, 1m, 2m, 4m, 8m with the default 6 attempts.
+NOTIFICATION_BACKOFF_BASE_SECONDS = 30
+NOTIFICATION_BACKOFF_MAX_SECONDS = 30 * 60
+# Longest the dispatcher sleeps with nothing due; a notification queued in
+# this process wakes it immediately (see _dispatch_wakeup).
+DISPATCH_IDLE_SECONDS = 5.0
+# Digest mode claims everything due at once so it can be grouped. A cycle's
+# notifications are all inserted by one _state.flush(), so they are due - and
+# claimed - together.
+DIGEST_CLAIM_LIMIT = 5000
+
+
+def _notification_retry_at(attempts: int) -> float:
+    delay = NOTIFICATION_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return time.time() + min(delay, NOTIFICATION_BACKOFF_MAX_SECONDS)
+
+
+def _setting_at_least(cfg: dict, name: str, minimum: int) -> int:
+    try:
+        return max(minimum, int(cfg.get(name) or 0))
+    except (TypeError, ValueError):
+        return minimum
+
+
+def _delivery_units(batch: list, digest: bool) -> list:
+    """Split claimed rows into messages: one per row, or in digest mode one
+    per event type (in first-queued order)."""
+    if not digest:
+        return [[entry] for entry in batch]
+    groups = {}
+    for entry in batch:
+        groups.setdefault(entry["event_type"], []).append(entry)
+    return list(groups.values())
+
+
+def _deliver_outbox_entries(cfg: dict, entries: list, max_attempts: int):
+    """Deliver one message covering `entries` (all the same event type) and
+    settle every row it covers. A digest succeeds or fails as a whole, so its
+    rows share their retry schedule and stay grouped on the next attempt."""
+    event_type = entries[0]["event_type"]
+    if len(entries) == 1:
+        title, body = entries[0]["title"], entries[0]["body"]
+        target = entries[0]["target"]
+    else:
+        title, body = notifier.digest_message(event_type, [e["title"] for e in entries])
+        target = f"{len(entries)} entities (digest)"
+    ids = [e["id"] for e in entries]
+    sent, error = notifier.deliver(cfg, title, body)
+    _record_notification(event_type, target, sent, error)
+    entity_ids = [e["entity_id"] for e in entries]
+    if sent:
+        delivered_at = datetime.now(timezone.utc).isoformat() if _cooldown_minutes(cfg) else None
+        dbstore.mark_notifications_sent(
+            ids, {(event_type, entity_id): delivered_at for entity_id in entity_ids} if delivered_at else None,
+        )
+        _state.settled(event_type, entity_ids, delivered_at)
+        return
+    attempts = max(e["attempts"] for e in entries) + 1
+    if attempts >= max_attempts or error == "not_configured":
+        dbstore.mark_notifications_failed(ids, error)
+        _state.settled(event_type, entity_ids)
+        _record(
+            "notification_failed",
+            f"Gave up on '{event_type}' for {target} after {attempts} attempt(s): {error}",
+            {"event_type": event_type, "error": error, "attempts": attempts, "dead_letter": True},
+        )
+    else:
+        dbstore.mark_notifications_failed(ids, error, retry_at=_notification_retry_at(attempts))
+
+
+class _TokenBucket:
+    """Global notification send budget: refills at `rate_per_minute`, holds
+    at most `burst` tokens, one token per message sent. Only the dispatcher
+    thread takes from it. configure() is called every pass so a changed
+    setting applies without a restart; a rate of 0 means unlimited."""
+
+    def __init__(self):
+        self.rate_per_minute = 0
+        self.burst = 0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def configure(self, rate_per_minute: int, burst: int):
+        burst = burst if burst > 0 else rate_per_minute
+        if (rate_per_minute, burst) != (self.rate_per_minute, self.burst):
+            self.rate_per_minute, self.burst = rate_per_minute, burst
+            self._tokens = float(burst)  # a new budget starts full
+            self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def take(self) -> bool:
+        if self.rate_per_minute <= 0:
+            return True
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+_send_budget = _TokenBucket()
+# Notifications that overflow the send budget are collapsed into one summary
+# message at most this often; in between they wait in the outbox and join
+# the next summary (or go out individually if the budget has refilled).
+OVERFLOW_SUMMARY_INTERVAL_SECONDS = 60
+_next_overflow_summary_at = 0.0
+
+
+def _deliver_overflow_summary(cfg: dict, entries: list, max_attempts: int):
+    """Send the notifications the budget had no room for as one message and
+    record a notification_suppressed event with per-event counts. The summary
+    itself bypasses the budget - it is the one message a burst is allowed."""
+    global _next_overflow_summary_at
+    now = time.time()
+    if now < _next_overflow_summary_at:
+        dbstore.defer_notifications([e["id"] for e in entries], _next_overflow_summary_at)
+        return
+    _next_overflow_summary_at = now + OVERFLOW_SUMMARY_INTERVAL_SECONDS
+    counts = {}
+    for entry in entries:
+        counts[entry["event_type"]] = counts.get(entry["event_type"], 0) + 1
+    _record(
+        "notification_suppressed",
+        f"Send budget exceeded: {len(entries)} notification(s) collapsed into one summary",
+        {"reason": "rate_limit", "total": len(entries), "counts": counts,
+         "rate_per_minute": _send_budget.rate_per_minute, "burst": _send_budget.burst},
+    )
+    title, body = notifier.overflow_message(entries)
+    sent, error = notifier.deliver(cfg, title, body)
+    _record_notification("notification_summary", f"{len(entries)} notifications", sent, error)
+    ids = [e["id"] for e in entries]
+    if sent:
+        delivered_at = datetime.now(timezone.utc).isoformat() if _cooldown_minutes(cfg) else None
+        dbstore.mark_notifications_sent(
+            ids, {(e["event_type"], e["entity_id"]): delivered_at for e in entries} if delivered_at else None,
+        )
+        for event_type in counts:
+            _state.settled(event_type, [e["entity_id"] for e in entries if e["event_type"] == event_type], delivered_at)
+        return
+    attempts = max(e["attempts"] for e in entries) + 1
+    if attempts >= max_attempts or error == "not_configured":
+        dbstore.mark_notifications_failed(ids, error)
+        for event_type in counts:
+            _state.settled(event_type, [e["entity_id"] for e in entries if e["event_type"] == event_type])
+    else:
+        dbstore.mark_notifications_failed(ids, error, retry_at=_notification_retry_at(attempts))
+
+
+def _claim_due(cfg: dict, limit: int, claim_seconds: float) -> list:
+    if cfg.get("notification_digest"):
+        limit = DIGEST_CLAIM_LIMIT
+    return dbstore.claim_due_notifications(limit, claim_seconds)
+
+
+def dispatch_notifications() -> int:
+    """Deliver every notification currently due; returns how many were tried.
+
+    Up to notification_concurrency POSTs run in parallel, each bounded by
+    notification_timeout_seconds, so a 300-device outage drains in roughly
+    300 / concurrency round trips instead of 300 serial ones - and never on
+    the poll cycle's time. With notification_digest on, everything due is
+    claimed at once and each event type goes out as a single message.
+    Every message takes a token from the notification_rate_per_minute budget;
+    once it runs dry the rest of the pass goes out as one summary (see
+    _deliver_overflow_summary()). Settings are re-read every pass, so a fixed
+    Apprise URL applies to the retries already queued.
+    """
+    cfg = dbstore.get_settings_typed(notifier.NOTIFICATION_SETTINGS)
+    concurrency = _setting_at_least(cfg, "notification_concurrency", 1)
+    max_attempts = _setting_at_least(cfg, "notification_max_attempts", 1)
+    timeout = _setting_at_least(cfg, "notification_timeout_seconds", 1)
+    # A claim outlives the slowest possible batch, so a live dispatcher never
+    # sees its own in-flight rows come due again.
+    claim_seconds = timeout * 2 + 30
+    _send_budget.configure(
+        max(0, int(cfg.get("notification_rate_per_minute") or 0)), max(0, int(cfg.get("notification_rate_burst") or 0)),
+    )
+    tried = 0
+    overflow = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="notify") as pool:
+        while True:
+            batch = _claim_due(cfg, concurrency * 4, claim_seconds)
+            if not batch:
+                break
+            futures = []
+            for unit in _delivery_units(batch, bool(cfg.get("notification_digest"))):
+                if _send_budget.take():
+                    futures.append(pool.submit(_deliver_outbox_entries, cfg, unit, max_attempts))
+                else:
+                    overflow.extend(unit)
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:  # pragma: no cover - defensive, the row is retried once its claim expires
+                    logging.error(f"Notification dispatch failed: {e}")
+            tried += len(batch)
+    if overflow:
+        try:
+            _deliver_overflow_summary(cfg, overflow, max_attempts)
+        except Exception as e:  # pragma: no cover - defensive, the rows are retried once their claim expires
+            logging.error(f"Notification overflow summary failed: {e}")
+    return tried
+
+
+def _dispatch_loop(stop_event: threading.Event):
+    """Background delivery of notification_outbox, alongside the poll loop
+    in whichever process holds the poller election. Rows outlive the
+    process, so whatever was queued or mid-retry at shutdown is picked up by
+    the next dispatcher to start."""
+    while not stop_event.is_set():
+        _dispatch_wakeup.clear()
+        try:
+            dispatch_notifications()
+            due = dbstore.next_notification_due_at()
+        except Exception as e:  # pragma: no cover - defensive, e.g. a locked DB
+            logging.warning(f"Notification dispatcher: {e}")
+            due = None
+        wait = DISPATCH_IDLE_SECONDS if due is None else min(DISPATCH_IDLE_SECONDS, max(0.0, due - time.time()))
+        _dispatch_wakeup.wait(wait)
+
+
+def _start_dispatcher(stop_event: threading.Event):
+    global _dispatch_thread
+    _dispatch_thread = threading.Thread(
+        target=_dispatch_loop, args=(stop_event,), name="notification-dispatcher", daemon=True,
+    )
+    _dispatch_thread.start()
 
 
 def _process_device_notifications(cfg: dict, health_status: list):
     """Fire device_unhealthy/device_healthy_again on a healthy-state
     transition, comparing against the previous poll cycle's stored state -
     never on a device's first-ever appearance (that would spam every device
-    at rollout/first run)."""
-    old_state = dbstore.get_health_state("device")
+    at rollout/first run).
+
+    Also extends each device's health timeline (device_health_intervals)
+    for every dimension in dbstore.DEVICE_HEALTH_DIMENSIONS."""
+    old_state = _state.health("device")
     cooldowns = {
-        "device_unhealthy": dbstore.get_last_notified("device_unhealthy"),
-        "device_healthy_again": dbstore.get_last_notified("device_healthy_again"),
+        "device_unhealthy": _state.last_notified("device_unhealthy"),
+        "device_healthy_again": _state.last_notified("device_healthy_again"),
     }
     new_states = {}
+    timelines = {}
     for d in health_status:
         device_id = d.get("id")
         if not device_id:
@@ -177,8 +600,11 @@ def _process_device_notifications(cfg: dict, health_status: list):
             body = f"Device {d.get('device', name)} transitioned to {'healthy' if new_healthy else 'unhealthy'}."
             _notify_entity(event, device_id, name, title, body, cfg, cooldowns[event], device_tags=d.get("tags"))
         new_states[device_id] = new_healthy
-    dbstore.set_health_state_bulk("device", new_states)
-    dbstore.prune_health_state("device", new_states.keys())
+        timelines[device_id] = {
+            dim: d[field] for dim, field in dbstore.DEVICE_HEALTH_DIMENSIONS.items() if field in d
+        }
+    _state.set_health("device", new_states, prune=True)
+    _state.record_device_health(timelines, datetime.now(timezone.utc).isoformat())
 
 
 def _process_lock_notifications(cfg: dict, health_status: list):
@@ -187,10 +613,10 @@ def _process_lock_notifications(cfg: dict, health_status: list):
     Lock behavior - inert until an admin opts in."""
     if not cfg.get("tailnet_lock_enabled"):
         return
-    old_state = dbstore.get_health_state("device_lock")
+    old_state = _state.health("device_lock")
     cooldowns = {
-        "device_needs_signing": dbstore.get_last_notified("device_needs_signing"),
-        "device_signed": dbstore.get_last_notified("device_signed"),
+        "device_needs_signing": _state.last_notified("device_needs_signing"),
+        "device_signed": _state.last_notified("device_signed"),
     }
     new_states = {}
     for d in health_status:
@@ -210,16 +636,15 @@ def _process_lock_notifications(cfg: dict, health_status: list):
             )
             _notify_entity(event, device_id, name, title, body, cfg, cooldowns[event], device_tags=d.get("tags"))
         new_states[device_id] = signed
-    dbstore.set_health_state_bulk("device_lock", new_states)
-    dbstore.prune_health_state("device_lock", new_states.keys())
+    _state.set_health("device_lock", new_states, prune=True)
 
 
 def _process_key_notifications(cfg: dict, key_status: list):
     """Fire key_expiring the moment a key crosses into unhealthy (expiring
     soon). There's no "key healthy again" event - a renewed/replaced key
     just stops being interesting."""
-    old_state = dbstore.get_health_state("key")
-    key_cooldown = dbstore.get_last_notified("key_expiring")
+    old_state = _state.health("key")
+    key_cooldown = _state.last_notified("key_expiring")
     new_states = {}
     for k in key_status:
         key_id = k.get("id")
@@ -234,67 +659,62 @@ def _process_key_notifications(cfg: dict, key_status: list):
                 "key_expiring", key_id, k.get("description") or key_id, title, body, cfg, key_cooldown,
             )
         new_states[key_id] = new_healthy
-    dbstore.set_health_state_bulk("key", new_states)
-    dbstore.prune_health_state("key", new_states.keys())
+    _state.set_health("key", new_states, prune=True)
 
 
 def _process_global_notifications(cfg: dict, health_metrics: dict):
-    old_state = dbstore.get_health_state("global")
+    old_state = _state.health("global")
     new_healthy = bool(health_metrics.get("global_healthy"))
     old_healthy = old_state.get("tailnet")
     if old_healthy is not None and old_healthy != new_healthy:
         event = "global_healthy_restored" if new_healthy else "global_unhealthy"
         title = "Tailnet is healthy again" if new_healthy else "Tailnet is unhealthy"
         body = f"{health_metrics.get('counter_healthy_false', 0)} device(s) currently unhealthy."
-        _notify_entity(event, "tailnet", "tailnet", title, body, cfg, dbstore.get_last_notified(event))
-    dbstore.set_health_state("global", "tailnet", new_healthy)
-
-
-def _needs_oauth_refresh(healthcheck, current_client_id) -> bool:
-    """Whether this process should fetch a fresh OAuth token before polling.
-
-    ACCESS_TOKEN and its renewal timer are per-process globals, so there are
-    three distinct staleness cases:
-
-    1. No token at all - e.g. OAuth creds became configured via the settings
-       UI while a still-working static token meant no 401 ever occurred to
-       trigger the usual retry-driven fetch.
-    2. A token for a DIFFERENT client id - creds were replaced (new client
-       id/secret) while a cached token from the OLD client is still truthy.
-       Without comparing the client id, that stale token for a possibly-now-
-       wrong tailnet would keep being used until it happened to expire or get
-       a 401, which a wrong-but-still-valid-elsewhere token might never do.
-    3. A token with no live renewal timer. Threads do not survive fork, so a
-       worker that inherited a valid ACCESS_TOKEN from the preloaded master
-       (see the --preload flag in the Dockerfile) has no 50-minute renewal
-       running of its own - only the master does, and the master serves no
-       requests. Without this case the polling worker would coast on the
-       inherited token until it expired and a 401 forced a refresh; correct,
-       but reactive. Fetching once here re-establishes a live timer in the
-       process that actually polls, so renewals stay ahead of expiry.
-
-    Case 3 is self-limiting: fetch_oauth_token() starts a new timer on
-    success, so the very next cycle sees a live one and skips. If the fetch
-    fails it leaves no timer and no token, and the retry on the next cycle is
-    exactly what's wanted.
+        _notify_entity(event, "tailnet", "tailnet", title, body, cfg, _state.last_notified(event))
+    _state.set_health("global", {"tailnet": new_healthy})
+
+
+# How often the poll loop checks whether the shared OAuth token is due for
+# renewal. Renewal starts at healthcheck.OAUTH_RENEW_FRACTION of its
+# lifetime, so any value well under the remaining quarter is ahead of expiry.
+OAUTH_RENEW_CHECK_SECONDS = 15
+
+
+def _renew_oauth_token_if_due():
+    """Proactive OAuth renewal, run by the one process that polls.
+
+    The token is shared through SQLite (see healthcheck.get_oauth_access_token()),
+    so this is the single renewer for every worker: once the token passes its
+    renew_at it is replaced here, under the token lease, well before anything
+    sees it expire. Web workers only fetch themselves if nothing has renewed it
+    (and then still one at a time, via the lease).
     """
-    if not current_client_id or not dbstore.get_setting("oauth_client_secret"):
-        return False  # not an OAuth install; a static token needs no refresh
-    if not getattr(healthcheck, "ACCESS_TOKEN", None):
-        return True
-    if getattr(healthcheck, "ACCESS_TOKEN_CLIENT_ID", None) != current_client_id:
-        return True
-    renewal_timer = getattr(healthcheck, "TOKEN_RENEWAL_TIMER", None)
-    # is_alive() is False for a timer inherited across fork: CPython's
-    # threading._after_fork() marks every thread but the current one stopped.
-    return renewal_timer is None or not renewal_timer.is_alive()
+    if not (dbstore.get_setting("oauth_client_id") and dbstore.get_setting("oauth_client_secret")):
+        return  # not an OAuth install; a static token needs no renewal
+    import healthcheck  # deferred: avoids circular import at module load time
+    try:
+        healthcheck.get_oauth_access_token()
+    except Exception as e:  # pragma: no cover - defensive
+        logging.warning(f"OAuth token renewal failed: {e}")
+
+
+@contextmanager
+def _timed(phases: dict, name: str):
+    """Add the enclosed wall time to phases[name], in milliseconds."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + (time.monotonic() - start) * 1000
 
 
 def run_poll_cycle():
     """Fetch devices + tailnet keys from the Tailscale API and persist them.
 
-    Safe to call directly (e.g. from an admin-triggered "poll now" action)
-    regardless of whether this process holds the poller election lock.
+    Safe to call directly regardless of whether this process holds the
+    poller election lock, though manual refreshes now go through the
+    poll_jobs queue instead (see _poll_loop()). Returns {"ok", "error"} so
+    a queued job can report how the cycle that served it went.
     """
     cycle_start = time.monotonic()
     if not (dbstore.is_tailnet_configured() and dbstore.is_auth_configured()):
@@ -303,19 +723,36 @@ def run_poll_cycle():
         # single POLL_INTERVAL_SECONDS forever on a fresh/unconfigured
         # instance - not actionable, not interesting, just repeats the same
         # "not configured" fact the setup wizard is already showing.
-        return
+        return {"ok": False, "error": "Tailscale connection is not configured yet"}
+
+    open_until = dbstore.circuit_open_until()
+    if open_until is not None:
+        # Upstream is in its cool-off window (repeated 429/5xx/timeouts, or an
+        # explicit Retry-After). Don't touch the API or the snapshot: /health
+        # keeps serving the last good data with poll_meta.degraded set.
+        remaining = max(0, int(open_until - time.time()))
+        _record(
+            "poll_skipped", f"Poll cycle skipped: Tailscale API circuit breaker open for another {remaining}s.",
+            {"reason": "circuit_open", "retry_in_seconds": remaining},
+        )
+        return {"ok": False, "error": f"Tailscale API circuit breaker open; retrying upstream in {remaining}s"}
 
     _record("poll_started", "Poll cycle starting.")
     import healthcheck  # deferred: avoids circular import at module load time
 
-    current_client_id = dbstore.get_setting("oauth_client_id")
-    if _needs_oauth_refresh(healthcheck, current_client_id):
-        healthcheck.fetch_oauth_token()
+    # Process-wide counters, so what this cycle did is the difference
+    # between now and the end (see dbstore.record_poller_metrics()).
+    writes_before = dict(dbstore.WRITE_STATS)
+    retries_before = healthcheck.UPSTREAM_STATS["retries"]
+    # Wall time per step (ms), for poll_completed and the poll_cycle_timing
+    # history; whatever isn't covered by a phase is bookkeeping.
+    phases = {}
 
     tailnet_domain = dbstore.get_setting("tailnet_domain")
-    devices_url = f"https://api.tailscale.com/api/v2/tailnet/{tailnet_domain}/devices"
-    keys_url = f"https://api.tailscale.com/api/v2/tailnet/{tailnet_domain}/keys?all=true"
-    auth_header = healthcheck.build_auth_header()
+    devices_url = api_url(f"/api/v2/tailnet/{tailnet_domain}/devices")
+    keys_url = api_url(f"/api/v2/tailnet/{tailnet_domain}/keys?all=true")
+    with _timed(phases, "token"):
+        auth_header = healthcheck.build_auth_header()
 
     cycle_error = None
     cycle_auth_error = False
@@ -323,9 +760,10 @@ def run_poll_cycle():
 
     devices_count = None
     try:
-        devices_response = healthcheck.make_authenticated_request(devices_url, dict(auth_header))
-        devices = devices_response.json().get("devices") or []
-        dbstore.upsert_devices(devices)
+        with _timed(phases, "devices_fetch"):
+            devices = healthcheck.make_authenticated_request(devices_url, dict(auth_header)).json().get("devices") or []
+        with _timed(phases, "devices_upsert"):
+            dbstore.upsert_devices(devices)
         devices_count = len(devices)
         needs_signing_count = sum(1 for d in devices if d.get("tailnetLockError"))
         detail = {"devices_count": devices_count}
@@ -339,9 +777,10 @@ def run_poll_cycle():
 
     keys_count = None
     try:
-        keys_response = healthcheck.make_authenticated_request(keys_url, dict(auth_header))
-        keys = keys_response.json().get("keys") or []
-        dbstore.upsert_keys(keys, healthcheck._infer_key_type)
+        with _timed(phases, "keys_fetch"):
+            keys = healthcheck.make_authenticated_request(keys_url, dict(auth_header)).json().get("keys") or []
+        with _timed(phases, "keys_upsert"):
+            dbstore.upsert_keys(keys, healthcheck._infer_key_type)
         keys_count = len(keys)
         _record("keys_success", f"Fetched {keys_count} tailnet key(s).", {"keys_count": keys_count})
     except Exception as e:
@@ -354,54 +793,228 @@ def run_poll_cycle():
 
     notify_cfg = dbstore.get_settings_typed(notifier.NOTIFICATION_SETTINGS + ("tailnet_lock_enabled",))
     if cycle_auth_error and not was_auth_error:
-        _notify_entity(
-            "poll_auth_error", "poller", "poller", "Tailscale authentication failing",
-            f"The last poll cycle failed with an authentication error: {cycle_error}",
-            notify_cfg, dbstore.get_last_notified("poll_auth_error"),
-        )
+        with _timed(phases, "notify_auth"):
+            _notify_entity(
+                "poll_auth_error", "poller", "poller", "Tailscale authentication failing",
+                f"The last poll cycle failed with an authentication error: {cycle_error}",
+                notify_cfg, _state.last_notified("poll_auth_error"),
+            )
 
     try:
-        health_status, health_metrics = healthcheck._compute_health_summary(dbstore.get_devices_snapshot())
-        key_status, keys_metrics = healthcheck._compute_keys_summary(dbstore.get_keys_snapshot())
-        dbstore.record_metrics_snapshot(health_metrics, keys_metrics)
-        _process_device_notifications(notify_cfg, health_status)
-        _process_lock_notifications(notify_cfg, health_status)
-        _process_key_notifications(notify_cfg, key_status)
-        _process_global_notifications(notify_cfg, health_metrics)
+        with _timed(phases, "summary"):
+            health_status, health_metrics = healthcheck._compute_health_summary(dbstore.get_devices_snapshot())
+            key_status, keys_metrics = healthcheck._compute_keys_summary(dbstore.get_keys_snapshot())
+        with _timed(phases, "metrics_snapshot"):
+            dbstore.record_metrics_snapshot(health_metrics, keys_metrics)
+        with _timed(phases, "device_feed"):
+            dbstore.record_device_feed(health_status)
+        with _timed(phases, "notify_devices"):
+            _process_device_notifications(notify_cfg, health_status)
+        with _timed(phases, "notify_lock"):
+            _process_lock_notifications(notify_cfg, health_status)
+        with _timed(phases, "notify_keys"):
+            _process_key_notifications(notify_cfg, key_status)
+        with _timed(phases, "notify_global"):
+            _process_global_notifications(notify_cfg, health_metrics)
     except Exception as e:  # pragma: no cover - defensive, must never break the poll cycle
         logging.warning(f"Poll cycle: failed to record metrics snapshot / process notifications: {e}")
-    dbstore.purge_metrics_history()
+    try:
+        with _timed(phases, "notify_state_flush"):
+            _state.flush()
+    except Exception as e:  # pragma: no cover - defensive; the buffer is kept and retried next cycle
+        logging.warning(f"Poll cycle: failed to write notification state: {e}")
 
     now_iso = datetime.now(timezone.utc).isoformat()
     dbstore.set_poll_meta(now_iso)
-    dbstore.purge_audit_log()
-    dbstore.purge_poller_log()
-    dbstore.purge_notification_state()
-    dbstore.purge_login_rate_limit()
-    duration_ms = round((time.monotonic() - cycle_start) * 1000, 1)
+    with _timed(phases, "purge"):
+        dbstore.purge_metrics_history()
+        dbstore.purge_audit_log()
+        dbstore.purge_poller_log()
+        dbstore.purge_notification_state()
+        dbstore.purge_notification_outbox()
+        dbstore.purge_device_health_intervals()
+        dbstore.purge_device_feed()
+        dbstore.purge_login_rate_limit()
+        dbstore.purge_poll_jobs()
+    duration_seconds = time.monotonic() - cycle_start
+    duration_ms = round(duration_seconds * 1000, 1)
+    phases = {name: round(ms, 1) for name, ms in phases.items()}
+    try:
+        dbstore.record_poll_cycle_timing(duration_ms, phases)
+    except Exception as e:  # pragma: no cover - defensive, must never break the poll cycle
+        logging.warning(f"Poll cycle: failed to record phase timings: {e}")
+    try:
+        dbstore.record_poller_metrics({
+            "duration_seconds": round(duration_seconds, 4),
+            "ok": cycle_error is None,
+            "api_seconds": {
+                request: round(phases[f"{request}_fetch"] / 1000, 4)
+                for request in ("devices", "keys") if f"{request}_fetch" in phases
+            },
+            "retries": healthcheck.UPSTREAM_STATS["retries"] - retries_before,
+            "db_rows_written": dbstore.WRITE_STATS["rows"] - writes_before["rows"],
+            "db_transactions": dbstore.WRITE_STATS["transactions"] - writes_before["transactions"],
+        })
+    except Exception as e:  # pragma: no cover - defensive, must never break the poll cycle
+        logging.warning(f"Poll cycle: failed to record poller metrics: {e}")
     _record(
         "poll_completed", f"Poll cycle complete in {duration_ms}ms.",
-        {"duration_ms": duration_ms, "devices_count": devices_count, "keys_count": keys_count},
+        {"duration_ms": duration_ms, "devices_count": devices_count, "keys_count": keys_count, "phases_ms": phases},
     )
+    return {"ok": cycle_error is None, "error": cycle_error}
 
 
-def _scheduled_cycle():
-    global _timer
+def _run_cycle_safely(job_ids=()):
+    """Run one cycle, never raising, and settle any manual poll jobs it serves."""
     try:
-        run_poll_cycle()
+        outcome = run_poll_cycle() or {"ok": True, "error": None}
     except Exception as e:  # pragma: no cover - defensive
         logging.error(f"Unhandled error in scheduled poll cycle: {e}")
+        outcome = {"ok": False, "error": str(e)}
+    if job_ids:
+        try:
+            dbstore.finish_poll_jobs(job_ids, outcome["ok"], outcome["error"], dbstore.get_poll_meta())
+        except Exception as e:  # pragma: no cover - defensive
+            logging.error(f"Failed to record manual poll job outcome: {e}")
+
+
+# How often the poll loop checks poll_jobs for a queued manual refresh
+# between scheduled cycles - the worst-case extra latency of a Refresh click.
+# One indexed read per tick, in the one process that polls.
+JOB_CHECK_SECONDS = 1.0
+
+
+def _poll_loop(stop_event: threading.Event):
+    """The poll loop shared by both modes: a scheduled cycle every
+    poll_interval_seconds(), plus an immediate one whenever a manual refresh
+    is queued (which also restarts the interval - it was a full cycle)."""
+    next_cycle = 0.0  # run the first cycle straight away
+    next_oauth_check = 0.0
+    while not stop_event.is_set():
+        if time.monotonic() >= next_oauth_check:
+            _renew_oauth_token_if_due()
+            next_oauth_check = time.monotonic() + OAUTH_RENEW_CHECK_SECONDS
+        job_ids = []
+        try:
+            if dbstore.has_queued_poll_job():
+                job_ids = dbstore.claim_queued_poll_jobs()
+        except Exception as e:  # pragma: no cover - defensive, e.g. a locked DB
+            logging.warning(f"Poll loop: failed to check for manual poll jobs: {e}")
+        if job_ids or time.monotonic() >= next_cycle:
+            _run_cycle_safely(job_ids)
+            next_cycle = time.monotonic() + poll_interval_seconds()
+        stop_event.wait(max(0.0, min(JOB_CHECK_SECONDS, next_cycle - time.monotonic())))
+
+
+# Upper bound on a long-poll (?wait=) for a manual poll job. Each waiter
+# holds a request thread the whole time, so the wait is kept short and a
+# worker lets only POLL_JOB_MAX_WAITERS requests wait at once; the rest get
+# the job's current state straight away and ask again.
+POLL_JOB_MAX_WAIT_SECONDS = 10
+POLL_JOB_MAX_WAITERS = 2
+_POLL_JOB_WAIT_STEP_SECONDS = 0.25
+_poll_job_waiters = threading.BoundedSemaphore(POLL_JOB_MAX_WAITERS)
+
+
+def wait_for_poll_job(job_id: str, timeout: float = 0):
+    """Return (job, waited): the poll job, after waiting up to `timeout`
+    seconds for it to finish, and whether this request got to wait at all
+    (False when the worker's waiter slots were taken; the job is then
+    returned as it stands).
+
+    Only ever reads SQLite - the web worker serving a long-poll never does
+    upstream I/O, it just re-reads the job row until the poller process
+    settles it or the wait runs out (then the still-running job is returned
+    and the client decides whether to ask again).
+    """
+    timeout = max(0.0, min(float(timeout or 0), POLL_JOB_MAX_WAIT_SECONDS))
+    job = dbstore.get_poll_job(job_id)
+    if timeout <= 0 or job is None or job["status"] not in ("queued", "running"):
+        return job, True
+    if not _poll_job_waiters.acquire(blocking=False):
+        return job, False
+    try:
+        deadline = time.monotonic() + timeout
+        while job is not None and job["status"] in ("queued", "running") and time.monotonic() < deadline:
+            time.sleep(_POLL_JOB_WAIT_STEP_SECONDS)
+            job = dbstore.get_poll_job(job_id)
+        return job, True
     finally:
-        _timer = threading.Timer(poll_interval_seconds(), _scheduled_cycle)
-        _timer.daemon = True
-        _timer.start()
+        _poll_job_waiters.release()
 
 
 def start():
-    """Start the background poller in this process, if it wins the election."""
+    """Start the background poller in this process, if it wins the election.
+
+    The loop runs on a daemon thread so this returns immediately - post_fork
+    must not block a worker's boot on a first cycle's upstream round trip.
+    """
+    global _loop_thread
     if not _acquire_poller_lock():
         logging.info("Poller lock held by another worker process; not starting poller here.")
         return False
     logging.info("Poller lock acquired; starting background poll loop.")
-    _scheduled_cycle()
+    stop_event = threading.Event()
+    _start_dispatcher(stop_event)
+    _loop_thread = threading.Thread(target=_poll_loop, args=(stop_event,), name="poller", daemon=True)
+    _loop_thread.start()
     return True
+
+
+# How often a dedicated poller process that lost the election re-checks the
+# lock - it is a hot standby for whichever process currently holds it.
+STANDBY_RETRY_SECONDS = 5
+
+
+def run_forever(stop_event: threading.Event = None):
+    """Run the poll loop in the foreground of a dedicated process.
+
+    This is the POLLER_MODE=process/external entry point (`python -m
+    poller`). Same fcntl election as start(), so a second copy - or a stale
+    web worker still in "worker" mode during a rolling config change - can
+    never double-poll; it just waits as a standby until the lock frees up.
+
+    Stopping (SIGTERM/SIGINT, or `stop_event` in tests) is only honoured
+    between cycles: a cycle that has started always finishes, so shutdown
+    never leaves a half-written snapshot the way killing a recycled web
+    worker mid-cycle could.
+    """
+    stop_event = stop_event or threading.Event()
+    while not _acquire_poller_lock():
+        logging.info(f"Poller lock held elsewhere; standing by (re-checking every {STANDBY_RETRY_SECONDS}s).")
+        if stop_event.wait(STANDBY_RETRY_SECONDS):
+            return
+    logging.info("Poller lock acquired; running dedicated poll loop.", extra={"event": "poller_process_started"})
+    _start_dispatcher(stop_event)
+    _poll_loop(stop_event)
+    # Let an in-flight delivery batch settle its rows; anything left is
+    # still in the outbox for the next poller to deliver.
+    _dispatch_wakeup.set()
+    _dispatch_thread.join(timeout=15)
+    _state.flush()  # anything still buffered
+    logging.info("Dedicated poll loop stopped.", extra={"event": "poller_process_stopped"})
+
+
+def main() -> int:
+    # Importing healthcheck runs the same bootstrap a web worker gets:
+    # logging config, dbstore.configure()/init_db()/sync_env_settings().
+    import healthcheck  # noqa: F401
+
+    stop_event = threading.Event()
+
+    def _stop(signum, _frame):
+        logging.info(f"Poller process received signal {signum}; stopping after the current cycle.")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    run_forever(stop_event)
+    return 0
+
+
+if __name__ == "__main__":
+    # Re-import under the canonical name: healthcheck.py does `import poller`,
+    # and running the loop from this __main__ copy would give the process two
+    # independent sets of module globals (lock handle, timer, mode).
+    import poller as _poller
+    sys.exit(_poller.main())
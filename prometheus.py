@@ -0,0 +1,264 @@
+"""Prometheus text exposition (format 0.0.4) for /metrics.
+
+Everything here is rendered from data the app already has: the health and
+key summaries /health and /keys are built from, the poll status, and the
+internals the poller records after each cycle (dbstore.record_poller_metrics()).
+render() is a pure function of those inputs; healthcheck.py caches its
+output per snapshot/settings generation, so a scrape between polls is a
+cache lookup rather than a pass over the device list.
+
+Per-device series are the only part that grows with the tailnet, so they
+are bounded by the metrics_* settings: which devices get series at all
+(all, unhealthy, none), which labels they carry besides `id`, and a cap on
+how many devices are exported - unhealthy devices first, with the number
+left out reported in tailscale_healthcheck_metrics_devices_dropped.
+
+Tailscale API calls are exported per endpoint from the all-time totals in
+dbstore.get_upstream_calls(): request, retry, token refresh and timeout
+counters, and latency and response size histograms whose bounds are exact
+upstreamstats bucket boundaries.
+"""
+from datetime import datetime
+
+import reqtiming
+import upstreamstats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "tailscale_healthcheck_"
+
+DEVICE_GAUGE_MODES = ("all", "unhealthy", "none")
+# Optional per-device labels and the /health field each one is read from.
+DEVICE_LABEL_FIELDS = {"device": "machineName", "hostname": "hostname", "os": "os", "tags": "tags"}
+
+# (check label, counter_* prefix, global_* flag) for the device counters.
+_DEVICE_CHECKS = (
+    ("overall", "counter_healthy", "global_healthy"),
+    ("online", "counter_healthy_online", "global_online_healthy"),
+    ("key", "counter_key_healthy", "global_key_healthy"),
+    ("update", "counter_update_healthy", "global_update_healthy"),
+    ("lock", "counter_lock_healthy", "global_lock_healthy"),
+)
+
+
+def parse_device_labels(raw) -> list:
+    """The configured metrics_device_labels, in DEVICE_LABEL_FIELDS order,
+    ignoring anything unknown."""
+    wanted = {part.strip().lower() for part in str(raw or "").split(",")}
+    return [name for name in DEVICE_LABEL_FIELDS if name in wanted]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, metric_type, help_text, samples):
+        """One metric family; `samples` is a list of (labels, value). Values
+        of None are skipped, and a family with no samples left is omitted."""
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        self.lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+        for labels, value in samples:
+            self.lines.append(f"{PREFIX}{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name, help_text, series):
+        """One histogram family; `series` is a list of (labels, [(le,
+        cumulative count)], count, sum)."""
+        if not series:
+            return
+        self.lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for labels, buckets, count, total in series:
+            for le, n in buckets:
+                self.lines.append(f"{PREFIX}{name}_bucket{_labels({**labels, 'le': _number(le)})} {n}")
+            self.lines.append(f"{PREFIX}{name}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+            self.lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {_number(total)}")
+            self.lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _select_devices(health_status, mode, max_devices):
+    """(devices to export, number dropped by the cap)."""
+    if mode == "none":
+        return [], 0
+    if mode == "unhealthy":
+        devices = [d for d in health_status if not d.get("healthy")]
+    else:
+        # Stable sort: unhealthy devices first, so the cap drops healthy ones.
+        devices = sorted(health_status, key=lambda d: bool(d.get("healthy")))
+    if max_devices and len(devices) > max_devices:
+        return devices[:max_devices], len(devices) - max_devices
+    return devices, 0
+
+
+def _device_labels(device, label_names):
+    labels = {"id": device.get("id")}
+    for name in label_names:
+        value = device.get(DEVICE_LABEL_FIELDS[name])
+        labels[name] = ",".join(value) if isinstance(value, list) else (value or "")
+    return labels
+
+
+def _epoch(iso_value):
+    if not iso_value:
+        return None
+    try:
+        return datetime.fromisoformat(iso_value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _render_upstream(out, upstream_calls):
+    endpoints = sorted(upstream_calls.items())
+
+    def counter(name, metric, help_text):
+        out.family(name, "counter", help_text, [
+            ({"endpoint": endpoint}, values.get((metric, ""), 0)) for endpoint, values in endpoints
+        ])
+
+    out.family("upstream_requests_total", "counter", "Tailscale API requests by endpoint and HTTP status (none: no response).", [
+        ({"endpoint": endpoint, "status": key}, n)
+        for endpoint, values in endpoints
+        for (metric, key), n in sorted(values.items())
+        if metric == "status"
+    ])
+    counter("upstream_retries_total", "retries", "Tailscale API request retries after a 429/5xx or connection error.")
+    counter("upstream_auth_refreshes_total", "auth_refreshes", "OAuth token refreshes triggered by a 401 from the Tailscale API.")
+    counter("upstream_timeouts_total", "timeouts", "Tailscale API requests that hit the HTTP timeout.")
+
+    def bucket_counts(values, metric):
+        return sum(n for (m, _), n in values.items() if m == metric)
+
+    out.histogram("upstream_request_duration_seconds", "Tailscale API request latency, per attempt.", [
+        (
+            {"endpoint": endpoint},
+            [(reqtiming.bucket_upper_ms(b) / 1000, n) for b, n in upstreamstats.cumulative(
+                values, "latency_bucket", upstreamstats.LATENCY_BOUND_BUCKETS)],
+            bucket_counts(values, "latency_bucket"),
+            values.get(("latency_sum_us", ""), 0) / 1e6,
+        )
+        for endpoint, values in endpoints
+    ])
+    out.histogram("upstream_response_size_bytes", "Tailscale API response body size.", [
+        (
+            {"endpoint": endpoint},
+            [(2 ** b, n) for b, n in upstreamstats.cumulative(values, "bytes_bucket", upstreamstats.BYTES_BOUND_BUCKETS)],
+            bucket_counts(values, "bytes_bucket"),
+            values.get(("bytes_sum", ""), 0),
+        )
+        for endpoint, values in endpoints
+    ])
+
+
+def render(health_status, health_metrics, keys_metrics, poll_meta, poller_metrics, device_options,
+           upstream_calls=None) -> str:
+    """Render the exposition text.
+
+    health_status/health_metrics and keys_metrics are what
+    _compute_health_summary() and _compute_keys_summary() return (keys
+    may be the "unavailable" metrics when the keys call failed),
+    poll_meta is _build_poll_meta(), poller_metrics is
+    dbstore.get_poller_metrics(), and device_options carries the
+    metrics_device_gauges / metrics_device_labels / metrics_max_devices
+    settings. upstream_calls is dbstore.get_upstream_calls() (all time).
+    """
+    out = _Writer()
+
+    out.family("devices", "gauge", "Devices by health check and outcome, as counted for /health.", [
+        ({"check": check, "healthy": outcome}, health_metrics.get(f"{prefix}_{outcome}"))
+        for check, prefix, _ in _DEVICE_CHECKS
+        for outcome in ("true", "false")
+    ])
+    out.family("global_healthy", "gauge", "Whether the tailnet passes each global health threshold (1/0).", [
+        ({"check": check}, health_metrics.get(flag)) for check, _, flag in _DEVICE_CHECKS
+    ])
+
+    if not keys_metrics.get("keys_error"):
+        out.family("keys", "gauge", "Tailnet API/auth keys by health, as counted for /keys.", [
+            ({"healthy": outcome}, keys_metrics.get(f"counter_key_healthy_{outcome}")) for outcome in ("true", "false")
+        ])
+        out.family("global_keys_healthy", "gauge", "Whether every tailnet key is outside the expiry warning window (1/0).", [
+            ({}, keys_metrics.get("global_keys_healthy")),
+        ])
+
+    mode = device_options.get("metrics_device_gauges")
+    mode = mode if mode in DEVICE_GAUGE_MODES else "all"
+    label_names = parse_device_labels(device_options.get("metrics_device_labels"))
+    devices, dropped = _select_devices(health_status, mode, max(0, int(device_options.get("metrics_max_devices") or 0)))
+    device_labels = [(_device_labels(d, label_names), d) for d in devices]
+    out.family("device_healthy", "gauge", "Per-device overall health (1/0).", [
+        (labels, d.get("healthy")) for labels, d in device_labels
+    ])
+    out.family("device_online", "gauge", "Per-device online check (1/0).", [
+        (labels, d.get("online_healthy")) for labels, d in device_labels
+    ])
+    out.family("device_key_days_to_expire", "gauge", "Whole days until the device's node key expires.", [
+        (labels, d.get("key_days_to_expire")) for labels, d in device_labels
+    ])
+    out.family("metrics_devices_dropped", "gauge", "Devices left out of the per-device series by metrics_max_devices.", [
+        ({}, dropped),
+    ])
+
+    out.family("last_poll_timestamp_seconds", "gauge", "Unix time the last poll cycle completed.", [
+        ({}, _epoch(poll_meta.get("last_polled_at"))),
+    ])
+    out.family("last_poll_ok", "gauge", "Whether the last poll cycle reached the Tailscale API without errors (1/0).", [
+        ({}, poll_meta.get("last_poll_ok")),
+    ])
+    out.family("circuit_open", "gauge", "Whether the Tailscale API circuit breaker is open and polling paused (1/0).", [
+        ({}, poll_meta.get("degraded")),
+    ])
+    out.family("poll_interval_seconds", "gauge", "Configured poll interval.", [
+        ({}, poll_meta.get("poll_interval_seconds")),
+    ])
+
+    last_cycle = poller_metrics.get("last_cycle") or {}
+    out.family("poll_cycles_total", "counter", "Poll cycles run.", [({}, poller_metrics.get("cycles_total"))])
+    out.family("poll_cycle_failures_total", "counter", "Poll cycles that ended with an API or storage error.", [
+        ({}, poller_metrics.get("cycle_failures_total")),
+    ])
+    out.family("poll_cycle_duration_seconds", "gauge", "Wall time of the last poll cycle.", [
+        ({}, last_cycle.get("duration_seconds")),
+    ])
+    api_help = "Time the last poll cycle spent on each Tailscale API request, retries included."
+    out.family("poll_api_request_duration_seconds", "gauge", api_help, [
+        ({"request": name}, seconds) for name, seconds in sorted((last_cycle.get("api_seconds") or {}).items())
+    ])
+    out.family("poll_api_retries_total", "counter", "Tailscale API request retries made by the poller.", [
+        ({}, poller_metrics.get("retries_total")),
+    ])
+    out.family("poll_db_rows_written", "gauge", "Database rows written during the last poll cycle.", [
+        ({}, last_cycle.get("db_rows_written")),
+    ])
+    out.family("poll_db_rows_written_total", "counter", "Database rows written during poll cycles.", [
+        ({}, poller_metrics.get("db_rows_written_total")),
+    ])
+    out.family("poll_db_transactions", "gauge", "Database write transactions during the last poll cycle.", [
+        ({}, last_cycle.get("db_transactions")),
+    ])
+    out.family("poll_db_transactions_total", "counter", "Database write transactions during poll cycles.", [
+        ({}, poller_metrics.get("db_transactions_total")),
+    ])
+    _render_upstream(out, upstream_calls or {})
+    return out.text()
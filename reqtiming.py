@@ -0,0 +1,167 @@
+"""Per-request phase timing (Server-Timing) and per-route latency histograms.
+
+Phases: code that is worth attributing wraps itself in phase(name) - the
+SQLite connection in dbstore, settings resolution, the health summaries,
+response encoding. While a request is being timed (begin() was called on
+its thread) each phase accumulates its *exclusive* time: a phase entered
+inside another pauses the outer one, so settings resolution doesn't also
+count the database reads it makes, and the phases add up to no more than
+the request. Outside a timed request (the poller, startup) phase() is a
+no-op costing one context variable lookup.
+
+Histograms: every finished request is counted into this process's
+histogram for its route, in log-spaced buckets (each ~19% wider than the
+last, from 0.1 ms to about two minutes), per UTC minute. drain_due()
+hands the accumulated counts over every FLUSH_SECONDS so the caller can
+add them to the shared store (dbstore.record_request_latency()), where
+every worker's counts meet; summarize() turns merged bucket counts back
+into percentiles. A percentile is reported as the upper bound of the
+bucket it falls in, so it is never understated and at most ~19% over.
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+
+FLUSH_SECONDS = 10.0
+
+_BUCKET_BASE_MS = 0.1
+_BUCKET_GROWTH = 2 ** 0.25
+_MAX_BUCKET = 80
+
+_current = contextvars.ContextVar("reqtiming", default=None)
+
+
+class _Timing:
+    __slots__ = ("started", "totals", "stack")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {}
+        self.stack = []  # [name, resumed_at] of the phases currently open
+
+
+def begin():
+    """Start timing the request on this thread (before_request)."""
+    _current.set(_Timing())
+
+
+def end():
+    """Stop timing; returns (total_ms, {phase: exclusive ms}), or None if
+    begin() wasn't called on this thread."""
+    timing = _current.get()
+    if timing is None:
+        return None
+    _current.set(None)
+    total_ms = (time.perf_counter() - timing.started) * 1000
+    return total_ms, {name: seconds * 1000 for name, seconds in timing.totals.items()}
+
+
+class phase:
+    """Context manager (or decorator) attributing the enclosed time to `name`."""
+    __slots__ = ("name", "_timing")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._timing = None
+
+    def __enter__(self):
+        timing = self._timing = _current.get()
+        if timing is not None:
+            now = time.perf_counter()
+            if timing.stack:
+                outer = timing.stack[-1]
+                timing.totals[outer[0]] = timing.totals.get(outer[0], 0.0) + now - outer[1]
+            timing.stack.append([self.name, now])
+        return self
+
+    def __exit__(self, *exc):
+        timing = self._timing
+        if timing is not None and timing.stack:
+            now = time.perf_counter()
+            name, resumed_at = timing.stack.pop()
+            timing.totals[name] = timing.totals.get(name, 0.0) + now - resumed_at
+            if timing.stack:
+                timing.stack[-1][1] = now
+        return False
+
+    def __call__(self, func):
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def server_timing_header(total_ms: float, phases: dict) -> str:
+    """Server-Timing value: each phase's exclusive time, then the total."""
+    parts = [f"{name};dur={ms:.2f}" for name, ms in sorted(phases.items(), key=lambda item: -item[1])]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+def bucket_for(ms: float) -> int:
+    if ms <= _BUCKET_BASE_MS:
+        return 0
+    return min(_MAX_BUCKET, math.ceil(math.log(ms / _BUCKET_BASE_MS, _BUCKET_GROWTH)))
+
+
+def bucket_upper_ms(bucket: int) -> float:
+    return _BUCKET_BASE_MS * _BUCKET_GROWTH ** bucket
+
+
+_lock = threading.Lock()
+_pending = {}  # (minute epoch, route) -> {bucket: count}
+_next_flush = time.monotonic() + FLUSH_SECONDS
+
+
+def record(route: str, ms: float):
+    minute = int(time.time() // 60) * 60
+    bucket = bucket_for(ms)
+    with _lock:
+        counts = _pending.setdefault((minute, route), {})
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+
+def drain_due(force: bool = False):
+    """The counts recorded since the last drain, as [(minute, route, bucket,
+    count)], once FLUSH_SECONDS have passed since then (or with force);
+    otherwise None. Only one caller gets each batch."""
+    global _next_flush, _pending
+    with _lock:
+        if not force and time.monotonic() < _next_flush:
+            return None
+        _next_flush = time.monotonic() + FLUSH_SECONDS
+        pending, _pending = _pending, {}
+    return [
+        (minute, route, bucket, count)
+        for (minute, route), counts in pending.items()
+        for bucket, count in counts.items()
+    ]
+
+
+def bucket_percentiles(counts: dict, upper) -> dict:
+    """p50/p95/p99/max from {bucket: count}, each as upper(bucket) of the
+    bucket the rank falls in; None when there are no counts."""
+    total = sum(counts.values())
+    ordered = sorted(counts.items())
+    result = {"p50": None, "p95": None, "p99": None}
+    for name, pct in (("p50", 50), ("p95", 95), ("p99", 99)):
+        rank = max(1, math.ceil(pct / 100 * total))
+        seen = 0
+        for bucket, count in ordered:
+            seen += count
+            if seen >= rank:
+                result[name] = upper(bucket)
+                break
+    result["max"] = upper(ordered[-1][0]) if ordered else None
+    return result
+
+
+def summarize(counts: dict) -> dict:
+    """count/p50/p95/p99/max (ms) from {bucket: count}."""
+    percentiles = bucket_percentiles(counts, lambda b: round(bucket_upper_ms(b), 2))
+    return {"count": sum(counts.values()), **{f"{name}_ms": value for name, value in percentiles.items()}}
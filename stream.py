@@ -0,0 +1,195 @@
+"""Server-Sent Events fan-out behind /health/stream.
+
+The poller may run in another worker or a separate process, so changes are
+picked up from SQLite rather than pushed in-process: one watcher thread per
+web worker reads dbstore.get_stream_state() every STREAM_CHECK_SECONDS and,
+when something moved, publishes events to every subscriber's queue. N open
+streams therefore cost one cheap query per second per worker, not N. The
+thread only runs while the worker has at least one subscriber.
+
+Events (the `data:` field is JSON):
+  - generation: the device feed generation or last poll changed; carries
+    {generation, last_polled_at}. Sent once on connect as well, so a
+    client can tell whether what it already holds is current.
+  - transition: one device changed healthy state (or was removed), as
+    {id, device, healthy, previous, generation}; healthy is null once a
+    device is removed.
+  - poller_log: new poller activity was recorded; {poller_log_id}.
+
+A stream holds a request thread for its whole life, which is why the
+Gunicorn config serves with threaded (gthread) workers. Each stream is also
+capped at STREAM_MAX_SECONDS, after which the browser's EventSource simply
+reconnects, and at STREAM_MAX_CLIENTS per worker, beyond which the endpoint
+answers 503 and clients fall back to polling. Under Gunicorn that cap is
+set from the worker's thread count (gunicorn_config.stream_max_clients,
+half the threads by default), so streams can never take every thread and
+leave probes and API calls queueing behind them.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+import dbstore
+
+STREAM_CHECK_SECONDS = 1.0
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 300
+# Per-worker cap. gunicorn_config.post_fork() replaces it with one derived
+# from the worker's threads; this value only applies outside Gunicorn.
+STREAM_MAX_CLIENTS = 200
+# Reconnect delay the browser is told to use after a stream ends.
+STREAM_RETRY_MS = 5000
+# Per-subscriber backlog; a client that falls this far behind is dropped
+# (it reconnects and starts from a fresh `generation` event).
+STREAM_QUEUE_SIZE = 256
+
+
+def format_event(event: str, data: dict, event_id=None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class _Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._state = None
+        self._healthy = None  # device id -> (name, healthy), for transitions
+
+    def subscribe(self):
+        """A queue of pre-formatted events for one client, primed with the
+        current state - or None when this worker is at STREAM_MAX_CLIENTS."""
+        with self._lock:
+            if len(self._subscribers) >= STREAM_MAX_CLIENTS:
+                return None
+            state = self._state or dbstore.get_stream_state()
+            sub = queue.Queue(STREAM_QUEUE_SIZE)
+            sub.put_nowait(self._generation_event(state))
+            self._subscribers.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="health-stream", daemon=True)
+                self._thread.start()
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @staticmethod
+    def _generation_event(state: dict) -> str:
+        return format_event(
+            "generation",
+            {"generation": state["generation"], "last_polled_at": state["last_polled_at"]},
+            event_id=state["generation"],
+        )
+
+    def _publish(self, events: list):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                for event in events:
+                    sub.put_nowait(event)
+            except queue.Full:
+                # Drop the backlog and end the stream; the client reconnects.
+                self.unsubscribe(sub)
+                with sub.mutex:
+                    sub.queue.clear()
+                sub.put_nowait(None)
+
+    def _transitions(self, since: int) -> list:
+        """Transition events for the devices changed after `since`, diffed
+        against the healthy state this watcher last saw."""
+        changes = dbstore.get_device_changes(since if self._healthy is not None else 0)
+        current = {d["id"]: (d.get("device"), d.get("healthy")) for d in changes["changed"]}
+        if self._healthy is None:
+            self._healthy = current  # first read: nothing to compare against yet
+            return []
+        if changes["reset"]:
+            removed = [device_id for device_id in self._healthy if device_id not in current]
+        else:
+            removed = changes["removed"]
+        events = []
+        for device_id, (name, healthy) in current.items():
+            _, previous = self._healthy.get(device_id, (None, None))
+            self._healthy[device_id] = (name, healthy)
+            if previous != healthy:
+                events.append(self._transition_event(device_id, name, healthy, previous, changes["generation"]))
+        for device_id in removed:
+            name, previous = self._healthy.pop(device_id, (None, None))
+            events.append(self._transition_event(device_id, name, None, previous, changes["generation"]))
+        return events
+
+    @staticmethod
+    def _transition_event(device_id, name, healthy, previous, generation) -> str:
+        return format_event("transition", {
+            "id": device_id, "device": name, "healthy": healthy, "previous": previous, "generation": generation,
+        })
+
+    def _check(self):
+        state = dbstore.get_stream_state()
+        previous, self._state = self._state, state
+        if previous is None:
+            self._transitions(0)
+            return
+        events = []
+        if state["generation"] != previous["generation"]:
+            events += self._transitions(previous["generation"])
+        if (state["generation"], state["last_polled_at"]) != (previous["generation"], previous["last_polled_at"]):
+            events.append(self._generation_event(state))
+        if state["poller_log_id"] != previous["poller_log_id"]:
+            events.append(format_event("poller_log", {"poller_log_id": state["poller_log_id"]}))
+        if events:
+            self._publish(events)
+
+    def _watch(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Nobody is listening: stop, and forget the state so the
+                    # next subscriber starts from a fresh read, not a stale diff.
+                    self._thread = None
+                    self._state = None
+                    self._healthy = None
+                    return
+            try:
+                self._check()
+            except Exception as e:  # pragma: no cover - defensive; keep serving heartbeats
+                logging.warning(f"Health stream: failed to read state: {e}")
+            time.sleep(STREAM_CHECK_SECONDS)
+
+
+broadcaster = _Broadcaster()
+
+
+def iter_events(sub, max_seconds: float = STREAM_MAX_SECONDS):
+    """The response body for one subscriber: its queued events, a comment
+    line as heartbeat when idle (so proxies keep the connection open), and
+    the end of the stream after max_seconds."""
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = sub.get(timeout=min(STREAM_HEARTBEAT_SECONDS, remaining))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            yield event
+    finally:
+        broadcaster.unsubscribe(sub)
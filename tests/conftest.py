@@ -0,0 +1,16 @@
+import pytest
+
+
+def _parse_samples(text):
+    """{series: value} for every sample line of a Prometheus text exposition."""
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            out[series] = float(value)
+    return out
+
+
+@pytest.fixture
+def metric_samples():
+    return _parse_samples
@@ -313,7 +313,8 @@ def test_json_api_family_is_public(configured, monkeypatch):
     assert client.get("/health/unhealthy").status_code == 200
 
     resp = client.get("/health/cache/invalidate")
-    assert resp.status_code == 200
+    assert resp.status_code == 202
+    assert client.get(resp.get_json()["status_url"]).status_code == 200
 
     # The human dashboard is still gated behind login.
     assert client.get("/dashboard").status_code == 302
@@ -565,3 +566,34 @@ def test_audit_api_exposes_change_filters(configured):
     filters = client.get("/admin/api/audit/filters").get_json()
     assert "os" in filters["changed_fields"]
     assert "client_version" in filters["changed_fields"]
+
+
+def test_audit_api_pages_with_a_keyset_cursor(configured):
+    configured.dbstore.create_user("admin", "correct-horse-battery-staple")
+    # The rows straddle two day partitions, and the last two share a
+    # timestamp: the id tiebreak must neither skip nor repeat one.
+    stamps = ["2026-01-01T23:59:58", "2026-01-01T23:59:59", "2026-01-02T00:00:00",
+              "2026-01-02T00:00:01", "2026-01-02T00:00:01"]
+    with configured.dbstore.get_connection() as conn:
+        for i, stamp in enumerate(stamps):
+            configured.dbstore._add_audit(conn, "device", f"d{i}", "updated", {}, occurred_at=stamp + "+00:00")
+
+    client = configured.app.test_client()
+    client.post("/admin/api/login", json={"username": "admin", "password": "correct-horse-battery-staple"})
+
+    seen, cursor = [], None
+    while True:
+        body = client.get(
+            "/admin/api/audit?entity_type=device&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        ).get_json()
+        assert body["total"] == 5
+        seen += [e["entity_id"] for e in body["entries"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["d4", "d3", "d2", "d1", "d0"]
+
+    # offset paging still works for older clients.
+    body = client.get("/admin/api/audit?entity_type=device&limit=2&offset=2").get_json()
+    assert [e["entity_id"] for e in body["entries"]] == ["d2", "d1"]
+    assert client.get("/admin/api/audit?cursor=not-a-cursor").status_code == 400
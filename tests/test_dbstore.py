@@ -1,6 +1,8 @@
 import os
 import sys
 
+import pytest
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 
 import dbstore  # noqa: E402
@@ -14,7 +16,7 @@ def _fresh_db(tmp_path):
 def test_schema_creates_tables(tmp_path):
     _fresh_db(tmp_path)
     with dbstore.get_connection() as conn:
-        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
     assert {"settings", "users", "devices", "tailnet_keys", "audit_log", "user_recovery_codes"} <= tables
 
 
@@ -48,6 +50,38 @@ def test_init_db_migrates_pre_mfa_users_table(tmp_path):
     assert dbstore.get_user_mfa_status("legacy") == {"enabled": False}
 
 
+def test_migrations_run_once_and_are_recorded(tmp_path, monkeypatch):
+    _fresh_db(tmp_path)
+    with dbstore.get_connection() as conn:
+        versions = [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [v for v, _, _ in dbstore.SCHEMA_MIGRATIONS]
+
+    # A current database skips every step, not just the ones that are no-ops.
+    def must_not_run(conn):
+        raise AssertionError("migration re-run on a current database")
+
+    monkeypatch.setattr(
+        dbstore, "SCHEMA_MIGRATIONS", tuple((v, d, must_not_run) for v, d, _ in dbstore.SCHEMA_MIGRATIONS),
+    )
+    dbstore.init_db()
+
+
+def test_failed_baseline_migration_leaves_no_tables(tmp_path, monkeypatch):
+    def baseline_then_fail(conn):
+        dbstore._migrate_baseline(conn)
+        raise RuntimeError("simulated crash")
+
+    monkeypatch.setattr(dbstore, "SCHEMA_MIGRATIONS", ((1, "baseline schema", baseline_then_fail),))
+    monkeypatch.setattr(dbstore, "SCHEMA_VERSION", 1)
+    dbstore.configure(str(tmp_path / "healthcheck.db"))
+    with pytest.raises(RuntimeError):
+        dbstore.init_db()
+
+    with dbstore.get_connection() as conn:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "settings" not in tables
+
+
 def test_setting_env_overrides_and_persists_after_env_removed(tmp_path, monkeypatch):
     _fresh_db(tmp_path)
     monkeypatch.setenv("TAILNET_DOMAIN", "example.ts.net")
@@ -126,32 +160,43 @@ def test_login_rate_limit_blocks_after_threshold(tmp_path):
     assert dbstore.check_login_rate_limit("5.6.7.8") is True
 
 
-def test_manual_poll_claim_collapses_concurrent_callers(tmp_path):
+def test_poll_jobs_coalesce_while_one_is_pending(tmp_path):
     _fresh_db(tmp_path)
-    # First caller wins the claim...
-    assert dbstore.try_claim_manual_poll(ttl_seconds=10) is True
-    # ...every other caller within the TTL window loses it, so N concurrent
-    # /health/cache/invalidate requests only ever result in one real poll.
-    assert dbstore.try_claim_manual_poll(ttl_seconds=10) is False
-    assert dbstore.try_claim_manual_poll(ttl_seconds=10) is False
-
-
-def test_manual_poll_claim_expires(tmp_path):
+    job, created = dbstore.enqueue_poll_job(requested_by="a")
+    assert created is True and job["status"] == "queued"
+    # Every other caller while it is queued (or running) gets the same job,
+    # so N concurrent /health/cache/invalidate requests cost one real poll.
+    again, created_again = dbstore.enqueue_poll_job(requested_by="b")
+    assert created_again is False and again["id"] == job["id"]
+
+    assert dbstore.claim_queued_poll_jobs() == [job["id"]]
+    assert dbstore.enqueue_poll_job()[0]["id"] == job["id"]  # still running
+
+    dbstore.finish_poll_jobs([job["id"]], True, last_polled_at="2026-01-01T00:00:00+00:00")
+    done = dbstore.get_poll_job(job["id"])
+    assert done["status"] == "succeeded"
+    assert done["last_polled_at"] == "2026-01-01T00:00:00+00:00"
+    # Once settled, the next request queues a fresh job.
+    fresh, created_fresh = dbstore.enqueue_poll_job()
+    assert created_fresh is True and fresh["id"] != job["id"]
+
+
+def test_stale_poll_job_is_failed_instead_of_blocking_new_requests(tmp_path, monkeypatch):
     _fresh_db(tmp_path)
-    assert dbstore.try_claim_manual_poll(ttl_seconds=-1) is True  # already-expired claim
-    # A new claim attempt after the (already-past) TTL must succeed again.
-    assert dbstore.try_claim_manual_poll(ttl_seconds=10) is True
+    job, _ = dbstore.enqueue_poll_job()
+    dbstore.claim_queued_poll_jobs()
+    # A poller that died mid-cycle never settles its job; past the stale
+    # window it must not keep swallowing every later refresh request.
+    monkeypatch.setattr(dbstore, "POLL_JOB_STALE_SECONDS", -1)
+    fresh, created = dbstore.enqueue_poll_job()
+    assert created is True and fresh["id"] != job["id"]
+    assert dbstore.get_poll_job(job["id"])["status"] == "failed"
 
 
-def test_manual_poll_claim_release_lets_next_caller_in_immediately(tmp_path):
+def test_unknown_poll_job_is_none(tmp_path):
     _fresh_db(tmp_path)
-    assert dbstore.try_claim_manual_poll(ttl_seconds=300) is True
-    assert dbstore.try_claim_manual_poll(ttl_seconds=300) is False
-    dbstore.release_manual_poll_claim()
-    # A normal-completion release must not require waiting out the
-    # crash-recovery TTL - the whole point is the next caller isn't blocked
-    # for up to 300s just because the previous poll already finished.
-    assert dbstore.try_claim_manual_poll(ttl_seconds=300) is True
+    assert dbstore.get_poll_job("nope") is None
+    assert dbstore.has_queued_poll_job() is False
 
 
 def test_rate_limit_storage_url_is_a_secret_setting():
@@ -257,13 +302,15 @@ def test_device_removed_is_audited(tmp_path):
 def test_audit_purge_by_retention(tmp_path):
     _fresh_db(tmp_path)
     dbstore.upsert_devices([_device("d1")])
-    assert len(dbstore.list_audit_log()) == 1
-
-    # Backdate the audit row past the retention window, then purge.
     with dbstore.get_connection() as conn:
-        conn.execute("UPDATE audit_log SET occurred_at = '2000-01-01T00:00:00+00:00'")
+        dbstore._add_audit(conn, "device", "d0", "deleted", {}, occurred_at="2000-01-01T00:00:00+00:00")
+    assert len(dbstore.list_audit_log()) == 2
+
+    # The row past the retention window goes with its whole day partition.
     dbstore.purge_audit_log(retention_days=14)
-    assert dbstore.list_audit_log() == []
+    assert [e["entity_id"] for e in dbstore.list_audit_log()] == ["d1"]
+    with dbstore.get_connection() as conn:
+        assert "20000101" not in dbstore._list_partition_days(conn, "audit_log")
 
 
 def test_audit_log_filters(tmp_path):
@@ -472,7 +519,9 @@ def test_get_settings_meta_matches_per_setting_lookup(tmp_path, monkeypatch):
     assert batched["exclude_os"]["source"] is None
 
 
-def _seed_change_rows(tmp_path):
+def _seed_change_rows(tmp_path, backdated=()):
+    """Seed one row per change shape; entity ids in `backdated` are written
+    into a day well past any retention window."""
     dbstore.configure(str(tmp_path / "healthcheck.db"))
     dbstore.init_db()
     with dbstore.get_connection() as conn:
@@ -486,7 +535,8 @@ def _seed_change_rows(tmp_path):
             ("setting", "log_level", "updated", {"old": "INFO", "new": "DEBUG", "source": "db"}),
         ]
         for entity_type, entity_id, action, changes in rows:
-            dbstore._add_audit(conn, entity_type, entity_id, action, changes)
+            occurred_at = "2000-01-01T00:00:00+00:00" if entity_id in backdated else None
+            dbstore._add_audit(conn, entity_type, entity_id, action, changes, occurred_at=occurred_at)
 
 
 def test_audit_changed_field_filter(tmp_path):
@@ -518,6 +568,45 @@ def test_audit_changed_field_options_exclude_setting_wrappers(tmp_path):
     assert dbstore.list_audit_log_changed_fields("device") == ["client_version", "hostname", "os"]
 
 
+def test_audit_facets_follow_writes_and_purges(tmp_path):
+    _seed_change_rows(tmp_path, backdated=("d1",))
+    with dbstore.get_connection() as conn:
+        dbstore._add_audit(
+            conn, "device", "d4", "removed", {"name": "old-box", "os": "linux"}, actor="alice",
+            occurred_at="2000-01-01T00:00:00+00:00",
+        )
+
+    assert dbstore.list_audit_log_actors() == ["alice", "poller"]
+    entities = {e["entity_id"]: e["name"] for e in dbstore.list_audit_log_entity_ids("device")}
+    assert entities == {"d1": "d1", "d2": "d2", "d3": "d3", "d4": "old-box"}
+    with dbstore.get_connection() as conn:
+        os_count = conn.execute(
+            "SELECT count FROM audit_facets WHERE kind = 'field' AND entity_type = 'device' AND value = 'os'"
+        ).fetchone()[0]
+    assert os_count == 3
+
+    dbstore.purge_audit_log(retention_days=14)
+    # Facets only the purged rows carried disappear; shared ones are decremented.
+    assert dbstore.list_audit_log_actors() == ["poller"]
+    assert {e["entity_id"] for e in dbstore.list_audit_log_entity_ids()} == {"d2", "d3", "log_level"}
+    assert dbstore.list_audit_log_changed_fields() == ["client_version", "hostname", "os"]
+    with dbstore.get_connection() as conn:
+        counts = {r["value"]: r["count"] for r in conn.execute("SELECT value, count FROM audit_facets WHERE kind = 'field'")}
+    assert counts == {"client_version": 1, "hostname": 1, "os": 1}
+
+
+def test_audit_facets_are_backfilled_for_existing_databases(tmp_path):
+    _seed_change_rows(tmp_path)
+    # A database from before audit_facets: the table and its migration are missing.
+    with dbstore.get_connection() as conn:
+        conn.execute("DROP TABLE audit_facets")
+        conn.execute("DELETE FROM schema_version WHERE version >= 6")
+    dbstore.init_db()
+    assert dbstore.list_audit_log_changed_fields("device") == ["client_version", "hostname", "os"]
+    assert dbstore.list_audit_log_actors() == ["poller"]
+    assert len(dbstore.list_audit_log_entity_ids()) == 4
+
+
 def test_audit_changes_contains_search(tmp_path):
     """Free-text search covers values, not just field names - that's the point
     of it next to the changed-field select."""
@@ -540,6 +629,101 @@ def test_audit_changes_contains_escapes_like_wildcards(tmp_path):
     assert dbstore.count_audit_log(changes_contains="_") < total
 
 
+def test_audit_search_matches_word_prefixes_and_entity_names(tmp_path):
+    _seed_change_rows(tmp_path)
+    with dbstore.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO devices (device_id, name, raw_json, first_seen_at, last_polled_at) "
+            "VALUES ('d9', 'build-server.example.ts.net', '{}', 'x', 'x')"
+        )
+        dbstore._add_audit(
+            conn, "device", "d9", "updated", {"os": {"old": "linux", "new": "freebsd"}},
+            occurred_at="2000-01-01T00:00:00+00:00",
+        )
+
+    assert {r["entity_id"] for r in dbstore.list_audit_log(changes_contains="rev")} == {"d3"}
+    assert {r["entity_id"] for r in dbstore.list_audit_log(changes_contains="1.1")} == {"d2"}
+    # Every word must match; the entity name is searchable alongside the changes.
+    assert {r["entity_id"] for r in dbstore.list_audit_log(changes_contains="build-server free")} == {"d9"}
+    assert dbstore.count_audit_log(changes_contains="linux") == 3
+    assert dbstore.count_audit_log(changes_contains="linux", entity_id="d1") == 1
+
+    # A dropped partition takes its search index with it.
+    dbstore.purge_audit_log(retention_days=14)
+    with dbstore.get_connection() as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'audit_log_fts_20000101'").fetchone() is None
+    assert dbstore.count_audit_log(changes_contains="build") == 0
+    assert dbstore.count_audit_log(changes_contains="linux") == 2
+
+
+def test_unpartitioned_logs_are_split_into_day_partitions(tmp_path):
+    """An existing database has audit_log/poller_log as single tables: init_db()
+    moves their rows into day partitions, keeping ids, order and search."""
+    dbstore.configure(str(tmp_path / "healthcheck.db"))
+    with dbstore.get_connection() as conn:
+        conn.executescript(
+            """
+            CREATE TABLE audit_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, occurred_at TEXT NOT NULL, entity_type TEXT NOT NULL,
+                entity_id TEXT NOT NULL, action TEXT NOT NULL, changes TEXT NOT NULL, actor TEXT
+            );
+            CREATE TABLE poller_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, occurred_at TEXT NOT NULL, event_type TEXT NOT NULL,
+                message TEXT NOT NULL, detail TEXT
+            );
+            INSERT INTO audit_log (occurred_at, entity_type, entity_id, action, changes) VALUES
+                ('2026-03-01T10:00:00+00:00', 'device', 'd1', 'updated', '{"os": {"old": "linux", "new": "windows"}}'),
+                ('2026-03-02T10:00:00+00:00', 'setting', 'log_level', 'updated', '{"old": "INFO", "new": "DEBUG"}');
+            INSERT INTO poller_log (occurred_at, event_type, message) VALUES
+                ('2026-03-01T10:00:00+00:00', 'poll_started', 'first'),
+                ('2026-03-02T10:00:00+00:00', 'poll_started', 'second');
+            """
+        )
+    dbstore.init_db()
+
+    with dbstore.get_connection() as conn:
+        assert dbstore._list_partition_days(conn, "audit_log") == ["20260301", "20260302"]
+        assert dbstore._list_partition_days(conn, "poller_log") == ["20260301", "20260302"]
+    assert [e["id"] for e in dbstore.list_audit_log()] == [2, 1]
+    assert dbstore.count_audit_log(changes_contains="windows") == 1
+    assert dbstore.count_audit_log(changes_contains="debug", start="2026-03-02T00:00:00+00:00") == 1
+    assert dbstore.list_audit_log_changed_fields("device") == ["os"]
+    assert [e["message"] for e in dbstore.list_poller_log()] == ["second", "first"]
+
+    # New rows land in today's partition with ids above every migrated one.
+    dbstore.set_setting("log_level", "INFO")
+    assert dbstore.list_audit_log(limit=1)[0]["id"] > 2
+
+
+def test_new_day_partition_appears_only_with_its_id_seed(tmp_path):
+    """A writer that sees the new day's table must also see its id range,
+    or its row would get id 1 and break id order across partitions."""
+    _fresh_db(tmp_path)
+    with dbstore.get_connection() as conn:
+        table = dbstore._ensure_partition(conn, "poller_log", "20260401")
+        with dbstore.get_connection() as other:
+            # Not visible to anyone else until the seed commits with it.
+            assert not other.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    with dbstore.get_connection() as conn:
+        conn.execute(f"INSERT INTO {table} (occurred_at, event_type, message) VALUES ('2026-04-01T00:00:01+00:00', 'x', 'y')")
+        row_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+    day_number = (dbstore.datetime(2026, 4, 1).date() - dbstore._EPOCH_DATE).days
+    assert row_id == day_number * dbstore._PARTITION_ID_STRIDE + 1
+
+
+def test_log_retention_is_capped_below_the_view_term_limit(tmp_path, monkeypatch):
+    _fresh_db(tmp_path)
+    assert dbstore.validate_setting_value("audit_retention_days", "400") == "400"
+    for name in ("audit_retention_days", "poller_log_retention_days"):
+        try:
+            dbstore.validate_setting_value(name, "600")
+            assert False, "expected ValueError"
+        except ValueError as e:
+            assert "between 1 and 400" in str(e)
+    monkeypatch.setenv("POLLER_LOG_RETENTION_DAYS", "1000")
+    assert dbstore.get_poller_log_retention_days() == dbstore.LOG_RETENTION_MAX_DAYS
+
+
 def test_audit_change_filters_combine_with_the_others(tmp_path):
     """New filters must AND with the existing ones, and count must agree with
     the page it describes."""
@@ -552,3 +736,72 @@ def test_audit_change_filters_combine_with_the_others(tmp_path):
 
     rows = dbstore.list_audit_log(changed_field="os", changes_contains="linux")
     assert dbstore.count_audit_log(changed_field="os", changes_contains="linux") == len(rows)
+
+
+def test_device_health_history_uptime_over_observed_time(tmp_path):
+    from datetime import datetime, timedelta, timezone
+
+    _fresh_db(tmp_path)
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    at = lambda hours: (t0 + timedelta(hours=hours)).isoformat()  # noqa: E731
+    dbstore.apply_notification_state(interval_changes=[
+        ("d1", "online", True, at(0)),
+        ("d1", "online", False, at(6)),
+        ("d1", "online", True, at(9)),
+        ("d1", "online", None, at(12)),  # device disappeared
+    ])
+
+    history = dbstore.get_device_health_history("d1", t0 - timedelta(hours=12), t0 + timedelta(hours=24))
+    online = history["dimensions"]["online"]
+    # 9h healthy out of 12h observed; the unobserved hours don't count.
+    assert online["uptime_percent"] == 75.0
+    assert online["transitions"] == 2
+    assert [i["healthy"] for i in online["intervals"]] == [True, False, True]
+
+    clipped = dbstore.get_device_health_history("d1", t0 + timedelta(hours=3), t0 + timedelta(hours=7))
+    intervals = clipped["dimensions"]["online"]["intervals"]
+    assert intervals[0]["started_at"] == at(3)
+    assert intervals[-1]["ended_at"] == at(7)
+    assert clipped["dimensions"]["online"]["uptime_percent"] == 75.0
+    assert dbstore.get_device_health_history("other", t0, t0 + timedelta(hours=1))["dimensions"] == {}
+
+
+def test_device_feed_tombstone_purge_forces_a_resync_for_older_clients(tmp_path):
+    _fresh_db(tmp_path)
+    first = dbstore.record_device_feed([{"id": "d1", "healthy": True}, {"id": "d2", "healthy": True}])
+    removed_at = dbstore.record_device_feed([{"id": "d1", "healthy": True}])
+    with dbstore.get_connection() as conn:
+        conn.execute("UPDATE device_feed SET changed_at = '2000-01-01T00:00:00+00:00' WHERE payload IS NULL")
+    dbstore.purge_device_feed()
+
+    # The tombstone for d2 is gone, so "since first" can't say it was removed.
+    stale = dbstore.get_device_changes(first)
+    assert stale["reset"] is True
+    assert [d["id"] for d in stale["changed"]] == ["d1"]
+    assert dbstore.get_device_changes(removed_at) == {
+        "generation": removed_at, "reset": False, "changed": [], "removed": [],
+    }
+
+
+def test_poll_cycle_timing_summary_and_rolling_window(tmp_path, monkeypatch):
+    _fresh_db(tmp_path)
+    monkeypatch.setattr(dbstore, "POLL_CYCLE_TIMING_KEEP", 20)
+    for i in range(1, 26):
+        phases = {"devices_fetch": float(i), "purge": 1.0}
+        if i % 5 == 0:
+            phases["notify_auth"] = 100.0
+        dbstore.record_poll_cycle_timing(float(i) + 2.0, phases)
+
+    with dbstore.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM poll_cycle_timing").fetchone()[0] == 20
+
+    summary = dbstore.get_poll_cycle_timing_summary()
+    assert summary["cycles"] == 20
+    # The window is cycles 6..25.
+    assert summary["total"] == {"cycles": 20, "p50_ms": 17.0, "p95_ms": 26.0, "max_ms": 27.0}
+    by_phase = {p["phase"]: p for p in summary["phases"]}
+    assert by_phase["devices_fetch"]["p50_ms"] == 15.0
+    assert by_phase["devices_fetch"]["max_ms"] == 25.0
+    assert by_phase["notify_auth"]["cycles"] == 4
+    # Slowest phase (by p95) first.
+    assert [p["phase"] for p in summary["phases"]] == ["notify_auth", "devices_fetch", "purge"]
@@ -129,3 +129,103 @@ def test_post_fork_starts_the_poller(db):
     module.post_fork(server=None, worker=types.SimpleNamespace(pid=123))
 
     assert started == [True]
+
+
+def test_post_fork_skips_the_poller_in_dedicated_process_mode(db, monkeypatch):
+    """POLLER_MODE=process/external: web workers must be pure readers."""
+    module = _load_gunicorn_config(db)
+    monkeypatch.setattr(module.poller, "POLLER_MODE", "process")
+    started = []
+    monkeypatch.setattr(module.poller, "start", lambda: started.append(True))
+
+    module.post_fork(server=None, worker=types.SimpleNamespace(pid=123))
+
+    assert started == []
+
+
+class _FakeProcess:
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self.terminated = False
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.terminated = True
+        self.returncode = 0
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+def test_master_spawns_and_respawns_the_dedicated_poller(db, monkeypatch):
+    module = _load_gunicorn_config(db)
+    monkeypatch.setattr(module.poller, "POLLER_MODE", "process")
+    monkeypatch.setattr(module, "POLLER_RESPAWN_MIN_SECONDS", 0)
+    spawned = []
+
+    def fake_popen(cmd, cwd=None):
+        spawned.append(cmd)
+        return _FakeProcess(pid=1000 + len(spawned))
+
+    monkeypatch.setattr(module.subprocess, "Popen", fake_popen)
+
+    module.when_ready(server=None)
+    assert len(spawned) == 1
+    assert spawned[0][1:] == ["-m", "poller"]
+
+    # Still running: worker forks/exits don't spawn a second one.
+    module.pre_fork(server=None, worker=None)
+    module.child_exit(server=None, worker=None)
+    assert len(spawned) == 1
+
+    # Died: the next master hook brings it back.
+    module._poller_process.returncode = -9
+    module.child_exit(server=None, worker=None)
+    assert len(spawned) == 2
+
+    proc = module._poller_process
+    module.on_exit(server=None)
+    assert proc.terminated is True
+
+
+def test_master_never_spawns_a_poller_in_worker_mode(db, monkeypatch):
+    module = _load_gunicorn_config(db)
+    monkeypatch.setattr(module.poller, "POLLER_MODE", "worker")
+    monkeypatch.setattr(module.subprocess, "Popen", lambda *a, **k: (_ for _ in ()).throw(AssertionError("spawned")))
+
+    module.when_ready(server=None)
+    module.pre_fork(server=None, worker=None)
+
+
+def test_worker_class_and_threads_come_from_the_environment(db):
+    module = _load_gunicorn_config(db, GUNICORN_WORKER_CLASS="gthread", GUNICORN_THREADS="32")
+    assert (module.worker_class, module.threads) == ("gthread", 32)
+
+    # Gunicorn would silently turn sync + threads > 1 back into gthread.
+    module = _load_gunicorn_config(db, GUNICORN_WORKER_CLASS="sync", GUNICORN_THREADS="32")
+    assert (module.worker_class, module.threads) == ("sync", 1)
+
+
+def test_unsupported_worker_class_falls_back_to_gthread(db, caplog):
+    """gevent/eventlet would need monkey-patching the poller isn't written for."""
+    with caplog.at_level("WARNING"):
+        module = _load_gunicorn_config(db, GUNICORN_WORKER_CLASS="gevent")
+    assert module.worker_class == "gthread"
+    assert "not supported" in caplog.text
+
+
+def test_stream_cap_leaves_threads_for_other_requests(db, monkeypatch):
+    module = _load_gunicorn_config(db, GUNICORN_WORKER_CLASS="gthread", GUNICORN_THREADS="16")
+    assert module.stream_max_clients == 8
+    monkeypatch.setattr(module.poller, "POLLER_MODE", "external")
+    monkeypatch.setattr(module.stream, "STREAM_MAX_CLIENTS", 200)
+    module.post_fork(server=None, worker=None)
+    assert module.stream.STREAM_MAX_CLIENTS == 8
+
+    # An override can't take the last thread; a sync worker has none to spare.
+    assert _load_gunicorn_config(db, GUNICORN_THREADS="4", STREAM_MAX_CLIENTS="50").stream_max_clients == 3
+    assert _load_gunicorn_config(db, GUNICORN_THREADS="4", STREAM_MAX_CLIENTS="1").stream_max_clients == 1
+    assert _load_gunicorn_config(db, GUNICORN_WORKER_CLASS="sync").stream_max_clients == 0
@@ -205,3 +205,77 @@ def test_identifier_metrics_stay_scoped_to_the_single_device(tailnet):
     assert metrics["counter_healthy_true"] == 0
     assert metrics["counter_healthy_false"] == 1
     assert metrics["counter_healthy_online_false"] == 1
+
+
+def test_changes_feed_returns_only_what_changed_since_a_generation(tailnet):
+    client = tailnet.app.test_client()
+    devices = tailnet.fetch_devices()
+
+    def poll():
+        return tailnet.dbstore.record_device_feed(tailnet._compute_health_summary(devices)[0])
+
+    first = poll()
+    full = _json(client, "/health/changes")
+    assert full["reset"] is True and full["generation"] == first
+    assert {d["id"]: d["healthy"] for d in full["changed"]} == {
+        d["id"]: d["healthy"] for d in _json(client, "/health")["devices"]
+    }
+
+    # Nothing changed: the generation holds and the delta is empty.
+    assert poll() == first
+    same = _json(client, f"/health/changes?since={first}")
+    assert (same["generation"], same["reset"], same["changed"], same["removed"]) == (first, False, [], [])
+
+    devices[1] = _device("d2", "bravo", online=True)
+    second = poll()
+    delta = _json(client, f"/health/changes?since={first}")
+    assert [(d["id"], d["healthy"]) for d in delta["changed"]] == [("d2", True)]
+    assert delta["generation"] == second and delta["removed"] == []
+
+    del devices[0]
+    third = poll()
+    delta = _json(client, f"/health/changes?since={second}")
+    assert (delta["generation"], delta["changed"], delta["removed"]) == (third, [], ["d1"])
+    # A client two generations behind gets both changes in one response.
+    assert [d["id"] for d in _json(client, f"/health/changes?since={first}")["changed"]] == ["d2"]
+
+    assert client.get("/health/changes?since=latest").status_code == 400
+    assert _json(client, f"/health/changes?since={third + 5}")["reset"] is True
+
+
+def test_health_responses_are_reused_until_the_snapshot_or_settings_change(tmp_path):
+    m = _load_healthcheck(tmp_path / "healthcheck.db")
+    m.dbstore.upsert_devices([_device("d1", "alpha"), _device("d2", "bravo")])
+    computed = []
+    summarize = m._compute_health_summary
+
+    def counting_summary(devices):
+        computed.append(len(devices))
+        return summarize(devices)
+
+    m._compute_health_summary = counting_summary
+    client = m.app.test_client()
+
+    first = _json(client, "/health")
+    assert _json(client, "/health") == first
+    assert len(computed) == 1
+    # Each endpoint has its own entry.
+    _json(client, "/health/healthy")
+    _json(client, "/health/alpha")
+    _json(client, "/health/alpha")
+    assert len(computed) == 3
+
+    # A new snapshot is served at once, not after the TTL.
+    m.dbstore.upsert_devices([_device("d1", "alpha"), _device("d2", "bravo", online=False)])
+    assert [d["healthy"] for d in _json(client, "/health")["devices"]] == [True, False]
+    assert len(computed) == 4
+
+    # So is a settings change.
+    m.dbstore.set_setting("exclude_identifier", "bravo")
+    assert [d["id"] for d in _json(client, "/health")["devices"]] == ["d1"]
+    assert len(computed) == 5
+
+    m.dbstore.set_setting("health_cache_seconds", "0")
+    _json(client, "/health")
+    _json(client, "/health")
+    assert len(computed) == 7
@@ -0,0 +1,41 @@
+"""tools/http_loadtest.py against a real Gunicorn: monitoring clients keep
+being served while /health/stream connections hold threads open."""
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from tools.http_loadtest import run  # noqa: E402
+
+
+def test_threaded_workers_serve_probes_alongside_open_streams():
+    args = types.SimpleNamespace(
+        clients=10, duration=2.0, warmup=0.5, path="/health/healthy", streams=3, client_procs=1,
+        url=None, token=None, workers=2, worker_class="gthread", threads=8, devices=20, poll_interval=60,
+        max_p99_ms=None, json=False,
+    )
+    report = run(args)
+
+    assert report["requests"] > 0
+    assert report["errors"] == 0
+    assert report["latency_ms_p99"] > 0
+    # Two workers, yet all three streams stayed up and the probes still got through.
+    assert report["streams_connected_at_end"] == 3
+    assert report["stream_events"] >= 3
+
+
+def test_streams_beyond_the_thread_budget_are_refused_not_queued():
+    # More streams than the worker has threads: without a cap they would take
+    # every thread and the probes would time out behind them.
+    args = types.SimpleNamespace(
+        clients=4, duration=2.0, warmup=0.5, path="/health/healthy", streams=6, client_procs=1,
+        url=None, token=None, workers=1, worker_class="gthread", threads=4, devices=20, poll_interval=60,
+        max_p99_ms=None, json=False,
+    )
+    report = run(args)
+
+    assert report["requests"] > 0
+    assert report["errors"] == 0
+    assert report["streams_connected_at_end"] == 2
+    assert report["streams_rejected"] == 4
@@ -70,22 +70,11 @@ def test_fetch_oauth_token_uses_timeout(monkeypatch, tmp_path):
         calls["timeout"] = timeout
         return DummyResponse()
 
-    class NoopTimer:
-        def __init__(self, *_args, **_kwargs):
-            pass
-
-        def start(self):
-            return None
-
-        def cancel(self):
-            return None
-
-    monkeypatch.setattr(module, "Timer", NoopTimer)
     monkeypatch.setattr(module.requests, "post", fake_post)
 
-    module.fetch_oauth_token()
+    assert module.fetch_oauth_token() == "token123"
     assert calls.get("timeout") == module.get_http_timeout()
-    assert module.ACCESS_TOKEN == "token123"
+    assert module.dbstore.get_oauth_token("abc")["access_token"] == "token123"
 
 
 def test_poll_cycle_times_out_gracefully(monkeypatch, tmp_path):
@@ -0,0 +1,72 @@
+"""microcache.SingleFlightCache: concurrent callers share one computation,
+results live for their TTL, and failures are shared but never cached."""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import microcache  # noqa: E402
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = microcache.SingleFlightCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "body", 30
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(20)]
+    for t in threads:
+        t.start()
+    while cache.stats()["coalesced"] < 19:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert results == ["body"] * 20
+    # Later callers hit the stored result.
+    assert cache.get_or_compute("k", compute) == "body"
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "coalesced": 19}
+
+
+def test_ttl_zero_and_failures_are_not_cached():
+    cache = microcache.SingleFlightCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls), 0
+
+    assert cache.get_or_compute("k", compute) == 1
+    assert cache.get_or_compute("k", compute) == 2
+
+    def fail():
+        raise RuntimeError("database is locked")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("broken", fail)
+    assert cache.get_or_compute("broken", lambda: ("recovered", 30)) == "recovered"
+
+
+def test_expired_and_least_recently_used_entries_are_dropped():
+    cache = microcache.SingleFlightCache(max_entries=2)
+    cache.get_or_compute("a", lambda: ("a", 30))
+    cache.get_or_compute("short", lambda: ("short", 0.01))
+    time.sleep(0.02)
+    cache.get_or_compute("b", lambda: ("b", 30))  # evicts the expired entry, not "a"
+    cache.get_or_compute("a", lambda: ("recomputed", 30))
+    cache.get_or_compute("c", lambda: ("c", 30))  # over the cap: "b" was used least recently
+
+    assert cache.get_or_compute("a", lambda: ("recomputed", 30)) == "a"
+    assert cache.get_or_compute("b", lambda: ("b2", 30)) == "b2"
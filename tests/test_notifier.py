@@ -92,6 +92,13 @@ def test_notify_sends_to_stateless_apprise_endpoint(mock_post):
     )
 
 
+@patch("notifier.requests.post")
+def test_deliver_uses_configured_timeout(mock_post):
+    mock_post.return_value = Mock(status_code=200, raise_for_status=lambda: None)
+    assert notifier.deliver(_cfg(notification_timeout_seconds=3), "Title", "Body") == (True, None)
+    assert mock_post.call_args.kwargs["timeout"] == 3
+
+
 @patch("notifier.requests.post")
 def test_notify_sends_bearer_token_header_when_set(mock_post):
     mock_post.return_value = Mock(status_code=200, raise_for_status=lambda: None)
@@ -167,3 +174,20 @@ def test_notify_failure_reason_is_sanitized(mock_post):
 
     assert sent is False
     assert "s3cr3t" not in reason
+
+
+def test_digest_message_counts_and_truncates():
+    title, body = notifier.digest_message("device_unhealthy", [f"dev{i} is unhealthy" for i in range(5)], max_listed=3)
+    assert title == "5 devices became unhealthy"
+    assert body.splitlines() == ["- dev0 is unhealthy", "- dev1 is unhealthy", "- dev2 is unhealthy", "... and 2 more."]
+    assert notifier.digest_message("poll_auth_error", ["a", "b"])[0] == "2 'poll_auth_error' notifications"
+
+
+def test_overflow_message_counts_per_event_type():
+    entries = [{"event_type": "device_unhealthy", "title": f"dev{i} is unhealthy"} for i in range(3)]
+    entries.append({"event_type": "key_expiring", "title": "key expiring"})
+    title, body = notifier.overflow_message(entries, max_listed=2)
+    assert title == "4 notifications held back by the rate limit"
+    assert body.splitlines() == [
+        "3 x device_unhealthy", "1 x key_expiring", "", "- dev0 is unhealthy", "- dev1 is unhealthy", "... and 2 more.",
+    ]
@@ -0,0 +1,111 @@
+"""The OAuth access token shared across processes through SQLite: one fetch
+per token lifetime, renewal at a fraction of expires_in, and a lease so
+concurrent callers never fetch at the same time."""
+import importlib.util
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import dbstore  # noqa: E402
+
+
+def _load_healthcheck(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "healthcheck.db"))
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "NO")
+    monkeypatch.setenv("OAUTH_CLIENT_ID", "client-a")
+    monkeypatch.setenv("OAUTH_CLIENT_SECRET", "secret-a")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    spec = importlib.util.spec_from_file_location("healthcheck", os.path.join(root, "healthcheck.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _TokenResponse:
+    status_code = 200
+
+    def __init__(self, token, expires_in=3600):
+        self._payload = {"access_token": token, "expires_in": expires_in}
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+def _counting_post(module, monkeypatch, expires_in=3600):
+    posts = []
+
+    def fake_post(url, data=None, timeout=None):
+        posts.append(data["client_id"])
+        return _TokenResponse(f"token-{len(posts)}", expires_in)
+
+    monkeypatch.setattr(module.requests, "post", fake_post)
+    return posts
+
+
+def test_token_is_fetched_once_and_shared(monkeypatch, tmp_path):
+    module = _load_healthcheck(monkeypatch, tmp_path)
+    posts = _counting_post(module, monkeypatch, expires_in=1000)
+
+    assert module.get_oauth_access_token() == "token-1"
+    assert module.build_auth_header() == {"Authorization": "Bearer token-1"}
+    assert posts == ["client-a"]
+
+    row = dbstore.get_oauth_token("client-a")
+    # Renewal is scheduled from the server's expires_in, not a fixed interval.
+    assert abs((row["renew_at"] - row["fetched_at"]) - 1000 * module.OAUTH_RENEW_FRACTION) < 1
+    assert abs((row["expires_at"] - row["fetched_at"]) - 1000) < 1
+
+
+def test_token_due_for_renewal_is_renewed_by_the_lease_holder_only(monkeypatch, tmp_path):
+    module = _load_healthcheck(monkeypatch, tmp_path)
+    posts = _counting_post(module, monkeypatch)
+    dbstore.store_oauth_token("client-a", "old-token", expires_in=3600, renew_fraction=0)
+
+    # Another process holds the lease and is already renewing: keep serving
+    # the still-valid token instead of fetching a second one.
+    assert dbstore.acquire_oauth_lease("client-a", "other-process", 30) is True
+    assert module.get_oauth_access_token() == "old-token"
+    assert posts == []
+
+    dbstore.release_oauth_lease("client-a", "other-process")
+    assert module.get_oauth_access_token() == "token-1"
+    assert posts == ["client-a"]
+
+
+def test_rejected_token_is_replaced_once(monkeypatch, tmp_path):
+    module = _load_healthcheck(monkeypatch, tmp_path)
+    posts = _counting_post(module, monkeypatch)
+    dbstore.store_oauth_token("client-a", "revoked", expires_in=3600, renew_fraction=0.75)
+
+    assert module.get_oauth_access_token(rejected_token="revoked") == "token-1"
+    # A second worker that drew the same 401 picks up the replacement rather
+    # than fetching again.
+    assert module.get_oauth_access_token(rejected_token="revoked") == "token-1"
+    assert posts == ["client-a"]
+
+
+def test_replaced_client_id_gets_its_own_token(monkeypatch, tmp_path):
+    module = _load_healthcheck(monkeypatch, tmp_path)
+    posts = _counting_post(module, monkeypatch)
+    dbstore.store_oauth_token("client-a", "token-for-a", expires_in=3600, renew_fraction=0.75)
+
+    monkeypatch.setenv("OAUTH_CLIENT_ID", "client-b")
+    dbstore.sync_env_settings()
+    assert module.get_oauth_access_token() == "token-1"
+    assert posts == ["client-b"]
+    assert dbstore.get_oauth_token("client-a") is None
+
+
+def test_failed_fetch_releases_the_lease(monkeypatch, tmp_path):
+    module = _load_healthcheck(monkeypatch, tmp_path)
+
+    def failing_post(url, data=None, timeout=None):
+        raise module.requests.exceptions.ConnectionError("down")
+
+    monkeypatch.setattr(module.requests, "post", failing_post)
+    assert module.get_oauth_access_token() is None
+    assert dbstore.get_oauth_token("client-a")["lease_owner"] is None
@@ -1,6 +1,7 @@
 import os
 import sys
 import threading
+import time
 import types
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
@@ -34,6 +35,7 @@ def _fake_healthcheck_module(devices, keys):
         return FakeResponse({"devices": devices})
 
     fake.make_authenticated_request = fake_make_authenticated_request
+    fake.UPSTREAM_STATS = {"retries": 0}
     fake._infer_key_type = lambda key: key.get("keyType", "auth")
 
     # Minimal stand-ins for the real health/keys summary computation - just
@@ -117,73 +119,6 @@ def test_poll_cycle_skips_when_auth_unconfigured(tmp_path, monkeypatch):
     assert dbstore.list_poller_log() == []
 
 
-def _live_timer():
-    """A running Timer, standing in for the 50-minute renewal one a process
-    starts after successfully fetching a token. Long delay so it never fires
-    during a test; callers must cancel it."""
-    timer = threading.Timer(3600, lambda: None)
-    timer.daemon = True
-    timer.start()
-    return timer
-
-
-def test_oauth_token_refetched_when_client_id_changes(tmp_path, monkeypatch):
-    # A cached ACCESS_TOKEN for an OLD oauth_client_id must not silently
-    # keep being used after credentials are replaced via the settings UI -
-    # only comparing "is there a token at all" (not which client it's for)
-    # would miss this, since the stale token is still truthy.
-    _fresh_db(tmp_path, monkeypatch)
-    dbstore.set_setting("oauth_client_id", "new-client", source="db")
-    dbstore.set_setting("oauth_client_secret", "new-secret", source="db")
-
-    fake = _fake_healthcheck_module([], [])
-    fetch_calls = {"count": 0}
-
-    def fake_fetch_oauth_token():
-        fetch_calls["count"] += 1
-        fake.ACCESS_TOKEN = "new-token"
-        fake.ACCESS_TOKEN_CLIENT_ID = "new-client"
-
-    fake.fetch_oauth_token = fake_fetch_oauth_token
-    fake.ACCESS_TOKEN = "stale-token-from-old-client"
-    fake.ACCESS_TOKEN_CLIENT_ID = "old-client"
-
-    sys.modules["healthcheck"] = fake
-    try:
-        poller.run_poll_cycle()
-    finally:
-        sys.modules.pop("healthcheck", None)
-
-    assert fetch_calls["count"] == 1
-    assert fake.ACCESS_TOKEN_CLIENT_ID == "new-client"
-
-
-def test_oauth_token_not_refetched_when_client_id_unchanged(tmp_path, monkeypatch):
-    # The self-heal must not force a needless re-fetch every cycle once a
-    # valid, current token is already cached AND this process has a live
-    # renewal timer of its own (the steady state - see _live_timer).
-    _fresh_db(tmp_path, monkeypatch)
-    dbstore.set_setting("oauth_client_id", "same-client", source="db")
-    dbstore.set_setting("oauth_client_secret", "same-secret", source="db")
-
-    fake = _fake_healthcheck_module([], [])
-    fetch_calls = {"count": 0}
-    fake.fetch_oauth_token = lambda: fetch_calls.__setitem__("count", fetch_calls["count"] + 1)
-    fake.ACCESS_TOKEN = "current-token"
-    fake.ACCESS_TOKEN_CLIENT_ID = "same-client"
-    timer = _live_timer()
-    fake.TOKEN_RENEWAL_TIMER = timer
-
-    sys.modules["healthcheck"] = fake
-    try:
-        poller.run_poll_cycle()
-    finally:
-        sys.modules.pop("healthcheck", None)
-        timer.cancel()
-
-    assert fetch_calls["count"] == 0
-
-
 def test_is_auth_error_detects_401_403_only():
     resp_401 = types.SimpleNamespace(status_code=401)
     resp_500 = types.SimpleNamespace(status_code=500)
@@ -260,6 +195,70 @@ def test_poll_cycle_populates_and_audits_changes(tmp_path, monkeypatch):
     assert "name" in updated[0]["changes"]
 
 
+def test_poll_cycle_records_poller_metrics(tmp_path, monkeypatch):
+    """Each cycle leaves its duration, per-request API time, retries and
+    database writes behind for /metrics, with running totals."""
+    _fresh_db(tmp_path, monkeypatch)
+    device = {
+        "id": "d1", "name": "dev1.example.com", "hostname": "dev1", "os": "linux",
+        "clientVersion": "1.0", "updateAvailable": False, "connectedToControl": True,
+        "lastSeen": "2024-01-01T00:00:00Z", "keyExpiryDisabled": True, "expires": None,
+    }
+    fake = _fake_healthcheck_module([device], [])
+    request = fake.make_authenticated_request
+
+    def retrying_request(url, headers):
+        fake.UPSTREAM_STATS["retries"] += 1
+        return request(url, headers)
+
+    fake.make_authenticated_request = retrying_request
+    sys.modules["healthcheck"] = fake
+    try:
+        poller.run_poll_cycle()
+        poller.run_poll_cycle()
+    finally:
+        sys.modules.pop("healthcheck", None)
+
+    metrics = dbstore.get_poller_metrics()
+    assert metrics["cycles_total"] == 2
+    assert metrics["cycle_failures_total"] == 0
+    assert metrics["retries_total"] == 4
+    last = metrics["last_cycle"]
+    assert last["ok"] is True
+    assert last["retries"] == 2
+    assert set(last["api_seconds"]) == {"devices", "keys"}
+    assert last["duration_seconds"] >= sum(last["api_seconds"].values())
+    assert last["db_transactions"] > 0 and last["db_rows_written"] >= last["db_transactions"]
+    assert metrics["db_rows_written_total"] > last["db_rows_written"]
+
+
+def test_poll_cycle_records_phase_timings(tmp_path, monkeypatch):
+    _fresh_db(tmp_path, monkeypatch)
+    device = {
+        "id": "d1", "name": "dev1.example.com", "hostname": "dev1", "os": "linux",
+        "clientVersion": "1.0", "updateAvailable": False, "connectedToControl": True,
+        "lastSeen": "2024-01-01T00:00:00Z", "keyExpiryDisabled": True, "expires": None,
+    }
+    sys.modules["healthcheck"] = _fake_healthcheck_module([device], [])
+    try:
+        poller.run_poll_cycle()
+    finally:
+        sys.modules.pop("healthcheck", None)
+
+    completed = dbstore.list_poller_log(event_type="poll_completed")[0]["detail"]
+    phases = completed["phases_ms"]
+    assert {
+        "token", "devices_fetch", "devices_upsert", "keys_fetch", "keys_upsert", "summary",
+        "metrics_snapshot", "device_feed", "notify_devices", "notify_global", "purge",
+    } <= set(phases)
+    assert sum(phases.values()) <= completed["duration_ms"] + 0.1 * len(phases)  # per-phase rounding
+
+    summary = dbstore.get_poll_cycle_timing_summary()
+    assert summary["cycles"] == 1
+    assert summary["total"]["max_ms"] == completed["duration_ms"]
+    assert {p["phase"] for p in summary["phases"]} == set(phases)
+
+
 def test_poll_cycle_removes_device_and_key_dropped_from_api_response(tmp_path, monkeypatch):
     """End-to-end (not just dbstore.upsert_*) check that a device/key no longer
     returned by the Tailscale API gets deleted from the DB, not left stale,
@@ -316,79 +315,122 @@ def test_poll_cycle_removes_device_and_key_dropped_from_api_response(tmp_path, m
     assert history[1]["counter_healthy_true"] == 0
 
 
-def test_oauth_token_refetched_when_renewal_timer_is_dead(tmp_path, monkeypatch):
-    """The post-fork case: a worker inherits a valid ACCESS_TOKEN from the
-    preloaded master but not the master's renewal thread (threads don't
-    survive fork). Without refetching here the polling worker would coast on
-    the inherited token until it expired and a 401 forced a refresh - correct,
-    but purely reactive. One fetch re-establishes a live timer in the process
-    that actually polls."""
+def test_poll_loop_renews_shared_oauth_token(tmp_path, monkeypatch):
+    """The poller is the proactive renewer: its loop asks for the shared
+    token (which renews it once due) on an OAuth install, and never touches
+    it with a static token."""
     _fresh_db(tmp_path, monkeypatch)
-    dbstore.set_setting("oauth_client_id", "same-client", source="db")
-    dbstore.set_setting("oauth_client_secret", "same-secret", source="db")
-
     fake = _fake_healthcheck_module([], [])
-    fetch_calls = {"count": 0}
-    timers = []
+    calls = []
+    fake.get_oauth_access_token = lambda: calls.append(True) or "t"
+    monkeypatch.setitem(sys.modules, "healthcheck", fake)
 
-    def fake_fetch_oauth_token():
-        fetch_calls["count"] += 1
-        # Mirrors the real fetch: a successful fetch starts a renewal timer.
-        timer = _live_timer()
-        timers.append(timer)
-        fake.TOKEN_RENEWAL_TIMER = timer
+    poller._renew_oauth_token_if_due()
+    assert calls == []
 
-    fake.fetch_oauth_token = fake_fetch_oauth_token
-    fake.ACCESS_TOKEN = "token-inherited-from-master"
-    fake.ACCESS_TOKEN_CLIENT_ID = "same-client"
-    fake.TOKEN_RENEWAL_TIMER = None  # no timer in this process
+    dbstore.set_setting("oauth_client_id", "c", source="db")
+    dbstore.set_setting("oauth_client_secret", "s", source="db")
+    poller._renew_oauth_token_if_due()
+    assert calls == [True]
 
+
+def test_poll_cycle_skips_upstream_while_circuit_is_open(tmp_path, monkeypatch):
+    _fresh_db(tmp_path, monkeypatch)
+    dbstore.record_upstream_failure("HTTP 503", threshold=1, cooldown_seconds=300)
+
+    calls = []
+    fake = _fake_healthcheck_module([], [])
+    fake.make_authenticated_request = lambda url, headers: calls.append(url)
     sys.modules["healthcheck"] = fake
     try:
         poller.run_poll_cycle()
-        assert fetch_calls["count"] == 1, "inherited token without a timer must trigger one fetch"
-        # Self-limiting: the timer the fetch started means the next cycle skips.
-        poller.run_poll_cycle()
-        poller.run_poll_cycle()
-        assert fetch_calls["count"] == 1, "must not refetch a token every cycle"
     finally:
         sys.modules.pop("healthcheck", None)
-        for t in timers:
-            t.cancel()
 
+    assert calls == []
+    assert dbstore.get_poll_meta() is None  # snapshot left untouched, not marked fresh
+    skipped = [e for e in dbstore.list_poller_log() if e["event_type"] == "poll_skipped"]
+    assert len(skipped) == 1
+    assert skipped[0]["detail"]["reason"] == "circuit_open"
+
+
+def test_run_forever_polls_until_stopped(tmp_path, monkeypatch):
+    """The dedicated-process loop (`python -m poller`): wins the election,
+    runs cycles, and exits cleanly between cycles once asked to stop."""
+    _fresh_db(tmp_path, monkeypatch)
+    monkeypatch.setattr(poller, "_have_lock", False)
+    monkeypatch.setattr(poller, "_lock_fh", None)
+    stop = threading.Event()
+    cycles = []
+
+    def fake_cycle():
+        cycles.append(True)
+        stop.set()
 
-def test_needs_oauth_refresh_cases():
-    """Unit coverage for the decision itself, without a whole poll cycle."""
-    def mod(token="t", client="c", timer=None):
-        m = types.SimpleNamespace(
-            ACCESS_TOKEN=token, ACCESS_TOKEN_CLIENT_ID=client, TOKEN_RENEWAL_TIMER=timer
-        )
-        return m
+    monkeypatch.setattr(poller, "run_poll_cycle", fake_cycle)
+    poller.run_forever(stop)
 
-    live = _live_timer()
+    assert cycles == [True]
+    assert poller._have_lock is True
+
+
+def test_run_forever_stands_by_while_another_process_holds_the_lock(tmp_path, monkeypatch):
+    _fresh_db(tmp_path, monkeypatch)
+    import fcntl
+    holder = open(poller._lock_path(), "w")
+    fcntl.flock(holder.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
     try:
-        # Steady state: token for the right client, live timer -> no refresh.
-        assert poller._needs_oauth_refresh(mod(timer=live), "c") is False
-        # No token yet.
-        assert poller._needs_oauth_refresh(mod(token=None, timer=live), "c") is True
-        # Token belongs to a replaced client id.
-        assert poller._needs_oauth_refresh(mod(client="old", timer=live), "c") is True
-        # Token present but no renewal timer in this process (post-fork).
-        assert poller._needs_oauth_refresh(mod(timer=None), "c") is True
-        # Not an OAuth install at all - a static token needs no refreshing.
-        assert poller._needs_oauth_refresh(mod(timer=None), None) is False
+        monkeypatch.setattr(poller, "_have_lock", False)
+        monkeypatch.setattr(poller, "_lock_fh", None)
+        monkeypatch.setattr(poller, "STANDBY_RETRY_SECONDS", 0.01)
+        monkeypatch.setattr(poller, "run_poll_cycle", lambda: (_ for _ in ()).throw(AssertionError("polled")))
+        stop = threading.Event()
+        threading.Timer(0.1, stop.set).start()
+        poller.run_forever(stop)
     finally:
-        live.cancel()
+        holder.close()
+    assert poller._have_lock is False
 
 
-def test_needs_oauth_refresh_treats_dead_timer_as_absent(tmp_path, monkeypatch):
-    """A cancelled/finished Timer object is not a live renewal - this is what
-    an inherited-across-fork timer looks like to the child process."""
+def test_poll_loop_serves_queued_manual_poll_jobs(tmp_path, monkeypatch):
+    """A manual refresh is only ever enqueued by the web tier; the poll loop
+    picks it up, runs one cycle for it and records the outcome on the job."""
     _fresh_db(tmp_path, monkeypatch)
-    dbstore.set_setting("oauth_client_id", "c", source="db")
-    dbstore.set_setting("oauth_client_secret", "s", source="db")
+    job, _ = dbstore.enqueue_poll_job(requested_by="test")
+    stop = threading.Event()
+
+    def fake_cycle():
+        stop.set()
+        return {"ok": False, "error": "upstream down"}
+
+    monkeypatch.setattr(poller, "run_poll_cycle", fake_cycle)
+    poller._poll_loop(stop)
 
-    dead = threading.Timer(3600, lambda: None)  # never started -> not alive
-    m = types.SimpleNamespace(ACCESS_TOKEN="t", ACCESS_TOKEN_CLIENT_ID="c", TOKEN_RENEWAL_TIMER=dead)
+    settled, _ = poller.wait_for_poll_job(job["id"])
+    assert settled["status"] == "failed"
+    assert settled["error"] == "upstream down"
+    assert settled["started_at"] and settled["finished_at"]
 
-    assert poller._needs_oauth_refresh(m, "c") is True
+
+def test_poll_job_long_polls_are_capped_per_worker(tmp_path, monkeypatch):
+    """Each long-poll holds a request thread; past the cap a caller gets the
+    job as it stands instead of another thread parked in a sleep loop."""
+    _fresh_db(tmp_path, monkeypatch)
+    job, _ = dbstore.enqueue_poll_job(requested_by="test")
+    monkeypatch.setattr(poller, "_POLL_JOB_WAIT_STEP_SECONDS", 0.01)
+    waiters = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(poller, "_poll_job_waiters", waiters)
+
+    started = time.monotonic()
+    pending, waited = poller.wait_for_poll_job(job["id"], timeout=0.1)
+    assert (pending["status"], waited) == ("queued", True)
+    assert time.monotonic() - started >= 0.1
+
+    waiters.acquire()  # another request is already waiting
+    started = time.monotonic()
+    pending, waited = poller.wait_for_poll_job(job["id"], timeout=5)
+    assert (pending["status"], waited) == ("queued", False)
+    assert time.monotonic() - started < 1
+    waiters.release()
+    # Asking without a wait never needs a slot.
+    assert poller.wait_for_poll_job(job["id"])[1] is True
@@ -1,15 +1,18 @@
-"""Coverage for poller.py's health-transition -> notifier.notify() wiring.
-Exercises the _process_*_notifications() helpers directly against a real
-dbstore (so entity_health_state persistence is real), with notifier.notify
-mocked out - never hits a real Apprise instance."""
+"""Coverage for poller.py's health-transition -> notification_outbox wiring
+and the dispatcher that delivers it. Exercises the _process_*_notifications()
+helpers directly against a real dbstore (so entity_health_state and the
+outbox are real), with notifier._send mocked out - never hits a real Apprise
+instance."""
 import os
 import sys
+import time
 from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 
 import dbstore  # noqa: E402
+import notifier  # noqa: E402
 import poller  # noqa: E402
 
 CFG = {
@@ -31,6 +34,18 @@ def _fresh_db(tmp_path):
     dbstore.init_db()
 
 
+def _queued():
+    """Event types queued in notification_outbox, oldest first (after the
+    write-behind buffer a poll cycle would flush)."""
+    poller._state.flush()
+    return [row["event_type"] for row in reversed(dbstore.list_notification_outbox())]
+
+
+def _health_state(entity_type):
+    poller._state.flush()
+    return dbstore.get_health_state(entity_type)
+
+
 def _device(device_id="d1", healthy=True, tailnet_lock_error="", tags=None):
     return {
         "id": device_id, "machineName": "mydevice", "device": "mydevice.example.ts.net",
@@ -38,106 +53,94 @@ def _device(device_id="d1", healthy=True, tailnet_lock_error="", tags=None):
     }
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_device_first_seen_never_notifies(mock_notify, tmp_path):
+def test_device_first_seen_never_notifies(tmp_path):
     _fresh_db(tmp_path)
     poller._process_device_notifications(CFG, [_device(healthy=False)])
-    mock_notify.assert_not_called()
-    assert dbstore.get_health_state("device") == {"d1": False}
+    assert _queued() == []
+    assert _health_state("device") == {"d1": False}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_device_transition_to_unhealthy_notifies(mock_notify, tmp_path):
+def test_device_transition_to_unhealthy_notifies(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device", "d1", True)
     poller._process_device_notifications(CFG, [_device(healthy=False)])
-    assert mock_notify.call_count == 1
-    assert mock_notify.call_args[0][0] == "device_unhealthy"
-    assert dbstore.get_health_state("device") == {"d1": False}
+    assert len(_queued()) == 1
+    assert _queued()[-1] == "device_unhealthy"
+    assert _health_state("device") == {"d1": False}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_device_transition_to_healthy_notifies(mock_notify, tmp_path):
+def test_device_transition_to_healthy_notifies(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device", "d1", False)
     poller._process_device_notifications(CFG, [_device(healthy=True)])
-    assert mock_notify.call_args[0][0] == "device_healthy_again"
+    assert _queued()[-1] == "device_healthy_again"
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_device_no_transition_does_not_notify(mock_notify, tmp_path):
+def test_device_no_transition_does_not_notify(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device", "d1", True)
     poller._process_device_notifications(CFG, [_device(healthy=True)])
-    mock_notify.assert_not_called()
+    assert _queued() == []
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_device_removed_prunes_state(mock_notify, tmp_path):
+def test_device_removed_prunes_state(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device", "gone", True)
     poller._process_device_notifications(CFG, [_device(healthy=True)])
-    assert dbstore.get_health_state("device") == {"d1": True}
+    assert _health_state("device") == {"d1": True}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_lock_notifications_skipped_when_tailnet_lock_disabled(mock_notify, tmp_path):
+def test_lock_notifications_skipped_when_tailnet_lock_disabled(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device_lock", "d1", True)
     cfg = dict(CFG, tailnet_lock_enabled=False)
     poller._process_lock_notifications(cfg, [_device(tailnet_lock_error="needs signature")])
-    mock_notify.assert_not_called()
+    assert _queued() == []
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_lock_notification_on_needs_signing_transition(mock_notify, tmp_path):
+def test_lock_notification_on_needs_signing_transition(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device_lock", "d1", True)
     poller._process_lock_notifications(CFG, [_device(tailnet_lock_error="needs signature")])
-    assert mock_notify.call_args[0][0] == "device_needs_signing"
-    assert dbstore.get_health_state("device_lock") == {"d1": False}
+    assert _queued()[-1] == "device_needs_signing"
+    assert _health_state("device_lock") == {"d1": False}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_lock_notification_on_signed_transition(mock_notify, tmp_path):
+def test_lock_notification_on_signed_transition(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("device_lock", "d1", False)
     poller._process_lock_notifications(CFG, [_device(tailnet_lock_error="")])
-    assert mock_notify.call_args[0][0] == "device_signed"
+    assert _queued()[-1] == "device_signed"
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_key_expiring_fires_only_on_healthy_to_unhealthy_transition(mock_notify, tmp_path):
+def test_key_expiring_fires_only_on_healthy_to_unhealthy_transition(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("key", "k1", True)
     poller._process_key_notifications(CFG, [{"id": "k1", "key_healthy": False, "description": "prod key", "key_days_to_expire": 3}])
-    assert mock_notify.call_args[0][0] == "key_expiring"
+    assert _queued()[-1] == "key_expiring"
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_key_no_healthy_again_event_exists(mock_notify, tmp_path):
+def test_key_no_healthy_again_event_exists(tmp_path):
     """There's deliberately no 'key healthy again' notification event -
     a key transitioning back to healthy must stay silent."""
     _fresh_db(tmp_path)
     dbstore.set_health_state("key", "k1", False)
     poller._process_key_notifications(CFG, [{"id": "k1", "key_healthy": True, "description": "prod key"}])
-    mock_notify.assert_not_called()
+    assert _queued() == []
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_global_health_transition_notifies(mock_notify, tmp_path):
+def test_global_health_transition_notifies(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("global", "tailnet", True)
     poller._process_global_notifications(CFG, {"global_healthy": False, "counter_healthy_false": 2})
-    assert mock_notify.call_args[0][0] == "global_unhealthy"
+    assert _queued()[-1] == "global_unhealthy"
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_global_health_no_transition_is_silent(mock_notify, tmp_path):
+def test_global_health_no_transition_is_silent(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_health_state("global", "tailnet", True)
     poller._process_global_notifications(CFG, {"global_healthy": True, "counter_healthy_false": 0})
-    mock_notify.assert_not_called()
+    assert _queued() == []
 
 
 def test_record_notification_logs_only_real_failures(tmp_path):
@@ -158,12 +161,17 @@ def test_record_notification_logs_only_real_failures(tmp_path):
 # notification_cooldown_minutes
 # ---------------------------------------------------------------------------
 
+def _configure_apprise():
+    """The dispatcher reads the saved settings (not CFG), like production."""
+    for name in ("apprise_api_url", "apprise_notification_urls", "notification_events"):
+        dbstore.set_setting(name, CFG[name], source="db")
+
+
 def _cfg_with_cooldown(minutes):
     return {**CFG, "notification_cooldown_minutes": minutes}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_cooldown_disabled_by_default_notifies_every_transition(mock_notify, tmp_path):
+def test_cooldown_disabled_by_default_notifies_every_transition(tmp_path):
     """0 (the default) must preserve the previous behaviour exactly - every
     transition notifies, and no cooldown rows are written."""
     _fresh_db(tmp_path)
@@ -171,12 +179,12 @@ def test_cooldown_disabled_by_default_notifies_every_transition(mock_notify, tmp
         poller._process_device_notifications(CFG, [_device(healthy=healthy)])
 
     # First cycle establishes state without notifying; the next three flip.
-    assert mock_notify.call_count == 3
+    assert len(_queued()) == 3
     assert dbstore.get_last_notified("device_unhealthy") == {}
+    assert poller._state.last_notified("device_unhealthy") == {}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_cooldown_suppresses_a_flapping_device(mock_notify, tmp_path):
+def test_cooldown_suppresses_a_flapping_device(tmp_path):
     """A device crossing the healthy line repeatedly inside the window should
     alert once per event type, not once per flap."""
     _fresh_db(tmp_path)
@@ -186,12 +194,11 @@ def test_cooldown_suppresses_a_flapping_device(mock_notify, tmp_path):
     for healthy in (False, True, False, True, False):
         poller._process_device_notifications(cfg, [_device(healthy=healthy)])
 
-    events = [call.args[0] for call in mock_notify.call_args_list]
+    events = _queued()
     assert events == ["device_unhealthy", "device_healthy_again"], events
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_cooldown_is_scoped_per_device_and_event(mock_notify, tmp_path):
+def test_cooldown_is_scoped_per_device_and_event(tmp_path):
     """One device's cooldown must not silence a different device, and the
     healthy/unhealthy directions track their windows independently."""
     _fresh_db(tmp_path)
@@ -200,41 +207,72 @@ def test_cooldown_is_scoped_per_device_and_event(mock_notify, tmp_path):
     poller._process_device_notifications(cfg, [_device("d1", healthy=True), _device("d2", healthy=True)])
     poller._process_device_notifications(cfg, [_device("d1", healthy=False), _device("d2", healthy=False)])
 
-    assert mock_notify.call_count == 2
-    assert set(dbstore.get_last_notified("device_unhealthy")) == {"d1", "d2"}
-    assert dbstore.get_last_notified("device_healthy_again") == {}
+    assert _queued() == ["device_unhealthy", "device_unhealthy"]
+    assert {r["entity_id"] for r in dbstore.list_notification_outbox()} == {"d1", "d2"}
 
 
-@patch("poller.notifier.notify", return_value=(True, None))
-def test_cooldown_expires(mock_notify, tmp_path):
+@patch("poller.notifier._send")
+def test_cooldown_expires(mock_send, tmp_path):
     """Once the window has passed, the same event notifies again."""
     _fresh_db(tmp_path)
     cfg = _cfg_with_cooldown(60)
+    _configure_apprise()
+    dbstore.set_setting("notification_cooldown_minutes", "60", source="db")
 
     poller._process_device_notifications(cfg, [_device(healthy=True)])
     poller._process_device_notifications(cfg, [_device(healthy=False)])
-    assert mock_notify.call_count == 1
+    assert len(_queued()) == 1
+    poller.dispatch_notifications()  # delivery starts the window
+    assert set(poller._state.last_notified("device_unhealthy")) == {"d1"}
 
     # Backdate the recorded delivery past the window.
     stale = (datetime.now(timezone.utc) - timedelta(minutes=90)).isoformat()
-    dbstore.set_last_notified("device_unhealthy", "d1", stale)
+    poller._state.settled("device_unhealthy", ["d1"], stale)
 
     poller._process_device_notifications(cfg, [_device(healthy=True)])
     poller._process_device_notifications(cfg, [_device(healthy=False)])
-    assert mock_notify.call_count == 3  # healthy_again + a second unhealthy
+    assert len(_queued()) == 3  # healthy_again + a second unhealthy
 
 
-@patch("poller.notifier.notify", return_value=(False, "Exception: connection refused"))
-def test_failed_delivery_does_not_start_a_cooldown(mock_notify, tmp_path):
+@patch("poller.notifier._send")
+def test_cooldown_start_is_stored_with_the_delivery(mock_send, tmp_path, monkeypatch):
+    """A poller recycled between a delivery and its next cycle must still
+    find the cooldown, or the next poller sends the same alert again."""
+    _fresh_db(tmp_path)
+    cfg = _cfg_with_cooldown(60)
+    _configure_apprise()
+    dbstore.set_setting("notification_cooldown_minutes", "60", source="db")
+
+    poller._process_device_notifications(cfg, [_device(healthy=True)])
+    poller._process_device_notifications(cfg, [_device(healthy=False)])
+    poller._state.flush()
+    poller.dispatch_notifications()
+    # No flush after the delivery: the worker is gone.
+    assert set(dbstore.get_last_notified("device_unhealthy")) == {"d1"}
+
+    monkeypatch.setattr(poller, "_state", poller._NotificationState())
+    poller._process_device_notifications(cfg, [_device(healthy=True)])
+    poller._process_device_notifications(cfg, [_device(healthy=False)])
+    assert _queued() == ["device_unhealthy", "device_healthy_again"]
+
+
+@patch("poller.notifier._send", side_effect=Exception("connection refused"))
+def test_failed_delivery_does_not_start_a_cooldown(mock_send, tmp_path):
     """A cooldown must only start on an actual delivery - otherwise one failed
     send would silence the next hour of real alerts."""
     _fresh_db(tmp_path)
     cfg = _cfg_with_cooldown(60)
+    dbstore.set_setting("notification_max_attempts", "1", source="db")
+    _configure_apprise()
 
     poller._process_device_notifications(cfg, [_device(healthy=True)])
     poller._process_device_notifications(cfg, [_device(healthy=False)])
+    poller._state.flush()
+    poller.dispatch_notifications()
 
+    poller._state.flush()
     assert dbstore.get_last_notified("device_unhealthy") == {}
+    assert dbstore.list_notification_outbox()[0]["status"] == "dead"
 
 
 def test_in_cooldown_handles_missing_and_malformed_timestamps():
@@ -242,3 +280,241 @@ def test_in_cooldown_handles_missing_and_malformed_timestamps():
     assert poller._in_cooldown("not-a-timestamp", 60) is False
     # A naive timestamp is treated as UTC rather than crashing on the subtraction.
     assert poller._in_cooldown(datetime.now(timezone.utc).replace(tzinfo=None).isoformat(), 60) is True
+
+
+# ---------------------------------------------------------------------------
+# notification_outbox dispatcher
+# ---------------------------------------------------------------------------
+
+def test_poll_cycle_side_only_queues_notifications(tmp_path):
+    """Nothing is POSTed on the poll cycle's time, however many transitions."""
+    _fresh_db(tmp_path)
+    devices = [_device(f"d{i}", healthy=True) for i in range(50)]
+    poller._process_device_notifications(CFG, devices)
+    with patch("poller.notifier._send") as mock_send:
+        poller._process_device_notifications(CFG, [dict(d, healthy=False) for d in devices])
+        mock_send.assert_not_called()
+    assert len(_queued()) == 50
+    assert {r["status"] for r in dbstore.list_notification_outbox()} == {"pending"}
+
+
+def test_cycle_bookkeeping_is_written_in_one_transaction(tmp_path):
+    """Health states and queued notifications for the whole fleet are held in
+    memory and written by a single flush, not a query per device."""
+    _fresh_db(tmp_path)
+    devices = [_device(f"d{i}", healthy=True) for i in range(200)]
+    poller._process_device_notifications(CFG, devices)
+    poller._state.flush()
+
+    connections = []
+    original = dbstore.get_connection
+    with patch.object(dbstore, "get_connection", side_effect=lambda: connections.append(1) or original()):
+        poller._process_device_notifications(CFG, [dict(d, healthy=False) for d in devices])
+        poller._process_lock_notifications(CFG, devices)
+        assert connections == []
+        assert dbstore.get_health_state("device")["d0"] is True  # not written yet
+        connections.clear()
+        assert poller._state.flush() == 200
+        assert len(connections) == 1
+    assert set(_health_state("device").values()) == {False}
+    assert len(_queued()) == 200
+
+
+def test_skipped_events_are_never_queued(tmp_path):
+    _fresh_db(tmp_path)
+    dbstore.set_health_state("device", "d1", True)
+    poller._process_device_notifications(dict(CFG, notification_events="global_unhealthy"), [_device(healthy=False)])
+    assert _queued() == []
+
+
+@patch("poller.notifier._send")
+def test_dispatcher_delivers_and_marks_sent(mock_send, tmp_path):
+    _fresh_db(tmp_path)
+    _configure_apprise()
+    for i in range(10):
+        dbstore.enqueue_notification("device_unhealthy", f"d{i}", f"dev{i}", "Title", "Body")
+
+    assert poller.dispatch_notifications() == 10
+    assert mock_send.call_count == 10
+    assert {r["status"] for r in dbstore.list_notification_outbox()} == {"sent"}
+    assert poller.dispatch_notifications() == 0
+
+
+@patch("poller.notifier._send", side_effect=Exception("apprise down"))
+def test_dispatcher_retries_with_backoff_then_dead_letters(mock_send, tmp_path):
+    _fresh_db(tmp_path)
+    _configure_apprise()
+    dbstore.set_setting("notification_max_attempts", "2", source="db")
+    outbox_id = dbstore.enqueue_notification("global_unhealthy", "tailnet", "tailnet", "Title", "Body")
+
+    poller.dispatch_notifications()
+    row = dbstore.list_notification_outbox()[0]
+    assert row["status"] == "pending" and row["attempts"] == 1
+    assert row["next_attempt_at"] > time.time() + poller.NOTIFICATION_BACKOFF_BASE_SECONDS - 5
+    assert poller.dispatch_notifications() == 0  # not due yet
+
+    with dbstore.get_connection() as conn:
+        conn.execute("UPDATE notification_outbox SET next_attempt_at = 0 WHERE id = ?", (outbox_id,))
+    poller.dispatch_notifications()
+    row = dbstore.list_notification_outbox()[0]
+    assert row["status"] == "dead" and row["attempts"] == 2
+    assert "apprise down" in row["last_error"]
+    event_types = [e["event_type"] for e in dbstore.list_poller_log()]
+    assert event_types.count("notification_failed") == 3  # two attempts + the dead-letter
+
+
+@patch("poller.notifier._send")
+def test_notifications_claimed_by_a_dead_process_are_redelivered(mock_send, tmp_path):
+    """A row left 'sending' by a process that died mid-delivery comes due
+    again once its claim expires - queued alerts survive a restart."""
+    _fresh_db(tmp_path)
+    _configure_apprise()
+    dbstore.enqueue_notification("global_unhealthy", "tailnet", "tailnet", "Title", "Body")
+    assert len(dbstore.claim_due_notifications(10, claim_seconds=-1)) == 1  # claimed, then "crashed"
+
+    assert poller.dispatch_notifications() == 1
+    assert dbstore.list_notification_outbox()[0]["status"] == "sent"
+
+
+# ---------------------------------------------------------------------------
+# notification_digest
+# ---------------------------------------------------------------------------
+
+@patch("poller.notifier._send")
+def test_digest_sends_one_message_per_event_type(mock_send, tmp_path):
+    _fresh_db(tmp_path)
+    _configure_apprise()
+    dbstore.set_setting("notification_digest", "true", source="db")
+    dbstore.set_setting("notification_cooldown_minutes", "60", source="db")
+    cfg = dict(_cfg_with_cooldown(60), notification_digest=True)
+    devices = [_device(f"d{i}", healthy=True) for i in range(60)]
+    poller._process_device_notifications(cfg, devices)
+    poller._process_device_notifications(cfg, [dict(d, healthy=False) for d in devices])
+    poller._state.flush()
+    dbstore.enqueue_notification("global_unhealthy", "tailnet", "tailnet", "Tailnet is unhealthy", "60 unhealthy")
+
+    assert poller.dispatch_notifications() == 61
+    assert mock_send.call_count == 2
+    titles = sorted(call.args[1] for call in mock_send.call_args_list)
+    assert titles == ["60 devices became unhealthy", "Tailnet is unhealthy"]
+    digest_body = next(c.args[2] for c in mock_send.call_args_list if c.args[1].startswith("60"))
+    assert digest_body.count("\n- ") == notifier.DIGEST_MAX_LISTED - 1
+    assert digest_body.endswith("... and 35 more.")
+    assert {r["status"] for r in dbstore.list_notification_outbox()} == {"sent"}
+    # Per-entity cooldowns still start for every device the digest covered.
+    poller._state.flush()
+    assert len(dbstore.get_last_notified("device_unhealthy")) == 60
+
+
+@patch("poller.notifier._send")
+def test_digest_window_holds_notifications_until_it_closes(mock_send, tmp_path):
+    _fresh_db(tmp_path)
+    _configure_apprise()
+    dbstore.set_setting("notification_digest", "true", source="db")
+    first = dbstore.enqueue_notification("device_unhealthy", "d1", "dev1", "dev1 is unhealthy", "b", hold_seconds=300)
+    second = dbstore.enqueue_notification("device_unhealthy", "d2", "dev2", "dev2 is unhealthy", "b", hold_seconds=300)
+    rows = {r["id"]: r for r in dbstore.list_notification_outbox()}
+    # The second transition joins the window the first one opened.
+    assert rows[first]["next_attempt_at"] == rows[second]["next_attempt_at"]
+
+    assert poller.dispatch_notifications() == 0
+    with dbstore.get_connection() as conn:
+        conn.execute("UPDATE notification_outbox SET next_attempt_at = 0")
+    assert poller.dispatch_notifications() == 2
+    assert mock_send.call_count == 1
+    assert mock_send.call_args.args[1] == "2 devices became unhealthy"
+
+
+# ---------------------------------------------------------------------------
+# notification_rate_per_minute (global send budget)
+# ---------------------------------------------------------------------------
+
+@patch("poller.notifier._send")
+def test_send_budget_overflow_becomes_one_summary(mock_send, tmp_path, monkeypatch):
+    _fresh_db(tmp_path)
+    _configure_apprise()
+    monkeypatch.setattr(poller, "_send_budget", poller._TokenBucket())
+    monkeypatch.setattr(poller, "_next_overflow_summary_at", 0.0)
+    dbstore.set_setting("notification_rate_per_minute", "3", source="db")
+    for i in range(8):
+        dbstore.enqueue_notification("device_unhealthy", f"d{i}", f"dev{i}", f"dev{i} is unhealthy", "Body")
+    dbstore.enqueue_notification("key_expiring", "k1", "key", "key expiring", "Body")
+
+    assert poller.dispatch_notifications() == 9
+    # Three individual messages (the burst), then one summary for the rest.
+    assert mock_send.call_count == 4
+    assert mock_send.call_args.args[1] == "6 notifications held back by the rate limit"
+    assert {r["status"] for r in dbstore.list_notification_outbox()} == {"sent"}
+    suppressed = dbstore.list_poller_log(event_type="notification_suppressed")
+    assert len(suppressed) == 1
+    assert suppressed[0]["detail"]["total"] == 6
+    assert sum(suppressed[0]["detail"]["counts"].values()) == 6
+
+    # More overflow inside the summary interval waits for the next summary
+    # instead of producing a second one straight away.
+    for i in range(2):
+        dbstore.enqueue_notification("device_healthy_again", f"d{i}", f"dev{i}", "healthy", "Body")
+    poller.dispatch_notifications()
+    assert mock_send.call_count == 4
+    assert {r["status"] for r in dbstore.list_notification_outbox() if r["event_type"] == "device_healthy_again"} == {"pending"}
+    assert dbstore.next_notification_due_at() >= time.time() + poller.OVERFLOW_SUMMARY_INTERVAL_SECONDS - 5
+
+
+def test_token_bucket_refills_and_caps_at_burst(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(poller.time, "monotonic", lambda: clock[0])
+    bucket = poller._TokenBucket()
+    bucket.configure(60, 2)
+    assert [bucket.take() for _ in range(3)] == [True, True, False]
+    clock[0] += 1  # one token per second at 60/min
+    assert bucket.take() is True and bucket.take() is False
+    clock[0] += 3600
+    assert [bucket.take() for _ in range(3)] == [True, True, False]
+    bucket.configure(0, 0)
+    assert all(bucket.take() for _ in range(100))
+
+
+def test_device_health_timeline_grows_with_transitions_not_polls(tmp_path):
+    _fresh_db(tmp_path)
+    device = dict(_device(healthy=True), online_healthy=True, key_healthy=True)
+    for _ in range(5):
+        poller._process_device_notifications(CFG, [device])
+    poller._process_device_notifications(CFG, [dict(device, online_healthy=False, healthy=False)])
+    poller._process_device_notifications(CFG, [dict(device, online_healthy=False, healthy=False)])
+    poller._process_device_notifications(CFG, [])  # device removed
+    poller._state.flush()
+
+    with dbstore.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT dimension, healthy, ended_at FROM device_health_intervals ORDER BY dimension, id"
+        ).fetchall()
+    by_dimension = {}
+    for r in rows:
+        by_dimension.setdefault(r["dimension"], []).append(bool(r["healthy"]))
+    assert by_dimension == {"healthy": [True, False], "online": [True, False], "key": [True]}
+    assert all(r["ended_at"] for r in rows)  # all closed once the device went away
+    history = dbstore.get_device_health_history("d1", datetime.now(timezone.utc) - timedelta(hours=1))
+    assert set(history["dimensions"]) == {"healthy", "online", "key"}
+
+
+def test_device_health_timeline_closes_dimensions_no_longer_reported(tmp_path):
+    """Turning Tailnet Lock off drops lock_healthy from every entry; its
+    open interval must end rather than read as still locked forever."""
+    _fresh_db(tmp_path)
+    device = dict(_device(healthy=True), lock_healthy=False)
+    poller._process_device_notifications(CFG, [device])
+    poller._process_device_notifications(CFG, [_device(healthy=True)])
+    poller._state.flush()
+
+    with dbstore.get_connection() as conn:
+        open_rows = conn.execute(
+            "SELECT dimension FROM device_health_intervals WHERE ended_at IS NULL ORDER BY dimension"
+        ).fetchall()
+    assert [r["dimension"] for r in open_rows] == ["healthy"]
+    # A later poll that reports it again starts a fresh interval.
+    poller._process_device_notifications(CFG, [device])
+    poller._state.flush()
+    with dbstore.get_connection() as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM device_health_intervals WHERE dimension = 'lock' AND ended_at IS NULL"
+        ).fetchone()[0] == 1
@@ -0,0 +1,128 @@
+"""/metrics: the Prometheus exposition rendered from the /health snapshot."""
+import importlib.util
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import prometheus  # noqa: E402
+
+
+def _load_healthcheck(database_path, **env) -> types.ModuleType:
+    here = os.path.dirname(__file__)
+    root = os.path.abspath(os.path.join(here, os.pardir))
+    spec = importlib.util.spec_from_file_location("healthcheck", os.path.join(root, "healthcheck.py"))
+    assert spec and spec.loader
+    old_env = os.environ.copy()
+    try:
+        os.environ.update({
+            "RATE_LIMIT_ENABLED": "NO",
+            "TAILNET_DOMAIN": "example.ts.net",
+            "AUTH_TOKEN": "test-token",
+            "DATABASE_PATH": str(database_path),
+            **env,
+        })
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)  # type: ignore
+        return module
+    finally:
+        os.environ.clear()
+        os.environ.update(old_env)
+
+
+def _device(device_id, hostname, *, online=True, tags=None):
+    last_seen = datetime.now(pytz.UTC) - (timedelta(minutes=0) if online else timedelta(days=30))
+    return {
+        "id": device_id, "name": f"{hostname}.example.ts.net", "hostname": hostname, "os": "linux",
+        "clientVersion": "1.98.0", "updateAvailable": False, "connectedToControl": online,
+        "lastSeen": last_seen.isoformat().replace("+00:00", "Z"),
+        "keyExpiryDisabled": True, "expires": None, "tags": tags or [], "tailnetLockError": "",
+    }
+
+
+@pytest.fixture
+def app_module(tmp_path):
+    m = _load_healthcheck(tmp_path / "healthcheck.db")
+    devices = [_device("d1", "alpha", tags=["tag:prod"]), _device("d2", "bravo", online=False)]
+    m.fetch_devices = lambda: devices
+    return m
+
+
+def test_metrics_mirror_the_health_counters(app_module, metric_samples):
+    client = app_module.app.test_client()
+    health = client.get("/health").get_json()["metrics"]
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"] == prometheus.CONTENT_TYPE
+    samples = metric_samples(resp.get_data(as_text=True))
+
+    assert samples['tailscale_healthcheck_devices{check="overall",healthy="true"}'] == health["counter_healthy_true"]
+    assert samples['tailscale_healthcheck_devices{check="online",healthy="false"}'] == health["counter_healthy_online_false"]
+    assert samples['tailscale_healthcheck_global_healthy{check="overall"}'] == int(health["global_healthy"])
+    assert samples['tailscale_healthcheck_device_healthy{id="d1",device="alpha"}'] == 1
+    assert samples['tailscale_healthcheck_device_online{id="d2",device="bravo"}'] == 0
+    assert samples["tailscale_healthcheck_metrics_devices_dropped"] == 0
+
+
+def test_metrics_are_rendered_once_per_generation(app_module):
+    calls = []
+    devices = app_module.fetch_devices
+    app_module.fetch_devices = lambda: calls.append(1) or devices()
+    client = app_module.app.test_client()
+
+    first = client.get("/metrics").get_data()
+    assert client.get("/metrics").get_data() == first
+    assert len(calls) == 1
+
+    app_module.dbstore.set_setting("metrics_device_gauges", "none")
+    text = client.get("/metrics").get_data(as_text=True)
+    assert len(calls) == 2
+    assert "tailscale_healthcheck_device_healthy" not in text
+
+
+def test_metrics_require_the_health_token_when_set(tmp_path):
+    m = _load_healthcheck(tmp_path / "healthcheck.db", HEALTH_ENDPOINT_TOKEN="s3cret")
+    m.fetch_devices = lambda: []
+    client = m.app.test_client()
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"X-Health-Token": "s3cret"}).status_code == 200
+
+
+def _status(device_id, healthy, **extra):
+    return {"id": device_id, "machineName": device_id, "hostname": f"{device_id}-host", "os": "linux",
+            "tags": [], "healthy": healthy, "online_healthy": healthy, "key_days_to_expire": None, **extra}
+
+
+def _render(health_status, **options):
+    options = {"metrics_device_gauges": "all", "metrics_device_labels": "device", "metrics_max_devices": 0, **options}
+    return prometheus.render(health_status, {}, {"keys_error": "n/a"}, {}, {"last_cycle": None}, options)
+
+
+def test_device_series_honour_mode_labels_and_cap(metric_samples):
+    statuses = [_status("a", True), _status("b", False), _status("c", True), _status("d", False)]
+
+    unhealthy = metric_samples(_render(statuses, metrics_device_gauges="unhealthy"))
+    assert {k for k in unhealthy if k.startswith("tailscale_healthcheck_device_healthy")} == {
+        'tailscale_healthcheck_device_healthy{id="b",device="b"}',
+        'tailscale_healthcheck_device_healthy{id="d",device="d"}',
+    }
+
+    capped = metric_samples(_render(statuses, metrics_max_devices=3, metrics_device_labels="os, hostname, bogus"))
+    exported = [k for k in capped if k.startswith("tailscale_healthcheck_device_healthy")]
+    assert len(exported) == 3
+    # Unhealthy devices are kept over healthy ones; labels follow a fixed order.
+    assert 'tailscale_healthcheck_device_healthy{id="b",hostname="b-host",os="linux"}' in capped
+    assert 'tailscale_healthcheck_device_healthy{id="d",hostname="d-host",os="linux"}' in capped
+    assert capped["tailscale_healthcheck_metrics_devices_dropped"] == 1
+
+    assert "device_healthy" not in _render(statuses, metrics_device_gauges="none")
+
+
+def test_label_values_are_escaped():
+    text = _render([_status('we"ird\\name\n', True)])
+    assert 'id="we\\"ird\\\\name\\n"' in text
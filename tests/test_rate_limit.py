@@ -89,3 +89,31 @@ def test_rate_limit_file_backend_per_ip(monkeypatch, tmp_path):
     client = app.test_client()
     r = client.get("/health")
     assert r.status_code == 429
+
+
+def test_rate_limit_file_backend_counts_concurrent_requests(monkeypatch, tmp_path):
+    """Threaded workers serve requests concurrently; every one of them must be
+    counted, not just whichever save happened to land last."""
+    import threading
+
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "YES")
+    monkeypatch.setenv("RATE_LIMIT_PER_IP", "1000")
+    monkeypatch.setenv("RATE_LIMIT_GLOBAL", "0")
+    monkeypatch.setenv("RATE_LIMIT_STORAGE_URL", f"file://{tmp_path / 'rl-threads.json'}")
+    module = _load_healthcheck()
+
+    barrier = threading.Barrier(20)
+
+    def hit():
+        barrier.wait()
+        for _ in range(5):
+            module._file_rate_limit_check_and_inc("10.0.0.1")
+
+    threads = [threading.Thread(target=hit) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert module._rl_file_load()["per_ip"]["10.0.0.1"] == 100
+    assert not list(tmp_path.glob("rl-threads.json.tmp*"))
@@ -54,9 +54,10 @@ def test_allow_get_head_options(client):
 
 def test_cache_invalidate_get_ok_and_post_forbidden(client):
     r_get = client.get("/health/cache/invalidate")
-    assert r_get.status_code == 200
+    assert r_get.status_code == 202
     data = r_get.get_json()
     assert "triggered" in data
+    assert data["job_id"]
 
     r_post = client.post("/health/cache/invalidate")
     assert r_post.status_code == 403
@@ -0,0 +1,106 @@
+"""Server-Timing phases and the cross-worker request latency histograms."""
+import importlib.util
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import reqtiming  # noqa: E402
+
+
+def _load_healthcheck(database_path, **env) -> types.ModuleType:
+    here = os.path.dirname(__file__)
+    root = os.path.abspath(os.path.join(here, os.pardir))
+    spec = importlib.util.spec_from_file_location("healthcheck", os.path.join(root, "healthcheck.py"))
+    assert spec and spec.loader
+    old_env = os.environ.copy()
+    try:
+        os.environ.update({
+            "RATE_LIMIT_ENABLED": "NO",
+            "TAILNET_DOMAIN": "example.ts.net",
+            "AUTH_TOKEN": "test-token",
+            "DATABASE_PATH": str(database_path),
+            **env,
+        })
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)  # type: ignore
+        return module
+    finally:
+        os.environ.clear()
+        os.environ.update(old_env)
+
+
+def _server_timing(header):
+    phases = {}
+    for part in header.split(","):
+        name, dur = part.strip().split(";dur=")
+        phases[name] = float(dur)
+    return phases
+
+
+def test_nested_phases_count_exclusive_time():
+    reqtiming.begin()
+    with reqtiming.phase("outer"):
+        time.sleep(0.02)
+        with reqtiming.phase("inner"):
+            time.sleep(0.03)
+    total_ms, phases = reqtiming.end()
+    assert phases["outer"] >= 15 and phases["inner"] >= 25
+    # Inclusive times would add up to more than the request took.
+    assert phases["outer"] + phases["inner"] <= total_ms
+    # Outside a timed request a phase is a no-op.
+    with reqtiming.phase("outer"):
+        pass
+    assert reqtiming.end() is None
+
+
+def test_summarize_reports_bucket_upper_bounds():
+    counts = {}
+    for ms in [1.0] * 90 + [50.0] * 9 + [400.0]:
+        bucket = reqtiming.bucket_for(ms)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    summary = reqtiming.summarize(counts)
+    assert summary["count"] == 100
+    assert 1.0 <= summary["p50_ms"] < 1.2
+    assert 50.0 <= summary["p95_ms"] < 60.0
+    assert 50.0 <= summary["p99_ms"] < 60.0
+    assert 400.0 <= summary["max_ms"] < 480.0
+    assert reqtiming.summarize({})["p99_ms"] is None
+
+
+def test_health_carries_server_timing_phases(tmp_path):
+    m = _load_healthcheck(tmp_path / "healthcheck.db")
+    m.fetch_devices = lambda: []
+    resp = m.app.test_client().get("/health")
+    phases = _server_timing(resp.headers["Server-Timing"])
+    assert {"db", "settings", "compute", "encode", "total"} <= set(phases)
+    assert sum(ms for name, ms in phases.items() if name != "total") <= phases["total"]
+
+
+def test_latency_histograms_merge_across_workers(tmp_path):
+    m = _load_healthcheck(tmp_path / "healthcheck.db")
+    m.fetch_devices = lambda: []
+    m.dbstore.create_user("admin", "correct-horse-battery-staple")
+    client = m.app.test_client()
+    client.post("/admin/api/login", json={"username": "admin", "password": "correct-horse-battery-staple"})
+    reqtiming.drain_due(force=True)
+
+    minute = int(time.time() // 60) * 60
+    fast, slow = reqtiming.bucket_for(2.0), reqtiming.bucket_for(300.0)
+    # Two workers flushing counts for the same minute and route.
+    m.dbstore.record_request_latency([(minute, "GET /health", fast, 60)])
+    m.dbstore.record_request_latency([(minute, "GET /health", fast, 38), (minute, "GET /health", slow, 2)])
+    # Older than the retention window: dropped on the next flush.
+    m.dbstore.record_request_latency([(minute - 3 * 3600, "GET /keys", fast, 5)])
+
+    data = client.get("/admin/api/debug/request-latency").get_json()
+    health = next(r for r in data["routes"] if r["route"] == "GET /health")
+    assert health["count"] == 100
+    assert 2.0 <= health["p50_ms"] < 2.4
+    assert health["p95_ms"] < 2.4
+    assert 300.0 <= health["p99_ms"] < 360.0
+    assert all(r["route"] != "GET /keys" for r in data["routes"])
+    with m.dbstore.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM request_latency WHERE route = 'GET /keys'").fetchone()[0] == 0
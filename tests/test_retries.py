@@ -135,15 +135,163 @@ def test_unauthorized_401_refreshes_token_and_succeeds(monkeypatch):
         # First call unauthorized, second succeeds
         return DummyResponse(401 if calls["count"] == 1 else 200)
 
-    def fake_fetch_token():
-        module.ACCESS_TOKEN = "newtoken"
+    rejected = []
+
+    def fake_get_token(rejected_token=None):
+        rejected.append(rejected_token)
+        return "newtoken"
 
     monkeypatch.setattr(module.requests, "get", fake_get)
-    monkeypatch.setattr(module, "fetch_oauth_token", fake_fetch_token)
+    monkeypatch.setattr(module, "get_oauth_access_token", fake_get_token)
 
     resp = module.make_authenticated_request("https://example.invalid", {"Authorization": "Bearer x"})
     assert isinstance(resp, DummyResponse)
     assert resp.status_code == 200
     # Should only be a single attempt with one inline retry due to 401
     assert calls["count"] == 2
+    # The token that drew the 401 is handed over, so the shared store
+    # replaces that one rather than serving it again.
+    assert rejected == ["x"]
+
+
+class _StatusResponse:
+    def __init__(self, code, headers=None):
+        self.status_code = code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self):
+        return {}
+
+
+def test_429_retry_after_is_honoured_before_retrying(monkeypatch, tmp_path):
+    module = _load_healthcheck_with_env({
+        "MAX_RETRIES": "3",
+        "BACKOFF_BASE_SECONDS": "0.5",
+        "BACKOFF_MAX_SECONDS": "8",
+        "BACKOFF_JITTER_SECONDS": "0",
+        "DATABASE_PATH": str(tmp_path / "healthcheck.db"),
+    })
+    responses = [_StatusResponse(429, {"Retry-After": "3"}), _StatusResponse(200)]
+    sleeps = []
+    monkeypatch.setattr(module.requests, "get", lambda *_a, **_kw: responses.pop(0))
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+
+    resp = module.make_authenticated_request("https://example.invalid", {"Authorization": "Bearer x"})
+
+    assert resp.status_code == 200
+    # The server's Retry-After, not the 0.5s exponential backoff.
+    assert sleeps == [3.0]
+    assert module.dbstore.get_circuit_state()["failures"] == 0
+
+
+def test_5xx_is_retried_with_backoff_then_counts_against_the_breaker(monkeypatch, tmp_path):
+    module = _load_healthcheck_with_env({
+        "MAX_RETRIES": "2",
+        "BACKOFF_BASE_SECONDS": "1",
+        "BACKOFF_JITTER_SECONDS": "0",
+        "CIRCUIT_BREAKER_THRESHOLD": "5",
+        "DATABASE_PATH": str(tmp_path / "healthcheck.db"),
+    })
+    calls = {"count": 0}
+
+    def always_503(*_a, **_kw):
+        calls["count"] += 1
+        return _StatusResponse(503)
+
+    sleeps = []
+    monkeypatch.setattr(module.requests, "get", always_503)
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+
+    try:
+        module.make_authenticated_request("https://example.invalid", {"Authorization": "Bearer x"})
+        assert False, "expected HTTPError"
+    except module.requests.exceptions.HTTPError as e:
+        assert e.response.status_code == 503
+
+    assert calls["count"] == 2
+    assert sleeps == [1.0]
+    state = module.dbstore.get_circuit_state()
+    assert state["failures"] == 1
+    assert module.dbstore.circuit_open_until(state) is None
 
+
+def test_long_retry_after_opens_the_breaker_instead_of_sleeping(monkeypatch, tmp_path):
+    module = _load_healthcheck_with_env({
+        "MAX_RETRIES": "3",
+        "BACKOFF_MAX_SECONDS": "8",
+        "DATABASE_PATH": str(tmp_path / "healthcheck.db"),
+    })
+    calls = {"count": 0}
+
+    def rate_limited(*_a, **_kw):
+        calls["count"] += 1
+        return _StatusResponse(429, {"Retry-After": "120"})
+
+    sleeps = []
+    monkeypatch.setattr(module.requests, "get", rate_limited)
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+
+    try:
+        module.make_authenticated_request("https://example.invalid", {"Authorization": "Bearer x"})
+        assert False, "expected HTTPError"
+    except module.requests.exceptions.HTTPError:
+        pass
+
+    assert calls["count"] == 1
+    assert sleeps == []
+    open_until = module.dbstore.circuit_open_until()
+    assert open_until is not None and open_until - module.time.time() > 100
+
+    # While open, no request reaches the network at all.
+    try:
+        module.make_authenticated_request("https://example.invalid", {"Authorization": "Bearer x"})
+        assert False, "expected CircuitOpenError"
+    except module.CircuitOpenError:
+        pass
+    assert calls["count"] == 1
+    assert module._build_poll_meta()["degraded"] is True
+
+
+def test_breaker_opens_after_threshold_and_success_resets_it(monkeypatch, tmp_path):
+    module = _load_healthcheck_with_env({
+        "MAX_RETRIES": "1",
+        "CIRCUIT_BREAKER_THRESHOLD": "2",
+        "CIRCUIT_BREAKER_COOLDOWN_SECONDS": "60",
+        "DATABASE_PATH": str(tmp_path / "healthcheck.db"),
+    })
+    monkeypatch.setattr(module.requests, "get", lambda *_a, **_kw: _StatusResponse(502))
+
+    for _ in range(2):
+        try:
+            module.make_authenticated_request("https://example.invalid", {})
+        except module.requests.exceptions.HTTPError:
+            pass
+    assert module.dbstore.circuit_open_until() is not None
+
+    # Cool-off elapsed: the breaker is half-open and one good response closes it.
+    state = module.dbstore.get_circuit_state()
+    with module.dbstore.get_connection() as conn:
+        module.dbstore._write_circuit_state(conn, dict(state, open_until=module.time.time() - 1))
+    monkeypatch.setattr(module.requests, "get", lambda *_a, **_kw: _StatusResponse(200))
+    module.make_authenticated_request("https://example.invalid", {})
+    assert module.dbstore.get_circuit_state()["failures"] == 0
+    assert module._build_poll_meta()["degraded"] is False
+
+
+def test_404_does_not_count_against_the_breaker(monkeypatch, tmp_path):
+    module = _load_healthcheck_with_env({
+        "MAX_RETRIES": "3",
+        "DATABASE_PATH": str(tmp_path / "healthcheck.db"),
+    })
+    monkeypatch.setattr(module.requests, "get", lambda *_a, **_kw: _StatusResponse(404))
+
+    try:
+        module.make_authenticated_request("https://example.invalid", {})
+    except module.requests.exceptions.HTTPError:
+        pass
+    assert module.dbstore.get_circuit_state()["failures"] == 0
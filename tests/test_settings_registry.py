@@ -46,6 +46,30 @@ def test_non_core_setting_env_override_persists_after_removal(tmp_path, monkeypa
     assert dbstore.get_setting_typed("online_threshold_minutes") == 42
 
 
+def test_sync_env_settings_uses_one_transaction(tmp_path, monkeypatch):
+    _fresh_db(tmp_path)
+    monkeypatch.setenv("TAILNET_DOMAIN", "one.ts.net")
+    monkeypatch.setenv("POLL_INTERVAL_SECONDS", "30")
+    dbstore.sync_env_settings()
+    monkeypatch.delenv("POLL_INTERVAL_SECONDS")
+    monkeypatch.setenv("TAILNET_DOMAIN", "two.ts.net")
+
+    original = dbstore.get_connection
+    opened = []
+
+    def counting_connection():
+        opened.append(1)
+        return original()
+
+    monkeypatch.setattr(dbstore, "get_connection", counting_connection)
+    dbstore.sync_env_settings()
+    # One to check the schema version, one for the whole registry.
+    assert len(opened) == 2
+    monkeypatch.setattr(dbstore, "get_connection", original)
+    assert dbstore.get_setting_meta("tailnet_domain") == {"value": "two.ts.net", "source": "env"}
+    assert dbstore.get_setting_meta("poll_interval_seconds") == {"value": "30", "source": "db"}
+
+
 def test_get_setting_typed_casts_int_float_bool(tmp_path):
     _fresh_db(tmp_path)
     dbstore.set_setting("online_threshold_minutes", "7", source="db")
@@ -120,10 +144,10 @@ def test_poller_log_filters_by_event_type_and_purges(tmp_path):
 
     assert "poll_started" in poller.get_poll_log_event_types()
 
-    with dbstore.get_connection() as conn:
-        conn.execute("UPDATE poller_log SET occurred_at = '2000-01-01T00:00:00+00:00'")
+    dbstore.record_poller_log("poll_started", "old", occurred_at="2000-01-01T00:00:00+00:00")
+    assert len(poller.get_poll_log()) == 3
     dbstore.purge_poller_log(retention_days=7)
-    assert poller.get_poll_log() == []
+    assert [e["message"] for e in poller.get_poll_log()] == ["boom", "start"]
 
 
 def test_metrics_history_record_and_purge(tmp_path):
@@ -145,9 +169,42 @@ def test_metrics_history_record_and_purge(tmp_path):
     with dbstore.get_connection() as conn:
         conn.execute("UPDATE metrics_history SET occurred_at = '2000-01-01T00:00:00+00:00'")
     dbstore.purge_metrics_history(retention_hours=48)
+    assert dbstore.get_metrics_history(hours=24) == []
+    # The rollups outlive the raw row, each tier for its own retention.
+    assert len(dbstore.get_metrics_history(hours=24 * 365)) == 1
+    with dbstore.get_connection() as conn:
+        conn.execute("UPDATE metrics_rollup SET bucket_start = '2000-01-01T00:00:00+00:00'")
+    dbstore.purge_metrics_history(retention_hours=48)
     assert dbstore.get_metrics_history(hours=24 * 365) == []
 
 
+def test_metrics_history_rollups_and_tier_selection(tmp_path):
+    _fresh_db(tmp_path)
+    for healthy in (4, 8, 6):
+        dbstore.record_metrics_snapshot({"counter_healthy_true": healthy}, {})
+    with dbstore.get_connection() as conn:
+        tiers = {r["tier"]: r for r in conn.execute("SELECT * FROM metrics_rollup").fetchall()}
+    # One bucket per tier (unless the three inserts straddled a boundary).
+    assert set(tiers) == {"5m", "1h", "1d"}
+    day = tiers["1d"]
+    assert (day["samples"], day["counter_healthy_true_min"], day["counter_healthy_true_max"]) == (3, 4, 8)
+    assert day["counter_healthy_true_sum"] == 18
+
+    assert dbstore.get_metrics_series(hours=24)["resolution"] == "raw"
+    # Raw rows that don't fit the point budget fall back to the finest tier that does.
+    assert dbstore.get_metrics_series(hours=24, max_points=2)["resolution"] == "1d"
+    series = dbstore.get_metrics_series(hours=24 * 30)
+    assert series["resolution"] == "1d"
+    [entry] = series["entries"]
+    assert entry["counter_healthy_true"] == 6
+    assert (entry["counter_healthy_true_min"], entry["counter_healthy_true_max"], entry["samples"]) == (4, 8, 3)
+
+    assert dbstore.metrics_history_resolution(24, 500, raw_points=10_000) == "5m"
+    assert dbstore.metrics_history_resolution(24 * 7, 500) == "1h"
+    assert dbstore.metrics_history_resolution(24 * 90, 500) == "1d"
+    assert dbstore.metrics_history_resolution(24 * 5000, 500) == "1d"
+
+
 def test_every_registry_setting_is_rendered_by_the_settings_ui():
     """The admin settings page renders from a hardcoded FIELDS_BY_GROUP list in
     frontend/src/pages/admin-settings.tsx, not from the registry - so adding a
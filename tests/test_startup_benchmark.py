@@ -0,0 +1,39 @@
+"""tools/startup_benchmark.py against the real healthcheck.py: the boot-time
+breakdown is reported, modules only some deployments need stay off the
+import path, and a warm boot stays inside a (generous) time budget."""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import tools.startup_benchmark as startup_benchmark  # noqa: E402
+from tools.startup_benchmark import boot_once  # noqa: E402
+
+
+def test_boot_reports_phases_and_skips_optional_imports(tmp_path):
+    boot = boot_once(str(tmp_path / "healthcheck.db"), {"RATE_LIMIT_ENABLED": "NO"})
+
+    assert list(boot["phases"]) == ["init_db", "sync_env_settings", "app_setup", "routes"]
+    assert boot["wall_ms"] > 0
+    assert "flask" in boot["imports_us"]
+    # Rate limiting is off and nobody has logged in with MFA.
+    assert "flask_limiter" not in boot["imports_us"]
+    assert "pyotp" not in boot["imports_us"]
+
+
+# Several times the median warm boot on a one-CPU runner: loose enough not to
+# flake, tight enough that a heavy import creeping back onto the boot path
+# (or a migration running on every start) fails the suite.
+WARM_BOOT_BUDGET_MS = 3000
+
+
+def test_warm_boot_fits_the_budget(capsys):
+    assert startup_benchmark.main(["--runs", "3", "--max-ms", str(WARM_BOOT_BUDGET_MS)]) == 0, capsys.readouterr().err
+
+
+def test_budget_overrun_fails_the_run(monkeypatch):
+    report = {"first_boot_ms": 900.0, "warm_boot_ms_median": 850.0, "warm_boot_ms_max": 870.0,
+              "phases_ms_median": {}, "heaviest_imports_ms": {}, "modules": [], "runs": 3}
+    monkeypatch.setattr(startup_benchmark, "run", lambda args: report)
+    assert startup_benchmark.main(["--max-ms", "800"]) == 1
+    assert startup_benchmark.main(["--max-ms", "900"]) == 0
@@ -0,0 +1,79 @@
+"""/health/stream: the per-worker watcher that turns poller writes into
+Server-Sent Events, and the endpoint that serves them."""
+import importlib.util
+import json
+import os
+import queue
+import time
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import dbstore  # noqa: E402
+import stream  # noqa: E402
+
+
+@pytest.fixture
+def broadcaster(tmp_path, monkeypatch):
+    dbstore.configure(str(tmp_path / "healthcheck.db"))
+    dbstore.init_db()
+    monkeypatch.setattr(stream, "STREAM_CHECK_SECONDS", 0.02)
+    fresh = stream._Broadcaster()
+    monkeypatch.setattr(stream, "broadcaster", fresh)
+    return fresh
+
+
+def _next_event(sub, timeout=5):
+    """(event name, data) of the next queued event."""
+    lines = dict(line.split(": ", 1) for line in sub.get(timeout=timeout).strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+def test_transitions_and_poller_activity_are_pushed(broadcaster):
+    dbstore.record_device_feed([{"id": "d1", "device": "a", "healthy": True}, {"id": "d2", "device": "b", "healthy": True}])
+    sub = broadcaster.subscribe()
+    assert _next_event(sub) == ("generation", {"generation": 1, "last_polled_at": None})
+    # Let the watcher take its baseline before anything changes.
+    time.sleep(0.2)
+
+    dbstore.record_device_feed([{"id": "d1", "device": "a", "healthy": False}])
+    events = [_next_event(sub) for _ in range(3)]
+    assert ("transition", {"id": "d1", "device": "a", "healthy": False, "previous": True, "generation": 2}) in events
+    assert ("transition", {"id": "d2", "device": "b", "healthy": None, "previous": True, "generation": 2}) in events
+    assert ("generation", {"generation": 2, "last_polled_at": None}) in events
+
+    dbstore.record_poller_log("poll_started", "Poll cycle starting.")
+    name, data = _next_event(sub)
+    assert name == "poller_log" and data["poller_log_id"]
+
+    broadcaster.unsubscribe(sub)
+    with pytest.raises(queue.Empty):
+        sub.get(timeout=0.2)
+
+
+def test_stream_endpoint_serves_events_and_caps_clients(broadcaster, monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "healthcheck.db"))
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "NO")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    spec = importlib.util.spec_from_file_location("healthcheck", os.path.join(root, "healthcheck.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    client = module.app.test_client()
+
+    resp = client.get("/health/stream")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    assert resp.headers["Cache-Control"] == "no-cache"
+    body = iter(resp.response)
+    assert next(body).startswith(b"retry: ")
+    assert next(body).startswith(b"event: generation\nid: 0\n")
+    assert broadcaster.subscriber_count() == 1
+    resp.close()
+    assert broadcaster.subscriber_count() == 0
+
+    monkeypatch.setattr(stream, "STREAM_MAX_CLIENTS", 0)
+    full = client.get("/health/stream")
+    assert full.status_code == 503
+    assert "Retry-After" in full.headers
@@ -0,0 +1,89 @@
+"""The bundled Tailscale API simulator (tools/tailscale_sim.py) and a real poll
+cycle driven against it - the same path tools/poller_loadtest.py exercises at
+scale, kept small here so it runs with the rest of the suite."""
+import importlib.util
+import os
+import sys
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import dbstore  # noqa: E402
+import poller  # noqa: E402
+from tools.tailscale_sim import Fleet, SimConfig, TailscaleSimulator  # noqa: E402
+
+
+def _load_healthcheck(monkeypatch, tmp_path, sim_url):
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "healthcheck.db"))
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "NO")
+    monkeypatch.setenv("TAILNET_DOMAIN", "sim.example")
+    monkeypatch.setenv("AUTH_TOKEN", "sim-static-token")
+    monkeypatch.setenv("BACKOFF_BASE_SECONDS", "0")
+    monkeypatch.setenv("BACKOFF_JITTER_SECONDS", "0")
+    monkeypatch.setattr(poller, "TAILSCALE_API_URL", sim_url)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    spec = importlib.util.spec_from_file_location("healthcheck", os.path.join(root, "healthcheck.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setitem(sys.modules, "healthcheck", module)
+    return module
+
+
+def test_fleet_is_deterministic_per_seed():
+    a = Fleet(SimConfig(devices=50, churn_rate=0.1, seed=3))
+    b = Fleet(SimConfig(devices=50, churn_rate=0.1, seed=3))
+    for _ in range(5):
+        a.advance()
+        b.advance()
+    strip = lambda fleet: [{k: v for k, v in d.items() if k != "lastSeen"} for d in fleet.devices]  # noqa: E731
+    assert strip(a) == strip(b)
+    assert len(a.devices) == 50
+    assert strip(a) != strip(Fleet(SimConfig(devices=50, churn_rate=0.1, seed=4)))
+
+
+def test_simulator_serves_fleet_and_injects_faults():
+    with TailscaleSimulator(SimConfig(devices=7, keys=2)) as sim:
+        headers = {"Authorization": "Bearer anything"}
+        devices = requests.get(f"{sim.url}/api/v2/tailnet/sim.example/devices", headers=headers, timeout=5)
+        keys = requests.get(f"{sim.url}/api/v2/tailnet/sim.example/keys?all=true", headers=headers, timeout=5)
+        token = requests.post(f"{sim.url}/api/v2/oauth/token", data={"client_id": "x"}, timeout=5)
+        assert len(devices.json()["devices"]) == 7
+        assert len(keys.json()["keys"]) == 2
+        assert token.json()["access_token"].startswith("sim-oauth-")
+
+    with TailscaleSimulator(SimConfig(devices=1, fault_429_rate=1.0, retry_after_seconds=9)) as sim:
+        resp = requests.get(f"{sim.url}/api/v2/tailnet/sim.example/devices", timeout=5)
+        assert resp.status_code == 429
+        assert resp.headers["Retry-After"] == "9"
+
+    with TailscaleSimulator(SimConfig(devices=1, drop_rate=1.0)) as sim:
+        try:
+            requests.get(f"{sim.url}/api/v2/tailnet/sim.example/devices", timeout=5)
+            assert False, "expected the connection to be dropped"
+        except requests.exceptions.ConnectionError:
+            pass
+
+
+def test_poll_cycle_against_simulator_persists_fleet(monkeypatch, tmp_path):
+    with TailscaleSimulator(SimConfig(devices=40, keys=3, churn_rate=0.1)) as sim:
+        _load_healthcheck(monkeypatch, tmp_path, sim.url)
+        poller.run_poll_cycle()
+        poller.run_poll_cycle()
+
+    assert dbstore.get_poll_status()["ok"] is True
+    assert len(dbstore.get_devices_snapshot()) == 40
+    assert len(dbstore.get_keys_snapshot()) == 3
+    assert dbstore.count_audit_log(entity_type="device", action="updated") > 0
+
+
+def test_poll_cycle_rides_through_transient_simulator_faults(monkeypatch, tmp_path):
+    # Every other request fails (5xx or dropped); MAX_RETRIES=4 absorbs it.
+    monkeypatch.setenv("MAX_RETRIES", "4")
+    with TailscaleSimulator(SimConfig(devices=10, fault_5xx_rate=0.25, drop_rate=0.25, seed=11)) as sim:
+        _load_healthcheck(monkeypatch, tmp_path, sim.url)
+        poller.run_poll_cycle()
+        faults = sum(v for k, v in sim.state.counters.items() if k.startswith("fault_"))
+
+    assert faults > 0
+    assert len(dbstore.get_devices_snapshot()) == 10
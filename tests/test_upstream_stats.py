@@ -0,0 +1,114 @@
+"""Per-endpoint Tailscale API call statistics (/admin/api/debug/upstream and /metrics)."""
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import upstreamstats  # noqa: E402
+
+DEVICES_URL = "https://api.example.invalid/api/v2/tailnet/example.ts.net/devices"
+
+
+def _load_healthcheck(database_path, **env) -> types.ModuleType:
+    here = os.path.dirname(__file__)
+    root = os.path.abspath(os.path.join(here, os.pardir))
+    spec = importlib.util.spec_from_file_location("healthcheck", os.path.join(root, "healthcheck.py"))
+    assert spec and spec.loader
+    old_env = os.environ.copy()
+    try:
+        os.environ.update({
+            "RATE_LIMIT_ENABLED": "NO",
+            "TAILNET_DOMAIN": "example.ts.net",
+            "AUTH_TOKEN": "test-token",
+            "DATABASE_PATH": str(database_path),
+            "BACKOFF_BASE_SECONDS": "0",
+            "BACKOFF_JITTER_SECONDS": "0",
+            **env,
+        })
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)  # type: ignore
+        return module
+    finally:
+        os.environ.clear()
+        os.environ.update(old_env)
+
+
+class _Response:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    m = _load_healthcheck(tmp_path / "healthcheck.db", MAX_RETRIES="3")
+    m.fetch_devices = lambda: []
+    monkeypatch.setattr(m.time, "sleep", lambda *_a, **_kw: None)
+    monkeypatch.setattr(m, "get_oauth_access_token", lambda rejected_token=None: "fresh-token")
+    return m
+
+
+def test_endpoint_labels():
+    assert upstreamstats.endpoint_for(DEVICES_URL) == "devices"
+    assert upstreamstats.endpoint_for("https://api.tailscale.com/api/v2/tailnet/-/keys?all=true") == "keys"
+    assert upstreamstats.endpoint_for("https://api.tailscale.com/api/v2/oauth/token") == "oauth_token"
+    assert upstreamstats.endpoint_for("https://api.tailscale.com/api/v2/device/123") == "other"
+
+
+def test_attempts_retries_refreshes_and_timeouts_are_counted(app_module, monkeypatch):
+    body = b"x" * 5000
+    responses = [_Response(401), _Response(503), _Response(200, body)]
+    monkeypatch.setattr(app_module.requests, "get", lambda *_a, **_kw: responses.pop(0))
+    app_module.make_authenticated_request(DEVICES_URL, {"Authorization": "Bearer stale"})
+
+    def timeout(*_a, **_kw):
+        raise requests.exceptions.Timeout("simulated timeout")
+
+    monkeypatch.setattr(app_module.requests, "get", timeout)
+    with pytest.raises(requests.exceptions.Timeout):
+        app_module.make_authenticated_request(DEVICES_URL, {"Authorization": "Bearer fresh-token"})
+
+    stats = upstreamstats.summarize(app_module.dbstore.get_upstream_calls(60)["devices"])
+    assert stats["calls"] == 4
+    assert stats["status"] == {"200": 1, "401": 1, "503": 1, "none": 1}
+    assert stats["errors"] == 3
+    assert (stats["retries"], stats["auth_refreshes"], stats["timeouts"]) == (1, 1, 1)
+    # Size percentiles are power-of-two bucket bounds; the total is exact.
+    assert stats["response_bytes"]["max"] == 8192
+    assert stats["response_bytes"]["total"] == 5000
+    assert stats["latency_ms"]["p50"] is not None
+
+
+def test_debug_api_and_metrics_export_the_calls(app_module, monkeypatch, metric_samples):
+    monkeypatch.setattr(app_module.requests, "get", lambda *_a, **_kw: _Response(200, b"{}"))
+    app_module.make_authenticated_request(DEVICES_URL, {"Authorization": "Bearer t"})
+    app_module.make_authenticated_request(DEVICES_URL, {"Authorization": "Bearer t"})
+
+    client = app_module.app.test_client()
+    app_module.dbstore.create_user("admin", "correct-horse-battery-staple")
+    client.post("/admin/api/login", json={"username": "admin", "password": "correct-horse-battery-staple"})
+    data = client.get("/admin/api/debug/upstream?minutes=5").get_json()
+    assert data["minutes"] == 5
+    assert [(e["endpoint"], e["calls"], e["status"]) for e in data["endpoints"]] == [("devices", 2, {"200": 2})]
+
+    samples = metric_samples(client.get("/metrics").get_data(as_text=True))
+    prefix = "tailscale_healthcheck_upstream_"
+    assert samples[prefix + 'requests_total{endpoint="devices",status="200"}'] == 2
+    assert samples[prefix + 'retries_total{endpoint="devices"}'] == 0
+    assert samples[prefix + 'request_duration_seconds_count{endpoint="devices"}'] == 2
+    assert samples[prefix + 'request_duration_seconds_bucket{endpoint="devices",le="+Inf"}'] == 2
+    assert samples[prefix + 'response_size_bytes_bucket{endpoint="devices",le="1024"}'] == 2
+    assert samples[prefix + 'response_size_bytes_sum{endpoint="devices"}'] == 4
+    # Cumulative buckets never decrease.
+    latency = [v for k, v in samples.items() if k.startswith(prefix + "request_duration_seconds_bucket")]
+    assert latency == sorted(latency)
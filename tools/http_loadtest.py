@@ -0,0 +1,306 @@
+"""Serve the real app under Gunicorn and hammer it with concurrent monitoring clients.
+
+Sizing aid for the serving mode (GUNICORN_WORKER_CLASS / GUNICORN_THREADS):
+starts Gunicorn exactly as the Docker image does (--preload, gunicorn_config.py)
+against a throwaway database, with the elected poller polling
+tools/tailscale_sim.py in the background, then runs --clients concurrent
+keep-alive clients requesting --path back to back for --duration seconds and
+reports:
+
+  - sustained throughput (successful requests/s) and errors (non-2xx,
+    failed or timed-out requests)
+  - latency p50 / p95 / p99 / max, measured per request on the client
+  - with --streams N, how many of N /health/stream connections were still
+    connected at the end and how many were refused with 503 because their
+    worker was at its stream cap (STREAM_MAX_CLIENTS, half its threads) -
+    the long-lived requests that must not take every thread
+
+    python -m tools.http_loadtest --clients 500 --duration 30
+    python -m tools.http_loadtest --clients 500 --streams 20 --worker-class sync
+    python -m tools.http_loadtest --url http://10.0.0.5:5000 --token "$TOKEN" --json
+
+Clients are threads spread over --client-procs processes, so the load
+generator isn't held back by one interpreter's GIL; on a small machine it
+still competes with the server for CPU, and --url against a server on
+another host gives the cleaner number. With --max-p99-ms the exit status is
+1 when p99 exceeds the budget. Run from the repository root.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from tools.tailscale_sim import SimConfig, TailscaleSimulator  # noqa: E402
+
+READY_TIMEOUT_SECONDS = 60
+# A monitoring probe that waits this long has failed, whatever comes back.
+REQUEST_TIMEOUT_SECONDS = 10
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(base_url: str, path: str, headers: dict, timeout: float = 5.0):
+    parsed = urllib.parse.urlsplit(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conn.close()
+
+
+def start_server(args, db_path: str, sim_url: str):
+    """Launch Gunicorn the way the Dockerfile does; returns (process, base_url)."""
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_PATH": db_path,
+        "TAILSCALE_API_URL": sim_url,
+        "TAILNET_DOMAIN": "sim.example",
+        "AUTH_TOKEN": "sim-static-token",
+        "POLL_INTERVAL_SECONDS": str(args.poll_interval),
+        "RATE_LIMIT_ENABLED": "NO",
+        "LOG_LEVEL": "WARNING",
+        "GUNICORN_WORKER_CLASS": args.worker_class,
+        "GUNICORN_THREADS": str(args.threads),
+        # Open streams only notice a closed client at their next heartbeat;
+        # don't let them hold up tearing down a throwaway server.
+        "GUNICORN_GRACEFUL_TIMEOUT": "2",
+    })
+    if args.token:
+        env["HEALTH_ENDPOINT_TOKEN"] = args.token
+    log = open(os.path.join(os.path.dirname(db_path), "gunicorn.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "--preload",
+         "-b", f"127.0.0.1:{port}", "-c", "gunicorn_config.py", "healthcheck:app"],
+        cwd=_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(base_url: str, headers: dict, proc=None, timeout: float = READY_TIMEOUT_SECONDS):
+    """Block until /health answers with a completed poll behind it."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Gunicorn exited with status {proc.returncode} before becoming ready")
+        try:
+            status, body = _get(base_url, "/health", headers)
+            if status == 200 and (json.loads(body).get("poll_meta") or {}).get("last_polled_at"):
+                return
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{base_url} was not ready after {timeout}s")
+
+
+def _client(base_url, path, headers, start_at, measure_from, stop_at, results):
+    """One monitoring client: a keep-alive connection, one request after
+    another. http.client reopens the connection by itself when the server
+    closed it (as sync workers do after every response)."""
+    parsed = urllib.parse.urlsplit(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=REQUEST_TIMEOUT_SECONDS)
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            ok = 200 <= resp.status < 300
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # Counted by completion, so a request stuck since the warm-up (no
+        # free worker) still shows up - as the error its timeout makes it.
+        if time.time() < measure_from:
+            continue
+        latencies.append(elapsed_ms)
+        errors += 0 if ok else 1
+    conn.close()
+    results.append((latencies, errors))
+
+
+def _client_process(base_url, path, headers, clients, start_at, measure_from, stop_at):
+    results = []
+    threads = [
+        threading.Thread(target=_client, args=(base_url, path, headers, start_at, measure_from, stop_at, results))
+        for _ in range(clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies = [ms for client_latencies, _ in results for ms in client_latencies]
+    return latencies, sum(errors for _, errors in results)
+
+
+class _StreamHolder:
+    """Keeps one /health/stream connection open and counts its events."""
+
+    def __init__(self, base_url, headers):
+        self.base_url, self.headers = base_url, headers
+        self.connected = False
+        self.rejected = False
+        self.events = 0
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        parsed = urllib.parse.urlsplit(self.base_url)
+        self._conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        try:
+            self._conn.request("GET", "/health/stream", headers=self.headers)
+            resp = self._conn.getresponse()
+            if resp.status != 200:
+                self.rejected = resp.status == 503
+                return
+            self.connected = True
+            for line in resp:
+                if line.startswith(b"event:"):
+                    self.events += 1
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        finally:
+            self.connected = False
+
+    def close(self):
+        if self._conn is not None and self._conn.sock is not None:
+            try:
+                self._conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def run(args) -> dict:
+    headers = {"X-Health-Token": args.token} if args.token else {}
+    sim = proc = None
+    base_url = args.url
+    try:
+        if not base_url:
+            sim = TailscaleSimulator(SimConfig(devices=args.devices)).start()
+            workdir = tempfile.mkdtemp(prefix="http-loadtest-")
+            proc, base_url = start_server(args, os.path.join(workdir, "healthcheck.db"), sim.url)
+        wait_ready(base_url, headers, proc)
+
+        streams = [_StreamHolder(base_url, headers).start() for _ in range(args.streams)]
+        procs = max(1, min(args.client_procs, args.clients))
+        per_proc = [args.clients // procs + (1 if i < args.clients % procs else 0) for i in range(procs)]
+        start_at = time.time() + 1.0  # every client process is up before anyone starts
+        measure_from = start_at + args.warmup
+        stop_at = measure_from + args.duration
+        with multiprocessing.get_context("fork").Pool(procs) as pool:
+            parts = pool.starmap(
+                _client_process,
+                [(base_url, args.path, headers, n, start_at, measure_from, stop_at) for n in per_proc],
+            )
+        streams_connected = sum(1 for s in streams if s.connected)
+        streams_rejected = sum(1 for s in streams if s.rejected)
+        stream_events = sum(s.events for s in streams)
+        for s in streams:
+            s.close()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if sim is not None:
+            sim.stop()
+
+    latencies = [ms for part, _ in parts for ms in part]
+    errors = sum(e for _, e in parts)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "token")},
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round((len(latencies) - errors) / args.duration, 1),  # successful ones
+        "latency_ms_p50": round(_percentile(latencies, 50) or 0, 1),
+        "latency_ms_p95": round(_percentile(latencies, 95) or 0, 1),
+        "latency_ms_p99": round(_percentile(latencies, 99) or 0, 1),
+        "latency_ms_max": round(max(latencies, default=0), 1),
+        "streams_connected_at_end": streams_connected,
+        "streams_rejected": streams_rejected,
+        "stream_events": stream_events,
+    }
+
+
+def _print_report(report: dict):
+    cfg = report["config"]
+    target = cfg["url"] or f"{cfg['workers']} x {cfg['worker_class']} workers" + (
+        f", {cfg['threads']} threads each" if cfg["worker_class"] == "gthread" else "")
+    print(f"{'target':>26}: {target}")
+    print(f"{'clients':>26}: {cfg['clients']} on GET {cfg['path']} for {cfg['duration']}s")
+    for name in ("requests", "errors", "requests_per_second", "latency_ms_p50", "latency_ms_p95",
+                 "latency_ms_p99", "latency_ms_max"):
+        print(f"{name:>26}: {report[name]}")
+    if cfg["streams"]:
+        print(f"{'streams_connected_at_end':>26}: {report['streams_connected_at_end']} / {cfg['streams']}")
+        print(f"{'streams_rejected':>26}: {report['streams_rejected']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=500, help="concurrent monitoring clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of load before measuring")
+    parser.add_argument("--path", default="/health", help="endpoint every client requests")
+    parser.add_argument("--streams", type=int, default=0, help="/health/stream connections held open meanwhile")
+    parser.add_argument("--client-procs", type=int, default=min(4, os.cpu_count() or 1),
+                        help="processes the client threads are spread over")
+    parser.add_argument("--url", default=None, help="load an already-running server instead of starting one")
+    parser.add_argument("--token", default=None, help="HEALTH_ENDPOINT_TOKEN to send (and set, when starting one)")
+    parser.add_argument("--workers", type=int, default=4, help="Gunicorn workers (the Docker image runs 4)")
+    parser.add_argument("--worker-class", default="gthread", choices=("gthread", "sync"))
+    parser.add_argument("--threads", type=int, default=16, help="threads per gthread worker")
+    parser.add_argument("--devices", type=int, default=200, help="simulated tailnet size")
+    parser.add_argument("--poll-interval", type=int, default=10, help="POLL_INTERVAL_SECONDS during the run")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="fail if p99 latency exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    if args.max_p99_ms is not None and report["latency_ms_p99"] > args.max_p99_ms:
+        print(f"\nFAIL: p99 latency {report['latency_ms_p99']} ms exceeds the {args.max_p99_ms} ms budget",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Drive full poll cycles against tools/tailscale_sim.py and report the cost.
+
+Sizing aid for deployments: runs the real poller.run_poll_cycle() (real
+healthcheck.py, real SQLite, real HTTP) against a simulated fleet in a
+throwaway database and reports, per cycle and in aggregate:
+
+  - cycle latency (wall clock around run_poll_cycle())
+  - DB write volume: rows changed (sqlite total_changes), connections /
+    transactions opened, and database + WAL growth on disk
+  - memory: Python heap (tracemalloc current/peak) and process max RSS
+
+    python -m tools.poller_loadtest --devices 5000 --churn 0.02 --cycles 20
+    python -m tools.poller_loadtest --devices 2000 --fault-5xx 0.1 --drop 0.05 --json
+
+Run from the repository root. Nothing here touches /data or any real tailnet:
+DATABASE_PATH and TAILSCALE_API_URL are pointed at a temp dir and the local
+simulator before healthcheck.py is imported.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from tools.tailscale_sim import TailscaleSimulator, add_config_arguments, config_from_args  # noqa: E402
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _disk_bytes(db_path: str) -> int:
+    total = 0
+    for suffix in ("", "-wal"):
+        try:
+            total += os.path.getsize(db_path + suffix)
+        except OSError:
+            pass
+    return total
+
+
+class _WriteCounter:
+    """Counts DB work by wrapping dbstore.get_connection(): every connection
+    the app opens is one transaction (get_connection() commits on exit), and
+    its total_changes at that point is the number of rows it wrote."""
+
+    def __init__(self, dbstore):
+        self.connections = 0
+        self.rows = 0
+        self._original = dbstore.get_connection
+        counter = self
+
+        @contextmanager
+        def counting_connection():
+            with counter._original() as conn:
+                counter.connections += 1
+                yield conn
+                counter.rows += conn.total_changes
+
+        dbstore.get_connection = counting_connection
+
+    def snapshot(self):
+        return self.connections, self.rows
+
+
+def run(args) -> dict:
+    sim = TailscaleSimulator(config_from_args(args)).start()
+    workdir = tempfile.mkdtemp(prefix="poller-loadtest-")
+    db_path = os.path.join(workdir, "healthcheck.db")
+    env = {
+        "DATABASE_PATH": db_path,
+        "TAILSCALE_API_URL": sim.url,
+        "TAILNET_DOMAIN": args.tailnet,
+        "RATE_LIMIT_ENABLED": "NO",
+        "LOG_LEVEL": args.log_level,
+        "BACKOFF_BASE_SECONDS": str(args.backoff_base),
+        "BACKOFF_JITTER_SECONDS": "0",
+    }
+    if args.oauth:
+        env.update({"OAUTH_CLIENT_ID": "sim-client", "OAUTH_CLIENT_SECRET": "sim-secret"})
+    else:
+        env["AUTH_TOKEN"] = "sim-static-token"
+    os.environ.update(env)
+
+    tracemalloc.start()
+    import dbstore
+    import healthcheck  # noqa: F401 - imported for its module-level app/settings bootstrap
+    import poller
+
+    counter = _WriteCounter(dbstore)
+    cycles = []
+    try:
+        for i in range(1, args.cycles + 1):
+            conns_before, rows_before = counter.snapshot()
+            disk_before = _disk_bytes(db_path)
+            started = time.perf_counter()
+            poller.run_poll_cycle()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            conns_after, rows_after = counter.snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            cycles.append({
+                "cycle": i,
+                "latency_ms": round(elapsed_ms, 1),
+                "rows_written": rows_after - rows_before,
+                "transactions": conns_after - conns_before,
+                "disk_growth_bytes": _disk_bytes(db_path) - disk_before,
+                "heap_current_mb": round(current / 1e6, 2),
+                "heap_peak_mb": round(peak / 1e6, 2),
+                "poll_ok": dbstore.get_poll_status().get("ok"),
+            })
+            if args.interval:
+                time.sleep(args.interval)
+    finally:
+        sim.stop()
+        tracemalloc.stop()
+
+    latencies = [c["latency_ms"] for c in cycles]
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    maxrss_mb = maxrss / 1e6 if sys.platform == "darwin" else maxrss / 1024
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json",)},
+        "cycles": cycles,
+        "summary": {
+            "latency_ms_p50": _percentile(latencies, 50),
+            "latency_ms_p95": _percentile(latencies, 95),
+            "latency_ms_max": max(latencies) if latencies else None,
+            "rows_written_mean": round(statistics.mean(c["rows_written"] for c in cycles), 1) if cycles else None,
+            "transactions_mean": round(statistics.mean(c["transactions"] for c in cycles), 1) if cycles else None,
+            "db_bytes_final": _disk_bytes(db_path),
+            "heap_peak_mb": max((c["heap_peak_mb"] for c in cycles), default=None),
+            "max_rss_mb": round(maxrss_mb, 1),
+            "failed_cycles": sum(1 for c in cycles if c["poll_ok"] is False),
+            "simulator_requests": dict(sim.state.counters),
+        },
+        "database_path": db_path,
+    }
+
+
+def _print_report(report: dict):
+    cols = ("cycle", "latency_ms", "rows_written", "transactions", "disk_growth_bytes", "heap_peak_mb", "poll_ok")
+    print("  ".join(f"{c:>17}" for c in cols))
+    for row in report["cycles"]:
+        print("  ".join(f"{str(row[c]):>17}" for c in cols))
+    print()
+    for name, value in report["summary"].items():
+        print(f"{name:>22}: {value}")
+    print(f"{'database':>22}: {report['database_path']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_config_arguments(parser)
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds to sleep between cycles")
+    parser.add_argument("--oauth", action="store_true", help="authenticate via the simulated OAuth token endpoint")
+    parser.add_argument("--backoff-base", type=float, default=0.05, help="BACKOFF_BASE_SECONDS for the run")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
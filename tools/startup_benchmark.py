@@ -0,0 +1,130 @@
+"""Measure how long a process takes to load healthcheck.py, and fail past a budget.
+
+Every Gunicorn worker (and the dedicated poller process) pays this on boot and
+again on every recycle, so it is worth keeping an eye on. Each run is a fresh
+interpreter importing healthcheck against a throwaway database, under
+`python -X importtime`, and the report breaks the time down into:
+
+  - imports: the heaviest modules by cumulative import time
+  - phases: healthcheck.STARTUP_TIMINGS (init_db, sync_env_settings, app
+    setup, route registration) - the same breakdown a worker logs at startup
+  - wall: the whole `import healthcheck`, first boot (which creates the
+    schema) reported apart from the warm boots that follow it
+
+    python -m tools.startup_benchmark --runs 7
+    python -m tools.startup_benchmark --runs 7 --max-ms 800 --json
+
+With --max-ms the exit status is 1 when the median warm boot exceeds the
+budget, so it can gate CI as a regression check. Run from the repository root.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+_PROBE = (
+    "import json, time\n"
+    "started = time.perf_counter()\n"
+    "import healthcheck\n"
+    "print(json.dumps({'wall_ms': (time.perf_counter() - started) * 1000,"
+    " 'phases': healthcheck.STARTUP_TIMINGS}))\n"
+)
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """{module: cumulative microseconds} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = [f.strip() for f in line[len("import time:"):].split("|")]
+        if len(fields) != 3 or not fields[1].isdigit():
+            continue  # the header line
+        modules[fields[2]] = int(fields[1])
+    return modules
+
+
+def boot_once(db_path: str, env: dict = None) -> dict:
+    """Import healthcheck in a fresh interpreter; returns its wall time,
+    STARTUP_TIMINGS phases and per-module import times."""
+    child_env = dict(os.environ)
+    child_env.update({"DATABASE_PATH": db_path, "LOG_LEVEL": "WARNING"})
+    child_env.update(env or {})
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=_ROOT, env=child_env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports_us"] = _parse_importtime(proc.stderr)
+    return result
+
+
+def run(args) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="startup-benchmark-"), "healthcheck.db")
+    env = {"RATE_LIMIT_ENABLED": "YES" if args.rate_limit else "NO"}
+    boots = [boot_once(db_path, env) for _ in range(max(2, args.runs + 1))]
+    first, warm = boots[0], boots[1:]
+
+    phases = {
+        phase: round(statistics.median(b["phases"].get(phase, 0) for b in warm), 1)
+        for phase in warm[0]["phases"]
+    }
+    imports = {}
+    for boot in warm:
+        for module, us in boot["imports_us"].items():
+            imports.setdefault(module, []).append(us)
+    # Top-level packages only: a submodule's time is already in its parent's.
+    heaviest = sorted(
+        ((m, statistics.median(v) / 1000) for m, v in imports.items() if "." not in m and m != "healthcheck"),
+        key=lambda item: item[1], reverse=True,
+    )[:args.top]
+    return {
+        "first_boot_ms": round(first["wall_ms"], 1),
+        "warm_boot_ms_median": round(statistics.median(b["wall_ms"] for b in warm), 1),
+        "warm_boot_ms_max": round(max(b["wall_ms"] for b in warm), 1),
+        "phases_ms_median": phases,
+        "heaviest_imports_ms": {m: round(ms, 1) for m, ms in heaviest},
+        "modules": sorted(imports),
+        "runs": len(warm),
+    }
+
+
+def _print_report(report: dict):
+    print(f"{'first boot':>24}: {report['first_boot_ms']} ms")
+    print(f"{'warm boot (median)':>24}: {report['warm_boot_ms_median']} ms over {report['runs']} runs")
+    print(f"{'warm boot (max)':>24}: {report['warm_boot_ms_max']} ms")
+    print("\nphases (median ms, after imports):")
+    for phase, ms in report["phases_ms_median"].items():
+        print(f"{phase:>24}: {ms}")
+    print("\nheaviest imports (median cumulative ms; -X importtime inflates these):")
+    for module, ms in report["heaviest_imports_ms"].items():
+        print(f"{module:>24}: {ms}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="warm boots to measure (after one first boot)")
+    parser.add_argument("--top", type=int, default=10, help="how many of the heaviest imports to list")
+    parser.add_argument("--rate-limit", action="store_true", help="boot with RATE_LIMIT_ENABLED=YES")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the median warm boot exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    if args.max_ms is not None and report["warm_boot_ms_median"] > args.max_ms:
+        print(f"\nFAIL: median warm boot {report['warm_boot_ms_median']} ms exceeds the {args.max_ms} ms budget",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
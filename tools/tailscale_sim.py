@@ -0,0 +1,370 @@
+"""Local stand-in for the Tailscale API, for load-testing the poller.
+
+Serves the three endpoints this app calls - devices, keys (?all=true) and
+oauth/token - from a deterministic synthetic fleet, so poller.run_poll_cycle()
+can be exercised at realistic scale without a real tailnet:
+
+    python -m tools.tailscale_sim --devices 5000 --churn 0.02 --port 8765
+    TAILSCALE_API_URL=http://127.0.0.1:8765 TAILNET_DOMAIN=sim.example \\
+        AUTH_TOKEN=sim gunicorn ... healthcheck:app
+
+Fleet generation and churn are driven by a seeded random.Random, so the same
+--seed/--devices/--churn always produce the same sequence of device lists
+(one churn step per devices fetch). Faults are drawn from a separate seeded
+stream so toggling them never changes what the fleet looks like.
+
+Injectable faults, each a probability per request:
+  - 401 (the token is rejected; exercises the OAuth refresh path)
+  - 429 with Retry-After, and 5xx (exercise retries and the circuit breaker)
+  - connection drop (the socket is closed with no response at all)
+plus fixed/jittered latency on every response.
+
+Standard library only: this must run anywhere the app's tests run.
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+_OSES = ("linux", "windows", "macOS", "iOS", "android")
+_VERSIONS = ("1.60.0", "1.62.1", "1.64.2", "1.66.0")
+_LATEST_VERSION = _VERSIONS[-1]
+_TAGS = ("tag:prod", "tag:staging", "tag:dev", "tag:server", "tag:laptop")
+
+
+@dataclass
+class SimConfig:
+    devices: int = 100
+    keys: int = 10
+    seed: int = 1
+    # Fraction of the fleet mutated per devices fetch (0.02 = 2% per cycle).
+    churn_rate: float = 0.0
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    fault_401_rate: float = 0.0
+    fault_429_rate: float = 0.0
+    fault_5xx_rate: float = 0.0
+    drop_rate: float = 0.0
+    retry_after_seconds: int = 1
+    token_ttl_seconds: int = 3600
+    tailnet: str = "sim.example"
+
+
+class Fleet:
+    """Deterministic synthetic fleet. `advance()` applies one churn step."""
+
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._next_id = 0
+        self.generation = 0
+        self.devices = [self._new_device() for _ in range(config.devices)]
+        self.keys = [self._new_key(i) for i in range(config.keys)]
+
+    def _iso(self, dt: datetime) -> str:
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _new_device(self) -> dict:
+        rng = self._rng
+        self._next_id += 1
+        n = self._next_id
+        version = rng.choice(_VERSIONS)
+        tags = sorted(rng.sample(_TAGS, rng.randint(0, 2)))
+        key_expiry_disabled = rng.random() < 0.3
+        return {
+            "id": f"sim{n:08d}",
+            "nodeId": f"nSim{n:08d}",
+            "name": f"host-{n:05d}.{self.config.tailnet}",
+            "hostname": f"host-{n:05d}",
+            "os": rng.choice(_OSES),
+            "clientVersion": version,
+            "updateAvailable": version != _LATEST_VERSION,
+            "connectedToControl": rng.random() < 0.9,
+            # Relative to real "now" so online-threshold health stays
+            # meaningful however long the simulator has been running.
+            "lastSeen": self._iso(datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, 600))),
+            "keyExpiryDisabled": key_expiry_disabled,
+            "expires": None if key_expiry_disabled else self._iso(
+                datetime.now(timezone.utc) + timedelta(days=rng.randint(30, 365))
+            ),
+            "tags": tags,
+            "tailnetLockError": "",
+        }
+
+    def _new_key(self, i: int) -> dict:
+        rng = self._rng
+        created = self._epoch + timedelta(days=rng.randint(0, 60))
+        return {
+            "id": f"kSim{i:05d}",
+            "description": f"sim key {i}",
+            "keyType": "auth" if i % 3 else "api",
+            "capabilities": {"devices": {"create": {"reusable": True}}} if i % 3 else {},
+            "created": self._iso(created),
+            "expires": self._iso(datetime.now(timezone.utc) + timedelta(days=rng.randint(1, 180))),
+        }
+
+    def _mutate(self, device: dict):
+        rng = self._rng
+        kind = rng.randrange(5)
+        if kind == 0:
+            device["connectedToControl"] = not device["connectedToControl"]
+        elif kind == 1:
+            device["clientVersion"] = rng.choice(_VERSIONS)
+            device["updateAvailable"] = device["clientVersion"] != _LATEST_VERSION
+        elif kind == 2:
+            device["tags"] = sorted(rng.sample(_TAGS, rng.randint(0, 2)))
+        elif kind == 3:
+            device["tailnetLockError"] = "" if device["tailnetLockError"] else "node key not signed"
+        else:
+            device["name"] = f"{device['hostname']}-{rng.randint(0, 99)}.{self.config.tailnet}"
+
+    def advance(self):
+        """One churn step: mutate ~churn_rate of the fleet, and replace a
+        small share of it outright (removed + newly enrolled devices), so
+        both the update and the created/removed audit paths see traffic."""
+        self.generation += 1
+        if not self.devices or self.config.churn_rate <= 0:
+            return
+        rng = self._rng
+        n_changed = max(1, int(round(len(self.devices) * self.config.churn_rate)))
+        for idx in rng.sample(range(len(self.devices)), min(n_changed, len(self.devices))):
+            self._mutate(self.devices[idx])
+        n_replaced = n_changed // 10
+        for _ in range(n_replaced):
+            self.devices.pop(rng.randrange(len(self.devices)))
+            self.devices.append(self._new_device())
+        now = self._iso(datetime.now(timezone.utc))
+        for d in self.devices:
+            if d["connectedToControl"]:
+                d["lastSeen"] = now
+
+
+class SimState:
+    """Shared, lock-protected simulator state plus request counters."""
+
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self.fleet = Fleet(config)
+        self.lock = threading.Lock()
+        self._fault_rng = random.Random(config.seed + 7919)
+        self._token_seq = 0
+        self.tokens = {}
+        self.counters = {}
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def draw_fault(self):
+        """Return None or one of "drop", "401", "429", "5xx" for this request."""
+        cfg = self.config
+        with self.lock:
+            roll = self._fault_rng.random()
+        for name, rate in (
+            ("drop", cfg.drop_rate), ("401", cfg.fault_401_rate),
+            ("429", cfg.fault_429_rate), ("5xx", cfg.fault_5xx_rate),
+        ):
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+    def latency(self) -> float:
+        cfg = self.config
+        if cfg.latency_ms <= 0 and cfg.latency_jitter_ms <= 0:
+            return 0.0
+        with self.lock:
+            jitter = self._fault_rng.uniform(0, cfg.latency_jitter_ms) if cfg.latency_jitter_ms > 0 else 0.0
+        return (cfg.latency_ms + jitter) / 1000.0
+
+    def issue_token(self) -> dict:
+        with self.lock:
+            self._token_seq += 1
+            token = f"sim-oauth-{self._token_seq}"
+            self.tokens[token] = time.time() + self.config.token_ttl_seconds
+        return {"access_token": token, "token_type": "Bearer", "expires_in": self.config.token_ttl_seconds}
+
+    def token_ok(self, header: str) -> bool:
+        """Any bearer token is accepted (static AUTH_TOKEN installs), except
+        a simulator-issued OAuth token past its expiry."""
+        if not header.startswith("Bearer "):
+            return False
+        token = header[len("Bearer "):]
+        expires = self.tokens.get(token)
+        return expires is None or expires > time.time()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "TailscaleSim/1"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> SimState:
+        return self.server.sim_state
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+        pass  # per-request access logs would swamp a load test
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drop(self):
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _apply_faults(self) -> bool:
+        """Sleep the configured latency, then maybe inject a fault. Returns
+        True if a fault response was sent (the caller must stop)."""
+        delay = self.state.latency()
+        if delay:
+            time.sleep(delay)
+        fault = self.state.draw_fault()
+        if fault is None:
+            return False
+        self.state.count(f"fault_{fault}")
+        if fault == "drop":
+            self._drop()
+        elif fault == "401":
+            self._send_json(401, {"message": "simulated: token rejected"})
+        elif fault == "429":
+            self._send_json(
+                429, {"message": "simulated: rate limited"},
+                {"Retry-After": str(self.state.config.retry_after_seconds)},
+            )
+        else:
+            self._send_json(503, {"message": "simulated: service unavailable"})
+        return True
+
+    def do_POST(self):  # noqa: N802 - BaseHTTPRequestHandler naming
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if urlsplit(self.path).path != "/api/v2/oauth/token":
+            self._send_json(404, {"message": "not found"})
+            return
+        self.state.count("oauth_token")
+        if self._apply_faults():
+            return
+        self._send_json(200, self.state.issue_token())
+
+    def do_GET(self):  # noqa: N802 - BaseHTTPRequestHandler naming
+        path = urlsplit(self.path).path
+        prefix = "/api/v2/tailnet/"
+        if not path.startswith(prefix) or not path.endswith(("/devices", "/keys")):
+            self._send_json(404, {"message": "not found"})
+            return
+        resource = path.rsplit("/", 1)[1]
+        self.state.count(resource)
+        if self._apply_faults():
+            return
+        if not self.state.token_ok(self.headers.get("Authorization", "")):
+            self._send_json(401, {"message": "token expired"})
+            return
+        with self.state.lock:
+            if resource == "devices":
+                self.state.fleet.advance()
+                payload = {"devices": [dict(d) for d in self.state.fleet.devices]}
+            else:
+                payload = {"keys": [dict(k) for k in self.state.fleet.keys]}
+        self._send_json(200, payload)
+
+
+class TailscaleSimulator:
+    """Run the simulator on a background thread:
+
+        with TailscaleSimulator(SimConfig(devices=1000)) as sim:
+            os.environ["TAILSCALE_API_URL"] = sim.url
+    """
+
+    def __init__(self, config: SimConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or SimConfig()
+        self.state = SimState(self.config)
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.sim_state = self.state
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tailscale-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Shared by this module's CLI and tools/poller_loadtest.py."""
+    defaults = SimConfig()
+    parser.add_argument("--devices", type=int, default=defaults.devices)
+    parser.add_argument("--keys", type=int, default=defaults.keys)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--churn", type=float, default=defaults.churn_rate, help="fraction of devices changed per poll")
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-jitter-ms", type=float, default=defaults.latency_jitter_ms)
+    parser.add_argument("--fault-401", type=float, default=defaults.fault_401_rate, help="probability per request")
+    parser.add_argument("--fault-429", type=float, default=defaults.fault_429_rate, help="probability per request")
+    parser.add_argument("--fault-5xx", type=float, default=defaults.fault_5xx_rate, help="probability per request")
+    parser.add_argument("--drop", type=float, default=defaults.drop_rate, help="connection-drop probability per request")
+    parser.add_argument("--retry-after", type=int, default=defaults.retry_after_seconds)
+    parser.add_argument("--token-ttl", type=int, default=defaults.token_ttl_seconds)
+    parser.add_argument("--tailnet", default=defaults.tailnet)
+
+
+def config_from_args(args) -> SimConfig:
+    return SimConfig(
+        devices=args.devices, keys=args.keys, seed=args.seed, churn_rate=args.churn,
+        latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms,
+        fault_401_rate=args.fault_401, fault_429_rate=args.fault_429, fault_5xx_rate=args.fault_5xx,
+        drop_rate=args.drop, retry_after_seconds=args.retry_after, token_ttl_seconds=args.token_ttl,
+        tailnet=args.tailnet,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_config_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+    sim = TailscaleSimulator(config_from_args(args), host=args.host, port=args.port)
+    print(f"Tailscale API simulator on {sim.url} (tailnet {args.tailnet}, {args.devices} devices)", flush=True)
+    try:
+        sim._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
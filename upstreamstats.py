@@ -0,0 +1,131 @@
+"""Statistics for calls to the Tailscale API.
+
+Every outbound Tailscale API request is wrapped in observe(endpoint), which
+records its latency, response size and status code (or that it timed out
+or got no response at all); make_authenticated_request() adds its retries
+and 401-triggered token refreshes with count(). Endpoints are the calls
+the app makes: devices, keys, oauth_token, and credential_validation (the
+setup wizard's trial calls).
+
+Upstream calls are few - a handful per poll cycle - and mostly made by the
+poller, which may be its own process, so each one is written straight to
+SQLite (dbstore.record_upstream_call()) rather than buffered: once into
+its UTC minute, for the last-hour view on /debug, and once into the
+all-time totals /metrics exports as counters and histograms.
+
+Latency uses reqtiming's log-spaced buckets; response sizes use powers of
+two. summarize() turns either back into percentiles, as bucket upper
+bounds, with reqtiming.bucket_percentiles().
+"""
+import logging
+import math
+import time
+
+import requests
+
+import dbstore
+import reqtiming
+
+ENDPOINTS = ("devices", "keys", "oauth_token", "credential_validation")
+
+# Prometheus histogram bounds that are exact bucket boundaries: every 8th
+# latency bucket (0.4 ms x 4^k) and every 2nd size bucket (4^k bytes).
+LATENCY_BOUND_BUCKETS = tuple(range(8, 81, 8))
+BYTES_BOUND_BUCKETS = tuple(range(10, 25, 2))
+
+
+def endpoint_for(url: str) -> str:
+    """The endpoint label for a Tailscale API URL made by this app."""
+    path = url.split("?", 1)[0].rstrip("/")
+    if path.endswith("/oauth/token"):
+        return "oauth_token"
+    last = path.rsplit("/", 1)[-1]
+    return last if last in ("devices", "keys") else "other"
+
+
+def bytes_bucket(size: int) -> int:
+    return 0 if size <= 1 else math.ceil(math.log2(size))
+
+
+def _response_size(response) -> int:
+    try:
+        return len(response.content or b"")
+    except (AttributeError, TypeError, RuntimeError):
+        return 0
+
+
+class observe:
+    """Context manager around one HTTP request; assign the response to
+    `.response` inside the block. Exceptions pass through untouched."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.response = None
+        self._phase = reqtiming.phase("upstream")
+
+    def __enter__(self):
+        self._phase.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+        self._phase.__exit__(exc_type, exc, tb)
+        values = {
+            ("calls", ""): 1,
+            ("latency_bucket", str(reqtiming.bucket_for(elapsed_ms))): 1,
+            ("latency_sum_us", ""): int(elapsed_ms * 1000),
+        }
+        status = getattr(self.response, "status_code", None) if exc_type is None else None
+        if status is None:
+            values[("status", "none")] = 1
+            if exc_type is not None and issubclass(exc_type, requests.exceptions.Timeout):
+                values[("timeouts", "")] = 1
+        else:
+            size = _response_size(self.response)
+            values[("status", str(status))] = 1
+            values[("bytes_bucket", str(bytes_bucket(size)))] = 1
+            values[("bytes_sum", "")] = size
+        _record(self.endpoint, values)
+        return False
+
+
+def count(endpoint: str, metric: str, n: int = 1):
+    """Add to one of the per-call counters: retries, auth_refreshes."""
+    _record(endpoint, {(metric, ""): n})
+
+
+def _record(endpoint, values):
+    try:
+        dbstore.record_upstream_call(endpoint, values)
+    except Exception as e:  # pragma: no cover - defensive; statistics must never fail an API call
+        logging.warning(f"Failed to record Tailscale API call statistics: {e}")
+
+
+def summarize(values: dict) -> dict:
+    """One endpoint's {(metric, key): value} as the debug API shows it."""
+    def buckets(metric):
+        return {int(key): n for (m, key), n in values.items() if m == metric}
+
+    status = {key: n for (metric, key), n in values.items() if metric == "status"}
+    latency = reqtiming.bucket_percentiles(buckets("latency_bucket"), lambda b: round(reqtiming.bucket_upper_ms(b), 1))
+    sizes = reqtiming.bucket_percentiles(buckets("bytes_bucket"), lambda b: 2 ** b)
+    calls = values.get(("calls", ""), 0)
+    return {
+        "calls": calls,
+        "errors": sum(n for key, n in status.items() if key == "none" or int(key) >= 400),
+        "timeouts": values.get(("timeouts", ""), 0),
+        "retries": values.get(("retries", ""), 0),
+        "auth_refreshes": values.get(("auth_refreshes", ""), 0),
+        "status": dict(sorted(status.items())),
+        "latency_ms": {**latency, "mean": round(values.get(("latency_sum_us", ""), 0) / 1000 / calls, 1) if calls else None},
+        "response_bytes": {"p50": sizes["p50"], "p95": sizes["p95"], "max": sizes["max"],
+                           "total": values.get(("bytes_sum", ""), 0)},
+    }
+
+
+def cumulative(values: dict, metric: str, bound_buckets) -> list:
+    """[(bound bucket, count of observations in buckets <= it)] for a
+    Prometheus histogram; the +Inf count is the sum of all buckets."""
+    counts = {int(key): n for (m, key), n in values.items() if m == metric}
+    return [(bound, sum(n for bucket, n in counts.items() if bucket <= bound)) for bound in bound_buckets]